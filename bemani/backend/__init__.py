@@ -1,9 +1,14 @@
-from bemani.backend.dispatch import Dispatch, UnrecognizedPCBIDException
+from bemani.backend.dispatch import (
+    Dispatch,
+    DispatchTable,
+    UnrecognizedPCBIDException,
+)
 from bemani.backend.base import Base
 
 
 __all__ = [
     "Dispatch",
+    "DispatchTable",
     "UnrecognizedPCBIDException",
     "Base",
 ]
@@ -254,6 +254,15 @@ class Base(ABC):
         """
         return {}
 
+    @classmethod
+    def all_classes(cls) -> Iterator[Type["Base"]]:
+        """
+        Given all registered factories, iterate over every game class they manage.
+        """
+        for factory in cls.__registered_handlers:
+            for game in factory.MANAGED_CLASSES:
+                yield game
+
     @classmethod
     def all_games(cls) -> Iterator[Tuple[GameConstants, int, str]]:
         """
@@ -309,6 +318,23 @@ class Base(ABC):
         """
         return self.data.remote.user.get_profile(self.game, self.version, userid)
 
+    def get_profiles(
+        self, userids: List[UserID]
+    ) -> List[Tuple[UserID, Optional[Profile]]]:
+        """
+        Does the identical thing to the above function, but takes a list of user IDs to
+        fetch in bulk.
+
+        Parameters:
+            userids - List of user IDs we are getting the profile for.
+
+        Returns:
+            A list of tuples with the User ID and dictionary representing the user's profile,
+            or None if the user has no profile for this game/version.
+        """
+        userids = list(set(userids))
+        return self.data.remote.user.get_profiles(self.game, self.version, userids)
+
     def get_any_profile(self, userid: UserID) -> Profile:
         """
         Return ANY profile for a user in a game series.
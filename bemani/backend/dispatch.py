@@ -1,7 +1,8 @@
-from typing import Optional, Any
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+from typing_extensions import Final
 
 from bemani.backend.base import Base, Status
-from bemani.common import Model
+from bemani.common import Model, RequestProfile
 from bemani.protocol import Node
 from bemani.data import Config, Data
 
@@ -13,6 +14,128 @@ class UnrecognizedPCBIDException(Exception):
         self.ip = ip
 
 
+class Route:
+    """
+    A resolved handler for a particular game class, service and method.
+    """
+
+    def __init__(
+        self, name: str, handler: Callable[[Base, Node], Optional[Node]]
+    ) -> None:
+        self.name = name
+        self.handler = handler
+
+
+class DispatchTable:
+    """
+    Caches everything about routing a packet that depends only on the model string,
+    service and method, so that dispatching a packet is a few dictionary lookups
+    instead of parsing, factory lookups, string formatting and reflection. Handler
+    tables for every registered game class are built once by precompute(), and the
+    game class for each model string is remembered after the first time a factory
+    resolves it. Game factories pick classes based only on the model, so this is safe.
+    """
+
+    # Bounds on the caches keyed by values that come from packets, since a misbehaving
+    # client can send us any model, service or method it wants.
+    MODEL_CACHE_SIZE: Final[int] = 1024
+    ROUTE_CACHE_SIZE: Final[int] = 16384
+
+    __handlers: Dict[Type[Base], Dict[str, Callable[[Base, Node], Optional[Node]]]] = {}
+    __models: Dict[str, Model] = {}
+    __classes: Dict[str, Optional[Type[Base]]] = {}
+    __routes: Dict[
+        Tuple[Type[Base], str, Optional[str]], Tuple[Optional[Route], Optional[Route]]
+    ] = {}
+
+    @classmethod
+    def precompute(cls) -> None:
+        """
+        Build handler tables for the base class and every game class managed by a
+        registered factory. Should be called after games are registered.
+        """
+        cls.__routes = {}
+        cls.__models = {}
+        cls.__classes = {}
+        cls.__handlers = {}
+        cls.handlers(Base)
+        for game in Base.all_classes():
+            cls.handlers(game)
+
+    @classmethod
+    def handlers(
+        cls, game: Type[Base]
+    ) -> Dict[str, Callable[[Base, Node], Optional[Node]]]:
+        """
+        Return every handle_<service>_<method>_request and handle_<service>_requests
+        function on a game class, keyed by name.
+        """
+        handlers = cls.__handlers.get(game)
+        if handlers is None:
+            handlers = {
+                name: getattr(game, name)
+                for name in dir(game)
+                if name.startswith("handle_")
+                and (name.endswith("_request") or name.endswith("_requests"))
+            }
+            cls.__handlers[game] = handlers
+        return handlers
+
+    @classmethod
+    def model(cls, modelstring: str) -> Model:
+        """
+        Return the parsed model for a model string.
+        """
+        model = cls.__models.get(modelstring)
+        if model is None:
+            model = Model.from_modelstring(modelstring)
+            if len(cls.__models) >= cls.MODEL_CACHE_SIZE:
+                cls.__models = {}
+                cls.__classes = {}
+            cls.__models[modelstring] = model
+        return model
+
+    @classmethod
+    def create(cls, data: Data, config: Config, modelstring: str) -> Optional[Base]:
+        """
+        Instantiate the game class for a model string, asking the registered factory
+        the first time a model string is seen.
+        """
+        model = cls.model(modelstring)
+        if modelstring in cls.__classes:
+            game_class = cls.__classes[modelstring]
+            if game_class is None:
+                return None
+            return game_class(data, config, model)
+
+        game = Base.create(data, config, model)
+        cls.__classes[modelstring] = type(game) if game is not None else None
+        return game
+
+    @classmethod
+    def routes(
+        cls, game: Type[Base], service: str, method: Optional[str]
+    ) -> Tuple[Optional[Route], Optional[Route]]:
+        """
+        Return the specific method handler and the generic service handler for a
+        service and method on a game class, either of which may be None.
+        """
+        key = (game, service, method)
+        routes = cls.__routes.get(key)
+        if routes is None:
+            handlers = cls.handlers(game)
+            specific = f"handle_{service}_{method}_request"
+            generic = f"handle_{service}_requests"
+            routes = (
+                Route(specific, handlers[specific]) if specific in handlers else None,
+                Route(generic, handlers[generic]) if generic in handlers else None,
+            )
+            if len(cls.__routes) >= cls.ROUTE_CACHE_SIZE:
+                cls.__routes = {}
+            cls.__routes[key] = routes
+        return routes
+
+
 class Dispatch:
     """
     Dispatch object responsible for taking a decoded tree of Node objects
@@ -72,11 +195,13 @@ class Dispatch:
             return None
 
         modelstring = tree.attribute("model")
-        model = Model.from_modelstring(modelstring)
+        DispatchTable.model(modelstring)
         pcbid = tree.attribute("srcid")
+        RequestProfile.tag(model=modelstring)
 
         # If we are enforcing, bail out if we don't recognize thie ID
-        pcb = self.__data.local.machine.get_machine(pcbid)
+        with RequestProfile.phase("pcbid"):
+            pcb = self.__data.local.machine.get_machine(pcbid)
         if self.__config.server.enforce_pcbid and pcb is None:
             self.log("Unrecognized PCBID {}", pcbid)
             raise UnrecognizedPCBIDException(
@@ -89,24 +214,28 @@ class Dispatch:
 
         request = tree.children[0]
 
-        config = self.__config.clone()
-        config["machine"] = {
-            "pcbid": pcbid,
-            "arcade": pcb.arcade,
-        }
+        config = self.__config.overlay(
+            machine={
+                "pcbid": pcbid,
+                "arcade": pcb.arcade,
+            }
+        )
 
         # If the machine we looked up is in an arcade, override the global
         # paseli settings with the arcade paseli settings.
         if pcb.arcade is not None:
             arcade = self.__data.local.machine.get_arcade(pcb.arcade)
             if arcade is not None:
-                config["paseli"]["enabled"] = arcade.data.get_bool("paseli_enabled")
-                config["paseli"]["infinite"] = arcade.data.get_bool("paseli_infinite")
+                config["paseli"] = {
+                    **config.get("paseli", {}),
+                    "enabled": arcade.data.get_bool("paseli_enabled"),
+                    "infinite": arcade.data.get_bool("paseli_infinite"),
+                }
                 if arcade.data.get_bool("mask_services_url"):
                     # Mask the address, no matter what the server settings are
-                    config["server"]["uri"] = None
+                    config["server"] = {**config.get("server", {}), "uri": None}
 
-        game = Base.create(self.__data, config, model)
+        game = DispatchTable.create(self.__data, config, modelstring)
         method = request.attribute("method")
         response = None
 
@@ -149,22 +278,22 @@ class Dispatch:
                         pcbid, modelstring, config.client.address
                     )
 
+        if game is None:
+            specific, generic = None, None
+        else:
+            specific, generic = DispatchTable.routes(type(game), request.name, method)
+
         # First, try to handle with specific service/method function
-        try:
-            handler = getattr(game, f"handle_{request.name}_{method}_request")
-        except AttributeError:
-            handler = None
-        if handler is not None:
-            response = handler(request)
+        if game is not None and specific is not None:
+            RequestProfile.tag(handler=specific.name)
+            with RequestProfile.phase("handler"):
+                response = specific.handler(game, request)
 
-        if response is None:
+        if game is not None and response is None and generic is not None:
             # Now, try to pass it off to a generic service handler
-            try:
-                handler = getattr(game, f"handle_{request.name}_requests")
-            except AttributeError:
-                handler = None
-            if handler is not None:
-                response = handler(request)
+            RequestProfile.tag(handler=generic.name)
+            with RequestProfile.phase("handler"):
+                response = generic.handler(game, request)
 
         if response is None:
             # Unrecognized handler
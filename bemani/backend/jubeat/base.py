@@ -1,13 +1,14 @@
 # vim: set fileencoding=utf-8
 import random
 import struct
-from typing import Dict, Iterable, List, Optional, Set, Tuple
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from typing_extensions import Final
 
 from bemani.backend.base import Base
 from bemani.backend.core import CoreHandler, CardManagerHandler, PASELIHandler
 from bemani.common import DBConstants, GameConstants, ValidatedDict, Model, Profile
-from bemani.data import Data, Score, UserID, Config
+from bemani.data import Attempt, Data, Score, UserID, Config
 from bemani.protocol import Node
 
 
@@ -52,6 +53,7 @@ class JubeatBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             self.omnimix = True
         else:
             self.omnimix = False
+        self.__pending_scores: Optional[List[Tuple[UserID, Attempt, Attempt]]] = None
 
     @property
     def music_version(self) -> int:
@@ -178,6 +180,39 @@ class JubeatBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             return None
         return self.format_scores(userid, profile, scores)
 
+    @contextmanager
+    def score_batch(self) -> Iterator[None]:
+        """
+        Defer the writes made by update_score until the end of the block, and then save
+        every score and attempt in bulk. Later updates in the block still see scores
+        updated earlier in the block. If the block raises, nothing is saved.
+        """
+        if self.__pending_scores is not None:
+            # Already batching, the outermost block will save everything.
+            yield
+            return
+
+        self.__pending_scores = []
+        try:
+            yield
+            pending = self.__pending_scores
+        finally:
+            self.__pending_scores = None
+
+        for userid in dict.fromkeys(userid for userid, _, _ in pending):
+            self.data.local.music.put_scores(
+                self.game,
+                self.music_version,
+                userid,
+                [score for uid, score, _ in pending if uid == userid],
+            )
+            self.data.local.music.put_attempts(
+                self.game,
+                self.music_version,
+                userid,
+                [attempt for uid, _, attempt in pending if uid == userid],
+            )
+
     def update_score(
         self,
         userid: UserID,
@@ -207,13 +242,15 @@ class JubeatBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
         ]:
             raise Exception(f"Invalid medal value {medal}")
 
-        oldscore = self.data.local.music.get_score(
-            self.game,
-            self.music_version,
-            userid,
-            songid,
-            chart,
-        )
+        oldscore = self.__get_pending_score(userid, songid, chart)
+        if oldscore is None:
+            oldscore = self.data.local.music.get_score(
+                self.game,
+                self.music_version,
+                userid,
+                songid,
+                chart,
+            )
 
         # Score history is verbatum, instead of highest score
         history = ValidatedDict({})
@@ -268,6 +305,21 @@ class JubeatBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
         # Look up where this score was earned
         lid = self.get_machine_id()
 
+        if self.__pending_scores is not None:
+            # Save these at the end of the batch instead.
+            self.__pending_scores.append(
+                (
+                    userid,
+                    Attempt(
+                        0, songid, chart, points, timestamp, lid, highscore, scoredata
+                    ),
+                    Attempt(
+                        0, songid, chart, oldpoints, timestamp, lid, raised, history
+                    ),
+                )
+            )
+            return
+
         # Write the new score back
         self.data.local.music.put_score(
             self.game,
@@ -296,6 +348,26 @@ class JubeatBase(CoreHandler, CardManagerHandler, PASELIHandler, Base):
             timestamp=timestamp,
         )
 
+    def __get_pending_score(
+        self, userid: UserID, songid: int, chart: int
+    ) -> Optional[Score]:
+        if not self.__pending_scores:
+            return None
+        for uid, score, _ in reversed(self.__pending_scores):
+            if uid == userid and score.id == songid and score.chart == chart:
+                return Score(
+                    0,
+                    songid,
+                    chart,
+                    score.points,
+                    score.timestamp,
+                    score.timestamp,
+                    score.location,
+                    0,
+                    score.data,
+                )
+        return None
+
     def default_select_jbox(self) -> Set[int]:
         gameitems = self.data.local.game.get_items(self.game, self.version)
         default_main: Set[int] = set()
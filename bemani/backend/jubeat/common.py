@@ -87,7 +87,8 @@ class JubeatGamendRegisterHandler(JubeatBase):
 
         if userid is not None:
             oldprofile = self.get_profile(userid)
-            newprofile = self.unformat_profile(userid, request, oldprofile)
+            with self.score_batch():
+                newprofile = self.unformat_profile(userid, request, oldprofile)
         else:
             newprofile = None
 
@@ -456,6 +456,11 @@ class ReflecBeatGroovin(ReflecBeatBase):
                 self.version,
                 songid=songid,
             )
+            missing_users = [
+                userid for (userid, _) in allscores if userid not in profiles
+            ]
+            for userid, profile in self.get_any_profiles(missing_users):
+                profiles[userid] = profile
 
             for ng in [
                 self.CHART_TYPE_BASIC,
@@ -471,8 +476,6 @@ class ReflecBeatGroovin(ReflecBeatBase):
 
                 for i in range(len(scores)):
                     userid, score = scores[i]
-                    if userid not in profiles:
-                        profiles[userid] = self.get_any_profile(userid)
                     profile = profiles[userid]
 
                     data = Node.void("data")
@@ -1079,11 +1082,17 @@ class ReflecBeatGroovin(ReflecBeatBase):
         rival = Node.void("rival")
         pdata.add_child(rival)
         slotid = 0
+        rivals = {
+            uid: prof
+            for (uid, prof) in self.get_profiles(
+                [link.other_userid for link in links if link.type == "rival"]
+            )
+        }
         for link in links:
             if link.type != "rival":
                 continue
 
-            rprofile = self.get_profile(link.other_userid)
+            rprofile = rivals.get(link.other_userid)
             if rprofile is None:
                 continue
             lobbyinfo = self.data.local.lobby.get_play_session_info(
@@ -814,11 +814,17 @@ class ReflecBeatLimelight(ReflecBeatBase):
         pdata.add_child(rival)
 
         slotid = 0
+        rivals = {
+            uid: prof
+            for (uid, prof) in self.get_profiles(
+                [link.other_userid for link in links if link.type == "rival"]
+            )
+        }
         for link in links:
             if link.type != "rival":
                 continue
 
-            rprofile = self.get_profile(link.other_userid)
+            rprofile = rivals.get(link.other_userid)
             if rprofile is None:
                 continue
 
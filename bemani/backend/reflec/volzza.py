@@ -142,11 +142,17 @@ class ReflecBeatVolzza(ReflecBeatVolzzaBase):
 
         if userid is not None:
             links = self.data.local.user.get_links(self.game, self.version, userid)
+            rivals = {
+                uid: prof
+                for (uid, prof) in self.get_profiles(
+                    [link.other_userid for link in links if link.type == "rival"]
+                )
+            }
             for link in links:
                 if link.type != "rival":
                     continue
 
-                rprofile = self.get_profile(link.other_userid)
+                rprofile = rivals.get(link.other_userid)
                 if rprofile is None:
                     continue
 
@@ -429,11 +435,17 @@ class ReflecBeatVolzza(ReflecBeatVolzzaBase):
         rival = Node.void("rival")
         pdata.add_child(rival)
         slotid = 0
+        rivals = {
+            uid: prof
+            for (uid, prof) in self.get_profiles(
+                [link.other_userid for link in links if link.type == "rival"]
+            )
+        }
         for link in links:
             if link.type != "rival":
                 continue
 
-            rprofile = self.get_profile(link.other_userid)
+            rprofile = rivals.get(link.other_userid)
             if rprofile is None:
                 continue
             lobbyinfo = self.data.local.lobby.get_play_session_info(
@@ -166,11 +166,16 @@ class ReflecBeatVolzza2(ReflecBeatVolzzaBase):
 
         if userid is not None:
             links = self.data.local.user.get_links(self.game, self.version, userid)
+            rivals = dict(
+                self.get_profiles(
+                    [link.other_userid for link in links if link.type == "rival"]
+                )
+            )
             for link in links:
                 if link.type != "rival":
                     continue
 
-                rprofile = self.get_profile(link.other_userid)
+                rprofile = rivals.get(link.other_userid)
                 if rprofile is None:
                     continue
 
@@ -379,7 +384,13 @@ class ReflecBeatVolzza2(ReflecBeatVolzzaBase):
             self.game, self.version, userid
         )
         links = self.data.local.user.get_links(self.game, self.version, userid)
-        rprofiles: Dict[UserID, Profile] = {}
+        rprofiles: Dict[UserID, Profile] = {
+            uid: prof
+            for (uid, prof) in self.get_profiles(
+                [link.other_userid for link in links if link.type == "rival"]
+            )
+            if prof is not None
+        }
         root = Node.void("player")
         pdata = Node.void("pdata")
         root.add_child(pdata)
@@ -461,13 +472,9 @@ class ReflecBeatVolzza2(ReflecBeatVolzzaBase):
             if link.type != "rival":
                 continue
 
-            if link.other_userid not in rprofiles:
-                rprofile = self.get_profile(link.other_userid)
-                if rprofile is None:
-                    continue
-                rprofiles[link.other_userid] = rprofile
-            else:
-                rprofile = rprofiles[link.other_userid]
+            rprofile = rprofiles.get(link.other_userid)
+            if rprofile is None:
+                continue
             lobbyinfo = self.data.local.lobby.get_play_session_info(
                 self.game, self.version, link.other_userid
             )
@@ -772,13 +779,9 @@ class ReflecBeatVolzza2(ReflecBeatVolzzaBase):
             if link.type != "rival":
                 continue
 
-            if link.other_userid not in rprofiles:
-                rprofile = self.get_profile(link.other_userid)
-                if rprofile is None:
-                    continue
-                rprofiles[link.other_userid] = rprofile
-            else:
-                rprofile = rprofiles[link.other_userid]
+            rprofile = rprofiles.get(link.other_userid)
+            if rprofile is None:
+                continue
             mycoursedict = rprofile.get_dict("mycourse")
 
             rec = Node.void("rec")
@@ -234,6 +234,11 @@ class ReflecBeatVolzzaBase(ReflecBeatBase):
                 self.version,
                 songid=songid,
             )
+            missing_users = [
+                userid for (userid, _) in allscores if userid not in profiles
+            ]
+            for userid, profile in self.get_any_profiles(missing_users):
+                profiles[userid] = profile
 
             for ng in [
                 self.CHART_TYPE_BASIC,
@@ -249,8 +254,6 @@ class ReflecBeatVolzzaBase(ReflecBeatBase):
 
                 for i in range(len(scores)):
                     userid, score = scores[i]
-                    if userid not in profiles:
-                        profiles[userid] = self.get_any_profile(userid)
                     profile = profiles[userid]
 
                     data = Node.void("data")
@@ -15,6 +15,8 @@ from bemani.common.aes import AESCipher
 from bemani.common.time import Time
 from bemani.common.parallel import Parallel
 from bemani.common.pe import PEFile
+from bemani.common.profiling import Histogram, Profiler, RequestProfile
+from bemani.common.cache import TTLCache
 
 
 __all__ = [
@@ -37,4 +39,8 @@ __all__ = [
     "Parallel",
     "intish",
     "PEFile",
+    "Histogram",
+    "Profiler",
+    "RequestProfile",
+    "TTLCache",
 ]
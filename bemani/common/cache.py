@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    A small thread-safe, size-bounded cache whose entries expire after a per-entry
+    time to live. Intended to be shared by everything in a process, so lookups and
+    invalidations are counted to make it possible to judge whether it is pulling
+    its weight.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        """
+        Initialize the cache.
+
+        Parameters:
+            maxsize - The maximum number of entries kept. The least recently used
+                      entry is evicted to make room for a new one.
+        """
+        self.maxsize = maxsize
+        self.__lock = threading.Lock()
+        self.__entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.__generation = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__expirations = 0
+        self.__invalidations = 0
+        self.__evictions = 0
+
+    @property
+    def generation(self) -> int:
+        """
+        A counter that changes whenever anything is invalidated. Take a snapshot before
+        loading a value and pass it to put(), so that a value loaded while a concurrent
+        writer was invalidating it is not cached.
+        """
+        return self.__generation
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Look up a key.
+
+        Parameters:
+            key - The key to look up.
+
+        Returns:
+            A tuple of whether the key was found and unexpired, and the cached value.
+            The value may legitimately be None, for caching negative lookups.
+        """
+        now = time.monotonic()
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                self.__misses += 1
+                return False, None
+            expiration, value = entry
+            if expiration <= now:
+                del self.__entries[key]
+                self.__expirations += 1
+                self.__misses += 1
+                return False, None
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return True, value
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: float,
+        generation: Optional[int] = None,
+    ) -> None:
+        """
+        Cache a value.
+
+        Parameters:
+            key - The key to cache under.
+            value - The value to cache. Callers should cache something immutable, or
+                    copy values on the way out, since the same object is handed to
+                    every caller that hits this entry.
+            ttl - Number of seconds the value stays valid for. Nothing is cached if
+                  this is zero or less.
+            generation - If provided, the value is only cached if nothing has been
+                         invalidated since this generation was read.
+        """
+        if ttl <= 0:
+            return
+        with self.__lock:
+            if generation is not None and generation != self.__generation:
+                return
+            self.__entries[key] = (time.monotonic() + ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drop a single key, if it is cached.
+
+        Parameters:
+            key - The key to drop.
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__invalidations += 1
+            self.__entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Drop every cached entry.
+        """
+        with self.__lock:
+            self.__generation += 1
+            self.__invalidations += 1
+            self.__entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable snapshot of the cache's counters.
+        """
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            return {
+                "size": len(self.__entries),
+                "maxsize": self.maxsize,
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "hit_rate": round(self.__hits / lookups, 4) if lookups else None,
+                "expirations": self.__expirations,
+                "invalidations": self.__invalidations,
+                "evictions": self.__evictions,
+            }
+
+    def reset_stats(self) -> None:
+        """
+        Zero the counters without dropping any cached entries.
+        """
+        with self.__lock:
+            self.__hits = 0
+            self.__misses = 0
+            self.__expirations = 0
+            self.__invalidations = 0
+            self.__evictions = 0
@@ -1,65 +1,246 @@
 import concurrent.futures
-from typing import Any, Callable, List, TypeVar
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
 
 T = TypeVar("T")
 
 
+class _Task:
+    """
+    A single callable handed to the shared executor. Whichever of a worker thread or
+    the calling thread claims it first runs it, so nobody ever waits on a task that
+    hasn't been picked up.
+    """
+
+    def __init__(self, func: Callable[..., Any], args: Tuple[Any, ...]) -> None:
+        self.func = func
+        self.args = args
+        self.submitted = time.monotonic()
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exception: Optional[BaseException] = None
+        self.__claim = threading.Lock()
+
+    def claim(self) -> bool:
+        return self.__claim.acquire(blocking=False)
+
+
 class Parallel:
     """
     Utilities for executing parallel operations. This is used as a convenience
     so that we don't have to plumb async/await support (yuck) through the network,
     but we can still make multiple queries at once to remote services and the DB.
+
+    Work is run on a bounded executor shared by the whole process. The thread asking
+    for the work runs any of it that the executor hasn't gotten to yet, so nested calls
+    can't deadlock and a busy executor degrades to running things serially instead of
+    starting more threads.
     """
 
-    @staticmethod
-    def execute(lambdas: List[Callable[[], Any]]) -> List[Any]:
+    # Default number of worker threads shared by the process.
+    DEFAULT_MAX_WORKERS = 32
+
+    __lock = threading.Lock()
+    __executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    __max_workers = DEFAULT_MAX_WORKERS
+    __timeout: Optional[float] = None
+    __local = threading.local()
+    __stats: Dict[str, Any] = {}
+
+    @classmethod
+    def configure(
+        cls,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
         """
-        Given a list of callables, execute them and return a list of their returns.
-        Guarantees order of return based on order of callable.
+        Set up the shared executor. Work already running is allowed to finish.
+
+        Parameters:
+            max_workers - Number of worker threads to run work on. Defaults to
+                          DEFAULT_MAX_WORKERS.
+            timeout - Default number of seconds a call waits for its results before
+                      giving up, or None to wait forever.
         """
+        with cls.__lock:
+            if cls.__executor is not None:
+                cls.__executor.shutdown(wait=False)
+                cls.__executor = None
+            cls.__max_workers = max(1, max_workers or cls.DEFAULT_MAX_WORKERS)
+            cls.__timeout = timeout
 
-        if len(lambdas) == 0:
-            return []
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=len(lambdas)
-        ) as executor:
-            futures = {
-                executor.submit(lambdas[pos]): pos for pos in range(len(lambdas))
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable snapshot of the shared executor's counters.
+        """
+        with cls.__lock:
+            stats = dict(cls.__stats)
+            started = stats.get("started", 0)
+            return {
+                "max_workers": cls.__max_workers,
+                "calls": stats.get("calls", 0),
+                "nested_calls": stats.get("nested_calls", 0),
+                "tasks": stats.get("tasks", 0),
+                "queued": stats.get("queued", 0),
+                "max_queued": stats.get("max_queued", 0),
+                "ran_inline": stats.get("ran_inline", 0),
+                "cancelled": stats.get("cancelled", 0),
+                "timeouts": stats.get("timeouts", 0),
+                "avg_wait_ms": (
+                    round(stats.get("wait_time", 0.0) * 1000 / started, 3)
+                    if started
+                    else None
+                ),
+                "avg_run_ms": (
+                    round(stats.get("run_time", 0.0) * 1000 / started, 3)
+                    if started
+                    else None
+                ),
             }
-            results = []  # List: Tuple[Any, int]
 
-            for future in concurrent.futures.as_completed(futures):
-                pos = futures[future]
-                data = future.result()
-                results.append((data, pos))
+    @classmethod
+    def reset_stats(cls) -> None:
+        """
+        Zero the counters, other than the current number of queued tasks.
+        """
+        with cls.__lock:
+            cls.__stats = {"queued": cls.__stats.get("queued", 0)}
+
+    @classmethod
+    def __count(cls, **amounts: float) -> None:
+        with cls.__lock:
+            for name, amount in amounts.items():
+                cls.__stats[name] = cls.__stats.get(name, 0) + amount
+            cls.__stats["max_queued"] = max(
+                cls.__stats.get("max_queued", 0), cls.__stats.get("queued", 0)
+            )
+
+    @classmethod
+    def __get_executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        with cls.__lock:
+            if cls.__executor is None:
+                cls.__executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=cls.__max_workers,
+                    thread_name_prefix="parallel",
+                )
+            return cls.__executor
 
-            return [r[0] for r in sorted(results, key=lambda r: r[1])]
+    @classmethod
+    def __run(cls, task: _Task, inline: bool) -> None:
+        # Only call this once the task has been claimed.
+        started = time.monotonic()
+        nested = getattr(cls.__local, "depth", 0)
+        cls.__local.depth = nested + 1
+        try:
+            task.result = task.func(*task.args)
+        except BaseException as e:
+            task.exception = e
+        finally:
+            cls.__local.depth = nested
+            task.done.set()
+            cls.__count(
+                queued=-1,
+                started=1,
+                ran_inline=1 if inline else 0,
+                wait_time=started - task.submitted,
+                run_time=time.monotonic() - started,
+            )
+
+    @classmethod
+    def __work(cls, task: _Task) -> None:
+        if task.claim():
+            cls.__run(task, False)
+
+    @classmethod
+    def __execute(
+        cls,
+        work: List[Tuple[Callable[..., Any], Tuple[Any, ...]]],
+        timeout: Optional[float],
+    ) -> List[Any]:
+        if len(work) == 0:
+            return []
+        if timeout is None:
+            timeout = cls.__timeout
+        deadline = (time.monotonic() + timeout) if timeout is not None else None
+
+        tasks = [_Task(func, args) for (func, args) in work]
+        nested = getattr(cls.__local, "depth", 0) > 0
+        cls.__count(
+            calls=1,
+            nested_calls=1 if nested else 0,
+            tasks=len(tasks),
+            queued=len(tasks),
+        )
+
+        # Hand the work to the executor, and then start working through the list
+        # ourselves, skipping anything a worker already picked up. We can't stop in the
+        # middle of a task once we start it, so when there is a deadline only do this
+        # when we must, which is when we are ourselves part of other parallel work.
+        inline = nested or deadline is None
+        if len(tasks) > 1 or not inline:
+            executor = cls.__get_executor()
+            for task in tasks[1:] if inline else tasks:
+                executor.submit(cls.__work, task)
+        if inline:
+            for task in tasks:
+                if deadline is not None and time.monotonic() >= deadline:
+                    break
+                if task.claim():
+                    cls.__run(task, True)
+
+        # Now wait for whatever the workers are still running.
+        for task in tasks:
+            remaining = (
+                max(0.0, deadline - time.monotonic()) if deadline is not None else None
+            )
+            if not task.done.wait(remaining):
+                # Make sure that anything not yet started never runs. Anything that
+                # has already started is left to finish on its own.
+                cancelled = sum(1 for t in tasks if t.claim())
+                cls.__count(queued=-cancelled, cancelled=cancelled, timeouts=1)
+                raise concurrent.futures.TimeoutError(
+                    f"Parallel work did not finish within {timeout} seconds!"
+                )
+
+        for task in tasks:
+            if task.exception is not None:
+                raise task.exception
+        return [task.result for task in tasks]
 
     @staticmethod
-    def map(lam: Callable[[T], Any], params: List[T]) -> List[Any]:
+    def execute(
+        lambdas: List[Callable[[], Any]], timeout: Optional[float] = None
+    ) -> List[Any]:
+        """
+        Given a list of callables, execute them and return a list of their returns.
+        Guarantees order of return based on order of callable.
+
+        If a timeout is given, or configured as the default, concurrent.futures.TimeoutError
+        is raised if the results aren't all available in that many seconds.
+        """
+
+        return Parallel.__execute([(lam, ()) for lam in lambdas], timeout)
+
+    @staticmethod
+    def map(
+        lam: Callable[[T], Any], params: List[T], timeout: Optional[float] = None
+    ) -> List[Any]:
         """
         Given a callable and a list of params, executes that callable with each set
         of params in the list and returns a list of their returns. Guarantees order
         of return.
         """
 
-        if len(params) == 0:
-            return []
-        with concurrent.futures.ThreadPoolExecutor(max_workers=len(params)) as executor:
-            futures = {
-                executor.submit(lam, params[pos]): pos for pos in range(len(params))
-            }
-            results = []  # List: Tuple[Any, int]
-
-            for future in concurrent.futures.as_completed(futures):
-                pos = futures[future]
-                data = future.result()
-                results.append((data, pos))
-
-            return [r[0] for r in sorted(results, key=lambda r: r[1])]
+        return Parallel.__execute([(lam, (param,)) for param in params], timeout)
 
     @staticmethod
-    def call(lambdas: "List[Callable[..., Any]]", *params: Any) -> List[Any]:
+    def call(
+        lambdas: "List[Callable[..., Any]]",
+        *params: Any,
+        timeout: Optional[float] = None,
+    ) -> List[Any]:
         """
         Given a list of callables and zero or more params, calls each callable in
         parallel with the params specified. Essentially a map of params to multiple
@@ -67,23 +248,7 @@ class Parallel:
         same order as the lambdas.
         """
 
-        if len(lambdas) == 0:
-            return []
-        with concurrent.futures.ThreadPoolExecutor(
-            max_workers=len(lambdas)
-        ) as executor:
-            futures = {
-                executor.submit(lambdas[pos], *params): pos
-                for pos in range(len(lambdas))
-            }
-            results = []  # List: Tuple[Any, int]
-
-            for future in concurrent.futures.as_completed(futures):
-                pos = futures[future]
-                data = future.result()
-                results.append((data, pos))
-
-            return [r[0] for r in sorted(results, key=lambda r: r[1])]
+        return Parallel.__execute([(lam, params) for lam in lambdas], timeout)
 
     @staticmethod
     def flatten(lists: List[List[Any]]) -> List[Any]:
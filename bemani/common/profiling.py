@@ -0,0 +1,399 @@
+import bisect
+import contextvars
+import cProfile
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+class Histogram:
+    """
+    A fixed-bucket latency histogram. Buckets are exponentially sized so that both
+    sub-millisecond phases such as decryption and multi-second handlers are useful.
+    """
+
+    # Upper bounds of each bucket, in milliseconds. Anything larger lands in a final overflow bucket.
+    BUCKETS: List[float] = [
+        0.1,
+        0.25,
+        0.5,
+        1.0,
+        2.5,
+        5.0,
+        10.0,
+        25.0,
+        50.0,
+        100.0,
+        250.0,
+        500.0,
+        1000.0,
+        2500.0,
+        5000.0,
+        10000.0,
+    ]
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(Histogram.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, milliseconds: float) -> None:
+        """
+        Record a single sample.
+
+        Parameters:
+            milliseconds - The duration of the sample in milliseconds.
+        """
+        self.counts[bisect.bisect_left(Histogram.BUCKETS, milliseconds)] += 1
+        self.count += 1
+        self.total += milliseconds
+        self.min = milliseconds if self.min is None else min(self.min, milliseconds)
+        self.max = milliseconds if self.max is None else max(self.max, milliseconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Estimate a percentile, reported as the upper bound of the bucket it falls in.
+
+        Parameters:
+            percent - The percentile to look up, from 0 to 100.
+
+        Returns:
+            An upper bound in milliseconds, or None if there are no samples.
+        """
+        if self.count == 0:
+            return None
+        wanted = self.count * percent / 100.0
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted and count > 0:
+                if bucket < len(Histogram.BUCKETS):
+                    return min(Histogram.BUCKETS[bucket], self.max or 0.0)
+                return self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else None,
+            "min_ms": self.min,
+            "max_ms": self.max,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "buckets": {
+                **{
+                    f"<={bound}": count
+                    for bound, count in zip(Histogram.BUCKETS, self.counts)
+                },
+                f">{Histogram.BUCKETS[-1]}": self.counts[-1],
+            },
+        }
+
+
+_current: "contextvars.ContextVar[Optional[RequestProfile]]" = contextvars.ContextVar(
+    "current_request_profile", default=None
+)
+
+
+class RequestProfile:
+    """
+    Timing information for a single request, broken down by phase. While a request is
+    being handled the profile is installed as the current profile, so that code deep in
+    the stack (dispatch, database access) can attribute time to it without plumbing.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.model: Optional[str] = None
+        self.handler: Optional[str] = None
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        """
+        Attribute time to a phase. Time spent in the same phase multiple times is summed.
+
+        Parameters:
+            phase - The name of the phase, such as "decode" or "db".
+            seconds - The time spent, in seconds.
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Returns the wall-clock time since this request started, in seconds.
+        """
+        return time.perf_counter() - self.start
+
+    @staticmethod
+    def current() -> Optional["RequestProfile"]:
+        """
+        Returns the profile for the request being handled, or None if profiling is off.
+        """
+        return _current.get()
+
+    @staticmethod
+    @contextmanager
+    def phase(phase: str) -> Iterator[None]:
+        """
+        Time a block of code as a phase of the current request. Does nothing if no
+        request is currently being profiled.
+
+        Parameters:
+            phase - The name of the phase.
+        """
+        profile = _current.get()
+        if profile is None:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            profile.add(phase, time.perf_counter() - start)
+
+    @staticmethod
+    def tag(model: Optional[str] = None, handler: Optional[str] = None) -> None:
+        """
+        Tag the current request with the model and handler that served it. Does nothing
+        if no request is currently being profiled.
+
+        Parameters:
+            model - The model string of the game that sent the request.
+            handler - The name of the handler function, such as handle_pcbtracker_alive_request.
+        """
+        profile = _current.get()
+        if profile is None:
+            return
+        if model is not None:
+            profile.model = model
+        if handler is not None:
+            profile.handler = handler
+
+
+class Profiler:
+    """
+    A per-process aggregator of request profiles. Latency for each phase is kept in
+    histograms overall, per model and per handler. Optionally, a sample of requests is
+    run under cProfile and the capture is kept for any that turn out to be slow.
+    """
+
+    def __init__(
+        self,
+        slow_threshold: Optional[float] = None,
+        sample_rate: float = 0.0,
+        profile_dir: Optional[str] = None,
+        dump_file: Optional[str] = None,
+        dump_interval: float = 60.0,
+    ) -> None:
+        """
+        Initialize the profiler.
+
+        Parameters:
+            slow_threshold - Requests taking longer than this many milliseconds are slow.
+            sample_rate - Fraction of requests, from 0.0 to 1.0, to run under cProfile.
+            profile_dir - Directory where cProfile captures of slow requests are written.
+            dump_file - If provided, statistics are periodically written to this file as JSON.
+            dump_interval - Minimum number of seconds between writes to the dump file.
+        """
+        self.slow_threshold = slow_threshold
+        self.sample_rate = sample_rate
+        self.profile_dir = profile_dir
+        self.dump_file = dump_file
+        self.dump_interval = dump_interval
+
+        self.__lock = threading.Lock()
+        self.__histograms: Dict[Tuple[str, str, str], Histogram] = {}
+        self.__requests = 0
+        self.__slow = 0
+        self.__captures = 0
+        self.__last_dump = time.time()
+        self.__engines: List[Any] = []
+
+    @contextmanager
+    def request(self) -> Iterator[RequestProfile]:
+        """
+        Profile a request. The yielded profile is installed as the current profile for the
+        duration of the block, and is recorded when the block exits.
+        """
+        profile = RequestProfile()
+        if self.sample_rate > 0.0 and random.random() < self.sample_rate:
+            profile.profiler = cProfile.Profile()
+            try:
+                profile.profiler.enable()
+            except ValueError:
+                # Another profiler is already active on this thread.
+                profile.profiler = None
+
+        token = _current.set(profile)
+        try:
+            yield profile
+        finally:
+            _current.reset(token)
+            if profile.profiler is not None:
+                profile.profiler.disable()
+            self.record(profile)
+
+    def instrument_engine(self, engine: Any) -> None:
+        """
+        Attribute time spent executing SQL on the given SQLAlchemy engine to the "db"
+        phase of the current request.
+
+        Parameters:
+            engine - A SQLAlchemy Engine.
+        """
+        if any(existing is engine for existing in self.__engines):
+            return
+        self.__engines.append(engine)
+
+        from sqlalchemy import event  # type: ignore
+
+        def before(conn: Any, *args: Any) -> None:
+            conn.info.setdefault("profiling_start", []).append(time.perf_counter())
+
+        def after(conn: Any, *args: Any) -> None:
+            starts = conn.info.get("profiling_start")
+            if not starts:
+                return
+            start = starts.pop()
+            profile = _current.get()
+            if profile is not None:
+                profile.add("db", time.perf_counter() - start)
+
+        event.listen(engine, "before_cursor_execute", before)
+        event.listen(engine, "after_cursor_execute", after)
+
+    def record(self, profile: RequestProfile) -> None:
+        """
+        Add a finished request to the aggregated statistics.
+
+        Parameters:
+            profile - The profile of the finished request.
+        """
+        total = profile.elapsed * 1000.0
+        slow = self.slow_threshold is not None and total >= self.slow_threshold
+        model = profile.model or "unknown"
+        handler = profile.handler or "unknown"
+        phases = [
+            (phase, seconds * 1000.0) for phase, seconds in profile.phases.items()
+        ]
+        phases.append(("total", total))
+
+        with self.__lock:
+            self.__requests += 1
+            if slow:
+                self.__slow += 1
+            for phase, milliseconds in phases:
+                for key in [
+                    ("all", "", phase),
+                    ("model", model, phase),
+                    ("handler", handler, phase),
+                ]:
+                    if key not in self.__histograms:
+                        self.__histograms[key] = Histogram()
+                    self.__histograms[key].add(milliseconds)
+
+        # Profiling must never fail the request it is measuring, so problems writing
+        # captures or stats are reported and otherwise ignored.
+        if slow and profile.profiler is not None and self.profile_dir is not None:
+            try:
+                self.__capture(profile, handler)
+            except OSError as e:
+                print(f"Failed to write request capture: {e}", file=sys.stderr)
+        if self.dump_file is not None:
+            # Claim the dump under the lock so that only one thread writes it per interval.
+            now = time.time()
+            with self.__lock:
+                due = now - self.__last_dump >= self.dump_interval
+                if due:
+                    self.__last_dump = now
+            if due:
+                try:
+                    # Each worker process writes its own file if the name has a {pid} placeholder.
+                    self.dump(self.dump_file.format(pid=os.getpid()))
+                except OSError as e:
+                    print(f"Failed to dump profiling stats: {e}", file=sys.stderr)
+
+    def __capture(self, profile: RequestProfile, handler: str) -> None:
+        if profile.profiler is None or self.profile_dir is None:
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        with self.__lock:
+            self.__captures += 1
+            capture = self.__captures
+        filename = os.path.join(
+            self.profile_dir,
+            f"{handler}-{int(time.time())}-{os.getpid()}-{capture}.prof",
+        )
+        profile.profiler.dump_stats(filename)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable snapshot of the aggregated statistics.
+        """
+        with self.__lock:
+            stats: Dict[str, Any] = {
+                "pid": os.getpid(),
+                "requests": self.__requests,
+                "slow_requests": self.__slow,
+                "slow_threshold_ms": self.slow_threshold,
+                "captures": self.__captures,
+                "all": {},
+                "model": {},
+                "handler": {},
+            }
+            for (group, name, phase), histogram in sorted(self.__histograms.items()):
+                if group == "all":
+                    stats["all"][phase] = histogram.to_dict()
+                else:
+                    stats[group].setdefault(name, {})[phase] = histogram.to_dict()
+        return stats
+
+    def dump(self, filename: str) -> None:
+        """
+        Write the aggregated statistics to a file as JSON.
+
+        Parameters:
+            filename - The file to write to. It is replaced atomically.
+        """
+        with self.__lock:
+            self.__last_dump = time.time()
+        stats = self.stats()
+
+        # Write to a unique file next to the destination, so that concurrent dumps never
+        # share a temporary file and the rename stays on the same filesystem.
+        fd, tmpfile = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(filename)), suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump(stats, fp, indent=2)
+            os.replace(tmpfile, filename)
+        except BaseException:
+            try:
+                os.remove(tmpfile)
+            except OSError:
+                pass
+            raise
+
+    def reset(self) -> None:
+        """
+        Clear all aggregated statistics.
+        """
+        with self.__lock:
+            self.__histograms = {}
+            self.__requests = 0
+            self.__slow = 0
+            self.__captures = 0
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List
 
 from bemani.data.api.client import APIClient
 from bemani.data.interfaces import APIProviderInterface
@@ -7,17 +7,13 @@ from bemani.data.interfaces import APIProviderInterface
 class BaseGlobalData:
     def __init__(self, api: APIProviderInterface) -> None:
         self.__localapi = api
-        self.__apiclients: Optional[List[APIClient]] = None
 
     @property
     def clients(self) -> List[APIClient]:
-        if self.__apiclients is None:
-            servers = self.__localapi.get_all_servers()
-            self.__apiclients = [
-                APIClient(
-                    server.uri, server.token, server.allow_stats, server.allow_scores
-                )
-                for server in servers
-            ]
-
-        return self.__apiclients
+        # Clients are cheap to make since connections to each server are shared by the
+        # whole process, and the server list itself is cached, so look it up every time
+        # in order to pick up servers that were added, edited or removed.
+        return [
+            APIClient(server.uri, server.token, server.allow_stats, server.allow_scores)
+            for server in self.__localapi.get_all_servers()
+        ]
@@ -0,0 +1,193 @@
+from abc import ABC, abstractmethod
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from bemani.common import TTLCache
+
+
+class ResponseCache(ABC):
+    """
+    Somewhere to keep responses from remote servers so that the same lookup made by
+    many games within a short window only goes over the network once. Entries are
+    keyed by an opaque string and remember when they were stored, so that callers can
+    decide for themselves whether an entry is fresh or merely usable while it is
+    refreshed.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        """
+        Look up a response.
+
+        Parameters:
+            key - The key the response was stored under.
+
+        Returns:
+            A tuple of the time the response was stored and the response itself, or
+            None if nothing unexpired is stored under this key.
+        """
+
+    @abstractmethod
+    def put(self, key: str, value: Any, lifetime: float) -> None:
+        """
+        Store a response.
+
+        Parameters:
+            key - The key to store the response under.
+            value - A JSON-serializable response.
+            lifetime - Number of seconds after which the response is dropped entirely.
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable snapshot of the backend's counters.
+        """
+
+
+class MemoryResponseCache(ResponseCache):
+    """
+    A response cache private to the current process.
+    """
+
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.__cache = TTLCache(maxsize=maxsize)
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        found, entry = self.__cache.get(key)
+        if not found:
+            return None
+        stored, encoded = entry
+        # Responses are kept encoded so that every caller gets its own copy to modify.
+        return stored, json.loads(encoded)
+
+    def put(self, key: str, value: Any, lifetime: float) -> None:
+        self.__cache.put(key, (time.time(), json.dumps(value)), lifetime)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.__cache.stats()
+
+
+class FilesystemResponseCache(ResponseCache):
+    """
+    A response cache kept as one file per response in a directory, so that every process
+    on the machine pointed at the same directory shares it. Files are replaced atomically,
+    and touched when read, so that the least recently used ones can be removed by
+    modification time when there are more than maxsize of them.
+    """
+
+    def __init__(self, directory: str, maxsize: int = 1024) -> None:
+        self.directory = directory
+        self.maxsize = maxsize
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def __count(self, hit: bool) -> None:
+        with self.__lock:
+            if hit:
+                self.__hits += 1
+            else:
+                self.__misses += 1
+
+    def get(self, key: str) -> Optional[Tuple[float, Any]]:
+        path = self.__path(key)
+        try:
+            with open(path, "rb") as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            self.__count(False)
+            return None
+
+        if entry["expires"] <= time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            self.__count(False)
+            return None
+        try:
+            # Mark this response as recently used so that pruning keeps it.
+            os.utime(path)
+        except OSError:
+            pass
+        self.__count(True)
+        return entry["stored"], entry["value"]
+
+    def put(self, key: str, value: Any, lifetime: float) -> None:
+        if lifetime <= 0:
+            return
+        now = time.time()
+        data = json.dumps({"stored": now, "expires": now + lifetime, "value": value})
+
+        fd, tmppath = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as fp:
+                fp.write(data)
+            os.replace(tmppath, self.__path(key))
+        except OSError:
+            try:
+                os.remove(tmppath)
+            except OSError:
+                pass
+            return
+        self.__prune()
+
+    def __prune(self) -> None:
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(".json")
+            ]
+        except OSError:
+            return
+        if len(entries) <= self.maxsize:
+            return
+
+        def mtime(entry: os.DirEntry) -> float:
+            try:
+                return entry.stat().st_mtime
+            except OSError:
+                return 0.0
+
+        entries.sort(key=mtime)
+        evicted = 0
+        for entry in entries[: len(entries) - self.maxsize]:
+            try:
+                os.remove(entry.path)
+                evicted += 1
+            except OSError:
+                # Another process got to it first.
+                pass
+        with self.__lock:
+            self.__evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            size = sum(
+                1
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(".json")
+            )
+        except OSError:
+            size = 0
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            return {
+                "size": size,
+                "maxsize": self.maxsize,
+                "hits": self.__hits,
+                "misses": self.__misses,
+                "hit_rate": round(self.__hits / lookups, 4) if lookups else None,
+                "evictions": self.__evictions,
+            }
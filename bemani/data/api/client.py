@@ -1,6 +1,10 @@
+import hashlib
 import json
 import requests
-from typing import Tuple, Dict, List, Any, Optional
+import threading
+import time
+from requests.adapters import HTTPAdapter
+from typing import Tuple, Dict, List, Any, Optional, Set
 from typing_extensions import Final
 
 from bemani.common import (
@@ -10,6 +14,7 @@ from bemani.common import (
     DBConstants,
     ValidatedDict,
 )
+from bemani.data.api.cache import ResponseCache
 
 
 class APIException(Exception):
@@ -36,21 +41,231 @@ class RemoteServerErrorAPIException(APIException):
     pass
 
 
+class _RemoteServer:
+    """
+    Connection state for a single remote server, shared by every client in the process
+    that talks to it. Holds a pool of keep-alive connections and tracks recent failures
+    so that a server which is down isn't waited on for every lookup.
+    """
+
+    def __init__(self, max_connections: int) -> None:
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            }
+        )
+
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.retry_at = 0.0
+        self.probing = False
+        self.requests = 0
+        self.errors = 0
+        self.skipped = 0
+        self.request_time = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "skipped": self.skipped,
+                "consecutive_failures": self.failures,
+                "avg_ms": (
+                    round(self.request_time * 1000 / self.requests, 3)
+                    if self.requests
+                    else None
+                ),
+            }
+
+
 class APIClient:
     """
     A client that fully speaks BEMAPI and can pull information from a remote server.
+
+    Connections to each remote server are pooled and kept alive across every client
+    in the process. A server that fails failure_threshold times in a row is skipped
+    for retry_interval seconds, after which a single request is let through to see
+    whether it has recovered.
+
+    Responses can additionally be cached for a number of seconds that depends on the
+    kind of object requested. Once that passes, a cached response is still handed out
+    for up to a further stale seconds while it is refreshed in the background.
     """
 
     API_VERSION: Final[str] = "v1"
 
+    # Defaults for talking to remote servers, changed with configure().
+    DEFAULT_CONNECT_TIMEOUT: Final[float] = 3.0
+    DEFAULT_TIMEOUT: Final[float] = 10.0
+    DEFAULT_MAX_CONNECTIONS: Final[int] = 8
+    DEFAULT_FAILURE_THRESHOLD: Final[int] = 3
+    DEFAULT_RETRY_INTERVAL: Final[float] = 30.0
+
+    __lock = threading.Lock()
+    __servers: Dict[str, _RemoteServer] = {}
+    __connect_timeout = DEFAULT_CONNECT_TIMEOUT
+    __timeout = DEFAULT_TIMEOUT
+    __max_connections = DEFAULT_MAX_CONNECTIONS
+    __failure_threshold = DEFAULT_FAILURE_THRESHOLD
+    __retry_interval = DEFAULT_RETRY_INTERVAL
+    __cache: Optional[ResponseCache] = None
+    __cache_ttls: Dict[str, float] = {}
+    __cache_stale = 0.0
+    __cache_stats: Dict[str, int] = {}
+    __refreshing: Set[str] = set()
+
     def __init__(
-        self, base_uri: str, token: str, allow_stats: bool, allow_scores: bool
+        self,
+        base_uri: str,
+        token: str,
+        allow_stats: bool,
+        allow_scores: bool,
     ) -> None:
         self.base_uri = base_uri
         self.token = token
         self.allow_stats = allow_stats
         self.allow_scores = allow_scores
 
+    @classmethod
+    def configure(
+        cls,
+        connect_timeout: Optional[float] = None,
+        timeout: Optional[float] = None,
+        max_connections: Optional[int] = None,
+        failure_threshold: Optional[int] = None,
+        retry_interval: Optional[float] = None,
+    ) -> None:
+        """
+        Set up how every client in this process talks to remote servers. Any pooled
+        connections are dropped, along with what is known about failing servers.
+
+        Parameters:
+            connect_timeout - Number of seconds to wait to connect to a server.
+            timeout - Number of seconds to wait for a server to respond once connected.
+            max_connections - Number of keep-alive connections kept to each server.
+            failure_threshold - Number of failures in a row before a server is skipped.
+            retry_interval - Number of seconds a failing server is skipped for.
+        """
+        with cls.__lock:
+            cls.__connect_timeout = (
+                connect_timeout
+                if connect_timeout is not None
+                else cls.DEFAULT_CONNECT_TIMEOUT
+            )
+            cls.__timeout = timeout if timeout is not None else cls.DEFAULT_TIMEOUT
+            cls.__max_connections = max(
+                1, max_connections or cls.DEFAULT_MAX_CONNECTIONS
+            )
+            cls.__failure_threshold = max(
+                1, failure_threshold or cls.DEFAULT_FAILURE_THRESHOLD
+            )
+            cls.__retry_interval = (
+                retry_interval
+                if retry_interval is not None
+                else cls.DEFAULT_RETRY_INTERVAL
+            )
+            for server in cls.__servers.values():
+                server.session.close()
+            cls.__servers = {}
+
+    @classmethod
+    def configure_cache(
+        cls,
+        cache: Optional[ResponseCache],
+        ttls: Dict[str, float] = {},
+        stale: float = 0.0,
+    ) -> None:
+        """
+        Set up caching of responses from remote servers for every client in this process.
+
+        Parameters:
+            cache - Where to keep responses, or None to disable caching.
+            ttls - Number of seconds responses stay fresh, keyed by the object requested
+                   (such as "records" or "catalog"). Objects that aren't listed here
+                   are never cached.
+            stale - Number of seconds past that a response is still used while it is
+                    refreshed in the background.
+        """
+        with cls.__lock:
+            cls.__cache = cache
+            cls.__cache_ttls = dict(ttls)
+            cls.__cache_stale = max(0.0, stale)
+            cls.__cache_stats = {}
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Any]:
+        """
+        Returns a JSON-serializable snapshot of the response cache's counters.
+        """
+        with cls.__lock:
+            if cls.__cache is None:
+                return {}
+            cache = cls.__cache
+            stats = {
+                name: cls.__cache_stats.get(name, 0)
+                for name in ["fresh", "stale", "misses", "refreshes", "refresh_errors"]
+            }
+        return {**stats, "backend": cache.stats()}
+
+    @classmethod
+    def __count(cls, name: str) -> None:
+        with cls.__lock:
+            cls.__cache_stats[name] = cls.__cache_stats.get(name, 0) + 1
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns a JSON-serializable snapshot of request counters for each remote server
+        this process has talked to, keyed by base URI.
+        """
+        with cls.__lock:
+            servers = dict(cls.__servers)
+        now = time.monotonic()
+        stats: Dict[str, Dict[str, Any]] = {}
+        for uri, server in servers.items():
+            stats[uri] = server.stats()
+            stats[uri]["skipping"] = (
+                server.failures >= cls.__failure_threshold and server.retry_at > now
+            )
+        return stats
+
+    def __get_server(self) -> _RemoteServer:
+        with APIClient.__lock:
+            server = APIClient.__servers.get(self.base_uri)
+            if server is None:
+                server = _RemoteServer(APIClient.__max_connections)
+                APIClient.__servers[self.base_uri] = server
+            return server
+
+    def __begin(self, server: _RemoteServer) -> None:
+        # Skip servers that have recently failed, other than letting a single request
+        # through once in a while to find out if they're back.
+        with server.lock:
+            if server.failures >= APIClient.__failure_threshold:
+                if server.probing or time.monotonic() < server.retry_at:
+                    server.skipped += 1
+                    raise APIException("Remote server recently failed, skipping!")
+                server.probing = True
+
+    def __finish(self, server: _RemoteServer, started: float, success: bool) -> None:
+        with server.lock:
+            server.requests += 1
+            server.request_time += time.monotonic() - started
+            server.probing = False
+            if success:
+                server.failures = 0
+            else:
+                server.errors += 1
+                server.failures += 1
+                if server.failures >= APIClient.__failure_threshold:
+                    server.retry_at = time.monotonic() + APIClient.__retry_interval
+
     def _content_type_valid(self, content_type: str) -> bool:
         if ";" in content_type:
             left, right = content_type.split(";", 1)
@@ -80,26 +295,42 @@ class APIClient:
             "Content-Type": "application/json; charset=utf-8",
         }
         data = json.dumps(request_args).encode("utf8")
+        timeout = (APIClient.__connect_timeout, APIClient.__timeout)
 
+        server = self.__get_server()
+        self.__begin(server)
+        started = time.monotonic()
+        success = False
         try:
-            r = requests.request(
-                "GET",
-                uri,
-                headers=headers,
-                data=data,
-                allow_redirects=False,
-                timeout=10,
-            )
-        except Exception:
-            raise APIException("Failed to query remote server!")
-
-        # Verify that content type is in the form of "application/json; charset=utf-8".
-        if not self._content_type_valid(r.headers["content-type"]):
-            raise APIException(
-                f'API returned invalid content type \'{r.headers["content-type"]}\'!'
-            )
-
-        jsondata = r.json()
+            try:
+                r = server.session.request(
+                    "GET",
+                    uri,
+                    headers=headers,
+                    data=data,
+                    allow_redirects=False,
+                    timeout=timeout,
+                )
+            except Exception:
+                raise APIException("Failed to query remote server!")
+
+            # Verify that content type is in the form of "application/json; charset=utf-8".
+            content_type = r.headers.get("content-type", "")
+            if not self._content_type_valid(content_type):
+                raise APIException(
+                    f"API returned invalid content type '{content_type}'!"
+                )
+
+            try:
+                jsondata = r.json()
+            except ValueError:
+                raise APIException("API returned invalid JSON!")
+
+            # Anything the server managed to answer properly, even with an error, means
+            # that it is up. Only internal errors count against it.
+            success = r.status_code != 500
+        finally:
+            self.__finish(server, started, success)
 
         if r.status_code == 200:
             return jsondata
@@ -134,6 +365,77 @@ class APIClient:
             "The server returned an invalid status code {}!", format(r.status_code)
         )
 
+    def __exchange_object(
+        self,
+        game: GameConstants,
+        version: int,
+        objtype: str,
+        request_args: Dict[str, Any],
+    ) -> Any:
+        servergame, serverversion = self.__translate(game, version)
+        request_uri = f"{self.API_VERSION}/{servergame}/{serverversion}"
+        request_args = {**request_args, "objects": [objtype]}
+
+        with APIClient.__lock:
+            cache = APIClient.__cache
+            ttl = APIClient.__cache_ttls.get(objtype, 0.0)
+            stale = APIClient.__cache_stale
+        if cache is None or ttl <= 0:
+            return self.__exchange_data(request_uri, request_args)[objtype]
+
+        key = hashlib.sha256(
+            json.dumps(
+                [self.base_uri, self.token, request_uri, request_args], sort_keys=True
+            ).encode("utf-8")
+        ).hexdigest()
+        entry = cache.get(key)
+        if entry is not None:
+            stored, value = entry
+            age = time.time() - stored
+            if age < ttl:
+                APIClient.__count("fresh")
+                return value
+            if age < ttl + stale:
+                APIClient.__count("stale")
+                self.__refresh(
+                    cache, key, request_uri, request_args, objtype, ttl + stale
+                )
+                return value
+
+        APIClient.__count("misses")
+        value = self.__exchange_data(request_uri, request_args)[objtype]
+        cache.put(key, value, ttl + stale)
+        return value
+
+    def __refresh(
+        self,
+        cache: ResponseCache,
+        key: str,
+        request_uri: str,
+        request_args: Dict[str, Any],
+        objtype: str,
+        lifetime: float,
+    ) -> None:
+        # Only one refresh of any given response at a time per process. If it fails, the
+        # stale response keeps being used until it ages out entirely.
+        with APIClient.__lock:
+            if key in APIClient.__refreshing:
+                return
+            APIClient.__refreshing.add(key)
+
+        def refresh() -> None:
+            try:
+                value = self.__exchange_data(request_uri, request_args)[objtype]
+                cache.put(key, value, lifetime)
+                APIClient.__count("refreshes")
+            except Exception:
+                APIClient.__count("refresh_errors")
+            finally:
+                with APIClient.__lock:
+                    APIClient.__refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="federation-refresh", daemon=True).start()
+
     def __translate(self, game: GameConstants, version: int) -> Tuple[str, str]:
         servergame = {
             GameConstants.DDR: "ddr",
@@ -246,16 +548,15 @@ class APIClient:
             return []
 
         try:
-            servergame, serverversion = self.__translate(game, version)
-            resp = self.__exchange_data(
-                f"{self.API_VERSION}/{servergame}/{serverversion}",
+            return self.__exchange_object(
+                game,
+                version,
+                "profile",
                 {
                     "ids": ids,
                     "type": idtype.value,
-                    "objects": ["profile"],
                 },
             )
-            return resp["profile"]
         except APIException:
             # Couldn't talk to server, assume empty profiles
             return []
@@ -274,21 +575,15 @@ class APIClient:
             return []
 
         try:
-            servergame, serverversion = self.__translate(game, version)
             data: Dict[str, Any] = {
                 "ids": ids,
                 "type": idtype.value,
-                "objects": ["records"],
             }
             if since is not None:
                 data["since"] = since
             if until is not None:
                 data["until"] = until
-            resp = self.__exchange_data(
-                f"{self.API_VERSION}/{servergame}/{serverversion}",
-                data,
-            )
-            return resp["records"]
+            return self.__exchange_object(game, version, "records", data)
         except APIException:
             # Couldn't talk to server, assume empty records
             return []
@@ -301,16 +596,15 @@ class APIClient:
             return []
 
         try:
-            servergame, serverversion = self.__translate(game, version)
-            resp = self.__exchange_data(
-                f"{self.API_VERSION}/{servergame}/{serverversion}",
+            return self.__exchange_object(
+                game,
+                version,
+                "statistics",
                 {
                     "ids": ids,
                     "type": idtype.value,
-                    "objects": ["statistics"],
                 },
             )
-            return resp["statistics"]
         except APIException:
             # Couldn't talk to server, assume empty statistics
             return []
@@ -321,16 +615,15 @@ class APIClient:
         # No point disallowing this, since its only ever used for bootstrapping.
 
         try:
-            servergame, serverversion = self.__translate(game, version)
-            resp = self.__exchange_data(
-                f"{self.API_VERSION}/{servergame}/{serverversion}",
+            return self.__exchange_object(
+                game,
+                version,
+                "catalog",
                 {
                     "ids": [],
                     "type": "server",
-                    "objects": ["catalog"],
                 },
             )
-            return resp["catalog"]
         except APIException:
             # Couldn't talk to server, assume empty catalog
             return {}
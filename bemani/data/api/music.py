@@ -707,11 +707,12 @@ class GlobalMusicData(BaseGlobalData):
         self,
         game: GameConstants,
         version: int,
-        localcards: List[Tuple[str, UserID]],
         localscores: List[Tuple[UserID, Score]],
         remotescores: List[Dict[str, Any]],
     ) -> List[Tuple[UserID, Score]]:
-        card_to_id = {cardid: userid for (cardid, userid) in localcards}
+        card_to_id = self.user.get_userids_for_cards(
+            [card for score in remotescores for card in score.get("cards", [])]
+        )
         allscores: Dict[UserID, Dict[int, Dict[int, Score]]] = {}
 
         def add_score(userid: UserID, score: Score) -> None:
@@ -784,9 +785,8 @@ class GlobalMusicData(BaseGlobalData):
             songkey = [songid, songchart]
 
         # Now, fetch all the scores remotely and locally
-        localcards, localscores, remotescores = Parallel.execute(
+        localscores, remotescores = Parallel.execute(
             [
-                self.user.get_all_cards,
                 lambda: self.music.get_all_scores(
                     game, version, userid, songid, songchart, since, until
                 ),
@@ -804,19 +804,18 @@ class GlobalMusicData(BaseGlobalData):
             ]
         )
 
-        return self.__merge_global_scores(
-            game, version, localcards, localscores, remotescores
-        )
+        return self.__merge_global_scores(game, version, localscores, remotescores)
 
     def __merge_global_records(
         self,
         game: GameConstants,
         version: int,
-        localcards: List[Tuple[str, UserID]],
         localscores: List[Tuple[UserID, Score]],
         remotescores: List[Dict[str, Any]],
     ) -> List[Tuple[UserID, Score]]:
-        card_to_id = {cardid: userid for (cardid, userid) in localcards}
+        card_to_id = self.user.get_userids_for_cards(
+            [card for score in remotescores for card in score.get("cards", [])]
+        )
         allscores: Dict[int, Dict[int, Tuple[UserID, Score]]] = {}
 
         def add_score(userid: UserID, score: Score) -> None:
@@ -887,9 +886,8 @@ class GlobalMusicData(BaseGlobalData):
             return self.music.get_all_records(game, version, userlist, locationlist)
 
         # Now, fetch all records remotely and locally
-        localcards, localscores, remotescores = Parallel.execute(
+        localscores, remotescores = Parallel.execute(
             [
-                self.user.get_all_cards,
                 lambda: self.music.get_all_records(
                     game, version, userlist, locationlist
                 ),
@@ -905,9 +903,7 @@ class GlobalMusicData(BaseGlobalData):
             ]
         )
 
-        return self.__merge_global_records(
-            game, version, localcards, localscores, remotescores
-        )
+        return self.__merge_global_records(game, version, localscores, remotescores)
 
     def get_clear_rates(
         self,
@@ -160,89 +160,110 @@ class GlobalUserData(BaseGlobalData):
         else:
             return self.user.get_any_profile(game, version, userid)
 
-    def get_any_profiles(
-        self, game: GameConstants, version: int, userids: List[UserID]
+    def __profiles_request(
+        self,
+        game: GameConstants,
+        version: int,
+        userids: List[UserID],
+        exact: bool,
     ) -> List[Tuple[UserID, Optional[Profile]]]:
-        if len(userids) == 0:
-            return []
-
         remote_ids = [userid for userid in userids if RemoteUser.is_remote(userid)]
         local_ids = [userid for userid in userids if not RemoteUser.is_remote(userid)]
 
+        def local_request() -> List[Tuple[UserID, Optional[Profile]]]:
+            if exact:
+                return self.user.get_profiles(game, version, local_ids)
+            else:
+                return self.user.get_any_profiles(game, version, local_ids)
+
         if len(remote_ids) == 0:
             # We only have local profiles here, just pass on to the underlying layer
-            return self.user.get_any_profiles(game, version, local_ids)
-        else:
-            # We have to fetch some local profiles and some remote profiles, and then
-            # merge them together
-            card_to_userid = {
-                RemoteUser.userid_to_card(userid): userid for userid in remote_ids
-            }
-
-            local_profiles, remote_profiles = Parallel.execute(
-                [
-                    lambda: self.user.get_any_profiles(game, version, local_ids),
-                    lambda: Parallel.flatten(
-                        Parallel.call(
-                            [client.get_profiles for client in self.clients],
-                            game,
-                            version,
-                            APIConstants.ID_TYPE_CARD,
-                            [
-                                RemoteUser.userid_to_card(userid)
-                                for userid in remote_ids
-                            ],
-                        )
-                    ),
-                ]
-            )
+            return local_request()
+
+        # We have to fetch some local profiles and some remote profiles, and then
+        # merge them together
+        card_to_userid = {
+            RemoteUser.userid_to_card(userid): userid for userid in remote_ids
+        }
+
+        local_profiles, remote_profiles = Parallel.execute(
+            [
+                local_request,
+                lambda: Parallel.flatten(
+                    Parallel.call(
+                        [client.get_profiles for client in self.clients],
+                        game,
+                        version,
+                        APIConstants.ID_TYPE_CARD,
+                        [RemoteUser.userid_to_card(userid) for userid in remote_ids],
+                    )
+                ),
+            ]
+        )
+
+        for profile in remote_profiles:
+            cards = [card.upper() for card in profile.get("cards", [])]
+            for card in cards:
+                # Map it back to the requested user
+                userid = card_to_userid.get(card)
+                if userid is None:
+                    continue
 
-            for profile in remote_profiles:
-                cards = [card.upper() for card in profile.get("cards", [])]
-                for card in cards:
-                    # Map it back to the requested user
-                    userid = card_to_userid.get(card)
-                    if userid is None:
-                        continue
-
-                    # Sanitize the returned data
-                    exact_match = profile.get("match", "partial") == "exact"
-                    refid = self.user.get_refid(game, version, userid)
-                    extid = self.user.get_extid(game, version, userid)
-
-                    # Add in our defaults we always provide
-                    local_profiles.append(
-                        (
-                            userid,
-                            self.__format_profile(
-                                Profile(
-                                    game,
-                                    version if exact_match else 0,
-                                    refid,
-                                    extid,
-                                    profile,
-                                ),
+                # Don't take non-exact matches when asked for a specific version.
+                exact_match = profile.get("match", "partial") == "exact"
+                if exact and (not exact_match):
+                    continue
+
+                # Sanitize the returned data
+                refid = self.user.get_refid(game, version, userid)
+                extid = self.user.get_extid(game, version, userid)
+
+                # Add in our defaults we always provide
+                local_profiles.append(
+                    (
+                        userid,
+                        self.__format_profile(
+                            Profile(
+                                game,
+                                version if exact_match else 0,
+                                refid,
+                                extid,
+                                profile,
                             ),
                         ),
-                    )
+                    ),
+                )
+
+                # Mark that we saw this card/user
+                del card_to_userid[card]
 
-                    # Mark that we saw this card/user
-                    del card_to_userid[card]
+        # Finally, mark all missing remote profiles as None
+        for card in card_to_userid:
+            local_profiles.append((card_to_userid[card], None))
 
-            # Finally, mark all missing remote profiles as None
-            for card in card_to_userid:
-                local_profiles.append((card_to_userid[card], None))
+        return local_profiles
 
-            return local_profiles
+    def get_profiles(
+        self, game: GameConstants, version: int, userids: List[UserID]
+    ) -> List[Tuple[UserID, Optional[Profile]]]:
+        if len(userids) == 0:
+            return []
+        return self.__profiles_request(game, version, userids, exact=True)
+
+    def get_any_profiles(
+        self, game: GameConstants, version: int, userids: List[UserID]
+    ) -> List[Tuple[UserID, Optional[Profile]]]:
+        if len(userids) == 0:
+            return []
+        return self.__profiles_request(game, version, userids, exact=False)
 
     def get_all_profiles(
         self, game: GameConstants, version: int
     ) -> List[Tuple[UserID, Profile]]:
         # Fetch local and remote profiles, and then merge by adding remote profiles to local
         # profiles when we don't have a profile for that user ID yet.
-        local_cards, local_profiles, remote_profiles = Parallel.execute(
+        local_profiles, remote_profiles = Parallel.execute(
             [
-                self.user.get_all_cards,
                 lambda: self.user.get_all_profiles(game, version),
                 lambda: Parallel.flatten(
                     Parallel.call(
@@ -256,7 +277,9 @@ class GlobalUserData(BaseGlobalData):
             ]
         )
 
-        card_to_id = {cardid: userid for (cardid, userid) in local_cards}
+        card_to_id = self.user.get_userids_for_cards(
+            [card for profile in remote_profiles for card in profile.get("cards", [])]
+        )
         id_to_profile = {userid: profile for (userid, profile) in local_profiles}
 
         for profile in remote_profiles:
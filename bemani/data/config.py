@@ -44,6 +44,42 @@ class Database:
     def read_only(self) -> bool:
         return bool(self.__config.get("database", {}).get("read_only", False))
 
+    @property
+    def machine_cache_ttl(self) -> float:
+        return float(self.__config.get("database", {}).get("machine_cache_ttl", 0.0))
+
+    @property
+    def card_cache_ttl(self) -> float:
+        return float(self.__config.get("database", {}).get("card_cache_ttl", 60.0))
+
+    @property
+    def music_cache_ttl(self) -> float:
+        return float(self.__config.get("database", {}).get("music_cache_ttl", 600.0))
+
+    @property
+    def server_cache_ttl(self) -> float:
+        return float(self.__config.get("database", {}).get("server_cache_ttl", 60.0))
+
+    @property
+    def pool_size(self) -> int:
+        return int(self.__config.get("database", {}).get("pool_size", 5))
+
+    @property
+    def max_overflow(self) -> int:
+        return int(self.__config.get("database", {}).get("max_overflow", 10))
+
+    @property
+    def pool_timeout(self) -> float:
+        return float(self.__config.get("database", {}).get("pool_timeout", 30.0))
+
+    @property
+    def pool_recycle(self) -> int:
+        return int(self.__config.get("database", {}).get("pool_recycle", 3600))
+
+    @property
+    def pool_pre_ping(self) -> bool:
+        return bool(self.__config.get("database", {}).get("pool_pre_ping", False))
+
 
 class Server:
     def __init__(self, parent_config: "Config") -> None:
@@ -95,6 +131,16 @@ class Server:
         # Region was fine.
         return region
 
+    @property
+    def compression_level(self) -> Optional[int]:
+        level = self.__config.get("server", {}).get("compression_level")
+        return int(level) if level is not None else None
+
+    @property
+    def xml_backend(self) -> Optional[str]:
+        backend = self.__config.get("server", {}).get("xml_backend")
+        return str(backend) if backend else None
+
     @property
     def area(self) -> Optional[str]:
         area = self.__config.get("server", {}).get("area")
@@ -175,6 +221,117 @@ class JubeatAssets:
         return str(directory) if directory else None
 
 
+class Profiling:
+    def __init__(self, parent_config: "Config") -> None:
+        self.__config = parent_config
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.__config.get("profiling", {}).get("enabled", False))
+
+    @property
+    def slow_threshold(self) -> Optional[float]:
+        threshold = self.__config.get("profiling", {}).get("slow_threshold")
+        return float(threshold) if threshold is not None else None
+
+    @property
+    def sample_rate(self) -> float:
+        return float(self.__config.get("profiling", {}).get("sample_rate", 0.0))
+
+    @property
+    def profile_dir(self) -> Optional[str]:
+        directory = self.__config.get("profiling", {}).get("profile_dir")
+        return os.path.abspath(str(directory)) if directory else None
+
+    @property
+    def dump_file(self) -> Optional[str]:
+        filename = self.__config.get("profiling", {}).get("dump_file")
+        return str(filename) if filename else None
+
+    @property
+    def dump_interval(self) -> float:
+        return float(self.__config.get("profiling", {}).get("dump_interval", 60.0))
+
+
+class Parallelism:
+    def __init__(self, parent_config: "Config") -> None:
+        self.__config = parent_config
+
+    @property
+    def max_workers(self) -> Optional[int]:
+        workers = self.__config.get("parallel", {}).get("max_workers")
+        return int(workers) if workers is not None else None
+
+    @property
+    def timeout(self) -> Optional[float]:
+        timeout = self.__config.get("parallel", {}).get("timeout")
+        return float(timeout) if timeout is not None else None
+
+
+class Federation:
+    def __init__(self, parent_config: "Config") -> None:
+        self.__config = parent_config
+
+    @property
+    def connect_timeout(self) -> Optional[float]:
+        timeout = self.__config.get("federation", {}).get("connect_timeout")
+        return float(timeout) if timeout is not None else None
+
+    @property
+    def timeout(self) -> Optional[float]:
+        timeout = self.__config.get("federation", {}).get("timeout")
+        return float(timeout) if timeout is not None else None
+
+    @property
+    def max_connections(self) -> Optional[int]:
+        connections = self.__config.get("federation", {}).get("max_connections")
+        return int(connections) if connections is not None else None
+
+    @property
+    def failure_threshold(self) -> Optional[int]:
+        threshold = self.__config.get("federation", {}).get("failure_threshold")
+        return int(threshold) if threshold is not None else None
+
+    @property
+    def retry_interval(self) -> Optional[float]:
+        interval = self.__config.get("federation", {}).get("retry_interval")
+        return float(interval) if interval is not None else None
+
+    @property
+    def cache_backend(self) -> str:
+        return str(
+            self.__config.get("federation", {}).get("cache", {}).get("backend", "none")
+        ).lower()
+
+    @property
+    def cache_directory(self) -> str:
+        directory = (
+            self.__config.get("federation", {}).get("cache", {}).get("directory")
+        )
+        if directory is None:
+            return os.path.join(self.__config.cache_dir, "federation")
+        return os.path.abspath(str(directory))
+
+    @property
+    def cache_max_entries(self) -> int:
+        return int(
+            self.__config.get("federation", {})
+            .get("cache", {})
+            .get("max_entries", 1024)
+        )
+
+    @property
+    def cache_stale(self) -> float:
+        return float(
+            self.__config.get("federation", {}).get("cache", {}).get("stale", 0.0)
+        )
+
+    @property
+    def cache_ttls(self) -> Dict[str, float]:
+        ttls = self.__config.get("federation", {}).get("cache", {}).get("ttl", {})
+        return {str(objtype): float(ttl) for objtype, ttl in (ttls or {}).items()}
+
+
 class Config(dict):
     def __init__(self, existing_contents: Dict[str, Any] = {}) -> None:
         super().__init__(existing_contents or {})
@@ -186,6 +343,9 @@ class Config(dict):
         self.webhooks = WebHooks(self)
         self.assets = Assets(self)
         self.machine = Machine(self)
+        self.profiling = Profiling(self)
+        self.parallel = Parallelism(self)
+        self.federation = Federation(self)
 
     def clone(self) -> "Config":
         # Somehow its not possible to clone this object if an instantiated Engine is present,
@@ -202,6 +362,17 @@ class Config(dict):
 
         return clone
 
+    def overlay(self, **sections: Any) -> "Config":
+        """
+        Return a lightweight copy of this config for handling a single request. Unlike
+        clone(), sections are shared with this config instead of deep-copied, so changes
+        must replace a whole section (or be passed in as keyword arguments) rather than
+        modify a shared section in place.
+        """
+        overlay = Config(self)
+        overlay.update(sections)
+        return overlay
+
     @property
     def filename(self) -> str:
         filename = self.get("filename")
@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from typing import Any, Dict
 
 import alembic.config
 from alembic.migration import MigrationContext
@@ -7,14 +10,15 @@ from sqlalchemy import create_engine  # type: ignore
 from sqlalchemy.orm import scoped_session  # type: ignore
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.engine import Engine  # type: ignore
+from sqlalchemy.pool import QueuePool  # type: ignore
 from sqlalchemy.sql import text  # type: ignore
-from sqlalchemy.exc import ProgrammingError  # type: ignore
+from sqlalchemy.exc import ProgrammingError, TimeoutError  # type: ignore
 
 from bemani.data.api.user import GlobalUserData
 from bemani.data.api.game import GlobalGameData
 from bemani.data.api.music import GlobalMusicData
 from bemani.data.config import Config
-from bemani.data.mysql.base import metadata
+from bemani.data.mysql.base import BaseData, metadata
 from bemani.data.mysql.user import UserData
 from bemani.data.mysql.music import MusicData
 from bemani.data.mysql.machine import MachineData
@@ -29,6 +33,42 @@ class DBCreateException(Exception):
     pass
 
 
+class _MeteredQueuePool(QueuePool):  # type: ignore
+    """
+    A regular connection pool that also counts how often a request had to wait for
+    somebody else to return a connection, which is the sign that the pool is too
+    small for the number of threads sharing it.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.__lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def _do_get(self) -> Any:
+        exhausted = (
+            self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+            and self._pool.empty()
+        )
+        start = time.monotonic()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            with self.__lock:
+                self.timeouts += 1
+            raise
+        finally:
+            with self.__lock:
+                self.checkouts += 1
+                if exhausted:
+                    self.waits += 1
+                    self.wait_time += time.monotonic() - start
+
+
 class LocalProvider:
     """
     A wrapper object for implementing local data operations only. Right
@@ -86,6 +126,9 @@ class Data:
     and storing data.
     """
 
+    __shared: Dict[Engine, "Data"] = {}
+    __shared_lock = threading.Lock()
+
     def __init__(self, config: Config) -> None:
         """
         Initializes the data object.
@@ -129,9 +172,67 @@ class Data:
     def create_engine(cls, config: Config) -> Engine:
         return create_engine(
             Data.sqlalchemy_url(config),
-            pool_recycle=3600,
+            poolclass=_MeteredQueuePool,
+            pool_size=config.database.pool_size,
+            max_overflow=config.database.max_overflow,
+            pool_timeout=config.database.pool_timeout,
+            pool_recycle=config.database.pool_recycle,
+            pool_pre_ping=config.database.pool_pre_ping,
         )
 
+    @classmethod
+    def shared(cls, config: Config) -> "Data":
+        """
+        Returns a data object that is built once for each DB engine and then reused
+        by every request this process serves. Each thread gets its own DB session
+        out of it, so it is safe to share across threads as long as every request
+        calls close() when done to hand its connection back to the pool.
+
+        Parameters:
+            config - A config structure with a 'database' section, as passed to
+                     the constructor. Only the first config seen for an engine is
+                     used, so this should be the process-wide config rather than
+                     a per-request one.
+        """
+        engine = config.database.engine
+        with cls.__shared_lock:
+            data = cls.__shared.get(engine)
+            if data is None:
+                data = Data(config)
+                cls.__shared[engine] = data
+            return data
+
+    @classmethod
+    def pool_stats(cls, engine: Engine) -> Dict[str, Any]:
+        """
+        Returns counters for the connection pool of an engine created by create_engine().
+        """
+        pool = engine.pool
+        stats: Dict[str, Any] = {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+        if isinstance(pool, _MeteredQueuePool):
+            stats["checkouts"] = pool.checkouts
+            stats["waits"] = pool.waits
+            stats["wait_time"] = round(pool.wait_time, 6)
+            stats["timeouts"] = pool.timeouts
+        return stats
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Any]:
+        """
+        Returns counters for the process-wide caches kept by the data layer.
+        """
+        return {
+            **MachineData.cache_stats(),
+            **MusicData.cache_stats(),
+            **APIData.cache_stats(),
+            **UserData.cache_stats(),
+        }
+
     def __exists(self) -> bool:
         # See if the DB was already created
         try:
@@ -220,11 +321,28 @@ class Data:
             "head",
         )
 
+    def reencode_blobs(self, batch_size: int = 1000) -> Dict[str, int]:
+        """
+        Rewrite any JSON data blobs still holding bytes in the legacy encoding.
+
+        Parameters:
+            batch_size - Number of rows to rewrite at once.
+
+        Returns:
+            A dictionary of table name to the number of rows rewritten.
+        """
+        base = BaseData(self.__config, self.__session)
+        return {
+            table.name: base.reencode_table(table, batch_size)
+            for table in metadata.sorted_tables
+            if "data" in table.columns
+        }
+
     def close(self) -> None:
         """
-        Close any open data connection.
+        Close the calling thread's session, returning its connection to the pool.
+        The data object itself stays usable, and the next query on this thread
+        checks out a connection again.
         """
         # Make sure we don't leak connections between web requests
-        if self.__session is not None:
-            self.__session.close()
-            self.__session = None
+        self.__session.remove()
@@ -1,9 +1,12 @@
 import uuid
 from sqlalchemy import Table, Column  # type: ignore
+from sqlalchemy.engine.base import Connection  # type: ignore
 from sqlalchemy.types import String, Integer  # type: ignore
 from typing import Any, Dict, List, Optional
+from typing_extensions import Final
 
-from bemani.common import Time
+from bemani.common import Time, TTLCache
+from bemani.data.config import Config
 from bemani.data.mysql.base import BaseData, metadata
 from bemani.data.interfaces import APIProviderInterface
 from bemani.data.types import Client, Server
@@ -39,6 +42,22 @@ server = Table(
 
 
 class APIData(APIProviderInterface, BaseData):
+    # Process-wide copy of the server list, consulted for every federated lookup.
+    SERVER_CACHE: Final[TTLCache] = TTLCache(maxsize=1)
+
+    def __init__(self, config: Config, conn: Connection) -> None:
+        super().__init__(config, conn)
+        self.__cache_ttl = config.database.server_cache_ttl
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns hit and miss counters for the server list cache in this process.
+        """
+        return {
+            "server": cls.SERVER_CACHE.stats(),
+        }
+
     def get_all_clients(self) -> List[Client]:
         """
         Grab all authorized clients in the system.
@@ -157,9 +176,14 @@ class APIData(APIProviderInterface, BaseData):
                 allow_scores,
             )
 
-        sql = "SELECT id, timestamp, uri, token, config FROM server ORDER BY timestamp ASC"
-        cursor = self.execute(sql)
-        return [format_result(result) for result in cursor]
+        found, results = APIData.SERVER_CACHE.get(None)
+        if not found:
+            generation = APIData.SERVER_CACHE.generation
+            sql = "SELECT id, timestamp, uri, token, config FROM server ORDER BY timestamp ASC"
+            cursor = self.execute(sql)
+            results = [dict(result) for result in cursor]
+            APIData.SERVER_CACHE.put(None, results, self.__cache_ttl, generation)
+        return [format_result(result) for result in results]
 
     def create_server(self, uri: str, token: str) -> int:
         """
@@ -181,6 +205,7 @@ class APIData(APIProviderInterface, BaseData):
                 "token": token,
             },
         )
+        APIData.SERVER_CACHE.invalidate(None)
         return cursor.lastrowid
 
     def get_server(self, serverid: int) -> Optional[Server]:
@@ -233,6 +258,7 @@ class APIData(APIProviderInterface, BaseData):
                 "config": config,
             },
         )
+        APIData.SERVER_CACHE.invalidate(None)
 
     def destroy_server(self, serverid: int) -> None:
         """
@@ -243,3 +269,4 @@ class APIData(APIProviderInterface, BaseData):
         """
         sql = "DELETE FROM server WHERE id = :id LIMIT 1"
         self.execute(sql, {"id": serverid})
+        APIData.SERVER_CACHE.invalidate(None)
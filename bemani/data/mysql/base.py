@@ -1,5 +1,7 @@
+import base64
 import json
 import random
+import zlib
 from typing import Dict, Any, Optional
 from typing_extensions import Final
 
@@ -10,7 +12,7 @@ from sqlalchemy.engine.base import Connection  # type: ignore
 from sqlalchemy.engine import CursorResult  # type: ignore
 from sqlalchemy.sql import text  # type: ignore
 from sqlalchemy.types import String, Integer  # type: ignore
-from sqlalchemy import Table, Column, MetaData  # type: ignore
+from sqlalchemy import Table, Column, MetaData, UniqueConstraint  # type: ignore
 
 metadata = MetaData()
 
@@ -29,14 +31,65 @@ session = Table(
 )
 
 
+"""
+Tags used to store bytes inside JSON blobs. Bytes are stored as a single-key object
+holding the base64 of the data, or of its zlib compressed form for large values that
+compress well. Blobs written before these tags existed stored bytes as a list of
+integers starting with the legacy tag, and those are still read transparently until
+they are rewritten by reencode_table().
+"""
+_BYTES_TAG: Final[str] = "__b64__"
+_ZLIB_BYTES_TAG: Final[str] = "__zlib__"
+_LEGACY_BYTES_TAG: Final[str] = "__bytes__"
+
+# Bytes values at least this long are compressed if it makes them smaller.
+_COMPRESS_THRESHOLD: Final[int] = 512
+
+
 class _BytesEncoder(json.JSONEncoder):
     def default(self, obj: Any) -> Any:
         if isinstance(obj, bytes):
-            # We're abusing lists here, we have a mixed type
-            return ["__bytes__"] + [b for b in obj]
+            if len(obj) >= _COMPRESS_THRESHOLD:
+                compressed = zlib.compress(obj)
+                if len(compressed) < len(obj):
+                    return {
+                        _ZLIB_BYTES_TAG: base64.b64encode(compressed).decode("ascii")
+                    }
+            return {_BYTES_TAG: base64.b64encode(obj).decode("ascii")}
         return json.JSONEncoder.default(self, obj)
 
 
+def _decode_bytes(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if _BYTES_TAG in obj:
+            return base64.b64decode(obj[_BYTES_TAG])
+        if _ZLIB_BYTES_TAG in obj:
+            return zlib.decompress(base64.b64decode(obj[_ZLIB_BYTES_TAG]))
+    return obj
+
+
+def _fix_legacy_bytes(jd: Any) -> Any:
+    if type(jd) == dict:
+        # Fix each element in the dictionary.
+        for key in jd:
+            jd[key] = _fix_legacy_bytes(jd[key])
+        return jd
+
+    if type(jd) == list:
+        # Could be serialized by us, could be a normal list.
+        if len(jd) >= 1 and jd[0] == _LEGACY_BYTES_TAG:
+            # This is a serialized bytestring
+            return bytes(jd[1:])
+
+        # Possibly one of these is a dictionary/list/serialized.
+        for i in range(len(jd)):
+            jd[i] = _fix_legacy_bytes(jd[i])
+        return jd
+
+    # Normal value, its deserialized version is itself.
+    return jd
+
+
 class BaseData:
     SESSION_LENGTH: Final[int] = 32
 
@@ -100,28 +153,83 @@ class BaseData:
         if data is None:
             return {}
 
-        def fix(jd: Any) -> Any:
-            if type(jd) == dict:
-                # Fix each element in the dictionary.
-                for key in jd:
-                    jd[key] = fix(jd[key])
-                return jd
+        # Only pay for decoding bytes when the blob actually contains some.
+        if _BYTES_TAG in data or _ZLIB_BYTES_TAG in data:
+            jd = json.loads(data, object_hook=_decode_bytes)
+        else:
+            jd = json.loads(data)
+        if _LEGACY_BYTES_TAG in data:
+            jd = _fix_legacy_bytes(jd)
+        return jd
 
-            if type(jd) == list:
-                # Could be serialized by us, could be a normal list.
-                if len(jd) >= 1 and jd[0] == "__bytes__":
-                    # This is a serialized bytestring
-                    return bytes(jd[1:])
+    def reencode_table(self, table: Table, batch_size: int = 1000) -> int:
+        """
+        Rewrite every row of a table whose data column still holds bytes in the
+        legacy list encoding, so that it uses the current encoding instead. Rows
+        are rewritten in batches, and each row is only updated if it still holds
+        the data that was read, so that this is safe to run against a live network.
+        A row that a game saved in the meantime is skipped, since saving it already
+        wrote the current encoding.
 
-                # Possibly one of these is a dictionary/list/serialized.
-                for i in range(len(jd)):
-                    jd[i] = fix(jd[i])
-                return jd
+        Parameters:
+            table - A table with a JSON data column and a unique key.
+            batch_size - Number of rows to fetch and rewrite at once.
 
-            # Normal value, its deserialized version is itself.
-            return jd
+        Returns:
+            The number of rows that were rewritten.
+        """
+        if table.primary_key.columns:
+            keys = [column.name for column in table.primary_key.columns]
+        else:
+            keys = [
+                constraint
+                for constraint in table.constraints
+                if isinstance(constraint, UniqueConstraint)
+            ][0].columns.keys()
+
+        columns = ", ".join(f"`{key}`" for key in keys)
+        where = " AND ".join(f"`{key}` = :{key}" for key in keys)
+        # Rows that only look like legacy bytes are skipped over with OFFSET, which only
+        # works if they come back in the same order every time.
+        select = f"""
+            SELECT {columns}, data FROM `{table.name}`
+            WHERE data LIKE :legacy ORDER BY {columns} LIMIT :limit OFFSET :offset
+        """
+        update = f"UPDATE `{table.name}` SET data = :data WHERE {where} AND data = CAST(:old AS JSON)"
 
-        return fix(json.loads(data))
+        rewritten = 0
+        skipped = 0
+        while True:
+            cursor = self.execute(
+                select,
+                {
+                    "legacy": f'%"{_LEGACY_BYTES_TAG}"%',
+                    "limit": batch_size,
+                    "offset": skipped,
+                },
+            )
+            if cursor.rowcount == 0:
+                return rewritten
+
+            for result in cursor.fetchall():
+                data = self.serialize(self.deserialize(result["data"]))
+                if _LEGACY_BYTES_TAG in data:
+                    # Something that only looks like legacy bytes, such as a string
+                    # containing the tag. Leave it alone and don't fetch it again.
+                    skipped += 1
+                    continue
+                cursor = self.execute(
+                    update,
+                    {
+                        "data": data,
+                        "old": result["data"],
+                        **{key: result[key] for key in keys},
+                    },
+                )
+                # If nothing matched, a game saved this row after we read it and the
+                # save already used the current encoding, so it won't be fetched again.
+                if cursor.rowcount == 1:
+                    rewritten += 1
 
     def _from_session(self, session: str, sesstype: str) -> Optional[int]:
         """
@@ -1,10 +1,12 @@
 from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
 from sqlalchemy.types import String, Integer, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
+from sqlalchemy.engine.base import Connection  # type: ignore
 from typing import Optional, Dict, List, Tuple, Any
 from typing_extensions import Final
 
-from bemani.common import GameConstants, ValidatedDict
+from bemani.common import GameConstants, TTLCache, ValidatedDict
+from bemani.data.config import Config
 from bemani.data.mysql.base import BaseData, metadata
 from bemani.data.types import Machine, Arcade, UserID, ArcadeID
 
@@ -87,6 +89,27 @@ class MachineData(BaseData):
     # and thus will start at 1.
     DEFAULT_SETTINGS_ARCADE: Final[ArcadeID] = ArcadeID(-1)
 
+    # Process-wide caches of machine and arcade rows, shared by every MachineData instance
+    # so that they survive across requests. Rows are cached rather than objects so that
+    # every caller gets its own Machine or Arcade to modify. Lookups that found nothing
+    # are cached as None, since unknown PCBIDs tend to retry over and over.
+    MACHINE_CACHE: Final[TTLCache] = TTLCache(maxsize=4096)
+    ARCADE_CACHE: Final[TTLCache] = TTLCache(maxsize=1024)
+
+    def __init__(self, config: Config, conn: Connection) -> None:
+        super().__init__(config, conn)
+        self.__cache_ttl = config.database.machine_cache_ttl
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns hit and miss counters for the machine and arcade caches in this process.
+        """
+        return {
+            "machine": cls.MACHINE_CACHE.stats(),
+            "arcade": cls.ARCADE_CACHE.stats(),
+        }
+
     def from_port(self, port: int) -> Optional[str]:
         """
         Given a port, look up the PCBID attached to that port.
@@ -166,16 +189,23 @@ class MachineData(BaseData):
         Returns:
             A Machine object representing a machine, or None if not found.
         """
-        sql = """
-            SELECT name, description, arcadeid, id, port, game, version, data
-            FROM machine WHERE pcbid = :pcbid
-        """
-        cursor = self.execute(sql, {"pcbid": pcbid})
-        if cursor.rowcount != 1:
-            # Machine doesn't exist
-            return None
+        found, result = MachineData.MACHINE_CACHE.get(pcbid)
+        if not found:
+            generation = MachineData.MACHINE_CACHE.generation
+            sql = """
+                SELECT name, description, arcadeid, id, port, game, version, data
+                FROM machine WHERE pcbid = :pcbid
+            """
+            cursor = self.execute(sql, {"pcbid": pcbid})
+            if cursor.rowcount != 1:
+                # Machine doesn't exist
+                result = None
+            else:
+                result = dict(cursor.fetchone())
+            MachineData.MACHINE_CACHE.put(pcbid, result, self.__cache_ttl, generation)
 
-        result = cursor.fetchone()
+        if result is None:
+            return None
         return Machine(
             result["id"],
             pcbid,
@@ -250,6 +280,7 @@ class MachineData(BaseData):
                 "data": self.serialize(machine.data),
             },
         )
+        MachineData.MACHINE_CACHE.invalidate(machine.pcbid)
 
     def create_machine(
         self,
@@ -309,6 +340,8 @@ class MachineData(BaseData):
                 # Failed to add machine, try with new port
                 continue
 
+            # We may have cached the fact that this PCBID didn't exist.
+            MachineData.MACHINE_CACHE.invalidate(pcbid)
             machine = self.get_machine(pcbid)
             if machine is not None:
                 return machine
@@ -322,6 +355,7 @@ class MachineData(BaseData):
         """
         sql = "DELETE FROM `machine` WHERE pcbid = :pcbid LIMIT 1"
         self.execute(sql, {"pcbid": pcbid})
+        MachineData.MACHINE_CACHE.invalidate(pcbid)
 
     def create_arcade(
         self,
@@ -361,6 +395,7 @@ class MachineData(BaseData):
                 VALUES (:userid, :arcadeid)
             """
             self.execute(sql, {"userid": owner, "arcadeid": arcadeid})
+        MachineData.ARCADE_CACHE.invalidate(arcadeid)
         new_arcade = self.get_arcade(arcadeid)
         if new_arcade is None:
             raise Exception("Failed to create an arcade!")
@@ -376,20 +411,27 @@ class MachineData(BaseData):
         Returns:
             An Arcade object if this arcade was found, or None otherwise.
         """
-        sql = """
-            SELECT name, description, pin, pref, area, data
-            FROM arcade WHERE id = :id
-        """
-        cursor = self.execute(sql, {"id": arcadeid})
-        if cursor.rowcount != 1:
-            # Arcade doesn't exist
-            return None
-
-        result = cursor.fetchone()
+        found, result = MachineData.ARCADE_CACHE.get(arcadeid)
+        if not found:
+            generation = MachineData.ARCADE_CACHE.generation
+            sql = """
+                SELECT name, description, pin, pref, area, data
+                FROM arcade WHERE id = :id
+            """
+            cursor = self.execute(sql, {"id": arcadeid})
+            if cursor.rowcount != 1:
+                # Arcade doesn't exist
+                result = None
+            else:
+                result = dict(cursor.fetchone())
 
-        sql = "SELECT userid FROM arcade_owner WHERE arcadeid = :id"
-        cursor = self.execute(sql, {"id": arcadeid})
+                sql = "SELECT userid FROM arcade_owner WHERE arcadeid = :id"
+                cursor = self.execute(sql, {"id": arcadeid})
+                result["owners"] = tuple(owner["userid"] for owner in cursor)
+            MachineData.ARCADE_CACHE.put(arcadeid, result, self.__cache_ttl, generation)
 
+        if result is None:
+            return None
         return Arcade(
             arcadeid,
             result["name"],
@@ -398,7 +440,7 @@ class MachineData(BaseData):
             result["pref"],
             result["area"] or None,
             self.deserialize(result["data"]),
-            [owner["userid"] for owner in cursor],
+            list(result["owners"]),
         )
 
     def put_arcade(self, arcade: Arcade) -> None:
@@ -440,6 +482,7 @@ class MachineData(BaseData):
                 VALUES (:userid, :arcadeid)
             """
             self.execute(sql, {"userid": owner, "arcadeid": arcade.id})
+        MachineData.ARCADE_CACHE.invalidate(arcade.id)
 
     def destroy_arcade(self, arcadeid: ArcadeID) -> None:
         """
@@ -455,6 +498,9 @@ class MachineData(BaseData):
         self.execute(sql, {"arcadeid": arcadeid})
         sql = "UPDATE `machine` SET arcadeid = NULL WHERE arcadeid = :arcadeid"
         self.execute(sql, {"arcadeid": arcadeid})
+        MachineData.ARCADE_CACHE.invalidate(arcadeid)
+        # Any number of machines may have just been unlinked, so start over.
+        MachineData.MACHINE_CACHE.clear()
 
     def get_all_arcades(self) -> List[Arcade]:
         """
@@ -2,9 +2,12 @@ from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
 from sqlalchemy.exc import IntegrityError  # type: ignore
 from sqlalchemy.types import String, Integer, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
-from typing import Optional, Dict, List, Tuple, Any
+from sqlalchemy.engine.base import Connection  # type: ignore
+from typing import Optional, Dict, List, Set, Tuple, Any
+from typing_extensions import Final
 
-from bemani.common import GameConstants, Time
+from bemani.common import GameConstants, Time, TTLCache
+from bemani.data.config import Config
 from bemani.data.exceptions import ScoreSaveException
 from bemani.data.mysql.base import BaseData, metadata
 from bemani.data.types import Score, Attempt, Song, UserID
@@ -54,6 +57,47 @@ score_history = Table(
     mysql_charset="utf8mb4",
 )
 
+"""
+Tables for storing the number of entries in score_history, per user and song/chart and
+per song/chart across all users. These are kept up to date as attempts are saved so that
+play counts can be looked up without counting the history table every time.
+"""
+score_play_count = Table(
+    "score_play_count",
+    metadata,
+    Column("userid", BigInteger(unsigned=True), nullable=False),
+    Column("musicid", Integer, nullable=False, index=True),
+    Column("plays", Integer, nullable=False),
+    UniqueConstraint("userid", "musicid", name="userid_musicid"),
+    mysql_charset="utf8mb4",
+)
+music_play_count = Table(
+    "music_play_count",
+    metadata,
+    Column("musicid", Integer, nullable=False, unique=True),
+    Column("plays", Integer, nullable=False),
+    mysql_charset="utf8mb4",
+)
+
+"""
+Table for storing the current record holder of each song/chart, so that records can be
+looked up without ranking every score. This is keyed by musicid like the score table,
+along with a scope naming which scores the record is drawn from. Right now the only scope
+is "global", the best score across the whole network. It is kept up to date as scores
+are saved, and can be rebuilt from the score table with "dbutils rebuild-records".
+"""
+record = Table(
+    "record",
+    metadata,
+    Column("musicid", Integer, nullable=False),
+    Column("scope", String(32), nullable=False),
+    Column("userid", BigInteger(unsigned=True), nullable=False),
+    Column("points", Integer, nullable=False),
+    Column("timestamp", Integer, nullable=False),
+    UniqueConstraint("musicid", "scope", name="musicid_scope"),
+    mysql_charset="utf8mb4",
+)
+
 """
 Table for storing the mapping between game songid/chart and musicid for the score
 and score_history table. To find scores, you will want to join this table with
@@ -83,38 +127,125 @@ music = Table(
 
 
 class MusicData(BaseData):
-    def __get_musicid(
-        self, game: GameConstants, version: int, songid: int, songchart: int
-    ) -> int:
+    RECORD_SCOPE_GLOBAL: Final[str] = "global"
+
+    # Process-wide index of (songid, chart) to music ID, loaded a whole game/version at a
+    # time the first time any song in it is needed. The music table only changes when
+    # read.py imports songs, so entries live for a long time. Songs that are not in the
+    # index are still looked up individually, so newly imported songs are found right away.
+    MUSICID_CACHE: Final[TTLCache] = TTLCache(maxsize=256)
+
+    def __init__(self, config: Config, conn: Connection) -> None:
+        super().__init__(config, conn)
+        self.__cache_ttl = config.database.music_cache_ttl
+
+    @classmethod
+    def invalidate_musicids(
+        cls, game: Optional[GameConstants] = None, version: Optional[int] = None
+    ) -> None:
+        """
+        Drop cached music IDs after the music table changes. Note that this only affects
+        the current process, other processes will notice when their entries expire.
+
+        Parameters:
+            game - Enum value representing a game series, or None for every game.
+            version - Integer representing which version of the game, or None for every version.
+        """
+        if game is None or version is None:
+            cls.MUSICID_CACHE.clear()
+        else:
+            cls.MUSICID_CACHE.invalidate((game.value, version))
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns hit and miss counters for the music ID cache in this process.
+        """
+        return {
+            "musicid": cls.MUSICID_CACHE.stats(),
+        }
+
+    def __get_musicid_index(
+        self, game: GameConstants, version: int
+    ) -> Dict[Tuple[int, int], int]:
+        if self.__cache_ttl <= 0:
+            # Caching is disabled, so loading the whole game/version would only be thrown
+            # away. Return an empty index so that songs are looked up individually.
+            return {}
+
+        key = (game.value, version)
+        found, index = MusicData.MUSICID_CACHE.get(key)
+        if found:
+            return index
+
+        generation = MusicData.MUSICID_CACHE.generation
+        sql = "SELECT songid, chart, id FROM music WHERE game = :game AND version = :version"
+        cursor = self.execute(sql, {"game": game.value, "version": version})
+        index = {(result["songid"], result["chart"]): result["id"] for result in cursor}
+        MusicData.MUSICID_CACHE.put(key, index, self.__cache_ttl, generation)
+        return index
+
+    def get_musicids(
+        self, game: GameConstants, version: int, songs: List[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], int]:
         """
-        Given a game/version/songid/chart, look up the unique music ID for this song.
+        Given a game/version and a list of songid/chart pairs, look up the unique music ID
+        for each song.
 
         Parameters:
             game - Enum value representing a game series.
             version - Integer representing which version of the game.
-            songid - ID of the song according to the game.
-            songchart - Chart number according to the game.
+            songs - List of tuples of songid and chart according to the game.
 
         Returns:
-            Integer representing music ID if found or raises an exception otherwise.
+            A dictionary keyed by songid/chart tuple whose values are integer music IDs.
+            Songs that do not exist are left out.
         """
-        sql = "SELECT id FROM music WHERE songid = :songid AND chart = :chart AND game = :game AND version = :version"
-        cursor = self.execute(
-            sql,
-            {
-                "songid": songid,
-                "chart": songchart,
-                "game": game.value,
-                "version": version,
-            },
-        )
-        if cursor.rowcount != 1:
-            # music doesn't exist
-            raise Exception(
-                f"Song {songid} chart {songchart} doesn't exist for game {game} version {version}"
+        index = self.__get_musicid_index(game, version)
+        musicids = {song: index[song] for song in songs if song in index}
+        missing = {song for song in songs if song not in musicids}
+        for songid, songchart in missing:
+            # Possibly imported after we loaded this game/version.
+            sql = "SELECT id FROM music WHERE songid = :songid AND chart = :chart AND game = :game AND version = :version"
+            cursor = self.execute(
+                sql,
+                {
+                    "songid": songid,
+                    "chart": songchart,
+                    "game": game.value,
+                    "version": version,
+                },
             )
-        result = cursor.fetchone()
-        return result["id"]
+            if cursor.rowcount == 1:
+                musicid = cursor.fetchone()["id"]
+                musicids[(songid, songchart)] = musicid
+                index[(songid, songchart)] = musicid
+        return musicids
+
+    def __get_musicids_or_raise(
+        self, game: GameConstants, version: int, songs: List[Tuple[int, int]]
+    ) -> Dict[Tuple[int, int], int]:
+        """
+        Given a game/version and a list of songid/chart pairs, look up the unique music ID
+        for each song.
+
+        Parameters:
+            game - Enum value representing a game series.
+            version - Integer representing which version of the game.
+            songs - List of tuples of songid and chart according to the game.
+
+        Returns:
+            A dictionary keyed by songid/chart tuple whose values are integer music IDs.
+            Raises an exception if any of the songs doesn't exist.
+        """
+        musicids = self.get_musicids(game, version, songs)
+        for songid, songchart in songs:
+            if (songid, songchart) not in musicids:
+                # music doesn't exist
+                raise Exception(
+                    f"Song {songid} chart {songchart} doesn't exist for game {game} version {version}"
+                )
+        return musicids
 
     def put_score(
         self,
@@ -144,47 +275,158 @@ class MusicData(BaseData):
             new_record - Whether this score was a new record or not.
             timestamp - Optional integer specifying when the high score happened.
         """
-        # First look up the song/chart from the music DB
-        musicid = self.__get_musicid(game, version, songid, songchart)
         ts = timestamp if timestamp is not None else Time.now()
+        self.put_scores(
+            game,
+            version,
+            userid,
+            [Attempt(0, songid, songchart, points, ts, location, new_record, data)],
+        )
 
-        # Add to user score
-        if new_record:
-            # We want to update the timestamp/location to now if its a new record.
-            sql = """
-                INSERT INTO `score` (`userid`, `musicid`, `points`, `data`, `timestamp`, `update`, `lid`)
-                VALUES (:userid, :musicid, :points, :data, :timestamp, :update, :location)
-                ON DUPLICATE KEY UPDATE
-                    data = VALUES(data),
-                    points = VALUES(points),
-                    `update` = VALUES(`update`),
-                    timestamp = VALUES(timestamp),
-                    lid = VALUES(lid)
-            """
-        else:
-            # We don't want to add the timestamp of the record since it wasn't a new high score.
-            # We also don't want to update thet location since this wasn't a new record.
-            sql = """
-                INSERT INTO `score` (`userid`, `musicid`, `points`, `data`, `timestamp`, `update`, `lid`)
-                VALUES (:userid, :musicid, :points, :data, :timestamp, :update, :location)
-                ON DUPLICATE KEY UPDATE
-                    data = VALUES(data),
-                    points = VALUES(points),
-                    `update` = VALUES(`update`)
-            """
+    def put_scores(
+        self,
+        game: GameConstants,
+        version: int,
+        userid: UserID,
+        scores: List[Attempt],
+    ) -> None:
+        """
+        Given a game/version and user ID, save several new/updated high scores at once.
+        Music IDs are resolved in bulk and scores are written with as few statements as
+        possible, so this is preferred over put_score when a game sends several songs
+        in one packet.
+
+        Parameters:
+            game - Enum value representing a game series.
+            version - Integer representing which version of the game.
+            userid - Integer representing a user. Usually looked up with UserData.
+            scores - List of Attempt objects, one per score to write, in the order they
+                     were earned. The key is ignored. As with put_score, new_record
+                     controls whether the timestamp and location are updated.
+        """
+        if not scores:
+            return
+
+        # First look up the song/charts from the music DB
+        musicids = self.__get_musicids_or_raise(
+            game, version, [(score.id, score.chart) for score in scores]
+        )
+
+        # Rows with and without new records need different statements. Split into runs
+        # rather than grouping so that the same song played twice is written in order.
+        runs: List[List[Attempt]] = []
+        for score in scores:
+            if runs and runs[-1][0].new_record == score.new_record:
+                runs[-1].append(score)
+            else:
+                runs.append([score])
+
+        for run in runs:
+            values: List[str] = []
+            params: Dict[str, Any] = {"userid": userid}
+            for i, score in enumerate(run):
+                values.append(
+                    f"(:userid, :musicid{i}, :points{i}, :data{i}, :timestamp{i}, :timestamp{i}, :location{i})"
+                )
+                params[f"musicid{i}"] = musicids[(score.id, score.chart)]
+                params[f"points{i}"] = score.points
+                params[f"data{i}"] = self.serialize(score.data)
+                params[f"timestamp{i}"] = score.timestamp
+                params[f"location{i}"] = score.location
+
+            if run[0].new_record:
+                # We want to update the timestamp/location to now if its a new record.
+                sql = f"""
+                    INSERT INTO `score` (`userid`, `musicid`, `points`, `data`, `timestamp`, `update`, `lid`)
+                    VALUES {", ".join(values)}
+                    ON DUPLICATE KEY UPDATE
+                        data = VALUES(data),
+                        points = VALUES(points),
+                        `update` = VALUES(`update`),
+                        timestamp = VALUES(timestamp),
+                        lid = VALUES(lid)
+                """
+            else:
+                # We don't want to add the timestamp of the record since it wasn't a new high score.
+                # We also don't want to update thet location since this wasn't a new record.
+                sql = f"""
+                    INSERT INTO `score` (`userid`, `musicid`, `points`, `data`, `timestamp`, `update`, `lid`)
+                    VALUES {", ".join(values)}
+                    ON DUPLICATE KEY UPDATE
+                        data = VALUES(data),
+                        points = VALUES(points),
+                        `update` = VALUES(`update`)
+                """
+            self.execute(sql, params)
+
+        self.__update_records(userid, set(musicids.values()))
+
+    def __update_records(self, userid: UserID, musicids: Set[int]) -> None:
+        """
+        Given a user whose scores were just saved, take over the record on any of the songs
+        where they now hold the best score. Like get_all_records, ties go to whoever got
+        the score last.
+
+        Parameters:
+            userid - Integer representing a user.
+            musicids - Set of music IDs whose scores were saved.
+        """
+        # MySQL applies these assignments in order, and later ones see the columns that
+        # earlier ones changed. So the condition must not depend on userid, and points
+        # must be updated last since the condition for timestamp depends on it.
+        takeover = (
+            "VALUES(points) > record.points OR "
+            "(VALUES(points) = record.points AND VALUES(timestamp) >= record.timestamp)"
+        )
+        sql = f"""
+            INSERT INTO `record` (musicid, scope, userid, points, timestamp)
+            SELECT score.musicid, :scope, score.userid, score.points, score.timestamp
+            FROM score WHERE score.userid = :userid AND score.musicid IN :musicids
+            ON DUPLICATE KEY UPDATE
+                record.userid = IF({takeover}, VALUES(userid), record.userid),
+                record.timestamp = IF({takeover}, VALUES(timestamp), record.timestamp),
+                record.points = IF({takeover}, VALUES(points), record.points)
+        """
         self.execute(
             sql,
             {
+                "scope": MusicData.RECORD_SCOPE_GLOBAL,
                 "userid": userid,
-                "musicid": musicid,
-                "points": points,
-                "data": self.serialize(data),
-                "timestamp": ts,
-                "update": ts,
-                "location": location,
+                "musicids": tuple(musicids),
             },
         )
 
+    def rebuild_records(self) -> None:
+        """
+        Recompute every record from the score table. Records are normally kept up to date
+        as scores are saved, so this is only needed if they were written some other way.
+        Records are overwritten in place, so this is safe to run on a live network.
+        """
+        best_points_sql = """
+            SELECT score.musicid AS musicid, MAX(score.points) AS points
+            FROM score GROUP BY score.musicid
+        """
+        records_sql = f"""
+            SELECT score.musicid AS musicid, score.points AS points, MAX(score.timestamp) AS timestamp
+            FROM score
+            JOIN ({best_points_sql}) best ON best.musicid = score.musicid AND best.points = score.points
+            GROUP BY score.musicid, score.points
+        """
+        sql = f"""
+            INSERT INTO `record` (musicid, scope, userid, points, timestamp)
+            SELECT score.musicid, :scope, score.userid, score.points, score.timestamp
+            FROM score
+            JOIN ({records_sql}) records ON
+                records.musicid = score.musicid AND
+                records.points = score.points AND
+                records.timestamp = score.timestamp
+            ON DUPLICATE KEY UPDATE
+                record.userid = VALUES(userid),
+                record.points = VALUES(points),
+                record.timestamp = VALUES(timestamp)
+        """
+        self.execute(sql, {"scope": MusicData.RECORD_SCOPE_GLOBAL})
+
     def put_attempt(
         self,
         game: GameConstants,
@@ -216,32 +458,136 @@ class MusicData(BaseData):
             new_record - Whether this score was a new record or not.
             timestamp - Optional integer specifying when the attempt happened.
         """
-        # First look up the song/chart from the music DB
-        musicid = self.__get_musicid(game, version, songid, songchart)
         ts = timestamp if timestamp is not None else Time.now()
+        self.put_attempts(
+            game,
+            version,
+            userid,
+            [Attempt(0, songid, songchart, points, ts, location, new_record, data)],
+        )
+
+    def put_attempts(
+        self,
+        game: GameConstants,
+        version: int,
+        userid: Optional[UserID],
+        attempts: List[Attempt],
+    ) -> None:
+        """
+        Given a game/version and user ID, save several score attempts with a single statement.
+
+        Parameters:
+            game - Enum value representing a game series.
+            version - Integer representing which version of the game.
+            userid - Integer representing a user. Usually looked up with UserData.
+            attempts - List of Attempt objects to save. The key is ignored.
+
+        Raises a ScoreSaveException if any of the attempts was already saved. All other
+        attempts are still saved in this case.
+        """
+        if not attempts:
+            return
+
+        # First look up the song/charts from the music DB
+        musicids = self.__get_musicids_or_raise(
+            game, version, [(attempt.id, attempt.chart) for attempt in attempts]
+        )
+        rows = [
+            {
+                "userid": userid if userid is not None else 0,
+                "musicid": musicids[(attempt.id, attempt.chart)],
+                "timestamp": attempt.timestamp,
+                "location": attempt.location,
+                "new_record": 1 if attempt.new_record else 0,
+                "points": attempt.points,
+                "data": self.serialize(attempt.data),
+            }
+            for attempt in attempts
+        ]
 
         # Add to score history
-        sql = """
+        values: List[str] = []
+        params: Dict[str, Any] = {}
+        for i, row in enumerate(rows):
+            values.append(
+                f"(:userid{i}, :musicid{i}, :timestamp{i}, :location{i}, :new_record{i}, :points{i}, :data{i})"
+            )
+            params.update({f"{key}{i}": value for key, value in row.items()})
+        sql = f"""
             INSERT INTO `score_history` (userid, musicid, timestamp, lid, new_record, points, data)
-            VALUES (:userid, :musicid, :timestamp, :location, :new_record, :points, :data)
+            VALUES {", ".join(values)}
         """
         try:
-            self.execute(
-                sql,
-                {
-                    "userid": userid if userid is not None else 0,
-                    "musicid": musicid,
-                    "timestamp": ts,
-                    "location": location,
-                    "new_record": 1 if new_record else 0,
-                    "points": points,
-                    "data": self.serialize(data),
-                },
-            )
+            self.execute(sql, params)
+            self.__count_plays(rows)
+            return
         except IntegrityError:
+            if len(rows) == 1:
+                raise ScoreSaveException(
+                    f"There is already an attempt by {rows[0]['userid']} for music id {rows[0]['musicid']} at {rows[0]['timestamp']}"
+                )
+
+        # The multi-row insert is all or nothing, so save what we can one at a time.
+        sql = """
+            INSERT INTO `score_history` (userid, musicid, timestamp, lid, new_record, points, data)
+            VALUES (:userid, :musicid, :timestamp, :location, :new_record, :points, :data)
+        """
+        saved: List[Dict[str, Any]] = []
+        duplicates: List[str] = []
+        for row in rows:
+            try:
+                self.execute(sql, row)
+                saved.append(row)
+            except IntegrityError:
+                duplicates.append(f"music id {row['musicid']} at {row['timestamp']}")
+        self.__count_plays(saved)
+        if duplicates:
             raise ScoreSaveException(
-                f"There is already an attempt by {userid if userid is not None else 0} for music id {musicid} at {ts}"
+                f"There is already an attempt by {rows[0]['userid']} for {', '.join(duplicates)}"
+            )
+
+    def __count_plays(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Given rows that were just added to score_history, bump the play count tables.
+
+        Parameters:
+            rows - List of dictionaries with at least a userid and musicid key.
+        """
+        if not rows:
+            return
+
+        userplays: Dict[Tuple[int, int], int] = {}
+        musicplays: Dict[int, int] = {}
+        for row in rows:
+            key = (row["userid"], row["musicid"])
+            userplays[key] = userplays.get(key, 0) + 1
+            musicplays[row["musicid"]] = musicplays.get(row["musicid"], 0) + 1
+
+        values: List[str] = []
+        params: Dict[str, Any] = {}
+        for i, ((userid, musicid), plays) in enumerate(userplays.items()):
+            values.append(f"(:userid{i}, :musicid{i}, :plays{i})")
+            params.update(
+                {f"userid{i}": userid, f"musicid{i}": musicid, f"plays{i}": plays}
             )
+        sql = f"""
+            INSERT INTO `score_play_count` (userid, musicid, plays)
+            VALUES {", ".join(values)}
+            ON DUPLICATE KEY UPDATE plays = plays + VALUES(plays)
+        """
+        self.execute(sql, params)
+
+        values = []
+        params = {}
+        for i, (musicid, plays) in enumerate(musicplays.items()):
+            values.append(f"(:musicid{i}, :plays{i})")
+            params.update({f"musicid{i}": musicid, f"plays{i}": plays})
+        sql = f"""
+            INSERT INTO `music_play_count` (musicid, plays)
+            VALUES {", ".join(values)}
+            ON DUPLICATE KEY UPDATE plays = plays + VALUES(plays)
+        """
+        self.execute(sql, params)
 
     def get_score(
         self,
@@ -264,40 +610,29 @@ class MusicData(BaseData):
         Returns:
             The optional data stored by the game previously, or None if no score exists.
         """
+        musicid = self.get_musicids(game, version, [(songid, songchart)]).get(
+            (songid, songchart)
+        )
+        if musicid is None:
+            # song doesn't exist, so neither does the score
+            return None
+
         sql = """
             SELECT
-                music.songid AS songid,
-                music.chart AS chart,
                 score.id AS scorekey,
                 score.timestamp AS timestamp,
                 score.update AS `update`,
                 score.lid AS lid,
-                (
-                    SELECT COUNT(score_history.timestamp)
-                    FROM score_history
-                    WHERE score_history.musicid = music.id AND score_history.userid = :userid
-                ) AS plays,
+                COALESCE(score_play_count.plays, 0) AS plays,
                 score.points AS points,
                 score.data AS data
-            FROM score, music
-            WHERE
-                score.userid = :userid AND
-                score.musicid = music.id AND
-                music.game = :game AND
-                music.version = :version AND
-                music.songid = :songid AND
-                music.chart = :songchart
+            FROM score
+            LEFT JOIN score_play_count ON
+                score_play_count.userid = score.userid AND
+                score_play_count.musicid = score.musicid
+            WHERE score.userid = :userid AND score.musicid = :musicid
         """
-        cursor = self.execute(
-            sql,
-            {
-                "userid": userid,
-                "game": game.value,
-                "version": version,
-                "songid": songid,
-                "songchart": songchart,
-            },
-        )
+        cursor = self.execute(sql, {"userid": userid, "musicid": musicid})
         if cursor.rowcount != 1:
             # score doesn't exist
             return None
@@ -305,8 +640,8 @@ class MusicData(BaseData):
         result = cursor.fetchone()
         return Score(
             result["scorekey"],
-            result["songid"],
-            result["chart"],
+            songid,
+            songchart,
             result["points"],
             result["timestamp"],
             result["update"],
@@ -338,17 +673,16 @@ class MusicData(BaseData):
                 score.update AS `update`,
                 score.userid AS userid,
                 score.lid AS lid,
-                (
-                    SELECT COUNT(score_history.timestamp)
-                    FROM score_history
-                    WHERE score_history.musicid = music.id AND score_history.userid = score.userid
-                ) AS plays,
+                COALESCE(score_play_count.plays, 0) AS plays,
                 score.points AS points,
                 score.data AS data
-            FROM score, music
+            FROM score
+            JOIN music ON music.id = score.musicid
+            LEFT JOIN score_play_count ON
+                score_play_count.userid = score.userid AND
+                score_play_count.musicid = score.musicid
             WHERE
                 score.id = :scorekey AND
-                score.musicid = music.id AND
                 music.game = :game AND
                 music.version = :version
         """
@@ -407,16 +741,16 @@ class MusicData(BaseData):
                 score.timestamp AS timestamp,
                 score.update AS `update`,
                 score.lid AS lid,
-                (
-                    select COUNT(score_history.timestamp) FROM score_history
-                    WHERE score_history.musicid = music.id AND score_history.userid = :userid
-                ) AS plays,
+                COALESCE(score_play_count.plays, 0) AS plays,
                 score.points AS points,
                 score.data AS data
-            FROM score, music
+            FROM score
+            JOIN music ON music.id = score.musicid
+            LEFT JOIN score_play_count ON
+                score_play_count.userid = score.userid AND
+                score_play_count.musicid = score.musicid
             WHERE
                 score.userid = :userid AND
-                score.musicid = music.id AND
                 music.game = :game AND
                 music.version = :version
         """
@@ -682,50 +1016,63 @@ class MusicData(BaseData):
         Returns:
             A list of UserID, Score objects representing all high scores for a game.
         """
-        # First, construct the queries for grabbing the songid/chart
+        # Join each score to the music row that gives its songid/chart. Without a version,
+        # the same music ID can be present in several versions so use the newest one.
         if version is not None:
-            songidquery = "SELECT songid FROM music WHERE music.id = score.musicid AND game = :game AND version = :version"
-            chartquery = "SELECT chart FROM music WHERE music.id = score.musicid AND game = :game AND version = :version"
+            musicjoin = "JOIN music ON music.id = score.musicid AND music.game = :game AND music.version = :version"
         else:
-            songidquery = "SELECT songid FROM music WHERE music.id = score.musicid AND game = :game ORDER BY version DESC LIMIT 1"
-            chartquery = "SELECT chart FROM music WHERE music.id = score.musicid AND game = :game ORDER BY version DESC LIMIT 1"
-
-        # Select statement for getting play count
-        playselect = "SELECT COUNT(timestamp) FROM score_history WHERE score_history.musicid = score.musicid AND score_history.userid = score.userid"
+            musicjoin = """
+                JOIN (
+                    SELECT id, MAX(version) AS version FROM music WHERE game = :game GROUP BY id
+                ) latest ON latest.id = score.musicid
+                JOIN music ON music.id = latest.id AND music.game = :game AND music.version = latest.version
+            """
 
-        # Now, construct the inner select statement so we can choose which scores we care about
-        innerselect = "SELECT DISTINCT(id) FROM music WHERE game = :game"
-        if version is not None:
-            innerselect = innerselect + " AND version = :version"
-        if songid is not None:
-            innerselect = innerselect + " AND songid = :songid"
-        if songchart is not None:
-            innerselect = innerselect + " AND chart = :songchart"
+        # Now, limit the query
+        conditions = ["1 = 1"]
+        if songid is not None or songchart is not None:
+            if version is not None:
+                # There is exactly one music row for this version, so filter it directly.
+                if songid is not None:
+                    conditions.append("music.songid = :songid")
+                if songchart is not None:
+                    conditions.append("music.chart = :songchart")
+            else:
+                # Match the song in any version, not just the newest one.
+                innerselect = "SELECT id FROM music WHERE game = :game"
+                if songid is not None:
+                    innerselect = innerselect + " AND songid = :songid"
+                if songchart is not None:
+                    innerselect = innerselect + " AND chart = :songchart"
+                conditions.append(f"score.musicid IN ({innerselect})")
+        if userid is not None:
+            conditions.append("score.userid = :userid")
+        if since is not None:
+            conditions.append("score.update >= :since")
+        if until is not None:
+            conditions.append("score.update < :until")
 
         # Finally, construct the full query
         sql = f"""
             SELECT
-                ({songidquery}) AS songid,
-                ({chartquery}) AS chart,
-                id AS scorekey,
-                points,
-                timestamp,
-                `update`,
-                lid,
-                data,
-                userid,
-                ({playselect}) AS plays
-            FROM score WHERE musicid IN ({innerselect})
+                music.songid AS songid,
+                music.chart AS chart,
+                score.id AS scorekey,
+                score.points AS points,
+                score.timestamp AS timestamp,
+                score.update AS `update`,
+                score.lid AS lid,
+                score.data AS data,
+                score.userid AS userid,
+                COALESCE(score_play_count.plays, 0) AS plays
+            FROM score
+            {musicjoin}
+            LEFT JOIN score_play_count ON
+                score_play_count.userid = score.userid AND
+                score_play_count.musicid = score.musicid
+            WHERE {" AND ".join(conditions)}
         """
 
-        # Now, limit the query
-        if userid is not None:
-            sql = sql + " AND userid = :userid"
-        if since is not None:
-            sql = sql + " AND score.update >= :since"
-        if until is not None:
-            sql = sql + " AND score.update < :until"
-
         # Now, query itself
         cursor = self.execute(
             sql,
@@ -782,50 +1129,68 @@ class MusicData(BaseData):
         Returns:
             A list of UserID, Score objects representing all high scores for a game.
         """
-        # First, construct the queries for grabbing the songid/chart
-        if version is not None:
-            songidquery = "SELECT songid FROM music WHERE music.id = score.musicid AND game = :game AND version = :version"
-            chartquery = "SELECT chart FROM music WHERE music.id = score.musicid AND game = :game AND version = :version"
-        else:
-            songidquery = "SELECT songid FROM music WHERE music.id = score.musicid AND game = :game ORDER BY version DESC LIMIT 1"
-            chartquery = "SELECT chart FROM music WHERE music.id = score.musicid AND game = :game ORDER BY version DESC LIMIT 1"
-
-        # Next, get a list of all songs that were played given the input criteria
-        musicid_sql = "SELECT DISTINCT(score.musicid) FROM score, music WHERE score.musicid = music.id AND music.game = :game"
+        # Join each score to the music row that gives its songid/chart. Without a version,
+        # the same music ID can be present in several versions so use the newest one.
         params: Dict[str, Any] = {"game": game.value}
         if version is not None:
-            musicid_sql = musicid_sql + " AND music.version = :version"
+            musicid_sql = (
+                "SELECT id FROM music WHERE game = :game AND version = :version"
+            )
+            musicjoin = "JOIN music ON music.id = score.musicid AND music.game = :game AND music.version = :version"
             params["version"] = version
-
-        # Figure out where the record was earned
-        if locationlist is not None:
-            if len(locationlist) == 0:
-                # We don't have any locations, but SQL will shit the bed, so lets add a default one.
-                locationlist.append(-1)
-            location_sql = "AND score.lid IN :locationlist"
-            params["locationlist"] = tuple(locationlist)
         else:
-            location_sql = ""
+            musicid_sql = "SELECT id FROM music WHERE game = :game"
+            musicjoin = """
+                JOIN (
+                    SELECT id, MAX(version) AS version FROM music WHERE game = :game GROUP BY id
+                ) latest ON latest.id = score.musicid
+                JOIN music ON music.id = latest.id AND music.game = :game AND music.version = latest.version
+            """
 
-        # Figure out who got the record
+        # Figure out who got the record, and where
+        conditions = ["1 = 1"]
         if userlist is not None:
-            if len(userlist) == 0:
-                # We don't have any users, but SQL will shit the bed, so lets add a fake one.
-                userlist.append(UserID(-1))
-            user_sql = f"SELECT userid FROM score WHERE score.musicid = played.musicid AND score.userid IN :userlist {location_sql} ORDER BY points DESC, timestamp DESC LIMIT 1"
-            params["userlist"] = tuple(userlist)
+            conditions.append("score.userid IN :userlist")
+            # We don't have any users, but SQL will shit the bed, so lets add a fake one.
+            params["userlist"] = tuple(userlist) if userlist else (-1,)
+        if locationlist is not None:
+            conditions.append("score.lid IN :locationlist")
+            # We don't have any locations, but SQL will shit the bed, so lets add a default one.
+            params["locationlist"] = tuple(locationlist) if locationlist else (-1,)
+        where = " AND ".join(conditions)
+
+        if userlist is None and locationlist is None:
+            # Network-wide records are kept up to date as scores are saved.
+            recordjoin = "JOIN record ON record.musicid = score.musicid AND record.userid = score.userid AND record.scope = :scope"
+            params["scope"] = MusicData.RECORD_SCOPE_GLOBAL
         else:
-            user_sql = f"SELECT userid FROM score WHERE score.musicid = played.musicid {location_sql} ORDER BY points DESC, timestamp DESC LIMIT 1"
-        records_sql = f"""
-            SELECT ({user_sql}) AS userid, musicid
-            FROM ({musicid_sql}) played
-        """
+            # Find the best points on each song, then the latest time those points were
+            # earned since king-of-the-hill rules are in effect for ties.
+            best_points_sql = f"""
+                SELECT score.musicid AS musicid, MAX(score.points) AS points
+                FROM score
+                WHERE score.musicid IN ({musicid_sql}) AND {where}
+                GROUP BY score.musicid
+            """
+            records_sql = f"""
+                SELECT score.musicid AS musicid, score.points AS points, MAX(score.timestamp) AS timestamp
+                FROM score
+                JOIN ({best_points_sql}) best ON best.musicid = score.musicid AND best.points = score.points
+                WHERE {where}
+                GROUP BY score.musicid, score.points
+            """
+            recordjoin = f"""
+                JOIN ({records_sql}) records ON
+                    records.musicid = score.musicid AND
+                    records.points = score.points AND
+                    records.timestamp = score.timestamp
+            """
 
         # Now, join it up against the score and music table to grab the info we need
         sql = f"""
             SELECT
-                ({songidquery}) AS songid,
-                ({chartquery}) AS chart,
+                music.songid AS songid,
+                music.chart AS chart,
                 score.points AS points,
                 score.userid AS userid,
                 score.id AS scorekey,
@@ -833,17 +1198,22 @@ class MusicData(BaseData):
                 score.timestamp AS timestamp,
                 score.update AS `update`,
                 score.lid AS lid,
-                (
-                    SELECT COUNT(score_history.timestamp) FROM score_history
-                    WHERE score_history.musicid = score.musicid
-                ) AS plays
-            FROM score, ({records_sql}) records
-            WHERE records.userid = score.userid AND records.musicid = score.musicid
+                score.musicid AS musicid,
+                COALESCE(music_play_count.plays, 0) AS plays
+            FROM score
+            {recordjoin}
+            {musicjoin}
+            LEFT JOIN music_play_count ON music_play_count.musicid = score.musicid
+            WHERE {where}
         """
         cursor = self.execute(sql, params)
 
-        return [
-            (
+        # If two users got the same points at the same time, arbitrarily pick one.
+        records: Dict[int, Tuple[UserID, Score]] = {}
+        for result in cursor:
+            if result["musicid"] in records:
+                continue
+            records[result["musicid"]] = (
                 UserID(result["userid"]),
                 Score(
                     result["scorekey"],
@@ -857,8 +1227,7 @@ class MusicData(BaseData):
                     self.deserialize(result["data"]),
                 ),
             )
-            for result in cursor
-        ]
+        return list(records.values())
 
     def get_attempt_by_key(
         self, game: GameConstants, version: int, key: int
@@ -2,12 +2,14 @@ import random
 from sqlalchemy import Table, Column, UniqueConstraint  # type: ignore
 from sqlalchemy.types import String, Integer, JSON  # type: ignore
 from sqlalchemy.dialects.mysql import BIGINT as BigInteger  # type: ignore
+from sqlalchemy.engine.base import Connection  # type: ignore
 from sqlalchemy.exc import IntegrityError  # type: ignore
 from typing import Optional, Dict, List, Tuple, Any
 from typing_extensions import Final
 from passlib.hash import pbkdf2_sha512  # type: ignore
 
-from bemani.common import ValidatedDict, Profile, GameConstants, Time
+from bemani.common import ValidatedDict, Profile, GameConstants, Time, TTLCache
+from bemani.data.config import Config
 from bemani.data.mysql.base import BaseData, metadata
 from bemani.data.remoteuser import RemoteUser
 from bemani.data.types import User, Achievement, Link, UserID, ArcadeID
@@ -176,6 +178,27 @@ class AccountCreationException(Exception):
 class UserData(BaseData):
     REF_ID_LENGTH: Final[int] = 16
 
+    # Process-wide index of card ID to the local user owning it, or None for cards that
+    # aren't registered here. Used to attribute scores and profiles pulled from remote
+    # servers to local users.
+    CARD_CACHE: Final[TTLCache] = TTLCache(maxsize=65536)
+
+    # Number of card IDs looked up in a single query.
+    CARD_LOOKUP_CHUNK: Final[int] = 1000
+
+    def __init__(self, config: Config, conn: Connection) -> None:
+        super().__init__(config, conn)
+        self.__cache_ttl = config.database.card_cache_ttl
+
+    @classmethod
+    def cache_stats(cls) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns hit and miss counters for the card cache in this process.
+        """
+        return {
+            "card": cls.CARD_CACHE.stats(),
+        }
+
     def from_cardid(self, cardid: str) -> Optional[UserID]:
         """
         Given a 16 digit card ID, look up a user ID.
@@ -352,6 +375,46 @@ class UserData(BaseData):
         cursor = self.execute(sql)
         return [(str(res["id"]).upper(), UserID(res["userid"])) for res in cursor]
 
+    def get_userids_for_cards(self, cardids: List[str]) -> Dict[str, UserID]:
+        """
+        Given a list of card IDs, look up which of them belong to local accounts.
+
+        Note that this is the E004 number as stored on the card. Not the 16 digit
+        ASCII value on the back. Use CardCipher to convert.
+
+        Parameters:
+            cardids - List of 16-digit card IDs to look for.
+
+        Returns:
+            A dictionary keyed by upper-cased card ID whose values are user IDs. Cards
+            that aren't associated with any account are left out.
+        """
+        userids: Dict[str, UserID] = {}
+        missing: List[str] = []
+        for cardid in {cardid.upper() for cardid in cardids}:
+            found, userid = UserData.CARD_CACHE.get(cardid)
+            if not found:
+                missing.append(cardid)
+            elif userid is not None:
+                userids[cardid] = userid
+
+        generation = UserData.CARD_CACHE.generation
+        for start in range(0, len(missing), UserData.CARD_LOOKUP_CHUNK):
+            chunk = missing[start : (start + UserData.CARD_LOOKUP_CHUNK)]
+            sql = "SELECT id, userid FROM card WHERE id IN :cardids"
+            cursor = self.execute(sql, {"cardids": tuple(chunk)})
+            loaded = {str(res["id"]).upper(): UserID(res["userid"]) for res in cursor}
+
+            # Remember cards that aren't ours too, since most cards seen in remote
+            # results will be.
+            for cardid in chunk:
+                userid = loaded.get(cardid)
+                UserData.CARD_CACHE.put(cardid, userid, self.__cache_ttl, generation)
+                if userid is not None:
+                    userids[cardid] = userid
+
+        return userids
+
     def get_cards(self, userid: UserID) -> List[str]:
         """
         Given a userid, look up all cards associated with the account.
@@ -379,6 +442,7 @@ class UserData(BaseData):
         """
         sql = "INSERT INTO card (userid, id) VALUES (:userid, :cardid)"
         self.execute(sql, {"userid": userid, "cardid": cardid})
+        UserData.CARD_CACHE.invalidate(cardid.upper())
 
         oldid = RemoteUser.card_to_userid(cardid)
         if RemoteUser.is_remote(oldid):
@@ -407,6 +471,7 @@ class UserData(BaseData):
         """
         sql = "DELETE FROM card WHERE id = :cardid AND userid = :userid LIMIT 1"
         self.execute(sql, {"cardid": cardid, "userid": userid})
+        UserData.CARD_CACHE.invalidate(cardid.upper())
 
     def put_user(self, user: User) -> None:
         """
@@ -536,6 +601,50 @@ class UserData(BaseData):
             self.deserialize(result["data"]),
         )
 
+    def get_profiles(
+        self, game: GameConstants, version: int, userids: List[UserID]
+    ) -> List[Tuple[UserID, Optional[Profile]]]:
+        """
+        Does the exact same thing as get_profile but across a list of users instead of one,
+        fetching every profile in a single query.
+
+        Parameters:
+            game - Enum value identifier of the game looking up the user.
+            version - Integer version of the game looking up the user.
+            userids - List of Integer user IDs, as looked up by one of the above functions.
+
+        Returns:
+            A List of tuples containing a userid and a dictionary previously stored by a game class if found,
+            or None otherwise.
+        """
+        if not userids:
+            return []
+        sql = """
+            SELECT refid.userid AS userid, refid.refid AS refid, extid.extid AS extid, profile.data AS data
+            FROM refid, extid, profile
+            WHERE
+                refid.userid IN :userids AND
+                refid.game = :game AND
+                refid.version = :version AND
+                extid.userid = refid.userid AND
+                extid.game = refid.game AND
+                profile.refid = refid.refid
+        """
+        cursor = self.execute(
+            sql, {"userids": userids, "game": game.value, "version": version}
+        )
+        profiles: Dict[UserID, Profile] = {
+            UserID(result["userid"]): Profile(
+                game,
+                version,
+                result["refid"],
+                result["extid"],
+                self.deserialize(result["data"]),
+            )
+            for result in cursor
+        }
+        return [(uid, profiles.get(uid)) for uid in userids]
+
     def get_any_profile(
         self, game: GameConstants, version: int, userid: UserID
     ) -> Optional[Profile]:
@@ -552,22 +661,16 @@ class UserData(BaseData):
         Returns:
             A dictionary previously stored by a game class if found, or None otherwise.
         """
-        played = self.get_games_played(userid, game=game)
-        versions = {p[1] for p in played}
-
-        if version in versions:
-            return self.get_profile(game, version, userid)
-        elif len(versions) > 0:
-            return self.get_profile(game, max(versions), userid)
-        else:
-            return None
+        return self.get_any_profiles(game, version, [userid])[0][1]
 
     def get_any_profiles(
         self, game: GameConstants, version: int, userids: List[UserID]
     ) -> List[Tuple[UserID, Optional[Profile]]]:
         """
         Does the exact same thing as get_any_profile but across a list of users instead of one.
-        Provided purely as a convenience function.
+        The version to use for each user is chosen in the same query that fetches the profiles,
+        preferring the requested version and falling back to the newest version the user has
+        played.
 
         Parameters:
             game - Enum value identifier of the game looking up the user.
@@ -581,40 +684,40 @@ class UserData(BaseData):
         if not userids:
             return []
         sql = """
-            SELECT refid.version AS version, refid.userid AS userid
+            SELECT
+                refid.userid AS userid, refid.version AS version, refid.refid AS refid,
+                extid.extid AS extid, profile.data AS data
             FROM refid
-            INNER JOIN profile ON refid.refid = profile.refid
-            WHERE refid.game = :game AND refid.userid IN :userids
+            JOIN profile ON profile.refid = refid.refid
+            JOIN extid ON extid.userid = refid.userid AND extid.game = refid.game
+            JOIN (
+                SELECT
+                    refid.userid AS userid,
+                    CASE
+                        WHEN SUM(refid.version = :version) > 0 THEN :version
+                        ELSE MAX(refid.version)
+                    END AS version
+                FROM refid
+                JOIN profile ON profile.refid = refid.refid
+                WHERE refid.game = :game AND refid.userid IN :userids
+                GROUP BY refid.userid
+            ) chosen ON chosen.userid = refid.userid AND chosen.version = refid.version
+            WHERE refid.game = :game
         """
-        cursor = self.execute(sql, {"game": game.value, "userids": userids})
-        profilever: Dict[UserID, int] = {}
-
-        for result in cursor:
-            tuid = UserID(result["userid"])
-            tver = result["version"]
-
-            if tuid not in profilever:
-                # Just assign it the first profile we find
-                profilever[tuid] = tver
-            else:
-                # If the profile for this version exists, prioritize it
-                if tver == version:
-                    profilever[tuid] = tver
-
-                # Only update the profile version with the newest game profile if the game
-                # profile for this version doesn't exist.
-                elif profilever[tuid] != version:
-                    profilever[tuid] = max(profilever[tuid], tver)
-
-        return [
-            (
-                uid,
-                self.get_profile(game, profilever[uid], uid)
-                if uid in profilever
-                else None,
+        cursor = self.execute(
+            sql, {"userids": userids, "game": game.value, "version": version}
+        )
+        profiles: Dict[UserID, Profile] = {
+            UserID(result["userid"]): Profile(
+                game,
+                result["version"],
+                result["refid"],
+                result["extid"],
+                self.deserialize(result["data"]),
             )
-            for uid in userids
-        ]
+            for result in cursor
+        }
+        return [(uid, profiles.get(uid)) for uid in userids]
 
     def get_games_played(
         self, userid: UserID, game: Optional[GameConstants] = None
@@ -1439,6 +1542,7 @@ class UserData(BaseData):
         # Now, insert the card, tying it to the account
         sql = "INSERT INTO card (id, userid) VALUES (:cardid, :userid)"
         cursor = self.execute(sql, {"cardid": cardid, "userid": userid})
+        UserData.CARD_CACHE.invalidate(cardid.upper())
         if cursor.rowcount != 1:
             return None
 
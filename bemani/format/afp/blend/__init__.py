@@ -1,11 +1,47 @@
+from PIL import Image
+from typing import Callable, Dict, Tuple
+
+from .blend import CompositePool
+from .blend import affine_composite as python_affine_composite
+from .blend import perspective_composite as python_perspective_composite
+
+
+# Every compositing implementation that is usable in this environment, keyed by name
+# and ordered from fastest to slowest. Each entry is a pair of affine and perspective
+# composite functions which all take the same arguments and render identically.
+COMPOSITE_BACKENDS: Dict[
+    str, Tuple[Callable[..., Image.Image], Callable[..., Image.Image]]
+] = {}
+
 try:
     # If we compiled the faster cython/c++ code, we can use it instead!
-    from .blendcpp import affine_composite
-    from .blendcpp import perspective_composite
+    from .blendcpp import affine_composite as cpp_affine_composite
+    from .blendcpp import perspective_composite as cpp_perspective_composite
+
+    COMPOSITE_BACKENDS["cpp"] = (cpp_affine_composite, cpp_perspective_composite)
 except ImportError:
-    # If we didn't, then fall back to the pure python implementation.
-    from .blend import affine_composite
-    from .blend import perspective_composite
+    pass
+
+try:
+    # If we didn't, but numpy is installed, the vectorized version is a close second.
+    from .blendnumpy import affine_composite as numpy_affine_composite
+    from .blendnumpy import perspective_composite as numpy_perspective_composite
+
+    COMPOSITE_BACKENDS["numpy"] = (numpy_affine_composite, numpy_perspective_composite)
+except ImportError:
+    pass
+
+# The pure python implementation is always available as a last resort.
+COMPOSITE_BACKENDS["python"] = (python_affine_composite, python_perspective_composite)
+
+DEFAULT_COMPOSITE_BACKEND = next(iter(COMPOSITE_BACKENDS))
+affine_composite, perspective_composite = COMPOSITE_BACKENDS[DEFAULT_COMPOSITE_BACKEND]
 
 
-__all__ = ["affine_composite", "perspective_composite"]
+__all__ = [
+    "CompositePool",
+    "COMPOSITE_BACKENDS",
+    "DEFAULT_COMPOSITE_BACKEND",
+    "affine_composite",
+    "perspective_composite",
+]
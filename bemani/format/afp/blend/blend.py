@@ -1,7 +1,12 @@
+import atexit
+import itertools
 import multiprocessing
 import signal
+import threading
+from collections import OrderedDict
+from multiprocessing.shared_memory import SharedMemory
 from PIL import Image
-from typing import Any, Callable, List, Optional, Sequence, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
 from ..types import Color, HSL, Matrix, Point, AAMode
 from .perspective import perspective_calculate
@@ -260,9 +265,9 @@ def pixel_renderer(
     mult_color: Color,
     hsl_shift: HSL,
     blendfunc: int,
-    imgbytes: Union[bytes, bytearray],
-    texbytes: Union[bytes, bytearray],
-    maskbytes: Optional[Union[bytes, bytearray]],
+    imgbytes: Union[bytes, bytearray, memoryview],
+    texbytes: Union[bytes, bytearray, memoryview],
+    maskbytes: Optional[Union[bytes, bytearray, memoryview]],
     aa_mode: int,
 ) -> Sequence[int]:
     # Determine offset
@@ -472,290 +477,554 @@ def pixel_renderer(
         )
 
 
-def affine_line_renderer(
-    work: multiprocessing.Queue,
-    results: multiprocessing.Queue,
+def _callback(inverse: Matrix, perspective: bool) -> Callable[[Point], Optional[Point]]:
+    if not perspective:
+        return lambda point: inverse.multiply_point(point)
+
+    def perspective_inverse(imgpoint: Point) -> Optional[Point]:
+        # Calculate the texture coordinate with our perspective interpolation.
+        texdiv = inverse.multiply_point(imgpoint)
+        if texdiv.z <= 0.0:
+            return None
+
+        return Point(texdiv.x / texdiv.z, texdiv.y / texdiv.z)
+
+    return perspective_inverse
+
+
+def _render_rows(
+    miny: int,
+    maxy: int,
     minx: int,
     maxx: int,
     imgwidth: int,
     imgheight: int,
     texwidth: int,
     texheight: int,
-    inverse: Matrix,
+    xscale: float,
+    yscale: float,
+    callback: Callable[[Point], Optional[Point]],
     add_color: Color,
     mult_color: Color,
     hsl_shift: HSL,
     blendfunc: int,
-    imgbytes: Union[bytes, bytearray],
-    texbytes: Union[bytes, bytearray],
-    maskbytes: Optional[Union[bytes, bytearray]],
+    imgbytes: Union[bytearray, memoryview],
+    texbytes: Union[bytes, memoryview],
+    maskbytes: Optional[Union[bytes, memoryview]],
     aa_mode: int,
 ) -> None:
-    while True:
-        imgy = work.get()
-        if imgy is None:
-            return
+    # Every pixel only ever reads its own destination value, so rows can be blitted
+    # in place, and different rows can be rendered at the same time.
+    for imgy in range(miny, maxy):
+        rowoff = imgy * imgwidth * 4
+        rowbytes = bytearray(imgbytes[rowoff : (rowoff + (imgwidth * 4))])
+        for imgx in range(minx, maxx):
+            rowbytes[(imgx * 4) : ((imgx + 1) * 4)] = pixel_renderer(
+                imgx,
+                imgy,
+                imgwidth,
+                imgheight,
+                texwidth,
+                texheight,
+                xscale,
+                yscale,
+                callback,
+                add_color,
+                mult_color,
+                hsl_shift,
+                blendfunc,
+                imgbytes,
+                texbytes,
+                maskbytes,
+                aa_mode,
+            )
+        imgbytes[rowoff : (rowoff + (imgwidth * 4))] = rowbytes
 
-        rowbytes = bytearray(
-            imgbytes[(imgy * imgwidth * 4) : ((imgy + 1) * imgwidth * 4)]
-        )
-        for imgx in range(imgwidth):
-            if imgx < minx or imgx >= maxx:
-                # No need to even consider this pixel.
-                continue
-            else:
-                # Blit new pixel into the correct range.
-                rowbytes[(imgx * 4) : ((imgx + 1) * 4)] = pixel_renderer(
-                    imgx,
-                    imgy,
-                    imgwidth,
-                    imgheight,
-                    texwidth,
-                    texheight,
-                    1.0 / inverse.xscale,
-                    1.0 / inverse.yscale,
-                    lambda point: inverse.multiply_point(point),
-                    add_color,
-                    mult_color,
-                    hsl_shift,
-                    blendfunc,
-                    imgbytes,
-                    texbytes,
-                    maskbytes,
-                    aa_mode,
-                )
 
-        results.put((imgy, bytes(rowbytes)))
+def _view(shm: SharedMemory) -> memoryview:
+    buf = shm.buf
+    if buf is None:
+        raise Exception("Logic error, shared memory segment is closed!")
+    return buf
 
 
-def affine_composite(
-    img: Image.Image,
-    add_color: Color,
-    mult_color: Color,
-    hsl_shift: HSL,
-    transform: Matrix,
-    mask: Optional[Image.Image],
-    blendfunc: int,
-    texture: Image.Image,
-    single_threaded: bool = False,
-    aa_mode: int = AAMode.SSAA_OR_BILINEAR,
-) -> Image.Image:
-    # Calculate the inverse so we can map canvas space back to texture space.
-    try:
-        inverse = transform.inverse()
-    except ZeroDivisionError:
-        # If this happens, that means one of the scaling factors was zero, making
-        # this object invisible. We can ignore this since the object should not
-        # be drawn.
-        return img
-
-    # Warn if we have an unsupported blend.
-    if blendfunc not in {0, 1, 2, 3, 8, 9, 13, 70, 256, 257}:
-        print(f"WARNING: Unsupported blend {blendfunc}")
-        return img
-
-    # These are calculated properties and caching them outside of the loop
-    # speeds things up a bit.
-    imgwidth = img.width
-    imgheight = img.height
-    texwidth = texture.width
-    texheight = texture.height
-
-    # Calculate the maximum range of update this texture can possibly reside in.
-    pix1 = transform.multiply_point(Point.identity())
-    pix2 = transform.multiply_point(Point.identity().add(Point(texwidth, 0)))
-    pix3 = transform.multiply_point(Point.identity().add(Point(0, texheight)))
-    pix4 = transform.multiply_point(Point.identity().add(Point(texwidth, texheight)))
-
-    # Map this to the rectangle we need to sweep in the rendering image.
-    minx = max(int(min(pix1.x, pix2.x, pix3.x, pix4.x)), 0)
-    maxx = min(int(max(pix1.x, pix2.x, pix3.x, pix4.x)) + 1, imgwidth)
-    miny = max(int(min(pix1.y, pix2.y, pix3.y, pix4.y)), 0)
-    maxy = min(int(max(pix1.y, pix2.y, pix3.y, pix4.y)) + 1, imgheight)
-
-    if maxx <= minx or maxy <= miny:
-        # This image is entirely off the screen!
-        return img
-
-    cores = multiprocessing.cpu_count()
-    if single_threaded or cores < 2:
-        # Get the data in an easier to manipulate and faster to update fashion.
-        imgbytearray = bytearray(img.tobytes("raw", "RGBA"))
-        texbytes = texture.tobytes("raw", "RGBA")
-        if mask:
-            alpha = mask.split()[-1]
-            maskbytes = alpha.tobytes("raw", "L")
-        else:
-            maskbytes = None
+def _attach(name: str) -> SharedMemory:
+    shm = SharedMemory(name=name)
+    # Workers only borrow segments that the pool owns and unlinks, so make sure the
+    # resource tracker doesn't also try to clean them up when a worker exits.
+    from multiprocessing import resource_tracker
 
-        # We don't have enough CPU cores to bother multiprocessing.
-        for imgy in range(miny, maxy):
-            for imgx in range(minx, maxx):
-                # Determine offset
-                imgoff = (imgx + (imgy * imgwidth)) * 4
-                imgbytearray[imgoff : (imgoff + 4)] = pixel_renderer(
-                    imgx,
-                    imgy,
-                    imgwidth,
-                    imgheight,
-                    texwidth,
-                    texheight,
-                    1.0 / inverse.xscale,
-                    1.0 / inverse.yscale,
-                    lambda point: inverse.multiply_point(point),
-                    add_color,
-                    mult_color,
-                    hsl_shift,
-                    blendfunc,
-                    imgbytearray,
-                    texbytes,
-                    maskbytes,
-                    aa_mode,
-                )
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+    return shm
 
-        img = Image.frombytes("RGBA", (imgwidth, imgheight), bytes(imgbytearray))
-    else:
-        imgbytes = img.tobytes("raw", "RGBA")
-        texbytes = texture.tobytes("raw", "RGBA")
-        if mask:
-            alpha = mask.split()[-1]
-            maskbytes = alpha.tobytes("raw", "L")
-        else:
-            maskbytes = None
 
-        # Let's spread the load across multiple processors.
-        procs: List[multiprocessing.Process] = []
-        work: multiprocessing.Queue = multiprocessing.Queue()
-        results: multiprocessing.Queue = multiprocessing.Queue()
-        expected: int = 0
-        interrupted: bool = False
+def _composite_worker(
+    work: multiprocessing.Queue, results: multiprocessing.Queue, cachesize: int
+) -> None:
+    # Ctrl+C is the parent's to handle, it tears us down when it sees it.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    attached: "OrderedDict[str, SharedMemory]" = OrderedDict()
+
+    def buffer(name: str) -> memoryview:
+        if name not in attached:
+            attached[name] = _attach(name)
+            while len(attached) > cachesize:
+                _, old = attached.popitem(last=False)
+                old.close()
+        attached.move_to_end(name)
+        return _view(attached[name])
 
-        def ctrlc(sig: Any, frame: Any) -> None:
-            nonlocal interrupted
-            interrupted = True
+    while True:
+        job = work.get()
+        if job is None:
+            break
+
+        jobid, imgname, texname, maskname, perspective, inverse, args = job
+        imgbytes = buffer(imgname)
+        texbytes = buffer(texname)
+        maskbytes = buffer(maskname) if maskname is not None else None
+        try:
+            (
+                miny,
+                maxy,
+                minx,
+                maxx,
+                imgwidth,
+                imgheight,
+                texwidth,
+                texheight,
+                xscale,
+                yscale,
+                add_color,
+                mult_color,
+                hsl_shift,
+                blendfunc,
+                aa_mode,
+            ) = args
+            _render_rows(
+                miny,
+                maxy,
+                minx,
+                maxx,
+                imgwidth,
+                imgheight,
+                texwidth,
+                texheight,
+                xscale,
+                yscale,
+                _callback(inverse, perspective),
+                add_color,
+                mult_color,
+                hsl_shift,
+                blendfunc,
+                imgbytes,
+                texbytes,
+                maskbytes,
+                aa_mode,
+            )
+            results.put((jobid, None))
+        except Exception as e:
+            results.put((jobid, e))
+        finally:
+            # Don't hold on to views, or the segment can never be closed.
+            del imgbytes, texbytes, maskbytes
+
+    for shm in attached.values():
+        shm.close()
+
+
+class CompositePool:
+    """
+    A set of worker processes for compositing images on multiple cores, meant to be
+    kept around for as long as its owner is rendering. The image being drawn on and
+    any masks are handed over in shared memory segments that are reused from one
+    call to the next, and textures are copied to shared memory only the first time
+    they are drawn, so each call costs little more than splitting up the rows.
+    """
+
+    # Textures are remembered by identity, so this many are kept alive and mapped.
+    TEXTURE_CACHE_SIZE: int = 256
+
+    # Areas smaller than this many pixels are quicker to draw than to hand off.
+    MIN_POOLED_PIXELS: int = 4096
+
+    def __init__(self, processes: Optional[int] = None) -> None:
+        self.processes = multiprocessing.cpu_count() if processes is None else processes
+        self.__lock = threading.Lock()
+        self.__procs: List[multiprocessing.Process] = []
+        self.__work: Optional[multiprocessing.Queue] = None
+        self.__results: Optional[multiprocessing.Queue] = None
+        self.__jobids = itertools.count()
+        self.__scratch: Dict[str, SharedMemory] = {}
+        self.__textures: "OrderedDict[int, Tuple[Image.Image, SharedMemory]]" = (
+            OrderedDict()
+        )
 
-        previous_handler = signal.getsignal(signal.SIGINT)
-        signal.signal(signal.SIGINT, ctrlc)
+    def __enter__(self) -> "CompositePool":
+        return self
 
-        for _ in range(cores):
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __start(self) -> None:
+        if self.__procs:
+            return
+
+        self.__work = multiprocessing.Queue()
+        self.__results = multiprocessing.Queue()
+        for _ in range(self.processes):
             proc = multiprocessing.Process(
-                target=affine_line_renderer,
+                target=_composite_worker,
                 args=(
-                    work,
-                    results,
-                    minx,
-                    maxx,
-                    imgwidth,
-                    imgheight,
-                    texwidth,
-                    texheight,
-                    inverse,
-                    add_color,
-                    mult_color,
-                    hsl_shift,
-                    blendfunc,
-                    imgbytes,
-                    texbytes,
-                    maskbytes,
-                    aa_mode,
+                    self.__work,
+                    self.__results,
+                    # Every texture plus the image and mask scratch segments.
+                    self.TEXTURE_CACHE_SIZE + 8,
                 ),
+                daemon=True,
             )
-            procs.append(proc)
             proc.start()
+            self.__procs.append(proc)
+
+    def close(self) -> None:
+        """
+        Stop the worker processes and free all shared memory. The pool starts again
+        if it is used after this.
+        """
+        with self.__lock:
+            if self.__work is not None:
+                for _ in self.__procs:
+                    self.__work.put(None)
+            for proc in self.__procs:
+                proc.join(timeout=5)
+                if proc.is_alive():
+                    proc.terminate()
+            self.__procs = []
+            self.__work = None
+            self.__results = None
+
+            for shm in self.__scratch.values():
+                shm.close()
+                shm.unlink()
+            self.__scratch = {}
+            for _, shm in self.__textures.values():
+                shm.close()
+                shm.unlink()
+            self.__textures.clear()
+
+    def __scratch_buffer(self, purpose: str, data: bytes) -> SharedMemory:
+        shm = self.__scratch.get(purpose)
+        if shm is None or shm.size < len(data):
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = SharedMemory(create=True, size=max(len(data), 1))
+            self.__scratch[purpose] = shm
+        _view(shm)[: len(data)] = data
+        return shm
+
+    def __texture_buffer(self, texture: Image.Image) -> SharedMemory:
+        key = id(texture)
+        entry = self.__textures.get(key)
+        if entry is not None:
+            self.__textures.move_to_end(key)
+            return entry[1]
+
+        data = texture.tobytes("raw", "RGBA")
+        shm = SharedMemory(create=True, size=max(len(data), 1))
+        _view(shm)[: len(data)] = data
+
+        # Keep a reference to the texture so its ID isn't reused while cached.
+        self.__textures[key] = (texture, shm)
+        while len(self.__textures) > self.TEXTURE_CACHE_SIZE:
+            _, (_, old) = self.__textures.popitem(last=False)
+            old.close()
+            old.unlink()
+        return shm
+
+    def __composite(
+        self,
+        img: Image.Image,
+        add_color: Color,
+        mult_color: Color,
+        hsl_shift: HSL,
+        inverse: Matrix,
+        perspective: bool,
+        xscale: float,
+        yscale: float,
+        bounds: Tuple[int, int, int, int],
+        mask: Optional[Image.Image],
+        blendfunc: int,
+        texture: Image.Image,
+        single_threaded: bool,
+        aa_mode: int,
+    ) -> Image.Image:
+        minx, maxx, miny, maxy = bounds
+        imgwidth = img.width
+        imgheight = img.height
+        texwidth = texture.width
+        texheight = texture.height
+        if mask:
+            alpha = mask.split()[-1]
+            maskbytes: Optional[bytes] = alpha.tobytes("raw", "L")
+        else:
+            maskbytes = None
 
-        for imgy in range(miny, maxy):
-            work.put(imgy)
-            expected += 1
+        if (
+            single_threaded
+            or self.processes < 2
+            or ((maxx - minx) * (maxy - miny)) < self.MIN_POOLED_PIXELS
+        ):
+            # We don't have enough CPU cores or work to bother multiprocessing.
+            imgbytearray = bytearray(img.tobytes("raw", "RGBA"))
+            _render_rows(
+                miny,
+                maxy,
+                minx,
+                maxx,
+                imgwidth,
+                imgheight,
+                texwidth,
+                texheight,
+                xscale,
+                yscale,
+                _callback(inverse, perspective),
+                add_color,
+                mult_color,
+                hsl_shift,
+                blendfunc,
+                imgbytearray,
+                texture.tobytes("raw", "RGBA"),
+                maskbytes,
+                aa_mode,
+            )
+            return Image.frombytes("RGBA", (imgwidth, imgheight), bytes(imgbytearray))
+
+        with self.__lock:
+            self.__start()
+            if self.__work is None or self.__results is None:
+                raise Exception("Logic error, worker pool did not start!")
+
+            imgsize = imgwidth * imgheight * 4
+            imgshm = self.__scratch_buffer("img", img.tobytes("raw", "RGBA"))
+            texshm = self.__texture_buffer(texture)
+            maskshm = (
+                self.__scratch_buffer("mask", maskbytes)
+                if maskbytes is not None
+                else None
+            )
 
-        lines: List[bytes] = [
-            imgbytes[x : (x + (imgwidth * 4))]
-            for x in range(
-                0,
-                imgwidth * imgheight * 4,
-                imgwidth * 4,
+            # Split the rows up into a few chunks per worker, so that a slow chunk
+            # doesn't leave the others idle.
+            jobid = next(self.__jobids)
+            chunk = max(
+                1, (maxy - miny + (self.processes * 4) - 1) // (self.processes * 4)
+            )
+            expected = 0
+            for start in range(miny, maxy, chunk):
+                self.__work.put(
+                    (
+                        jobid,
+                        imgshm.name,
+                        texshm.name,
+                        maskshm.name if maskshm is not None else None,
+                        perspective,
+                        inverse,
+                        (
+                            start,
+                            min(start + chunk, maxy),
+                            minx,
+                            maxx,
+                            imgwidth,
+                            imgheight,
+                            texwidth,
+                            texheight,
+                            xscale,
+                            yscale,
+                            add_color,
+                            mult_color,
+                            hsl_shift,
+                            blendfunc,
+                            aa_mode,
+                        ),
+                    )
+                )
+                expected += 1
+
+            error: Optional[Exception] = None
+            while expected > 0:
+                resultid, exc = self.__results.get()
+                if resultid != jobid:
+                    # Left over from a call that was interrupted.
+                    continue
+                expected -= 1
+                if exc is not None:
+                    error = exc
+            if error is not None:
+                raise error
+
+            return Image.frombytes(
+                "RGBA", (imgwidth, imgheight), bytes(_view(imgshm)[:imgsize])
             )
-        ]
-        for _ in range(expected):
-            imgy, result = results.get()
-            lines[imgy] = result
 
-        for _proc in procs:
-            work.put(None)
-        for proc in procs:
-            proc.join()
+    def affine_composite(
+        self,
+        img: Image.Image,
+        add_color: Color,
+        mult_color: Color,
+        hsl_shift: HSL,
+        transform: Matrix,
+        mask: Optional[Image.Image],
+        blendfunc: int,
+        texture: Image.Image,
+        single_threaded: bool = False,
+        aa_mode: int = AAMode.SSAA_OR_BILINEAR,
+    ) -> Image.Image:
+        # Calculate the inverse so we can map canvas space back to texture space.
+        try:
+            inverse = transform.inverse()
+        except ZeroDivisionError:
+            # If this happens, that means one of the scaling factors was zero, making
+            # this object invisible. We can ignore this since the object should not
+            # be drawn.
+            return img
+
+        # Warn if we have an unsupported blend.
+        if blendfunc not in {0, 1, 2, 3, 8, 9, 13, 70, 256, 257}:
+            print(f"WARNING: Unsupported blend {blendfunc}")
+            return img
+
+        # These are calculated properties and caching them outside of the loop
+        # speeds things up a bit.
+        imgwidth = img.width
+        imgheight = img.height
+        texwidth = texture.width
+        texheight = texture.height
+
+        # Calculate the maximum range of update this texture can possibly reside in.
+        pix1 = transform.multiply_point(Point.identity())
+        pix2 = transform.multiply_point(Point.identity().add(Point(texwidth, 0)))
+        pix3 = transform.multiply_point(Point.identity().add(Point(0, texheight)))
+        pix4 = transform.multiply_point(
+            Point.identity().add(Point(texwidth, texheight))
+        )
 
-        signal.signal(signal.SIGINT, previous_handler)
-        if interrupted:
-            raise KeyboardInterrupt()
+        # Map this to the rectangle we need to sweep in the rendering image.
+        minx = max(int(min(pix1.x, pix2.x, pix3.x, pix4.x)), 0)
+        maxx = min(int(max(pix1.x, pix2.x, pix3.x, pix4.x)) + 1, imgwidth)
+        miny = max(int(min(pix1.y, pix2.y, pix3.y, pix4.y)), 0)
+        maxy = min(int(max(pix1.y, pix2.y, pix3.y, pix4.y)) + 1, imgheight)
 
-        img = Image.frombytes("RGBA", (imgwidth, imgheight), b"".join(lines))
-    return img
+        if maxx <= minx or maxy <= miny:
+            # This image is entirely off the screen!
+            return img
 
+        return self.__composite(
+            img,
+            add_color,
+            mult_color,
+            hsl_shift,
+            inverse,
+            False,
+            1.0 / inverse.xscale,
+            1.0 / inverse.yscale,
+            (minx, maxx, miny, maxy),
+            mask,
+            blendfunc,
+            texture,
+            single_threaded,
+            aa_mode,
+        )
 
-def perspective_line_renderer(
-    work: multiprocessing.Queue,
-    results: multiprocessing.Queue,
-    minx: int,
-    maxx: int,
-    imgwidth: int,
-    imgheight: int,
-    texwidth: int,
-    texheight: int,
-    xscale: float,
-    yscale: float,
-    inverse: Matrix,
-    add_color: Color,
-    mult_color: Color,
-    hsl_shift: HSL,
-    blendfunc: int,
-    imgbytes: Union[bytes, bytearray],
-    texbytes: Union[bytes, bytearray],
-    maskbytes: Optional[Union[bytes, bytearray]],
-    aa_mode: int,
-) -> None:
-    def perspective_inverse(imgpoint: Point) -> Optional[Point]:
-        # Calculate the texture coordinate with our perspective interpolation.
-        texdiv = inverse.multiply_point(imgpoint)
-        if texdiv.z <= 0.0:
-            return None
+    def perspective_composite(
+        self,
+        img: Image.Image,
+        add_color: Color,
+        mult_color: Color,
+        hsl_shift: HSL,
+        transform: Matrix,
+        camera: Point,
+        focal_length: float,
+        mask: Optional[Image.Image],
+        blendfunc: int,
+        texture: Image.Image,
+        single_threaded: bool = False,
+        aa_mode: int = AAMode.SSAA_ONLY,
+    ) -> Image.Image:
+        # Warn if we have an unsupported blend.
+        if blendfunc not in {0, 1, 2, 3, 8, 9, 13, 70, 256, 257}:
+            print(f"WARNING: Unsupported blend {blendfunc}")
+            return img
+
+        # Get the perspective-correct inverse matrix for looking up texture coordinates.
+        inverse_matrix, minx, miny, maxx, maxy = perspective_calculate(
+            img.width,
+            img.height,
+            texture.width,
+            texture.height,
+            transform,
+            camera,
+            focal_length,
+        )
+        if inverse_matrix is None:
+            # This texture is entirely off of the screen.
+            return img
 
-        return Point(texdiv.x / texdiv.z, texdiv.y / texdiv.z)
+        return self.__composite(
+            img,
+            add_color,
+            mult_color,
+            hsl_shift,
+            inverse_matrix,
+            True,
+            transform.xscale,
+            transform.yscale,
+            (minx, maxx, miny, maxy),
+            mask,
+            blendfunc,
+            texture,
+            single_threaded,
+            aa_mode,
+        )
 
-    while True:
-        imgy = work.get()
-        if imgy is None:
-            return
 
-        rowbytes = bytearray(
-            imgbytes[(imgy * imgwidth * 4) : ((imgy + 1) * imgwidth * 4)]
-        )
-        for imgx in range(imgwidth):
-            if imgx < minx or imgx >= maxx:
-                # No need to even consider this pixel.
-                continue
-            else:
-                # Blit new pixel into the correct range.
-                rowbytes[(imgx * 4) : ((imgx + 1) * 4)] = pixel_renderer(
-                    imgx,
-                    imgy,
-                    imgwidth,
-                    imgheight,
-                    texwidth,
-                    texheight,
-                    xscale,
-                    yscale,
-                    perspective_inverse,
-                    add_color,
-                    mult_color,
-                    hsl_shift,
-                    blendfunc,
-                    imgbytes,
-                    texbytes,
-                    maskbytes,
-                    aa_mode,
-                )
+# Pool used by the module-level functions below, for callers that don't keep their own.
+_shared_pool: Optional[CompositePool] = None
+
+
+def _get_shared_pool() -> CompositePool:
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = CompositePool()
+        atexit.register(_shared_pool.close)
+    return _shared_pool
 
-        results.put((imgy, bytes(rowbytes)))
+
+def affine_composite(
+    img: Image.Image,
+    add_color: Color,
+    mult_color: Color,
+    hsl_shift: HSL,
+    transform: Matrix,
+    mask: Optional[Image.Image],
+    blendfunc: int,
+    texture: Image.Image,
+    single_threaded: bool = False,
+    aa_mode: int = AAMode.SSAA_OR_BILINEAR,
+) -> Image.Image:
+    return _get_shared_pool().affine_composite(
+        img,
+        add_color,
+        mult_color,
+        hsl_shift,
+        transform,
+        mask,
+        blendfunc,
+        texture,
+        single_threaded=single_threaded,
+        aa_mode=aa_mode,
+    )
 
 
 def perspective_composite(
@@ -772,146 +1041,17 @@ def perspective_composite(
     single_threaded: bool = False,
     aa_mode: int = AAMode.SSAA_ONLY,
 ) -> Image.Image:
-    # Warn if we have an unsupported blend.
-    if blendfunc not in {0, 1, 2, 3, 8, 9, 13, 70, 256, 257}:
-        print(f"WARNING: Unsupported blend {blendfunc}")
-        return img
-
-    # These are calculated properties and caching them outside of the loop
-    # speeds things up a bit.
-    imgwidth = img.width
-    imgheight = img.height
-    texwidth = texture.width
-    texheight = texture.height
-
-    # Get the perspective-correct inverse matrix for looking up texture coordinates.
-    inverse_matrix, minx, miny, maxx, maxy = perspective_calculate(
-        imgwidth, imgheight, texwidth, texheight, transform, camera, focal_length
+    return _get_shared_pool().perspective_composite(
+        img,
+        add_color,
+        mult_color,
+        hsl_shift,
+        transform,
+        camera,
+        focal_length,
+        mask,
+        blendfunc,
+        texture,
+        single_threaded=single_threaded,
+        aa_mode=aa_mode,
     )
-    if inverse_matrix is None:
-        # This texture is entirely off of the screen.
-        return img
-
-    def perspective_inverse(imgpoint: Point) -> Optional[Point]:
-        # Calculate the texture coordinate with our perspective interpolation.
-        texdiv = inverse_matrix.multiply_point(imgpoint)
-        if texdiv.z <= 0.0:
-            return None
-
-        return Point(texdiv.x / texdiv.z, texdiv.y / texdiv.z)
-
-    cores = multiprocessing.cpu_count()
-    if single_threaded or cores < 2:
-        # Get the data in an easier to manipulate and faster to update fashion.
-        imgbytearray = bytearray(img.tobytes("raw", "RGBA"))
-        texbytes = texture.tobytes("raw", "RGBA")
-        if mask:
-            alpha = mask.split()[-1]
-            maskbytes = alpha.tobytes("raw", "L")
-        else:
-            maskbytes = None
-
-        # We don't have enough CPU cores to bother multiprocessing.
-        for imgy in range(miny, maxy):
-            for imgx in range(minx, maxx):
-                # Determine offset
-                imgoff = (imgx + (imgy * imgwidth)) * 4
-                imgbytearray[imgoff : (imgoff + 4)] = pixel_renderer(
-                    imgx,
-                    imgy,
-                    imgwidth,
-                    imgheight,
-                    texwidth,
-                    texheight,
-                    transform.xscale,
-                    transform.yscale,
-                    perspective_inverse,
-                    add_color,
-                    mult_color,
-                    hsl_shift,
-                    blendfunc,
-                    imgbytearray,
-                    texbytes,
-                    maskbytes,
-                    aa_mode,
-                )
-
-        img = Image.frombytes("RGBA", (imgwidth, imgheight), bytes(imgbytearray))
-    else:
-        imgbytes = img.tobytes("raw", "RGBA")
-        texbytes = texture.tobytes("raw", "RGBA")
-        if mask:
-            alpha = mask.split()[-1]
-            maskbytes = alpha.tobytes("raw", "L")
-        else:
-            maskbytes = None
-
-        # Let's spread the load across multiple processors.
-        procs: List[multiprocessing.Process] = []
-        work: multiprocessing.Queue = multiprocessing.Queue()
-        results: multiprocessing.Queue = multiprocessing.Queue()
-        expected: int = 0
-        interrupted: bool = False
-
-        def ctrlc(sig: Any, frame: Any) -> None:
-            nonlocal interrupted
-            interrupted = True
-
-        previous_handler = signal.getsignal(signal.SIGINT)
-        signal.signal(signal.SIGINT, ctrlc)
-
-        for _ in range(cores):
-            proc = multiprocessing.Process(
-                target=perspective_line_renderer,
-                args=(
-                    work,
-                    results,
-                    minx,
-                    maxx,
-                    imgwidth,
-                    imgheight,
-                    texwidth,
-                    texheight,
-                    transform.xscale,
-                    transform.yscale,
-                    inverse_matrix,
-                    add_color,
-                    mult_color,
-                    hsl_shift,
-                    blendfunc,
-                    imgbytes,
-                    texbytes,
-                    maskbytes,
-                    aa_mode,
-                ),
-            )
-            procs.append(proc)
-            proc.start()
-
-        for imgy in range(miny, maxy):
-            work.put(imgy)
-            expected += 1
-
-        lines: List[bytes] = [
-            imgbytes[x : (x + (imgwidth * 4))]
-            for x in range(
-                0,
-                imgwidth * imgheight * 4,
-                imgwidth * 4,
-            )
-        ]
-        for _ in range(expected):
-            imgy, result = results.get()
-            lines[imgy] = result
-
-        for _proc in procs:
-            work.put(None)
-        for proc in procs:
-            proc.join()
-
-        signal.signal(signal.SIGINT, previous_handler)
-        if interrupted:
-            raise KeyboardInterrupt()
-
-        img = Image.frombytes("RGBA", (imgwidth, imgheight), b"".join(lines))
-    return img
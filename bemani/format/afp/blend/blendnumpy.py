@@ -0,0 +1,661 @@
+import numpy as np
+from PIL import Image
+from typing import List, Optional, Tuple
+
+from ..types import Color, HSL, Matrix, Point, AAMode
+from .perspective import perspective_calculate
+
+
+# Rough upper bound on the number of texture samples we compute at once. Anti-aliasing
+# takes up to 25 samples per pixel, so large objects are rendered a band of rows at a
+# time in order to keep the intermediate arrays from getting out of hand.
+MAX_SAMPLES_PER_BAND = 1 << 20
+
+# Blend functions that we know how to render.
+SUPPORTED_BLENDS = {0, 1, 2, 3, 8, 9, 13, 70, 256, 257}
+
+
+# This is a vectorized port of blendcppimpl.cxx, used when the compiled extension
+# isn't available. Every operation is written to produce the same bytes as the C++
+# code given the same inputs, including its rounding and truncation quirks, so the
+# two can be swapped without changing rendered output.
+
+
+def _round(color: np.ndarray) -> np.ndarray:
+    # The C++ code rounds with roundf(), which works in single precision and rounds
+    # halfway cases away from zero, unlike numpy's round-half-to-even.
+    single = color.astype(np.float32).astype(np.float64)
+    magnitude = np.abs(single)
+    whole = np.floor(magnitude)
+    whole += (magnitude - whole) >= 0.5
+    return np.copysign(whole, single)
+
+
+def _clamp(color: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore"):
+        return np.minimum(np.maximum(0.0, _round(color)), 255.0).astype(np.int64)
+
+
+def _truncate(value: np.ndarray) -> np.ndarray:
+    # Equivalent of a C cast from double to int, which truncates towards zero.
+    with np.errstate(invalid="ignore"):
+        return value.astype(np.int64)
+
+
+def _truncate_byte(value: np.ndarray) -> np.ndarray:
+    # Equivalent of a C cast from double to unsigned char.
+    return _truncate(value) & 0xFF
+
+
+def _swing_offsets(swing: float) -> List[float]:
+    # The C++ code accumulates the sample offsets in a loop, so compute them the same
+    # way in order to land on the exact same sample locations.
+    offsets = []
+    add = 0.5 - swing
+    while add <= 0.5 + swing:
+        offsets.append(add)
+        add += swing / 2.0
+    return offsets
+
+
+def _multiply_points(
+    inverse: Matrix, xloc: np.ndarray, yloc: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Same as Matrix.multiply_point() for a whole grid of points with a Z of zero.
+    return (
+        (inverse.a11 * xloc) + (inverse.a21 * yloc) + (inverse.a31 * 0.0) + inverse.a41,
+        (inverse.a12 * xloc) + (inverse.a22 * yloc) + (inverse.a32 * 0.0) + inverse.a42,
+        (inverse.a13 * xloc) + (inverse.a23 * yloc) + (inverse.a33 * 0.0) + inverse.a43,
+    )
+
+
+def _texture_coordinates(
+    inverse: Matrix, perspective: bool, xloc: np.ndarray, yloc: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    texx, texy, texz = _multiply_points(inverse, xloc, yloc)
+    if not perspective:
+        return _truncate(texx), _truncate(texy)
+
+    # Points behind the camera don't map to anything on the texture.
+    visible = texz > 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (
+            np.where(visible, _truncate(texx / texz), -1),
+            np.where(visible, _truncate(texy / texz), -1),
+        )
+
+
+def _rgb_to_hsl(
+    r: np.ndarray, g: np.ndarray, b: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    cmax = np.maximum(np.maximum(r, g), b)
+    cmin = np.minimum(np.minimum(r, g), b)
+    total = (cmin + cmax).astype(np.float64)
+    delta = (cmax - cmin).astype(np.float64)
+    gray = cmax == cmin
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        l = total / (2.0 * 255.0)
+        s = np.where(l <= 0.5, delta / total, delta / ((2.0 * 255) - total))
+        h = np.where(
+            r == cmax,
+            ((g - b) / 6.0) / delta,
+            np.where(
+                g == cmax,
+                (1.0 / 3.0) + ((b - r) / 6.0) / delta,
+                (2.0 / 3.0) + ((r - g) / 6.0) / delta,
+            ),
+        )
+
+    return np.where(gray, 0.0, h), np.where(gray, 0.0, s), l
+
+
+def _hue_to_rgb(v1: np.ndarray, v2: np.ndarray, vh: np.ndarray) -> np.ndarray:
+    vh = np.where(vh < 0.0, vh + 1.0, vh)
+    vh = np.where(vh >= 1.0, vh - 1.0, vh)
+    return np.where(
+        (6.0 * vh) < 1.0,
+        v1 + ((v2 - v1) * 6.0 * vh),
+        np.where(
+            (2.0 * vh) < 1.0,
+            v2,
+            np.where((3.0 * vh) < 2.0, v1 + ((v2 - v1) * ((2.0 / 3.0) - vh) * 6.0), v1),
+        ),
+    )
+
+
+def _hsl_to_rgb(
+    h: np.ndarray, s: np.ndarray, l: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    h = h.copy()
+    while True:
+        under = h < 0.0
+        if not under.any():
+            break
+        h[under] += 1.0
+    while True:
+        over = h >= 1.0
+        if not over.any():
+            break
+        h[over] -= 1.0
+    s = np.minimum(np.maximum(s, 0.0), 1.0)
+    l = np.minimum(np.maximum(l, 0.0), 1.0)
+
+    v2 = np.where(l < 0.5, l * (1.0 + s), (l + s) - (l * s))
+    v1 = (2.0 * l) - v2
+    gray = _truncate_byte(l * 255.0)
+    return (
+        np.where(
+            s == 0.0, gray, _truncate_byte(255.0 * _hue_to_rgb(v1, v2, h + (1.0 / 3.0)))
+        ),
+        np.where(s == 0.0, gray, _truncate_byte(255.0 * _hue_to_rgb(v1, v2, h))),
+        np.where(
+            s == 0.0, gray, _truncate_byte(255.0 * _hue_to_rgb(v1, v2, h - (1.0 / 3.0)))
+        ),
+    )
+
+
+def _blend_normal(dest: np.ndarray, src: np.ndarray) -> np.ndarray:
+    srcpercent = src[..., 3] / 255.0
+    destpercent = dest[..., 3] / 255.0
+    srcremainder = 1.0 - srcpercent
+    new_alpha = np.minimum(
+        np.maximum(0.0, srcpercent + destpercent * srcremainder), 1.0
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        blended = np.stack(
+            [
+                _clamp(
+                    (
+                        (dest[..., c] * destpercent * srcremainder)
+                        + (src[..., c] * srcpercent)
+                    )
+                    / new_alpha
+                )
+                for c in range(3)
+            ]
+            + [_clamp(255 * new_alpha)],
+            axis=-1,
+        )
+
+    # Fully transparent sources leave the destination alone, and fully opaque ones
+    # replace it outright.
+    blended = np.where((src[..., 3] == 255)[..., None], src, blended)
+    return np.where((src[..., 3] == 0)[..., None], dest, blended)
+
+
+def _blend_addition(dest: np.ndarray, src: np.ndarray) -> np.ndarray:
+    srcpercent = src[..., 3] / 255.0
+    blended = np.stack(
+        [_clamp(dest[..., c] + (src[..., c] * srcpercent)) for c in range(3)]
+        + [_clamp(dest[..., 3] + (255 * srcpercent))],
+        axis=-1,
+    )
+    return np.where((src[..., 3] == 0)[..., None], dest, blended)
+
+
+def _blend_subtraction(dest: np.ndarray, src: np.ndarray) -> np.ndarray:
+    srcpercent = src[..., 3] / 255.0
+    blended = np.stack(
+        [_clamp(dest[..., c] - (src[..., c] * srcpercent)) for c in range(3)]
+        + [dest[..., 3]],
+        axis=-1,
+    )
+    return np.where((src[..., 3] == 0)[..., None], dest, blended)
+
+
+def _blend_multiply(dest: np.ndarray, src: np.ndarray) -> np.ndarray:
+    src_alpha = src[..., 3] / 255.0
+    src_remainder = 1.0 - src_alpha
+    return np.stack(
+        [
+            _clamp(
+                (255 * ((dest[..., c] / 255.0) * (src[..., c] / 255.0) * src_alpha))
+                + (dest[..., c] * src_remainder)
+            )
+            for c in range(3)
+        ]
+        + [dest[..., 3]],
+        axis=-1,
+    )
+
+
+def _blend_overlay(dest: np.ndarray, src: np.ndarray) -> np.ndarray:
+    return np.stack(
+        [
+            _clamp(255 * (2.0 * (dest[..., c] / 255.0) * (src[..., c] / 255.0)))
+            for c in range(3)
+        ]
+        + [dest[..., 3]],
+        axis=-1,
+    )
+
+
+def _blend_mask(visible: np.ndarray) -> np.ndarray:
+    # Masks are drawn in red for debugging visibility.
+    return np.where(
+        visible[..., None],
+        np.array([255, 0, 0, 255], dtype=np.int64),
+        np.array([0, 0, 0, 0], dtype=np.int64),
+    )
+
+
+def blend_points(
+    add_color: Color,
+    mult_color: Color,
+    hsl_shift: HSL,
+    # An array of RGBA colors, with the color channels as the last axis.
+    src_color: np.ndarray,
+    # An array of the same shape as src_color.
+    dest_color: np.ndarray,
+    blendfunc: int,
+) -> np.ndarray:
+    # Calculate multiplicative and additive colors against the source.
+    src_color = np.stack(
+        [
+            _clamp((src_color[..., 0] * mult_color.r) + (255 * add_color.r)),
+            _clamp((src_color[..., 1] * mult_color.g) + (255 * add_color.g)),
+            _clamp((src_color[..., 2] * mult_color.b) + (255 * add_color.b)),
+            _clamp((src_color[..., 3] * mult_color.a) + (255 * add_color.a)),
+        ],
+        axis=-1,
+    )
+
+    # Only add in HSL shift effects if they exist, since its expensive to
+    # convert and shift.
+    if not hsl_shift.is_identity:
+        h, s, l = _rgb_to_hsl(src_color[..., 0], src_color[..., 1], src_color[..., 2])
+        r, g, b = _hsl_to_rgb(h + hsl_shift.h, s + hsl_shift.s, l + hsl_shift.l)
+        src_color = np.stack([r, g, b, src_color[..., 3]], axis=-1)
+
+    if blendfunc == 3:
+        return _blend_multiply(dest_color, src_color)
+    elif blendfunc == 8:
+        return _blend_addition(dest_color, src_color)
+    elif blendfunc == 9 or blendfunc == 70:
+        return _blend_subtraction(dest_color, src_color)
+    elif blendfunc == 13:
+        return _blend_overlay(dest_color, src_color)
+    elif blendfunc == 256:
+        # Dummy blend function for calculating masks.
+        return _blend_mask((dest_color[..., 3] != 0) & (src_color[..., 3] != 0))
+    elif blendfunc == 257:
+        # Dummy blend function for calculating masks.
+        return _blend_mask(src_color[..., 3] != 0)
+    else:
+        return _blend_normal(dest_color, src_color)
+
+
+def _sample_nearest(
+    imgx: np.ndarray,
+    imgy: np.ndarray,
+    texdata: np.ndarray,
+    texwidth: int,
+    texheight: int,
+    inverse: Matrix,
+    perspective: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Grab the center of the pixel to get the color.
+    texx, texy = _texture_coordinates(
+        inverse, perspective, imgx[None, :] + 0.5, imgy[:, None] + 0.5
+    )
+
+    # Pixels that land outside of the texture aren't updated.
+    valid = (texx >= 0) & (texy >= 0) & (texx < texwidth) & (texy < texheight)
+    return valid, texdata[np.where(valid, texx + (texy * texwidth), 0)]
+
+
+def _sample_bilinear(
+    imgx: np.ndarray,
+    imgy: np.ndarray,
+    texdata: np.ndarray,
+    texwidth: int,
+    texheight: int,
+    inverse: Matrix,
+    perspective: bool,
+) -> Tuple[np.ndarray, np.ndarray]:
+    texx, texy, texz = _multiply_points(
+        inverse, imgx[None, :] + 0.5, imgy[:, None] + 0.5
+    )
+
+    # Bilinear resampling can only be done where all four neighbors are on the
+    # texture. Note that like the C++ code, this is decided before the perspective
+    # divide.
+    aax = _truncate(texx)
+    aay = _truncate(texy)
+    usable = ~(
+        (aax <= 0) | (aay <= 0) | (aax >= (texwidth - 1)) | (aay >= (texheight - 1))
+    )
+
+    if perspective:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            texx = texx / texz
+            texy = texy / texz
+        aax = _truncate(texx)
+        aay = _truncate(texy)
+    aaxrem = texx - aax
+    aayrem = texy - aay
+
+    # Find the four pixels that we can interpolate from. The first number is the x, and
+    # second is y. We never read pixels for locations we didn't decide to interpolate,
+    # but keep the lookups in bounds regardless.
+    aax = np.clip(aax, 0, max(texwidth - 2, 0))
+    aay = np.clip(aay, 0, max(texheight - 2, 0))
+    tex00 = texdata[aax + (aay * texwidth)]
+    tex10 = texdata[np.minimum(aax + 1, texwidth - 1) + (aay * texwidth)]
+    tex01 = texdata[aax + (np.minimum(aay + 1, texheight - 1) * texwidth)]
+    tex11 = texdata[
+        np.minimum(aax + 1, texwidth - 1)
+        + (np.minimum(aay + 1, texheight - 1) * texwidth)
+    ]
+
+    # Calculate various scaling factors based on alpha and percentage.
+    tex00percent = tex00[..., 3] / 255.0
+    tex10percent = tex10[..., 3] / 255.0
+    tex01percent = tex01[..., 3] / 255.0
+    tex11percent = tex11[..., 3] / 255.0
+
+    y0percent = (tex00percent * (1.0 - aaxrem)) + (tex10percent * aaxrem)
+    y1percent = (tex01percent * (1.0 - aaxrem)) + (tex11percent * aaxrem)
+    finalpercent = (y0percent * (1.0 - aayrem)) + (y1percent * aayrem)
+
+    channels = []
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for c in range(3):
+            # Interpolate in the X direction on both Y axis, and then the Y direction
+            # to get the final pixel value.
+            y0 = (tex00[..., c] * tex00percent * (1.0 - aaxrem)) + (
+                tex10[..., c] * tex10percent * aaxrem
+            )
+            y1 = (tex01[..., c] * tex01percent * (1.0 - aaxrem)) + (
+                tex11[..., c] * tex11percent * aaxrem
+            )
+            channels.append(
+                _truncate_byte(((y0 * (1.0 - aayrem)) + (y1 * aayrem)) / finalpercent)
+            )
+    channels.append(_truncate_byte(finalpercent * 255))
+    average = np.stack(channels, axis=-1)
+
+    # Pixels that would be blank are white with no alpha, to avoid dividing by zero.
+    blank = np.array([255, 255, 255, 0], dtype=np.int64)
+    return usable, np.where((finalpercent <= 0.0)[..., None], blank, average)
+
+
+def _sample_supersampled(
+    imgx: np.ndarray,
+    imgy: np.ndarray,
+    imgwidth: int,
+    imgheight: int,
+    texdata: np.ndarray,
+    texwidth: int,
+    texheight: int,
+    inverse: Matrix,
+    perspective: bool,
+    xswing: float,
+    yswing: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    # Lay the samples out as (row, column, y sample, x sample).
+    xloc = imgx[None, :, None, None] + np.array(_swing_offsets(xswing))
+    yloc = imgy[:, None, None, None] + np.array(_swing_offsets(yswing))[:, None]
+
+    # Samples that fall outside of the image don't count at all. Samples that fall
+    # outside of the texture still count towards the average, so that we get partial
+    # transparency to the pixel that is already there.
+    onimage = (xloc >= 0.0) & (xloc < imgwidth) & (yloc >= 0.0) & (yloc < imgheight)
+    texx, texy = _texture_coordinates(inverse, perspective, xloc, yloc)
+    ontexture = (
+        onimage & (texx >= 0) & (texy >= 0) & (texx < texwidth) & (texy < texheight)
+    )
+    texels = texdata[np.where(ontexture, texx + (texy * texwidth), 0)]
+
+    # Grab the values to average, making sure to factor in alpha as a poor-man's blend
+    # to ensure that partial transparency pixel values don't unnecessarily factor into
+    # average calculations. Fully transparent pixels add nothing, so skip them.
+    alpha = np.where(ontexture, texels[..., 3], 0)
+    counted = alpha != 0
+    apercent = alpha / 255.0
+    sums = [
+        np.where(counted, _truncate(texels[..., c] * apercent), 0).sum(axis=(2, 3))
+        for c in range(3)
+    ]
+    count = counted.sum(axis=(2, 3))
+    denom = np.maximum(onimage.sum(axis=(2, 3)), 1)
+    average_alpha = alpha.sum(axis=(2, 3)) // denom
+
+    # Average the pixels. Make sure to divide out the alpha in preparation for blending,
+    # being careful to do the integer division that the C++ code does.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        apercent = average_alpha / 255.0
+        average = np.stack(
+            [_truncate_byte((total // denom) / apercent) for total in sums]
+            + [average_alpha],
+            axis=-1,
+        )
+
+    # Samples that existed in bounds but with zero alpha are white with no alpha.
+    blank = np.array([255, 255, 255, 0], dtype=np.int64)
+    average = np.where((average_alpha == 0)[..., None], blank, average)
+
+    # None of the samples existing in bounds means there's nothing to draw.
+    return count > 0, average
+
+
+def _composite(
+    img: Image.Image,
+    add_color: Color,
+    mult_color: Color,
+    hsl_shift: HSL,
+    inverse: Matrix,
+    perspective: bool,
+    xscale: float,
+    yscale: float,
+    bounds: Tuple[int, int, int, int],
+    mask: Optional[Image.Image],
+    blendfunc: int,
+    texture: Image.Image,
+    aa_mode: int,
+) -> Image.Image:
+    minx, maxx, miny, maxy = bounds
+    imgwidth = img.width
+    imgheight = img.height
+    texwidth = texture.width
+    texheight = texture.height
+
+    imgdata = (
+        np.frombuffer(img.tobytes("raw", "RGBA"), dtype=np.uint8)
+        .reshape((imgheight, imgwidth, 4))
+        .copy()
+    )
+    texdata = (
+        np.frombuffer(texture.tobytes("raw", "RGBA"), dtype=np.uint8)
+        .reshape((texwidth * texheight, 4))
+        .astype(np.int64)
+    )
+    if mask is not None:
+        alpha = mask.split()[-1]
+        maskdata: Optional[np.ndarray] = np.frombuffer(
+            alpha.tobytes("raw", "L"), dtype=np.uint8
+        ).reshape((imgheight, imgwidth))
+    else:
+        maskdata = None
+
+    # Regardless of AA work, calculate the transform matrix for determining the stride
+    # for AA pixel lookups. Essentially what we're doing here is calculating the scale,
+    # clamping it at 1.0 as the minimum and then setting the AA sample swing accordingly.
+    # This has the effect of anti-aliasing scaled up images a bit softer than would
+    # otherwise be achieved.
+    if aa_mode == AAMode.UNSCALED_SSAA_ONLY:
+        xswing = 0.5
+        yswing = 0.5
+    else:
+        xswing = 0.5 * max(1.0, xscale)
+        yswing = 0.5 * max(1.0, yscale)
+    bilinear = aa_mode == AAMode.SSAA_OR_BILINEAR and xscale >= 1.0 and yscale >= 1.0
+
+    # Every pixel only ever reads its own destination value, so we can safely work on
+    # a band of rows at a time.
+    imgx = np.arange(minx, maxx, dtype=np.float64)
+    samples = (maxx - minx) * (1 if aa_mode == AAMode.NONE else 25)
+    band = max(1, MAX_SAMPLES_PER_BAND // max(samples, 1))
+    for start in range(miny, maxy, band):
+        end = min(start + band, maxy)
+        imgy = np.arange(start, end, dtype=np.float64)
+
+        if aa_mode == AAMode.NONE:
+            update, src = _sample_nearest(
+                imgx, imgy, texdata, texwidth, texheight, inverse, perspective
+            )
+        else:
+            update, src = _sample_supersampled(
+                imgx,
+                imgy,
+                imgwidth,
+                imgheight,
+                texdata,
+                texwidth,
+                texheight,
+                inverse,
+                perspective,
+                xswing,
+                yswing,
+            )
+            if bilinear:
+                usable, interpolated = _sample_bilinear(
+                    imgx, imgy, texdata, texwidth, texheight, inverse, perspective
+                )
+                update = update | usable
+                src = np.where(usable[..., None], interpolated, src)
+
+        # If we are masked off, don't update.
+        if maskdata is not None:
+            update = update & (maskdata[start:end, minx:maxx] != 0)
+        if not update.any():
+            continue
+
+        dest = imgdata[start:end, minx:maxx]
+        blended = blend_points(
+            add_color,
+            mult_color,
+            hsl_shift,
+            src[update],
+            dest[update].astype(np.int64),
+            blendfunc,
+        )
+        dest[update] = blended.astype(np.uint8)
+
+    return Image.frombytes("RGBA", (imgwidth, imgheight), imgdata.tobytes())
+
+
+def affine_composite(
+    img: Image.Image,
+    add_color: Color,
+    mult_color: Color,
+    hsl_shift: HSL,
+    transform: Matrix,
+    mask: Optional[Image.Image],
+    blendfunc: int,
+    texture: Image.Image,
+    single_threaded: bool = False,
+    aa_mode: int = AAMode.SSAA_OR_BILINEAR,
+) -> Image.Image:
+    # Work is done with whole array operations, so there are no threads to disable and
+    # single_threaded is only accepted for compatibility with the other compositors.
+    if blendfunc not in SUPPORTED_BLENDS:
+        print(f"WARNING: Unsupported blend {blendfunc}")
+        return img
+
+    # Calculate the inverse so we can map canvas space back to texture space.
+    try:
+        inverse = transform.inverse()
+    except ZeroDivisionError:
+        # If this happens, that means one of the scaling factors was zero, making
+        # this object invisible. We can ignore this since the object should not
+        # be drawn.
+        return img
+
+    imgwidth = img.width
+    imgheight = img.height
+    texwidth = texture.width
+    texheight = texture.height
+
+    # Calculate the maximum range of update this texture can possibly reside in.
+    pix1 = transform.multiply_point(Point.identity())
+    pix2 = transform.multiply_point(Point.identity().add(Point(texwidth, 0)))
+    pix3 = transform.multiply_point(Point.identity().add(Point(0, texheight)))
+    pix4 = transform.multiply_point(Point.identity().add(Point(texwidth, texheight)))
+
+    # Map this to the rectangle we need to sweep in the rendering image.
+    minx = max(int(min(pix1.x, pix2.x, pix3.x, pix4.x)), 0)
+    maxx = min(int(max(pix1.x, pix2.x, pix3.x, pix4.x)) + 1, imgwidth)
+    miny = max(int(min(pix1.y, pix2.y, pix3.y, pix4.y)), 0)
+    maxy = min(int(max(pix1.y, pix2.y, pix3.y, pix4.y)) + 1, imgheight)
+
+    if maxx <= minx or maxy <= miny:
+        # This image is entirely off the screen!
+        return img
+
+    return _composite(
+        img,
+        add_color,
+        mult_color,
+        hsl_shift,
+        inverse,
+        False,
+        transform.xscale,
+        transform.yscale,
+        (minx, maxx, miny, maxy),
+        mask,
+        blendfunc,
+        texture,
+        aa_mode,
+    )
+
+
+def perspective_composite(
+    img: Image.Image,
+    add_color: Color,
+    mult_color: Color,
+    hsl_shift: HSL,
+    transform: Matrix,
+    camera: Point,
+    focal_length: float,
+    mask: Optional[Image.Image],
+    blendfunc: int,
+    texture: Image.Image,
+    single_threaded: bool = False,
+    aa_mode: int = AAMode.SSAA_ONLY,
+) -> Image.Image:
+    if blendfunc not in SUPPORTED_BLENDS:
+        print(f"WARNING: Unsupported blend {blendfunc}")
+        return img
+
+    # Get the perspective-correct inverse matrix for looking up texture coordinates.
+    inverse_matrix, minx, miny, maxx, maxy = perspective_calculate(
+        img.width,
+        img.height,
+        texture.width,
+        texture.height,
+        transform,
+        camera,
+        focal_length,
+    )
+    if inverse_matrix is None:
+        # This texture is entirely off of the screen.
+        return img
+
+    return _composite(
+        img,
+        add_color,
+        mult_color,
+        hsl_shift,
+        inverse_matrix,
+        True,
+        transform.xscale,
+        transform.yscale,
+        (minx, maxx, miny, maxy),
+        mask,
+        blendfunc,
+        texture,
+        aa_mode,
+    )
@@ -1,7 +1,11 @@
 from typing import Any, Dict, Generator, List, Set, Tuple, Optional, Union
 from PIL import Image
 
-from .blend import affine_composite, perspective_composite
+from .blend import (
+    CompositePool,
+    COMPOSITE_BACKENDS,
+    DEFAULT_COMPOSITE_BACKEND,
+)
 from .swf import (
     SWF,
     Frame,
@@ -722,6 +726,7 @@ class AFPRenderer(VerboseOutput):
         swfs: Dict[str, SWF] = {},
         single_threaded: bool = False,
         enable_aa: bool = False,
+        composite_backend: Optional[str] = None,
     ) -> None:
         super().__init__()
 
@@ -729,6 +734,18 @@ class AFPRenderer(VerboseOutput):
         self.__single_threaded = single_threaded
         self.__enable_aa = enable_aa
 
+        # Which compositing implementation to draw with, defaulting to the fastest one.
+        backend = composite_backend or DEFAULT_COMPOSITE_BACKEND
+        if backend not in COMPOSITE_BACKENDS:
+            raise Exception(f"Compositing backend {backend} is not available!")
+        self.__composite_functions = COMPOSITE_BACKENDS[backend]
+
+        # Worker processes for the pure python compositor, kept for as long as we render
+        # so that they aren't started over for every object drawn.
+        self.__pool: Optional[CompositePool] = (
+            CompositePool() if (backend == "python" and not single_threaded) else None
+        )
+
         # Library of shapes (draw instructions), textures (actual images) and swfs (us and other files for imports).
         self.shapes: Dict[str, Shape] = shapes
         self.textures: Dict[str, Image.Image] = textures
@@ -748,6 +765,22 @@ class AFPRenderer(VerboseOutput):
             "aeplib.__Packages.aeplib",
         }
 
+    def close(self) -> None:
+        # Stop any worker processes used for compositing. The renderer can still be
+        # used afterwards, it will start them again if it needs them.
+        if self.__pool is not None:
+            self.__pool.close()
+
+    def __affine_composite(self, *args: Any, **kwargs: Any) -> Image.Image:
+        if self.__pool is not None:
+            return self.__pool.affine_composite(*args, **kwargs)
+        return self.__composite_functions[0](*args, **kwargs)
+
+    def __perspective_composite(self, *args: Any, **kwargs: Any) -> Image.Image:
+        if self.__pool is not None:
+            return self.__pool.perspective_composite(*args, **kwargs)
+        return self.__composite_functions[1](*args, **kwargs)
+
     def add_shape(self, name: str, data: Shape) -> None:
         # Register a named shape with the renderer.
         if not data.parsed:
@@ -1426,7 +1459,7 @@ class AFPRenderer(VerboseOutput):
     ) -> Image.Image:
         if mask.rectangle is None:
             # Calculate the new mask rectangle.
-            mask.rectangle = affine_composite(
+            mask.rectangle = self.__affine_composite(
                 Image.new(
                     "RGBA",
                     (int(mask.bounds.right), int(mask.bounds.bottom)),
@@ -1449,7 +1482,7 @@ class AFPRenderer(VerboseOutput):
 
         # Draw the mask onto a new image.
         if projection == AP2PlaceObjectTag.PROJECTION_AFFINE:
-            calculated_mask = affine_composite(
+            calculated_mask = self.__affine_composite(
                 Image.new(
                     "RGBA", (parent_mask.width, parent_mask.height), (0, 0, 0, 0)
                 ),
@@ -1468,7 +1501,7 @@ class AFPRenderer(VerboseOutput):
                 print(
                     "WARNING: Element requests perspective projection but no camera exists!"
                 )
-                calculated_mask = affine_composite(
+                calculated_mask = self.__affine_composite(
                     Image.new(
                         "RGBA", (parent_mask.width, parent_mask.height), (0, 0, 0, 0)
                     ),
@@ -1483,7 +1516,7 @@ class AFPRenderer(VerboseOutput):
                     aa_mode=AAMode.NONE,
                 )
             else:
-                calculated_mask = perspective_composite(
+                calculated_mask = self.__perspective_composite(
                     Image.new(
                         "RGBA", (parent_mask.width, parent_mask.height), (0, 0, 0, 0)
                     ),
@@ -1501,7 +1534,7 @@ class AFPRenderer(VerboseOutput):
                 )
 
         # Composite it onto the current mask.
-        return affine_composite(
+        return self.__affine_composite(
             parent_mask.copy(),
             Color(0.0, 0.0, 0.0, 0.0),
             Color(1.0, 1.0, 1.0, 1.0),
@@ -1727,7 +1760,7 @@ class AFPRenderer(VerboseOutput):
                         else:
                             aamode = AAMode.NONE
 
-                        img = affine_composite(
+                        img = self.__affine_composite(
                             img,
                             add_color,
                             mult_color,
@@ -1753,7 +1786,7 @@ class AFPRenderer(VerboseOutput):
                             print(
                                 "WARNING: Element requests perspective projection but no camera exists!"
                             )
-                            img = affine_composite(
+                            img = self.__affine_composite(
                                 img,
                                 add_color,
                                 mult_color,
@@ -1775,7 +1808,7 @@ class AFPRenderer(VerboseOutput):
                             else:
                                 aamode = AAMode.NONE
 
-                            img = perspective_composite(
+                            img = self.__perspective_composite(
                                 img,
                                 add_color,
                                 mult_color,
@@ -1811,7 +1844,7 @@ class AFPRenderer(VerboseOutput):
             # This is a shape draw reference.
             texture = self.textures[renderable.source.reference]
             if projection == AP2PlaceObjectTag.PROJECTION_AFFINE:
-                img = affine_composite(
+                img = self.__affine_composite(
                     img,
                     add_color,
                     mult_color,
@@ -1830,7 +1863,7 @@ class AFPRenderer(VerboseOutput):
                     print(
                         "WARNING: Element requests perspective projection but no camera exists!"
                     )
-                    img = affine_composite(
+                    img = self.__affine_composite(
                         img,
                         add_color,
                         mult_color,
@@ -1845,7 +1878,7 @@ class AFPRenderer(VerboseOutput):
                         else AAMode.NONE,
                     )
                 else:
-                    img = perspective_composite(
+                    img = self.__perspective_composite(
                         img,
                         add_color,
                         mult_color,
@@ -52,6 +52,8 @@ class ARC:
         else:
             # Compressed
             lz77 = Lz77()
-            return lz77.decompress(
-                self.__data[fileoffset : (fileoffset + compressedsize)]
+            outbuf = bytearray(uncompressedsize)
+            lz77.decompress_into(
+                self.__data[fileoffset : (fileoffset + compressedsize)], outbuf
             )
+            return bytes(outbuf)
@@ -1,9 +1,11 @@
 import hashlib
 import io
+import mmap
 import os
 import struct
+from collections import OrderedDict
 from PIL import Image
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from bemani.format.dxt import DXTBuffer
 from bemani.protocol.binary import BinaryEncoding
@@ -17,17 +19,30 @@ class IFS:
     Best-effort utility for decoding the `.ifs` file format. There are better tools out
     there, but this was developed before their existence. This should work with most of
     the games out there including non-rhythm games that use this format.
+
+    Only the header is parsed up front. File data is sliced out of the archive, and
+    decompressed or decoded, when it is read. Use IFS.open() to map an archive on disk
+    instead of reading the whole thing into memory.
     """
 
+    # Number of decompressed or decoded files to hang on to, so that reading the same
+    # file more than once doesn't redo the work.
+    DECODED_CACHE_SIZE = 16
+
     def __init__(
         self,
-        data: bytes,
+        data: Union[bytes, mmap.mmap],
         decode_binxml: bool = False,
         decode_textures: bool = False,
         keep_hex_names: bool = False,
         reference_loader: Optional[Callable[[str], Optional["IFS"]]] = None,
     ) -> None:
-        self.__files: Dict[str, bytes] = {}
+        self.__data = data
+        # Mapping of filename to the offset and size of the file in this archive, the
+        # super-file it is stored in instead if it is external, and its name in the header.
+        self.__files: Dict[str, Tuple[int, int, Optional[str], str]] = {}
+        self.__references: Dict[str, IFS] = {}
+        self.__decoded: "OrderedDict[str, bytes]" = OrderedDict()
         self.__formats: Dict[str, str] = {}
         self.__compressed: Dict[str, bool] = {}
         self.__imgsize: Dict[str, Tuple[int, int, int, int]] = {}
@@ -38,6 +53,78 @@ class IFS:
         self.__loader = reference_loader
         self.__parse_file(data)
 
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        decode_binxml: bool = False,
+        decode_textures: bool = False,
+        keep_hex_names: bool = False,
+        reference_loader: Optional[Callable[[str], Optional["IFS"]]] = None,
+    ) -> "IFS":
+        """
+        Open an IFS file on disk, memory-mapping it rather than reading it in.
+
+        Parameters:
+            path - Path to the IFS file.
+            decode_binxml, decode_textures, keep_hex_names - Same as for the constructor.
+            reference_loader - Same as for the constructor. If not provided, super-files
+                               are opened the same way from the directory of this file.
+
+        Returns:
+            An IFS instance. Call close() on it, or use it as a context manager, to
+            release the mapping once done with it.
+        """
+        with open(path, "rb") as fp:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if reference_loader is None:
+            directory = os.path.dirname(os.path.abspath(path))
+
+            def load_reference(name: str) -> Optional[IFS]:
+                filename = os.path.join(directory, name)
+                if not os.path.isfile(filename):
+                    return None
+                return cls.open(filename, keep_hex_names=True)
+
+            reference_loader = load_reference
+
+        try:
+            return cls(
+                data,
+                decode_binxml=decode_binxml,
+                decode_textures=decode_textures,
+                keep_hex_names=keep_hex_names,
+                reference_loader=reference_loader,
+            )
+        except Exception:
+            data.close()
+            raise
+
+    def close(self) -> None:
+        """
+        Release the memory-mapped archive, as well as any super-files that were loaded
+        to resolve references. Views returned by read_view() must not be used after this.
+        """
+        for reference in self.__references.values():
+            reference.close()
+        self.__references = {}
+        self.__decoded.clear()
+
+        if isinstance(self.__data, mmap.mmap):
+            try:
+                self.__data.close()
+            except BufferError:
+                # Somebody is still holding on to a view, so the mapping will be released
+                # when the last of those goes away instead.
+                pass
+
+    def __enter__(self) -> "IFS":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
     def __fix_name(self, filename: str) -> str:
         if filename[0] == "_" and filename[1].isdigit():
             filename = filename[1:]
@@ -45,7 +132,7 @@ class IFS:
         filename = filename.replace("__", "_")
         return filename
 
-    def __parse_file(self, data: bytes) -> None:
+    def __parse_file(self, data: Union[bytes, mmap.mmap]) -> None:
         # Grab the magic values and make sure this is an IFS
         (
             signature,
@@ -134,34 +221,13 @@ class IFS:
         # Recursively walk the entire filesystem extracting files and their locations.
         get_children(os.sep, header)
 
-        # Cache of other file data.
-        otherdata: Dict[str, IFS] = {}
-
         for fn in files:
             (start, size, pack_time, external_file) = files[fn]
-            if external_file is not None:
-                if external_file not in otherdata:
-                    if self.__loader is None:
-                        ifsdata = None
-                    else:
-                        ifsdata = self.__loader(external_file)
-
-                    if ifsdata is None:
-                        raise Exception(
-                            f"Couldn't extract file data for {fn} referencing IFS file {external_file}!"
-                        )
-                    else:
-                        otherdata[external_file] = ifsdata
+            if external_file is None and (start + size) > len(data):
+                raise Exception(f"Couldn't extract file data for {fn}!")
 
-                if fn in otherdata[external_file].filenames:
-                    filedata = otherdata[external_file].read_file(fn)
-                else:
-                    raise Exception(f"{fn} not found in {external_file} IFS!")
-            else:
-                filedata = data[start : (start + size)]
-                if len(filedata) != size:
-                    raise Exception(f"Couldn't extract file data for {fn}!")
-            self.__files[fn] = filedata
+            # Files stored in super-files are looked up in them when they are read.
+            self.__files[fn] = (start, size, external_file, fn)
 
         # Now, find all of the index files that are available.
         for filename in list(self.__files.keys()):
@@ -172,14 +238,14 @@ class IFS:
                 texdir = os.path.dirname(filename)
 
                 benc = BinaryEncoding()
-                texdata = benc.decode(self.__files[filename])
+                texdata = benc.decode(self.__raw(filename).tobytes())
 
                 if texdata is None:
                     # Now, try as XML
                     xenc = XmlEncoding()
                     encoding = "ascii"
                     texdata = xenc.decode(
-                        b'<?xml encoding="ascii"?>' + self.__files[filename]
+                        b'<?xml encoding="ascii"?>' + self.__raw(filename).tobytes()
                     )
 
                     if texdata is None:
@@ -265,14 +331,14 @@ class IFS:
                 geodir = os.path.join(os.path.dirname(afpdir), "geo")
 
                 benc = BinaryEncoding()
-                afpdata = benc.decode(self.__files[filename])
+                afpdata = benc.decode(self.__raw(filename).tobytes())
 
                 if afpdata is None:
                     # Now, try as XML
                     xenc = XmlEncoding()
                     encoding = "ascii"
                     afpdata = xenc.decode(
-                        b'<?xml encoding="ascii"?>' + self.__files[filename]
+                        b'<?xml encoding="ascii"?>' + self.__raw(filename).tobytes()
                     )
 
                     if afpdata is None:
@@ -327,16 +393,85 @@ class IFS:
     def filenames(self) -> List[str]:
         return [f for f in self.__files]
 
+    def __raw(self, filename: str) -> memoryview:
+        start, size, external_file, fn = self.__files[filename]
+        if external_file is None:
+            return memoryview(self.__data)[start : (start + size)]
+
+        # This file lives in a super-file, so load that the first time we need it.
+        if external_file not in self.__references:
+            ifsdata = (
+                self.__loader(external_file) if self.__loader is not None else None
+            )
+            if ifsdata is None:
+                raise Exception(
+                    f"Couldn't extract file data for {fn} referencing IFS file {external_file}!"
+                )
+            self.__references[external_file] = ifsdata
+
+        try:
+            return self.__references[external_file].read_view(fn)
+        except KeyError:
+            raise Exception(f"{fn} not found in {external_file} IFS!")
+
+    def __needs_decode(self, filename: str) -> bool:
+        return (
+            self.__compressed.get(filename, False)
+            or (self.__decode_binxml and os.path.splitext(filename)[1] == ".xml")
+            or (self.__decode_textures and filename in self.__formats)
+        )
+
+    def __decoded_file(self, filename: str) -> bytes:
+        if filename in self.__decoded:
+            self.__decoded.move_to_end(filename)
+            return self.__decoded[filename]
+
+        filedata = self.__decode(filename, self.__raw(filename))
+        self.__decoded[filename] = filedata
+        while len(self.__decoded) > self.DECODED_CACHE_SIZE:
+            self.__decoded.popitem(last=False)
+        return filedata
+
+    def read_view(self, filename: str) -> memoryview:
+        """
+        Read a file without copying it out of the archive where possible.
+
+        Parameters:
+            filename - The name of the file, as found in filenames.
+
+        Returns:
+            A read-only view of the file data, after any decompression and decoding.
+        """
+        if self.__needs_decode(filename):
+            return memoryview(self.__decoded_file(filename))
+        return self.__raw(filename)
+
     def read_file(self, filename: str) -> bytes:
+        """
+        Read a file, after any decompression and decoding.
+
+        Parameters:
+            filename - The name of the file, as found in filenames.
+
+        Returns:
+            The file data.
+        """
+        if self.__needs_decode(filename):
+            return self.__decoded_file(filename)
+        return self.__raw(filename).tobytes()
+
+    def __decode(self, filename: str, rawdata: memoryview) -> bytes:
         # First, figure out if this file is stored compressed or not. If it is, decompress
         # it so that we have the raw data available to us.
         decompress = self.__compressed.get(filename, False)
-        filedata = self.__files[filename]
+        filedata = rawdata.tobytes()
         if decompress:
             uncompressed_size, compressed_size = struct.unpack(">II", filedata[0:8])
             if len(filedata) == compressed_size + 8:
                 lz77 = Lz77()
-                filedata = lz77.decompress(filedata[8:])
+                outbuf = bytearray(uncompressed_size)
+                lz77.decompress_into(filedata[8:], outbuf)
+                filedata = bytes(outbuf)
             else:
                 filedata = filedata[8:] + filedata[0:8]
 
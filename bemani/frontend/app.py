@@ -52,7 +52,7 @@ def before_request() -> None:
         return
 
     g.config = config
-    g.data = Data(config)
+    g.data = Data.shared(config)
     g.sessionID = None
     g.userID = None
     try:
@@ -1,5 +1,6 @@
 import struct
-from typing import Optional, List, Dict, Any
+from functools import lru_cache, partial
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple
 from typing_extensions import Final
 
 from bemani.protocol.stream import InputStream, OutputStream
@@ -52,11 +53,8 @@ class PackedOrdering:
             size - Number of bytes to work with as an integer
             allow_expansion - Boolean describing whether to add to the end of the order when needed
         """
-        self.order: List[Optional[int]] = []
+        self.order: List[Optional[int]] = [None] * size
         self.expand = allow_expansion
-
-        for _ in range(size):
-            self.order.append(None)
         self.__orderlen = size
         self.__lastbyte = 0
         self.__lastshort = 0
@@ -85,8 +83,11 @@ class PackedOrdering:
                 self.__append_empty()
 
         # Mark buffer as used
-        for i in range(size):
-            self.order[i + offset] = size
+        if (size + offset) > self.__orderlen:
+            raise BinaryEncodingException(
+                "Ran out of data when attempting to mark data as used!"
+            )
+        self.order[offset : (offset + size)] = [size] * size
 
     def get_next_byte(self) -> Optional[int]:
         """
@@ -249,6 +250,100 @@ class PackedOrdering:
         return ordering
 
 
+class NodeNameCodec:
+    """
+    Packs and unpacks node names to and from the 6-bit-byte representation found in
+    compressed binary packets. The set of node names used by the games is small and
+    stable, so results are kept in a process-wide bounded LRU cache shared by every
+    encoder and decoder.
+    """
+
+    CACHE_SIZE: Final[int] = 8192
+
+    CHAR_LUT: Final[Dict[str, int]] = {
+        ch: i for i, ch in enumerate(Node.NODE_NAME_CHARS)
+    }
+
+    @staticmethod
+    def pack(name: str) -> bytes:
+        """
+        Pack a node name into 6-bit bytes, padded with zero bits to a byte boundary.
+
+        Parameters:
+            name - A string name which should be encoded as a node name.
+
+        Returns:
+            The packed name, not including the length byte.
+        """
+        return _pack_name(name)
+
+    @staticmethod
+    def unpack(length: int, data: bytes) -> str:
+        """
+        Unpack a node name from 6-bit bytes.
+
+        Parameters:
+            length - The number of characters in the name.
+            data - The packed name, not including the length byte.
+
+        Returns:
+            A string representing the name in ascii.
+        """
+        return _unpack_name(length, bytes(data))
+
+    @staticmethod
+    def warm(names: Iterable[str]) -> None:
+        """
+        Pre-populate the cache with a collection of node names, so that the first packets
+        seen after startup don't pay to pack and unpack them.
+
+        Parameters:
+            names - An iterable of node names.
+        """
+        for name in names:
+            if len(name) > BinaryEncoding.NAME_MAX_COMPRESSED:
+                continue
+            if any(ch not in NodeNameCodec.CHAR_LUT for ch in name):
+                continue
+            _unpack_name(len(name), _pack_name(name))
+
+    @staticmethod
+    def cache_info() -> Dict[str, Any]:
+        """
+        Return hit and miss statistics for the pack and unpack caches.
+        """
+        return {
+            "pack": _pack_name.cache_info()._asdict(),
+            "unpack": _unpack_name.cache_info()._asdict(),
+        }
+
+
+@lru_cache(maxsize=NodeNameCodec.CACHE_SIZE)
+def _pack_name(name: str) -> bytes:
+    lut = NodeNameCodec.CHAR_LUT
+    bits = 0
+    for ch in name:
+        bits = (bits << 6) | lut[ch]
+
+    # Pad out the rest with zeros to a byte boundary.
+    length = ((len(name) * 6) + 7) // 8
+    bits <<= (length * 8) - (len(name) * 6)
+    return bits.to_bytes(length, "big")
+
+
+@lru_cache(maxsize=NodeNameCodec.CACHE_SIZE)
+def _unpack_name(length: int, data: bytes) -> str:
+    bits = int.from_bytes(data, "big")
+    total = len(data) * 8
+    chars = Node.NODE_NAME_CHARS
+
+    # Convert as many whole 6-bit bytes as the data holds, and then chop to length.
+    count = total // 6
+    bits >>= total - (count * 6)
+    ret = "".join(chars[(bits >> ((count - 1 - i) * 6)) & 0x3F] for i in range(count))
+    return ret[:length]
+
+
 class BinaryDecoder:
     """
     A class capable of taking a binary blob and decoding it to a Node tree.
@@ -314,28 +409,17 @@ class BinaryDecoder:
         if length > BinaryEncoding.NAME_MAX_COMPRESSED:
             raise BinaryEncodingException("Node name length over compressed limit")
 
-        binary_length = int(((length * 6) + 7) / 8)
-
-        def int_to_bin(integer: int) -> str:
-            val = bin(integer)[2:]
-            while len(val) < 8:
-                val = "0" + val
-
-            return val
+        if length == 0:
+            # read_blob() treats an empty read as a failure, so don't ask it for one.
+            return ""
 
-        data = ""
-        for _ in range(binary_length):
-            next_byte = self.stream.read_int()
-            if next_byte is None:
-                raise BinaryEncodingException(
-                    "Ran out of data when attempting to read node name!"
-                )
-            data = data + int_to_bin(next_byte)
-        data_str = [data[i : (i + 6)] for i in range(0, len(data), 6)]
-        data_int = [int(val, 2) for val in data_str]
-        ret = "".join([Node.NODE_NAME_CHARS[val] for val in data_int])
-        ret = ret[:length]
-        return ret
+        binary_length = int(((length * 6) + 7) / 8)
+        data = self.stream.read_blob(binary_length)
+        if data is None:
+            raise BinaryEncodingException(
+                "Ran out of data when attempting to read node name!"
+            )
+        return NodeNameCodec.unpack(length, data)
 
     def __read_node(self, node_type: int) -> Node:
         """
@@ -365,11 +449,57 @@ class BinaryDecoder:
                 child = self.__read_node(child_type)
                 node.add_child(child)
 
-    def get_tree(self) -> Node:
+    def __decode_scalar(
+        self, body: bytes, loc: int, decode_value: str, dtype: str
+    ) -> Any:
+        """
+        Decode a single scalar value or string out of the body.
+
+        Parameters:
+            body - The binary body of the packet.
+            loc - The location of the value in the body.
+            decode_value - The struct format string to decode the value with.
+            dtype - The data type name of the value.
+
+        Returns:
+            The decoded value.
+        """
+        val = struct.unpack_from(decode_value, body, loc)[0]
+
+        if dtype == "str":
+            # Need to convert this from encoding to standard string.
+            # Also, need to lob off the trailing null.
+            try:
+                val = val[:-1].decode(self.encoding, "replace")
+            except UnicodeDecodeError:
+                # Nothing we can do here
+                pass
+
+        return val
+
+    def __decode_list(self, body: bytes, loc: int, decode_value: str) -> List[Any]:
+        """
+        Decode an array or composite value out of the body.
+
+        Parameters:
+            body - The binary body of the packet.
+            loc - The location of the value in the body.
+            decode_value - The struct format string to decode the values with.
+
+        Returns:
+            A list of decoded values.
+        """
+        return list(struct.unpack_from(decode_value, body, loc))
+
+    def get_tree(self, lazy: bool = False) -> Node:
         """
         Parse the header and body such that we can return a Node tree
         representing the data passed to us.
 
+        Parameters:
+            lazy - If True, node values are located in the body but not decoded until
+                   they are first accessed. Attributes are always decoded up front.
+
         Returns:
             Node object
         """
@@ -433,6 +563,7 @@ class BinaryDecoder:
                 if composite and array:
                     raise Exception("Logic error, no support for composite arrays!")
 
+                loader: Callable[[], Any]
                 if not array:
                     # Scalar value
                     alignment = value["alignment"]
@@ -454,39 +585,29 @@ class BinaryDecoder:
                         ordering.mark_used(size + 4, loc, round_to=4)
                         loc = loc + 4
 
-                        decode_data = body[loc : (loc + size)]
                         decode_value = f">{size}{enc}"
                     else:
                         # The size is built-in
                         ordering.mark_used(size, loc)
 
-                        decode_data = body[loc : (loc + size)]
                         decode_value = f">{enc}"
 
                     if composite:
-                        val_list = list(struct.unpack(decode_value, decode_data))
                         if value["type"] == "attribute":
                             raise Exception(
                                 "Logic error, shouldn't have composite attribute type!"
                             )
-                        node.set_value(val_list)
+                        loader = partial(self.__decode_list, body, loc, decode_value)
+                    elif value["type"] == "attribute":
+                        node.set_attribute(
+                            value["name"],
+                            self.__decode_scalar(body, loc, decode_value, dtype),
+                        )
                         continue
-
-                    val = struct.unpack(decode_value, decode_data)[0]
-
-                    if dtype == "str":
-                        # Need to convert this from encoding to standard string.
-                        # Also, need to lob off the trailing null.
-                        try:
-                            val = val[:-1].decode(self.encoding, "replace")
-                        except UnicodeDecodeError:
-                            # Nothing we can do here
-                            pass
-
-                    if value["type"] == "attribute":
-                        node.set_attribute(value["name"], val)
                     else:
-                        node.set_value(val)
+                        loader = partial(
+                            self.__decode_scalar, body, loc, decode_value, dtype
+                        )
                 else:
                     # Array value
                     loc = ordering.get_next_int()
@@ -501,14 +622,41 @@ class BinaryDecoder:
 
                     ordering.mark_used(length + 4, loc, round_to=4)
                     loc = loc + 4
-                    decode_data = body[loc : (loc + length)]
                     decode_value = f">{enc * elems}"
 
-                    val = struct.unpack(decode_value, decode_data)
-                    node.set_value([v for v in val])
+                    loader = partial(self.__decode_list, body, loc, decode_value)
+
+                if lazy:
+                    node.set_value_loader(loader)
+                else:
+                    node.set_value(loader())
 
         return root
 
+    def iterparse(self) -> Generator[Tuple[str, Node], None, None]:
+        """
+        Parse the header and lay out the body, and then walk the resulting tree in
+        document order, yielding events. Node values are not decoded until they are
+        accessed, so a consumer that only looks at a handful of nodes will only pay
+        to decode those values.
+
+        Returns:
+            A generator of (event, node) tuples. The event is one of 'start' when a
+            node is entered, 'value' for nodes that carry a value, and 'end' after all
+            of a node's children have been walked.
+        """
+        root = self.get_tree(lazy=True)
+
+        def walk(node: Node) -> Generator[Tuple[str, Node], None, None]:
+            yield ("start", node)
+            if node.data_length != 0:
+                yield ("value", node)
+            for child in node.children:
+                yield from walk(child)
+            yield ("end", node)
+
+        yield from walk(root)
+
 
 class BinaryEncoder:
     """
@@ -532,11 +680,6 @@ class BinaryEncoder:
         self.executed = False
         self.compressed = compressed
 
-        # Generate the characer LUT
-        self.char_lut: Dict[str, int] = {}
-        for i in range(len(Node.NODE_NAME_CHARS)):
-            self.char_lut[Node.NODE_NAME_CHARS[i]] = i
-
     def __write_node_name(self, name: str) -> None:
         """
         Given the current position in the stream, write the 6-bit-byte packed string name of the
@@ -563,31 +706,9 @@ class BinaryEncoder:
             self.stream.write_blob(encoded)
             return
 
-        def char_to_bin(ch: str) -> str:
-            index = self.char_lut[ch]
-            val = bin(index)[2:]
-
-            while len(val) < 6:
-                val = "0" + val
-
-            return val[-6:]
-
-        # Convert to six bit bytes
-        length = len(name)
-        data = "".join([char_to_bin(c) for c in name])
-
-        # Pad out the rest with zeros
-        while (len(data) & 0x7) != 0:
-            data = data + "0"
-
-        # Convert to 8-bit bytes
-        data_chunks = [data[i : (i + 8)] for i in range(0, len(data), 8)]
-        data_int = [int(val, 2) for val in data_chunks]
-
         # Output
-        self.stream.write_int(length)
-        for val in data_int:
-            self.stream.write_int(val)
+        self.stream.write_int(len(name))
+        self.stream.write_blob(NodeNameCodec.pack(name))
 
     def __write_node(self, node: Node) -> None:
         """
@@ -845,18 +966,16 @@ class BinaryEncoding:
             return "shift-jis"
         return enc
 
-    def decode(self, data: bytes, skip_on_exceptions: bool = False) -> Optional[Node]:
+    def __get_decoder(self, data: bytes) -> Optional[BinaryDecoder]:
         """
-        Given a data blob, decode the data with the current encoding. Will
-        also set the class property value 'encoding' to the encoding used
-        on the last decode.
+        Given a data blob, parse the magic and return a decoder for the rest of the
+        data. Will also set the class property value 'encoding' to the encoding used.
 
         Parameters:
             data - Binary blob representing the data to decode
 
         Returns:
-            Node object representing the root of the decoded tree, or None
-            if we couldn't decode the object for some reason.
+            BinaryDecoder object, or None if this isn't a binary packet.
         """
         try:
             data_magic, contents, encoding_raw, encoding_swapped = struct.unpack(
@@ -882,22 +1001,58 @@ class BinaryEncoding:
             return None
 
         encoding = BinaryEncoding.ENCODINGS.get(encoding_raw)
+        if encoding is None:
+            return None
 
-        if encoding is not None:
-            self.encoding = encoding
-            try:
-                decoder = BinaryDecoder(
-                    data[4:], self.__sanitize_encoding(encoding), self.compressed
-                )
-                return decoder.get_tree()
-            except BinaryEncodingException:
-                if skip_on_exceptions:
-                    return None
-                else:
-                    raise
-        else:
+        self.encoding = encoding
+        return BinaryDecoder(
+            data[4:], self.__sanitize_encoding(encoding), self.compressed
+        )
+
+    def decode(
+        self, data: bytes, skip_on_exceptions: bool = False, lazy: bool = False
+    ) -> Optional[Node]:
+        """
+        Given a data blob, decode the data with the current encoding. Will
+        also set the class property value 'encoding' to the encoding used
+        on the last decode.
+
+        Parameters:
+            data - Binary blob representing the data to decode
+            lazy - If True, node values are only decoded when first accessed.
+
+        Returns:
+            Node object representing the root of the decoded tree, or None
+            if we couldn't decode the object for some reason.
+        """
+        decoder = self.__get_decoder(data)
+        if decoder is None:
             return None
 
+        try:
+            return decoder.get_tree(lazy=lazy)
+        except BinaryEncodingException:
+            if skip_on_exceptions:
+                return None
+            else:
+                raise
+
+    def iterparse(self, data: bytes) -> Generator[Tuple[str, Node], None, None]:
+        """
+        Given a data blob, yield (event, node) tuples while walking the decoded tree.
+        See BinaryDecoder.iterparse() for details on the events generated.
+
+        Parameters:
+            data - Binary blob representing the data to decode
+
+        Returns:
+            A generator of (event, node) tuples.
+        """
+        decoder = self.__get_decoder(data)
+        if decoder is None:
+            raise BinaryEncodingException("Data is not a binary packet!")
+        yield from decoder.iterparse()
+
     def encode(
         self, tree: Node, encoding: Optional[str] = None, compressed: bool = True
     ) -> bytes:
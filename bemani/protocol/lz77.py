@@ -1,7 +1,7 @@
 import ctypes
 import os
 from collections import defaultdict
-from typing import Generator, List, MutableMapping, Optional, Set, Tuple
+from typing import Dict, Generator, List, MutableMapping, Optional, Set, Tuple
 from typing_extensions import Final
 
 from .. import package_root
@@ -72,7 +72,7 @@ class Lz77Decompress:
         self.pending_copy_pos: int = 0
         self.pending_copy_max: int = 0
         self.ringlength: int = backref or self.RING_LENGTH
-        self.ring: bytes = b"\x00" * self.ringlength
+        self.ring: bytearray = bytearray(self.ringlength)
 
     def _ring_read(self, copy_pos: int, copy_len: int) -> Generator[bytes, None, None]:
         """
@@ -89,7 +89,7 @@ class Lz77Decompress:
                 # Copy the whole thing out, we have enough space to do so
                 amount = copy_len
 
-            ret = self.ring[copy_pos : (copy_pos + amount)]
+            ret = bytes(self.ring[copy_pos : (copy_pos + amount)])
             self._ring_write(ret)
             yield ret
 
@@ -110,14 +110,113 @@ class Lz77Decompress:
             if amount > (self.ringlength - self.write_pos):
                 amount = self.ringlength - self.write_pos
 
-            self.ring = (
-                self.ring[: self.write_pos]
-                + bytedata[:amount]
-                + self.ring[(self.write_pos + amount) :]
-            )
+            self.ring[self.write_pos : (self.write_pos + amount)] = bytedata[:amount]
             bytedata = bytedata[amount:]
             self.write_pos = (self.write_pos + amount) % self.ringlength
 
+    def decompress_into(self, buffer: bytearray) -> int:
+        """
+        Decompress the entire stream directly into a caller-provided buffer. Since
+        the whole output is kept, backrefs are copied straight out of the output
+        buffer instead of going through the ring. If the buffer was preallocated
+        to the right size (for instance, when a file format stores the uncompressed
+        length), no reallocation happens at all. Otherwise the buffer is grown as
+        needed. In all cases, the buffer is truncated to the decompressed length.
+        This does not update the ring and cannot be mixed with decompress_bytes().
+
+        Parameters:
+            buffer - A bytearray to write the decompressed data into.
+
+        Returns:
+            The number of bytes written to the buffer.
+        """
+        data = memoryview(self.data)
+        datalen = len(data)
+        ringlength = self.ringlength
+        read_pos = self.read_pos
+        write_pos = 0
+
+        while True:
+            if read_pos >= datalen:
+                # We have nothing left to read.
+                break
+
+            flags = data[read_pos]
+            read_pos += 1
+            flagpos = 0
+
+            while flagpos < 8:
+                if (flags >> flagpos) & 1 == self.FLAG_COPY:
+                    # Figure out how many copies are queued up so we can pull them at once
+                    amount = 1
+                    flagpos += 1
+                    while flagpos < 8 and (flags >> flagpos) & 1 == self.FLAG_COPY:
+                        amount += 1
+                        flagpos += 1
+
+                    # Grab chunk right out of the data source. Slice assignment grows
+                    # the buffer for us if we run past the end.
+                    if read_pos + amount > datalen:
+                        amount = datalen - read_pos
+                        if amount == 0:
+                            break
+                    buffer[write_pos : (write_pos + amount)] = data[
+                        read_pos : (read_pos + amount)
+                    ]
+                    read_pos += amount
+                    write_pos += amount
+                    continue
+
+                # Backref copy
+                flagpos += 1
+                if read_pos >= datalen:
+                    self.eof = True
+                    break
+                if read_pos + 1 >= datalen:
+                    raise LzException("Unexpected EOF mid-backref")
+
+                hi = data[read_pos]
+                lo = data[read_pos + 1]
+                read_pos += 2
+
+                copy_pos = (hi << 4) | (lo >> 4)
+                if copy_pos == 0:
+                    # This is the end of the stream.
+                    self.eof = True
+                    break
+                copy_len = (lo & 0xF) + 3
+
+                # Backrefs further back than the ring can hold wrap around it.
+                distance = copy_pos % ringlength or ringlength
+                source = write_pos - distance
+                while copy_len > 0:
+                    if source < 0:
+                        # Anything before the start of the stream reads as zeros, since
+                        # that is what the ring is initialized to.
+                        amount = min(copy_len, -source)
+                        buffer[write_pos : (write_pos + amount)] = bytes(amount)
+                    else:
+                        # Overlapping backrefs can only copy what has been written so far,
+                        # so copy at most the distance at once and loop for the rest.
+                        amount = min(copy_len, distance)
+                        buffer[write_pos : (write_pos + amount)] = buffer[
+                            source : (source + amount)
+                        ]
+                    write_pos += amount
+                    source += amount
+                    copy_len -= amount
+
+            if self.eof:
+                break
+
+        self.read_pos = read_pos
+        self.left = datalen - read_pos
+        self.eof = True
+
+        # Trim any preallocated space that we didn't need.
+        del buffer[write_pos:]
+        return write_pos
+
     def decompress_bytes(self) -> Generator[bytes, None, None]:
         """
         Yield the next byte from the decompressed output. If we are
@@ -451,16 +550,224 @@ class Lz77Compress:
                 yield bytes([flags]) + b"".join(data)
 
 
+class Lz77ChainCompress:
+    """
+    A class that can compress arbitrary binary data using the Lz77 protocol, using
+    a hash-chain match finder in the style of zlib. Every 3-byte prefix seen so far
+    is linked into a chain of previous positions with the same prefix, and only the
+    most recent max_chain entries of a chain are examined when looking for a backref.
+    When lazy matching is enabled, a match is only taken if the match starting at
+    the next byte isn't longer. Together these bound the amount of work done per
+    byte, trading compression ratio for speed compared to Lz77Compress which always
+    finds the longest possible backref.
+    """
+
+    RING_LENGTH: Final[int] = 0x1000
+
+    MIN_BACKREF: Final[int] = 3
+    MAX_BACKREF: Final[int] = 18
+
+    FLAG_COPY: Final[int] = 1
+    FLAG_BACKREF: Final[int] = 0
+
+    def __init__(
+        self,
+        data: bytes,
+        backref: Optional[int] = None,
+        max_chain: int = 16,
+        lazy: bool = True,
+    ) -> None:
+        """
+        Initialize the object.
+
+        Parameters:
+            data - Binary blob representing the data to be compressed.
+            max_chain - The maximum number of previous positions to examine per match.
+            lazy - Whether to defer a match when the next byte has a longer one.
+        """
+        self.data: bytes = data
+        self.ringlength: int = backref or self.RING_LENGTH
+        self.max_chain: int = max_chain
+        self.lazy: bool = lazy
+        self.head: Dict[int, int] = {}
+        self.prev: List[int] = [-1] * len(data)
+        self.inserted: int = 0
+
+    def _insert_until(self, pos: int) -> None:
+        """
+        Link every position before pos into the hash chains.
+
+        Parameters:
+            pos - The absolute position to stop inserting at.
+        """
+        data = self.data
+        head = self.head
+        prev = self.prev
+        end = min(pos, len(data) - 2)
+
+        for loc in range(self.inserted, end):
+            key = (data[loc] << 16) | (data[loc + 1] << 8) | data[loc + 2]
+            prev[loc] = head.get(key, -1)
+            head[key] = loc
+
+        if end > self.inserted:
+            self.inserted = end
+
+    def _find_match(self, pos: int) -> Tuple[int, int]:
+        """
+        Find the longest backref for the data starting at pos, examining at most
+        max_chain candidates.
+
+        Parameters:
+            pos - The absolute position of the data to find a backref for.
+
+        Returns:
+            A tuple of the backref length and backref distance. The length is 0 if
+            no usable backref was found.
+        """
+        data = self.data
+        maxlen = min(self.MAX_BACKREF, len(data) - pos)
+        if self.max_chain <= 0 or maxlen < self.MIN_BACKREF or pos < self.MIN_BACKREF:
+            # We either don't have enough data written to backref, or we
+            # don't have enough data in the stream that could be made into
+            # a backref.
+            return (0, 0)
+
+        self._insert_until(pos)
+        key = (data[pos] << 16) | (data[pos + 1] << 8) | data[pos + 2]
+        candidate = self.head.get(key, -1)
+        earliest = max(0, pos - (self.ringlength - 1))
+        chain = self.max_chain
+        best_length = 0
+        best_distance = 0
+
+        while candidate >= earliest and chain > 0:
+            # Only bother comparing if this candidate could beat the best one.
+            if data[candidate + best_length] == data[pos + best_length]:
+                length = 0
+                while (
+                    length < maxlen and data[candidate + length] == data[pos + length]
+                ):
+                    length += 1
+
+                if length > best_length:
+                    best_length = length
+                    best_distance = pos - candidate
+                    if length == maxlen:
+                        # Can't do any better than this.
+                        break
+
+            candidate = self.prev[candidate]
+            chain -= 1
+
+        if best_length < self.MIN_BACKREF:
+            return (0, 0)
+        return (best_length, best_distance)
+
+    def compress_bytes(self) -> Generator[bytes, None, None]:
+        """
+        Given the current stream, go through and assemble the next flag byte
+        followed by the next chunk of compressed data.
+        """
+        data = self.data
+        datalen = len(data)
+        pos = 0
+        deferred: Optional[Tuple[int, int]] = None
+
+        if self.max_chain <= 0:
+            # We aren't looking for backrefs at all, so everything is a copy. Output
+            # full chunks of 8 copies and then a final chunk with the end of stream.
+            while datalen - pos >= 8:
+                yield b"\xFF" + data[pos : (pos + 8)]
+                pos += 8
+
+            flags = (1 << (datalen - pos)) - 1
+            yield bytes([flags]) + data[pos:] + b"\x00\x00"
+            return
+
+        while True:
+            # Need to assemble and return the next chunk, which is a flag
+            # byte and then 8 instructions.
+            flags = 0x0
+            chunk = bytearray()
+
+            for flagpos in range(8):
+                if pos >= datalen:
+                    # Output the end of stream marker and we're done.
+                    flags |= self.FLAG_BACKREF << flagpos
+                    chunk += b"\x00\x00"
+                    yield bytes([flags]) + bytes(chunk)
+                    return
+
+                if deferred is not None:
+                    length, distance = deferred
+                    deferred = None
+                else:
+                    length, distance = self._find_match(pos)
+
+                if self.lazy and 0 < length < self.MAX_BACKREF:
+                    # See if we would do better by outputting this byte as a copy
+                    # and taking the backref starting at the next byte instead.
+                    following = self._find_match(pos + 1)
+                    if following[0] > length:
+                        length = 0
+                        deferred = following
+
+                if length == 0:
+                    flags |= self.FLAG_COPY << flagpos
+                    chunk.append(data[pos])
+                    pos += 1
+                else:
+                    flags |= self.FLAG_BACKREF << flagpos
+                    chunk.append((distance >> 4) & 0xFF)
+                    chunk.append((length - 3) & 0xF | ((distance & 0xF) << 4))
+                    pos += length
+
+            yield bytes([flags]) + bytes(chunk)
+
+
 class Lz77:
     """
     A wrapper class encapsulating Lz77 encoding and decoding.
     """
 
-    def __init__(self, backref: Optional[int] = None) -> None:
+    # Level 0 stores everything as copies, levels 1-8 use the hash-chain match finder
+    # with increasing chain depth, and level 9 finds the longest possible backref.
+    LEVEL_STORE: Final[int] = 0
+    LEVEL_BEST: Final[int] = 9
+
+    CHAIN_LEVELS: Final[Dict[int, Tuple[int, bool]]] = {
+        0: (0, False),
+        1: (1, False),
+        2: (2, False),
+        3: (4, False),
+        4: (8, True),
+        5: (16, True),
+        6: (32, True),
+        7: (64, True),
+        8: (256, True),
+    }
+
+    def __init__(
+        self, backref: Optional[int] = None, level: Optional[int] = None
+    ) -> None:
         """
         Initialize the object.
+
+        Parameters:
+            backref - Optional ring length to use instead of the default.
+            level - Optional compression level from 0 (fastest, no compression) to 9
+                    (slowest, best compression). Defaults to 9. Note that if the C++
+                    implementation is available it is faster than any python level, so
+                    it is used for every level other than 0.
         """
+        if level is None:
+            level = self.LEVEL_BEST
+        if level < self.LEVEL_STORE or level > self.LEVEL_BEST:
+            raise LzException(f"Invalid compression level {level}!")
+
         self.backref = backref
+        self.level = level
 
     def decompress(self, data: bytes) -> bytes:
         """
@@ -472,15 +779,46 @@ class Lz77:
         Returns:
             Raw binary data.
         """
+        outbuf = bytearray()
+        self.decompress_into(data, outbuf)
+        return bytes(outbuf)
+
+    def decompress_into(self, data: bytes, buffer: bytearray) -> int:
+        """
+        Given a binary blob, decompress it directly into a caller-provided buffer.
+        If the caller knows the decompressed size, preallocating the buffer to that
+        size avoids any intermediate copies or reallocations. The buffer is resized
+        to exactly the length of the decompressed data.
+
+        Parameters:
+            data - Lz77-compressed binary data
+            buffer - A bytearray to write the raw binary data into.
+
+        Returns:
+            The length of the raw binary data.
+        """
         if clib is not None:
             # Given a maximum backref length of 18, if we had a file that was
             # only backrefs of maximum size. We would get a compression of around
             # (18 * 8) / (2 * 8 + 1), or 8.47. So, allocate 9 times in the output
-            # buffer.
-            outbuf = b"\0" * (len(data) * 9)
-            result = clib.decompress(data, len(data), outbuf, len(outbuf))
+            # buffer unless the caller has told us the exact size.
+            worst_case = len(data) * 9
+            if len(buffer) < ((len(data) * 8) // 9) + 1:
+                buffer.extend(bytes(worst_case - len(buffer)))
+            while True:
+                outbuf = (ctypes.c_char * len(buffer)).from_buffer(buffer)
+                result = clib.decompress(data, len(data), outbuf, len(buffer))
+                del outbuf
+
+                if result == -3 and len(buffer) < worst_case:
+                    # The caller's size hint was too small, fall back to the worst case.
+                    buffer.extend(bytes(worst_case - len(buffer)))
+                    continue
+                break
+
             if result >= 0:
-                return outbuf[:result]
+                del buffer[result:]
+                return int(result)
             elif result == -1:
                 raise LzException("Not enough room in output buffer!")
             elif result == -2:
@@ -491,7 +829,7 @@ class Lz77:
                 raise LzException("Unknown exception in C++ code!")
         else:
             lz = Lz77Decompress(data, backref=self.backref)
-            return b"".join(lz.decompress_bytes())
+            return lz.decompress_into(buffer)
 
     def compress(self, data: bytes) -> bytes:
         """
@@ -503,7 +841,7 @@ class Lz77:
         Returns:
             L7zz-compressed binary data.
         """
-        if clib is not None:
+        if clib is not None and self.level != self.LEVEL_STORE:
             # Given a worst case scenario where we end up copying every byte to
             # the output, compression would actually inflate the file by 9/8 size.
             # Leave enough room for a trailing EOF reference.
@@ -519,6 +857,12 @@ class Lz77:
                 raise LzException("Not enough room to write output byte!")
             else:
                 raise LzException("Unknown exception in C++ code!")
-        else:
+        elif self.level == self.LEVEL_BEST:
             lz = Lz77Compress(data, backref=self.backref)
             return b"".join(lz.compress_bytes())
+        else:
+            max_chain, lazy = self.CHAIN_LEVELS[self.level]
+            chainlz = Lz77ChainCompress(
+                data, backref=self.backref, max_chain=max_chain, lazy=lazy
+            )
+            return b"".join(chainlz.compress_bytes())
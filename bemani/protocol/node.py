@@ -1,6 +1,6 @@
-import copy
+import array
 import struct
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional
 from typing_extensions import Final
 
 # Hack to get around mypy's lack of scoping on types.
@@ -20,8 +20,23 @@ class Node:
     string attributes, and either a value or zero or more children. Note that it is possible and
     supported for a node to not have a value or children. This also includes a decent amount of
     constructor helper classmethods to make constructing a tree from source code easier.
+
+    Since a single response can contain many thousands of nodes, nodes are kept compact. Attribute
+    and children containers are only allocated when first used, and numeric array values are
+    stored in typed arrays instead of lists of python objects.
     """
 
+    __slots__ = (
+        "__name",
+        "__array",
+        "__translated_type",
+        "__type",
+        "__attrs",
+        "__value",
+        "__loader",
+        "__children",
+    )
+
     NODE_NAME_CHARS: Final[
         str
     ] = "0123456789:ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
@@ -355,6 +370,21 @@ class Node:
             "composite": False,
         },
     }
+    # Typed array storage codes for each struct encoding character of a numeric node type.
+    # Floats are stored as doubles so that values round-trip exactly as they were set.
+    ARRAY_TYPECODES: Final[Dict[str, str]] = {
+        "b": "b",
+        "B": "B",
+        "h": "h",
+        "H": "H",
+        "i": "i",
+        "I": "I",
+        "q": "q",
+        "Q": "Q",
+        "f": "d",
+        "d": "d",
+    }
+
     ARRAY_BIT: Final[int] = 0x40
     ATTR_TYPE: Final[int] = 0x2E
     END_OF_NODE: Final[int] = 0xFE
@@ -565,9 +595,10 @@ class Node:
         self.__array = False
         self.__translated_type: Optional[Dict[str, Any]] = None
         self.__type: Optional[int] = None
-        self.__attrs: Dict[str, str] = {}
+        self.__attrs: Optional[Dict[str, str]] = None
         self.__value: Any = None
-        self.__children: List[Node] = []
+        self.__loader: Optional[Callable[[], Any]] = None
+        self.__children: Optional[List[Node]] = None
 
         if name is not None:
             self.set_name(name)
@@ -694,6 +725,8 @@ class Node:
             val - The string value to set the attribute value to. Defaults to empty string if
                   not provided.
         """
+        if self.__attrs is None:
+            self.__attrs = {}
         self.__attrs[attr] = val
 
     def attribute(self, attr: str, default: Optional[str] = None) -> Optional[str]:
@@ -706,6 +739,8 @@ class Node:
         Returns:
             The attribute value as a string.
         """
+        if self.__attrs is None:
+            return default
         return self.__attrs.get(attr, default)
 
     def add_child(self, child: "Node") -> None:
@@ -718,6 +753,8 @@ class Node:
         if not isinstance(child, Node):
             raise NodeException("Invalid child")
 
+        if self.__children is None:
+            self.__children = []
         self.__children.append(child)
 
     def child(self, name: str) -> Optional["Node"]:
@@ -732,6 +769,9 @@ class Node:
         Returns:
             A Node if a child was found by name, or None if not.
         """
+        if self.__children is None:
+            return None
+
         tree = name.split("/", 1)
         for child in self.__children:
             if child.name == tree[0]:
@@ -765,21 +805,25 @@ class Node:
     @property
     def children(self) -> List["Node"]:
         """
-        Wrapper for accessing children.
+        Wrapper for accessing children. Use add_child() to add children to a node.
 
         Returns:
             A list of Node instances which are children of this Node.
         """
+        if self.__children is None:
+            return []
         return self.__children
 
     @property
     def attributes(self) -> Dict[str, str]:
         """
-        Wrapper for accessing attributes.
+        Wrapper for accessing attributes. Use set_attribute() to add attributes to a node.
 
         Returns:
             A dictionary keyed by attribute name whose values are strings.
         """
+        if self.__attrs is None:
+            return {}
         return self.__attrs
 
     @property
@@ -807,6 +851,26 @@ class Node:
             )
         return self.__translated_type["composite"]
 
+    def set_value_loader(self, loader: Callable[[], Any]) -> None:
+        """
+        Sets a callable which produces the value of this node. The callable is invoked the first
+        time the value is needed and its result is passed to set_value(). This allows decoders to
+        skip decoding values that are never looked at.
+
+        Parameters:
+            loader - A callable taking no arguments and returning a mixed value for this node.
+        """
+        self.__loader = loader
+
+    def __load(self) -> None:
+        """
+        Resolve a pending value loader, if there is one.
+        """
+        if self.__loader is not None:
+            loader = self.__loader
+            self.__loader = None
+            self.set_value(loader())
+
     def set_value(self, val: Any) -> None:
         """
         Sets the value of this node. If this node is an array type (see Node.array boolean), expects an array. If
@@ -815,7 +879,8 @@ class Node:
         Paramters:
             val - A mixed value to set the node to.
         """
-        is_array = isinstance(val, (list, tuple))
+        self.__loader = None
+        is_array = isinstance(val, (list, tuple, array.array))
 
         if self.__translated_type is None:
             raise Exception("Logic error, tried to set value before setting type!")
@@ -835,18 +900,14 @@ class Node:
                 f'Input {"is" if is_array else "is not"} array, expected {"array" if self.__array else "scalar"}'
             )
 
-        def val_to_str(val: Any) -> Union[str, bytes]:
+        def to_storage(val: Any) -> Any:
             if translated_type["name"] == "bool":
                 # Support user-built boolean types
-                if val is True:
-                    return "true"
-                if val is False:
-                    return "false"
+                if val is True or val is False:
+                    return val
 
                 # Support construction from binary
-                return "true" if val != 0 else "false"
-            elif translated_type["name"] == "float":
-                return str(val)
+                return val != 0
             elif translated_type["name"] == "ip4":
                 try:
                     # Support construction from binary
@@ -860,15 +921,27 @@ class Node:
 
                     raise NodeException(f"Invalid value {val} for IP4 type")
             elif translated_type["int"]:
-                return str(val)
+                return val if type(val) is int else int(str(val))
             else:
-                # This could return either a string or bytes.
+                # This could be a float, string or bytes.
                 return val
 
         if is_array or translated_type["composite"]:
-            self.__value = [val_to_str(v) for v in val]
+            typecode = None
+            if translated_type["name"] != "bool":
+                typecode = Node.ARRAY_TYPECODES.get(translated_type["enc"][:1])
+
+            if typecode is not None:
+                try:
+                    self.__value = array.array(typecode, val)
+                    return
+                except (TypeError, OverflowError):
+                    # Values that aren't already numbers or don't fit in the type are kept
+                    # as a list, so that they are reported when encoding just like before.
+                    pass
+            self.__value = [to_storage(v) for v in val]
         else:
-            self.__value = val_to_str(val)
+            self.__value = to_storage(val)
 
     @property
     def value(self) -> Any:
@@ -881,27 +954,28 @@ class Node:
         if self.__translated_type is None:
             raise Exception("Logic error, tried to get value before setting type!")
         translated_type: Dict[str, Any] = self.__translated_type
+        self.__load()
 
-        def str_to_val(string: Union[str, bytes]) -> Any:
-            if translated_type["name"] == "bool":
-                return string == "true"
-            elif translated_type["name"] == "float":
-                return float(string)
+        def from_storage(val: Any) -> Any:
+            if translated_type["name"] == "float":
+                return float(val)
             elif translated_type["name"] == "ip4":
-                if not isinstance(string, str):
+                if not isinstance(val, str):
                     raise Exception("Logic error, expected a string!")
-                ip = [int(tup) for tup in string.split(".")]
+                ip = [int(tup) for tup in val.split(".")]
                 return struct.pack("BBBB", ip[0], ip[1], ip[2], ip[3])
-            elif translated_type["int"]:
-                return int(string)
             else:
-                # At this point, we could be a string or bytes.
-                return string
+                # At this point, we could be a bool, int, string or bytes.
+                return val
 
-        if self.__array or translated_type["composite"]:
-            return [str_to_val(v) for v in self.__value]
+        if self.__value is None:
+            return None
+        elif isinstance(self.__value, array.array):
+            return self.__value.tolist()
+        elif self.__array or translated_type["composite"]:
+            return [from_storage(v) for v in self.__value]
         else:
-            return str_to_val(self.__value)
+            return from_storage(self.__value)
 
     def __to_xml(self, depth: int) -> str:
         """
@@ -919,8 +993,9 @@ class Node:
                 "Logic error, tried to get XML representation before setting type!"
             )
         translated_type: Dict[str, Any] = self.__translated_type
+        self.__load()
 
-        attrs_dict = copy.deepcopy(self.__attrs)
+        attrs_dict = dict(self.__attrs or {})
         order = sorted(attrs_dict.keys())
         if self.data_length != 0:
             # Represent type and length
@@ -955,12 +1030,17 @@ class Node:
         else:
             attrs = ""
 
+        def val_to_str(val: Any) -> str:
+            if translated_type["name"] == "bool":
+                return "true" if val else "false"
+            return str(val)
+
         def get_val() -> str:
             if self.__array or translated_type["composite"]:
                 if self.__value is None:
                     vals = ""
                 else:
-                    vals = " ".join([val for val in self.__value])
+                    vals = " ".join([val_to_str(val) for val in self.__value])
             elif translated_type["name"] == "str":
                 vals = escape(self.__value)
             elif translated_type["name"] == "bin":
@@ -973,7 +1053,7 @@ class Node:
 
                 vals = "".join([bin_to_hex(v) for v in self.__value])
             else:
-                vals = str(self.__value)
+                vals = val_to_str(self.__value)
             return vals
 
         if self.__children:
@@ -1021,6 +1101,9 @@ class Node:
             return False
 
         try:
+            self.__load()
+            other.__load()
+
             if self.__name != other.__name:
                 return False
             if self.__array != other.__array:
@@ -1028,7 +1111,7 @@ class Node:
             if self.__type != other.__type:
                 return False
 
-            if not self.__array:
+            if not isinstance(self.__value, (list, array.array)):
                 if self.__value != other.__value:
                     return False
             else:
@@ -1039,18 +1122,16 @@ class Node:
                     if self.__value[i] != other.__value[i]:
                         return False
 
-            for attr in self.__attrs:
-                if other.attribute(attr) != self.attribute(attr):
-                    return False
-            for attr in other.__attrs:
-                if self.attribute(attr) != other.attribute(attr):
-                    return False
+            if self.attributes != other.attributes:
+                return False
 
-            if len(self.__children) != len(other.__children):
+            children = self.children
+            other_children = other.children
+            if len(children) != len(other_children):
                 return False
 
-            for i in range(len(self.__children)):
-                if self.__children[i] != other.__children[i]:
+            for i in range(len(children)):
+                if children[i] != other_children[i]:
                     return False
 
             return True
@@ -1,9 +1,12 @@
 import binascii
 import hashlib
-from typing import Optional
+import time
+from functools import lru_cache
+from typing import Callable, Optional
 from typing_extensions import Final
 
 from bemani.protocol.lz77 import Lz77
+from bemani.protocol.rc4 import RC4
 from bemani.protocol.binary import BinaryEncoding
 from bemani.protocol.xml import XmlEncoding
 from bemani.protocol.node import Node
@@ -34,10 +37,23 @@ class EAmuseProtocol:
     UTF_8: Final[str] = "utf-8"
     ASCII: Final[str] = "ascii"
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        xml_backend: Optional[str] = None,
+        timer: Optional[Callable[[str, float], None]] = None,
+    ) -> None:
         """
         Initialize the object.
+
+        Parameters:
+            xml_backend - The XmlEncoding backend to use for XML packets. If left as None,
+                          the default backend is used.
+            timer - An optional callable which is given the name of each phase of decoding
+                    and encoding (decrypt, decompress, decode, encode, compress, encrypt)
+                    along with the number of seconds it took.
         """
+        self.xml_backend = xml_backend
+        self.timer = timer
         self.last_text_encoding: Optional[str] = None
         self.last_packet_encoding: Optional[int] = None
 
@@ -52,24 +68,7 @@ class EAmuseProtocol:
         Returns:
             binary string representing the encrypted/decrypted data
         """
-        S = list(range(256))
-        j = 0
-        out = []
-
-        # KSA Phase
-        for i in range(256):
-            j = (j + S[i] + key[i % len(key)]) & 0xFF
-            S[i], S[j] = S[j], S[i]
-
-        # PRGA Phase
-        i = j = 0
-        for char in data:
-            i = (i + 1) & 0xFF
-            j = (j + S[i]) & 0xFF
-            S[i], S[j] = S[j], S[i]
-            out.append(char ^ S[(S[i] + S[j]) & 0xFF])
-
-        return bytes(out)
+        return RC4(key).crypt(data)
 
     def __decrypt(self, encryption_key: Optional[str], data: bytes) -> bytes:
         """
@@ -84,23 +83,9 @@ class EAmuseProtocol:
         Returns:
             binary string representing transformed data
         """
-        key: Optional[bytes] = None
         if encryption_key:
-            # Key is concatenated with the shared secret above
-            version, first, second = encryption_key.split("-")
-            key = (
-                binascii.unhexlify((first + second).encode("ascii"))
-                + EAmuseProtocol.SHARED_SECRET
-            )
-
-            # Next, key is sent through MD5 to derive the real key
-            m = hashlib.md5()
-            m.update(key)
-            key = m.digest()
-
-        if key:
             # This is an encrypted old-style packet
-            return self._rc4_crypt(data, key)
+            return self._rc4_crypt(data, _derive_key(encryption_key))
 
         # No encryption
         return data
@@ -144,7 +129,9 @@ class EAmuseProtocol:
         else:
             raise EAmuseException(f"Unknown compression {compression}")
 
-    def __compress(self, compression: Optional[str], data: bytes) -> bytes:
+    def __compress(
+        self, compression: Optional[str], data: bytes, level: Optional[int] = None
+    ) -> bytes:
         """
         Given data and an optional compression scheme, compress the data.
 
@@ -153,6 +140,7 @@ class EAmuseProtocol:
                           be of the form 'l7zz' or 'none'. The python value
                           None will also be recognized as 'none'.
             data - Binary string representing data to transform.
+            level - An optional compression level, see Lz77 for values.
 
         Returns:
             binary string representing transformed data
@@ -162,24 +150,25 @@ class EAmuseProtocol:
             return data
         elif compression == "lz77":
             # This is a compressed new-style packet
-            lz = Lz77()
+            lz = Lz77(level=level)
             return lz.compress(data)
         else:
             raise EAmuseException(f"Unknown compression {compression}")
 
-    def __decode(self, data: bytes) -> Node:
+    def __decode(self, data: bytes, lazy: bool = False) -> Node:
         """
         Given data, decode the data into a Node tree.
 
         Parameters:
             data - Binary string representing data to decode.
+            lazy - Whether to defer decoding binary node values until they are accessed.
 
         Returns:
             Node tree on success or None on failure.
         """
         # Assume it's a binary page
         binary = BinaryEncoding()
-        ret = binary.decode(data, skip_on_exceptions=True)
+        ret = binary.decode(data, skip_on_exceptions=True, lazy=lazy)
 
         if ret is not None:
             # We got a result, it was binary
@@ -189,7 +178,7 @@ class EAmuseProtocol:
             return ret
 
         # Assume its XML
-        xml = XmlEncoding()
+        xml = XmlEncoding(self.xml_backend)
         ret = xml.decode(data, skip_on_exceptions=True)
 
         if ret is not None:
@@ -227,13 +216,17 @@ class EAmuseProtocol:
             return binary.encode(tree, encoding=text_encoding, compressed=False)
         elif packet_encoding == EAmuseProtocol.XML:
             # It's XML, encode it
-            xml = XmlEncoding()
+            xml = XmlEncoding(self.xml_backend)
             return xml.encode(tree, encoding=text_encoding)
         else:
             raise EAmuseException(f"Invalid packet encoding {packet_encoding}")
 
     def decode(
-        self, compression: Optional[str], encryption: Optional[str], data: bytes
+        self,
+        compression: Optional[str],
+        encryption: Optional[str],
+        data: bytes,
+        lazy: bool = False,
     ) -> Node:
         """
         Given a request with optional compression and encryption set, decrypt,
@@ -244,13 +237,27 @@ class EAmuseProtocol:
                           The python value None can also be passed in.
             encryption - A string specifying the encryption key, or None if no encryption.
             data - A binary string of data to parse.
+            lazy - If True, values in binary packets are only decoded when they are first
+                   accessed, so handlers that read a few fields don't pay for the rest.
 
         Returns:
             A Node tree structure representing the parsed request, or None on failure.
         """
+        if self.timer is not None:
+            start = time.perf_counter()
+            data = self.__decrypt(encryption, data)
+            decrypted = time.perf_counter()
+            data = self.__decompress(compression, data)
+            decompressed = time.perf_counter()
+            tree = self.__decode(data, lazy=lazy)
+            self.timer("decrypt", decrypted - start)
+            self.timer("decompress", decompressed - decrypted)
+            self.timer("decode", time.perf_counter() - decompressed)
+            return tree
+
         data = self.__decrypt(encryption, data)
         data = self.__decompress(compression, data)
-        return self.__decode(data)
+        return self.__decode(data, lazy=lazy)
 
     def encode(
         self,
@@ -259,6 +266,7 @@ class EAmuseProtocol:
         tree: Node,
         text_encoding: Optional[str] = None,
         packet_encoding: Optional[int] = None,
+        compression_level: Optional[int] = None,
     ) -> bytes:
         """
         Given a response with optional compression and encryption set, encode, compress
@@ -273,6 +281,8 @@ class EAmuseProtocol:
                             last decoded packet. See __encode for values.
             packet_encpding - A packet encoding to use. If not provided, uses the packet encoding
                               of the last decoded packet. See __encode for values.
+            compression_level - A compression level to use, trading compression ratio for speed.
+                                If not provided, uses the best compression. See Lz77 for values.
 
         Returns:
             A blob of data representing the encoded packet.
@@ -292,6 +302,44 @@ class EAmuseProtocol:
         self.last_text_encoding = None
         self.last_packet_encoding = None
 
+        if self.timer is not None:
+            start = time.perf_counter()
+            data = self.__encode(tree, text_encoding, packet_encoding)
+            encoded = time.perf_counter()
+            data = self.__compress(compression, data, compression_level)
+            compressed = time.perf_counter()
+            data = self.__encrypt(encryption, data)
+            self.timer("encode", encoded - start)
+            self.timer("compress", compressed - encoded)
+            self.timer("encrypt", time.perf_counter() - compressed)
+            return data
+
         data = self.__encode(tree, text_encoding, packet_encoding)
-        data = self.__compress(compression, data)
+        data = self.__compress(compression, data, compression_level)
         return self.__encrypt(encryption, data)
+
+
+@lru_cache(maxsize=1024)
+def _derive_key(encryption_key: str) -> bytes:
+    """
+    Given a string encryption key as returned from a HTTP request, derive the
+    real RC4 key. This is cached since the same key is used to decrypt a request
+    and then encrypt the response to it.
+
+    Parameters:
+        encryption_key - A string encryption key in the form 1-xxyyzzww-aabb.
+
+    Returns:
+        binary string representing the derived key.
+    """
+    # Key is concatenated with the shared secret above
+    version, first, second = encryption_key.split("-")
+    key = (
+        binascii.unhexlify((first + second).encode("ascii"))
+        + EAmuseProtocol.SHARED_SECRET
+    )
+
+    # Next, key is sent through MD5 to derive the real key
+    m = hashlib.md5()
+    m.update(key)
+    return m.digest()
@@ -0,0 +1,151 @@
+import ctypes
+import os
+from functools import lru_cache
+from typing import Optional
+from typing_extensions import Final
+
+from .. import package_root
+
+
+# Attempt to use the faster C++ libraries if they're available
+try:
+    clib = None
+    clib_path = os.path.join(package_root, "protocol")
+    files = [
+        f for f in os.listdir(clib_path) if f.startswith("rc4cpp") and f.endswith(".so")
+    ]
+    if len(files) > 0:
+        clib = ctypes.cdll.LoadLibrary(os.path.join(clib_path, files[0]))
+        clib.schedule.argtypes = (
+            ctypes.c_char_p,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_int,
+        )
+        clib.schedule.restype = ctypes.c_int
+        clib.crypt.argtypes = (
+            ctypes.c_char_p,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_int,
+        )
+        clib.crypt.restype = ctypes.c_int
+except Exception:
+    clib = None
+
+
+class RC4Exception(Exception):
+    """
+    An exception thrown when we encounter an error with RC4 encryption/decryption.
+    """
+
+
+class RC4:
+    """
+    A wrapper class encapsulating RC4 encryption and decryption. The key schedule
+    for a given key is computed once and cached, since a session's request and
+    response (and any retries) are all crypted with the same key. If the C++
+    implementation is built it is used for both phases, otherwise we fall back
+    to a pure python implementation.
+    """
+
+    STATE_LENGTH: Final[int] = 256
+    STATE_CACHE_SIZE: Final[int] = 1024
+
+    def __init__(self, key: bytes, native: Optional[bool] = None) -> None:
+        """
+        Initialize the object.
+
+        Parameters:
+            key - Binary string representing the key to use.
+            native - Force the C++ (True) or pure python (False) implementation. If
+                     left as None, the C++ implementation is used when available.
+        """
+        if not key:
+            raise RC4Exception("Cannot crypt with an empty key!")
+        if native is None:
+            native = clib is not None
+        if native and clib is None:
+            raise RC4Exception("C++ implementation is not available!")
+
+        self.native: bool = native
+        self.state: bytes = _schedule(key, native)
+
+    def crypt(self, data: bytes) -> bytes:
+        """
+        Given a data blob, perform RC4 encryption/decryption. Since RC4 is a
+        symmetric stream cipher, the same operation both encrypts and decrypts.
+
+        Parameters:
+            data - Binary string representing data to be encrypted/decrypted
+
+        Returns:
+            binary string representing the encrypted/decrypted data
+        """
+        if self.native and clib is not None:
+            outbuf = ctypes.create_string_buffer(len(data))
+            result = clib.crypt(
+                self.state, len(self.state), data, len(data), outbuf, len(outbuf)
+            )
+            if result >= 0:
+                return outbuf.raw[:result]
+            elif result == -1:
+                raise RC4Exception("Invalid key schedule state!")
+            elif result == -2:
+                raise RC4Exception("Not enough room in output buffer!")
+            else:
+                raise RC4Exception("Unknown exception in C++ code!")
+        else:
+            S = bytearray(self.state)
+            out = bytearray(len(data))
+            i = j = 0
+
+            # PRGA Phase
+            for pos, char in enumerate(data):
+                i = (i + 1) & 0xFF
+                si = S[i]
+                j = (j + si) & 0xFF
+                sj = S[j]
+                S[i] = sj
+                S[j] = si
+                out[pos] = char ^ S[(si + sj) & 0xFF]
+
+            return bytes(out)
+
+
+@lru_cache(maxsize=RC4.STATE_CACHE_SIZE)
+def _schedule(key: bytes, native: bool) -> bytes:
+    """
+    Given a key, run the KSA phase of RC4 and return the resulting state. This
+    is cached so that repeated crypts with the same key skip the schedule.
+
+    Parameters:
+        key - Binary string representing the key to use.
+        native - Whether to use the C++ implementation.
+
+    Returns:
+        binary string of length RC4.STATE_LENGTH representing the initial state.
+    """
+    if native and clib is not None:
+        outbuf = ctypes.create_string_buffer(RC4.STATE_LENGTH)
+        result = clib.schedule(key, len(key), outbuf, len(outbuf))
+        if result == RC4.STATE_LENGTH:
+            return outbuf.raw
+        elif result == -1:
+            raise RC4Exception("Cannot crypt with an empty key!")
+        elif result == -2:
+            raise RC4Exception("Not enough room in output buffer!")
+        else:
+            raise RC4Exception("Unknown exception in C++ code!")
+
+    S = list(range(RC4.STATE_LENGTH))
+    j = 0
+
+    # KSA Phase
+    for i in range(RC4.STATE_LENGTH):
+        j = (j + S[i] + key[i % len(key)]) & 0xFF
+        S[i], S[j] = S[j], S[i]
+
+    return bytes(S)
@@ -0,0 +1,76 @@
+#include <stdio.h>
+#include <stdint.h>
+#include <string.h>
+
+#define STATE_LEN 256
+
+extern "C"
+{
+    int schedule(uint8_t *key, unsigned int keylen, uint8_t *state, unsigned int statelen)
+    {
+        if (keylen == 0)
+        {
+            // RC4 is undefined for an empty key.
+            return -1;
+        }
+        if (statelen < STATE_LEN)
+        {
+            // We cannot write the whole state, we would corrupt memory.
+            return -2;
+        }
+
+        // KSA Phase
+        for (unsigned int i = 0; i < STATE_LEN; i++)
+        {
+            state[i] = (uint8_t)i;
+        }
+
+        uint8_t j = 0;
+        for (unsigned int i = 0; i < STATE_LEN; i++)
+        {
+            j = j + state[i] + key[i % keylen];
+
+            uint8_t tmp = state[i];
+            state[i] = state[j];
+            state[j] = tmp;
+        }
+
+        return STATE_LEN;
+    }
+
+    int crypt(uint8_t *state, unsigned int statelen, uint8_t *indata, unsigned int inlen, uint8_t *outdata, unsigned int outlen)
+    {
+        if (statelen < STATE_LEN)
+        {
+            // We were not handed a full KSA state.
+            return -1;
+        }
+        if (outlen < inlen)
+        {
+            // We cannot crypt, we will run out of room!
+            return -2;
+        }
+
+        // Work on a local copy so that the scheduled state can be reused for the
+        // next packet encrypted with the same key.
+        uint8_t S[STATE_LEN];
+        memcpy(S, state, STATE_LEN);
+
+        // PRGA Phase
+        uint8_t i = 0;
+        uint8_t j = 0;
+        for (unsigned int loc = 0; loc < inlen; loc++)
+        {
+            i = i + 1;
+            j = j + S[i];
+
+            uint8_t tmp = S[i];
+            S[i] = S[j];
+            S[j] = tmp;
+
+            outdata[loc] = indata[loc] ^ S[(uint8_t)(S[i] + S[j])];
+        }
+
+        return inlen;
+    }
+}
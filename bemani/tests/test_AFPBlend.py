@@ -0,0 +1,181 @@
+# vim: set fileencoding=utf-8
+import random
+import unittest
+
+from PIL import Image
+
+from bemani.format.afp.blend import COMPOSITE_BACKENDS
+from bemani.format.afp.blend.blend import CompositePool
+from bemani.format.afp.types import AAMode, Color, HSL, Matrix, Point
+
+
+class TestAFPBlend(unittest.TestCase):
+    def test_pool_matches_single_threaded(self) -> None:
+        rng = random.Random(0)
+        texture = Image.frombytes(
+            "RGBA", (32, 32), bytes(rng.randrange(256) for _ in range(32 * 32 * 4))
+        )
+        mask = Image.new("RGBA", (100, 100), (255, 0, 0, 255))
+        img = Image.new("RGBA", (100, 100), (10, 20, 30, 255))
+        transform = Matrix.affine(a=2.5, b=0.5, c=0.0, d=2.5, tx=5.0, ty=10.0)
+        colors = (Color(0.0, 0.0, 0.0, 0.0), Color(1.0, 1.0, 1.0, 1.0), HSL(0, 0, 0))
+
+        with CompositePool(processes=2) as pool:
+            for blend in [0, 8]:
+                expected = pool.affine_composite(
+                    img,
+                    *colors,
+                    transform,
+                    mask,
+                    blend,
+                    texture,
+                    single_threaded=True,
+                    aa_mode=AAMode.SSAA_OR_BILINEAR,
+                )
+                self.assertNotEqual(expected.tobytes(), img.tobytes())
+
+                # Run twice, so the second call draws with an already shared texture.
+                for _ in range(2):
+                    actual = pool.affine_composite(
+                        img,
+                        *colors,
+                        transform,
+                        mask,
+                        blend,
+                        texture,
+                        aa_mode=AAMode.SSAA_OR_BILINEAR,
+                    )
+                    self.assertEqual(actual.tobytes(), expected.tobytes())
+
+            expected = pool.perspective_composite(
+                img,
+                *colors,
+                transform,
+                Point(50.0, 50.0, -500.0),
+                500.0,
+                None,
+                0,
+                texture,
+                single_threaded=True,
+            )
+            actual = pool.perspective_composite(
+                img,
+                *colors,
+                transform,
+                Point(50.0, 50.0, -500.0),
+                500.0,
+                None,
+                0,
+                texture,
+            )
+            self.assertEqual(actual.tobytes(), expected.tobytes())
+
+    @unittest.skipUnless("numpy" in COMPOSITE_BACKENDS, "numpy is not installed")
+    def test_numpy_blends(self) -> None:
+        affine_composite, _ = COMPOSITE_BACKENDS["numpy"]
+        img = Image.new("RGBA", (4, 4), (100, 50, 200, 255))
+        texture = Image.new("RGBA", (1, 1), (200, 100, 50, 128))
+        transform = Matrix.affine(a=2.0, b=0.0, c=0.0, d=2.0, tx=1.0, ty=1.0)
+        colors = (Color(0.0, 0.0, 0.0, 0.0), Color(1.0, 1.0, 1.0, 1.0), HSL(0, 0, 0))
+
+        for blend, expected in [
+            (0, (150, 75, 125, 255)),
+            (3, (89, 35, 119, 255)),
+            (8, (200, 100, 225, 255)),
+            (9, (0, 0, 175, 255)),
+            (13, (157, 39, 78, 255)),
+            (256, (255, 0, 0, 255)),
+            (257, (255, 0, 0, 255)),
+        ]:
+            out = affine_composite(
+                img,
+                *colors,
+                transform,
+                None,
+                blend,
+                texture,
+                aa_mode=AAMode.NONE,
+            )
+            self.assertEqual(out.getpixel((1, 1)), expected)
+            self.assertEqual(out.getpixel((2, 2)), expected)
+            # Pixels that the texture doesn't cover are left alone.
+            self.assertEqual(out.getpixel((0, 0)), (100, 50, 200, 255))
+            self.assertEqual(out.getpixel((3, 3)), (100, 50, 200, 255))
+
+        # Masked off pixels are left alone too.
+        mask = Image.new("RGBA", (4, 4), (0, 0, 0, 0))
+        mask.putpixel((1, 1), (255, 0, 0, 255))
+        out = affine_composite(
+            img, *colors, transform, mask, 0, texture, aa_mode=AAMode.NONE
+        )
+        self.assertEqual(out.getpixel((1, 1)), (150, 75, 125, 255))
+        self.assertEqual(out.getpixel((2, 2)), (100, 50, 200, 255))
+
+    @unittest.skipUnless(
+        "numpy" in COMPOSITE_BACKENDS and "cpp" in COMPOSITE_BACKENDS,
+        "numpy or the compiled extension is not available",
+    )
+    def test_numpy_matches_native(self) -> None:
+        rng = random.Random(0)
+        texture = Image.frombytes(
+            "RGBA", (24, 24), bytes(rng.randrange(256) for _ in range(24 * 24 * 4))
+        )
+        img = Image.frombytes(
+            "RGBA", (64, 48), bytes(rng.randrange(256) for _ in range(64 * 48 * 4))
+        )
+        mask = Image.frombytes(
+            "RGBA",
+            (64, 48),
+            bytes(rng.choice([0, 255]) for _ in range(64 * 48 * 4)),
+        )
+        transform = Matrix.affine(a=1.3, b=0.4, c=-0.4, d=1.3, tx=12.0, ty=-3.0)
+        colors = (
+            Color(0.1, 0.0, -0.1, 0.0),
+            Color(1.0, 0.8, 1.0, 0.9),
+            HSL(0.25, -0.1, 0.05),
+        )
+
+        for blend in [0, 3, 8, 9, 13, 256, 257]:
+            for aa_mode in [
+                AAMode.NONE,
+                AAMode.UNSCALED_SSAA_ONLY,
+                AAMode.SSAA_ONLY,
+                AAMode.SSAA_OR_BILINEAR,
+            ]:
+                results = [
+                    affine(
+                        img,
+                        *colors,
+                        transform,
+                        mask,
+                        blend,
+                        texture,
+                        single_threaded=True,
+                        aa_mode=aa_mode,
+                    ).tobytes()
+                    for (affine, _) in (
+                        COMPOSITE_BACKENDS["cpp"],
+                        COMPOSITE_BACKENDS["numpy"],
+                    )
+                ]
+                self.assertEqual(results[0], results[1])
+
+                results = [
+                    perspective(
+                        img,
+                        *colors,
+                        transform,
+                        Point(32.0, 24.0, -100.0),
+                        150.0,
+                        None,
+                        blend,
+                        texture,
+                        single_threaded=True,
+                        aa_mode=aa_mode,
+                    ).tobytes()
+                    for (_, perspective) in (
+                        COMPOSITE_BACKENDS["cpp"],
+                        COMPOSITE_BACKENDS["numpy"],
+                    )
+                ]
+                self.assertEqual(results[0], results[1])
@@ -1,10 +1,34 @@
 # vim: set fileencoding=utf-8
+import os
+import tempfile
+import time
 import unittest
+from typing import Any, Dict
+from unittest.mock import Mock, patch
 
-from bemani.data.api.client import APIClient
+import requests
+
+from bemani.common import APIConstants, GameConstants, VersionConstants
+from bemani.data.api.cache import FilesystemResponseCache, MemoryResponseCache
+from bemani.data.api.client import APIClient, APIException
+
+
+def response(status: int, body: Dict[str, Any]) -> Mock:
+    r = Mock()
+    r.status_code = status
+    r.headers = {"content-type": "application/json; charset=utf-8"}
+    r.json.return_value = body
+    return r
 
 
 class TestAPIClient(unittest.TestCase):
+    def setUp(self) -> None:
+        APIClient.configure(failure_threshold=2, retry_interval=60)
+
+    def tearDown(self) -> None:
+        APIClient.configure()
+        APIClient.configure_cache(None)
+
     def test_content_type(self) -> None:
         client = APIClient("https://127.0.0.1", "token", False, False)
         self.assertFalse(client._content_type_valid("application/text"))
@@ -20,3 +44,183 @@ class TestAPIClient(unittest.TestCase):
         self.assertTrue(client._content_type_valid("application/json;charset=UTF-8"))
         self.assertTrue(client._content_type_valid("application/json;charset = UTF-8"))
         self.assertTrue(client._content_type_valid("application/json; charset = UTF-8"))
+
+    def test_shared_session(self) -> None:
+        info = {"name": "Remote", "email": "a@b.c", "versions": ["v1"]}
+        with patch.object(
+            requests.Session, "request", autospec=True, return_value=response(200, info)
+        ) as request:
+            first = APIClient("https://remote/", "token", True, True)
+            second = APIClient("https://remote/", "other", True, True)
+            self.assertEqual(first.get_server_info()["name"], "Remote")
+            self.assertEqual(second.get_server_info()["name"], "Remote")
+            APIClient("https://elsewhere", "token", True, True).get_server_info()
+
+            # Both clients for the same server went over the same pooled session.
+            sessions = [call.args[0] for call in request.call_args_list]
+            self.assertIs(sessions[0], sessions[1])
+            self.assertIsNot(sessions[0], sessions[2])
+            self.assertEqual(sessions[0].headers["Accept-Encoding"], "gzip, deflate")
+            self.assertEqual(request.call_args_list[1].kwargs["timeout"], (3.0, 10.0))
+            self.assertEqual(
+                request.call_args_list[1].kwargs["headers"]["Authorization"],
+                "Token other",
+            )
+
+        stats = APIClient.stats()
+        self.assertEqual(stats["https://remote/"]["requests"], 2)
+        self.assertEqual(stats["https://elsewhere"]["requests"], 1)
+
+    def test_circuit_breaker(self) -> None:
+        client = APIClient("https://remote", "token", True, True)
+        with patch.object(
+            requests.Session,
+            "request",
+            side_effect=requests.exceptions.ConnectTimeout(),
+        ) as request, patch("bemani.data.api.client.time.monotonic") as monotonic:
+            monotonic.return_value = 1000.0
+            for _ in range(4):
+                self.assertEqual(
+                    client.get_profiles(
+                        GameConstants.IIDX,
+                        VersionConstants.IIDX_ROOTAGE,
+                        Mock(value="card"),
+                        ["E004"],
+                    ),
+                    [],
+                )
+
+            # After two failures in a row the server is skipped entirely.
+            self.assertEqual(request.call_count, 2)
+            stats = APIClient.stats()["https://remote"]
+            self.assertEqual(stats["errors"], 2)
+            self.assertEqual(stats["skipped"], 2)
+            self.assertTrue(stats["skipping"])
+
+            # Once the retry interval passes a single request is tried again, and the
+            # server is used normally once it answers.
+            monotonic.return_value = 1061.0
+            request.side_effect = None
+            request.return_value = response(200, {"profile": [{"name": "PLAYER"}]})
+            self.assertEqual(
+                client.get_profiles(
+                    GameConstants.IIDX,
+                    VersionConstants.IIDX_ROOTAGE,
+                    Mock(value="card"),
+                    ["E004"],
+                ),
+                [{"name": "PLAYER"}],
+            )
+            self.assertFalse(APIClient.stats()["https://remote"]["skipping"])
+
+            # Errors that a working server answers with don't count as failures.
+            request.return_value = response(401, {"error": "Unauthorized"})
+            for _ in range(3):
+                with self.assertRaises(APIException):
+                    client.get_server_info()
+            self.assertEqual(request.call_count, 6)
+
+    def test_response_cache(self) -> None:
+        APIClient.configure_cache(
+            MemoryResponseCache(), {"statistics": 60, "catalog": 600}, stale=60
+        )
+        client = APIClient("https://remote", "token", True, True)
+        other = APIClient("https://elsewhere", "token", True, True)
+
+        def stats() -> Any:
+            return client.get_statistics(
+                GameConstants.IIDX,
+                VersionConstants.IIDX_ROOTAGE,
+                APIConstants.ID_TYPE_SERVER,
+                [],
+            )
+
+        with patch.object(
+            requests.Session,
+            "request",
+            return_value=response(200, {"statistics": [{"plays": 1}], "records": []}),
+        ) as request, patch("time.time") as now:
+            now.return_value = 1000.0
+            self.assertEqual(stats(), [{"plays": 1}])
+            self.assertEqual(stats(), [{"plays": 1}])
+            self.assertEqual(request.call_count, 1)
+
+            # Callers get their own copy of cached responses.
+            stats()[0]["plays"] = 5
+            self.assertEqual(stats(), [{"plays": 1}])
+
+            # Different servers, games and requests are cached separately, and objects
+            # without a TTL aren't cached at all.
+            other.get_statistics(
+                GameConstants.IIDX,
+                VersionConstants.IIDX_ROOTAGE,
+                APIConstants.ID_TYPE_SERVER,
+                [],
+            )
+            client.get_statistics(
+                GameConstants.IIDX,
+                VersionConstants.IIDX_ROOTAGE,
+                APIConstants.ID_TYPE_SONG,
+                ["1"],
+            )
+            for _ in range(2):
+                client.get_records(
+                    GameConstants.IIDX,
+                    VersionConstants.IIDX_ROOTAGE,
+                    APIConstants.ID_TYPE_SERVER,
+                    [],
+                )
+            self.assertEqual(request.call_count, 5)
+
+            # Stale responses are returned right away and refreshed in the background.
+            now.return_value = 1090.0
+            request.return_value = response(200, {"statistics": [{"plays": 2}]})
+            self.assertEqual(stats(), [{"plays": 1}])
+            for _ in range(100):
+                if APIClient.cache_stats()["refreshes"] == 1:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(stats(), [{"plays": 2}])
+            self.assertEqual(request.call_count, 6)
+
+            # Past the stale window, the request is made again while the caller waits.
+            now.return_value = 1300.0
+            request.return_value = response(200, {"statistics": [{"plays": 3}]})
+            self.assertEqual(stats(), [{"plays": 3}])
+            self.assertEqual(request.call_count, 7)
+
+        cache_stats = APIClient.cache_stats()
+        self.assertEqual(cache_stats["fresh"], 4)
+        self.assertEqual(cache_stats["stale"], 1)
+        self.assertEqual(cache_stats["refreshes"], 1)
+
+    def test_filesystem_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            first = FilesystemResponseCache(directory, maxsize=2)
+            second = FilesystemResponseCache(directory, maxsize=2)
+
+            with patch("time.time") as now:
+                now.return_value = 1000.0
+                first.put("a", {"value": 1}, 60)
+                self.assertEqual(second.get("a"), (1000.0, {"value": 1}))
+                self.assertIsNone(second.get("b"))
+
+                # Entries are dropped once their lifetime is up.
+                now.return_value = 1060.0
+                self.assertIsNone(second.get("a"))
+
+                # The oldest entries are evicted to stay under the size limit.
+                first.put("b", 2, 60)
+                first.put("c", 3, 60)
+                first.put("d", 4, 60)
+                self.assertEqual(second.stats()["size"], 2)
+                self.assertEqual(first.stats()["evictions"], 1)
+                self.assertIsNotNone(second.get("d"))
+
+                # Reading an entry marks it as recently used, so the other one goes first.
+                os.utime(os.path.join(directory, "c.json"), (100, 100))
+                os.utime(os.path.join(directory, "d.json"), (200, 200))
+                self.assertIsNotNone(second.get("c"))
+                first.put("e", 5, 60)
+                self.assertIsNotNone(second.get("c"))
+                self.assertIsNone(second.get("d"))
@@ -0,0 +1,50 @@
+# vim: set fileencoding=utf-8
+import unittest
+from unittest.mock import Mock
+
+from bemani.data.config import Config
+from bemani.data.mysql.api import APIData
+from bemani.tests.helpers import FakeCursor
+
+
+SERVER_ROW = {
+    "id": 1,
+    "timestamp": 1234567890,
+    "uri": "https://remote",
+    "token": "token",
+    "config": 0x2,
+}
+
+
+class TestAPIData(unittest.TestCase):
+    def setUp(self) -> None:
+        APIData.SERVER_CACHE.clear()
+        APIData.SERVER_CACHE.reset_stats()
+
+    def test_get_all_servers_cached(self) -> None:
+        api = APIData(Config({"database": {"server_cache_ttl": 60}}), None)
+        api.execute = Mock(return_value=FakeCursor([SERVER_ROW]))  # type: ignore
+
+        first = api.get_all_servers()
+        second = api.get_all_servers()
+        self.assertEqual(api.execute.call_count, 1)
+        self.assertEqual(second[0].uri, "https://remote")
+        self.assertTrue(second[0].allow_stats)
+        self.assertFalse(second[0].allow_scores)
+
+        # Each caller gets its own objects to modify.
+        first[0].allow_scores = True
+        self.assertIsNot(first[0], second[0])
+        self.assertFalse(api.get_all_servers()[0].allow_scores)
+
+        # Writes invalidate the cached list.
+        api.put_server(first[0])
+        api.get_all_servers()
+        self.assertEqual(api.execute.call_count, 3)
+        api.destroy_server(1)
+        api.get_all_servers()
+        self.assertEqual(api.execute.call_count, 5)
+
+        stats = APIData.cache_stats()["server"]
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 3)
@@ -1,8 +1,10 @@
 # vim: set fileencoding=utf-8
+import os
 import unittest
 from unittest.mock import Mock
 
 from bemani.data.mysql.base import BaseData
+from bemani.data.mysql.user import profile
 
 
 class TestBaseData(unittest.TestCase):
@@ -30,9 +32,33 @@ class TestBaseData(unittest.TestCase):
         }
 
         serialized = data.serialize(testdict)
-        self.assertEqual(serialized, '{"bytes": ["__bytes__", 1, 2, 3, 4, 5]}')
+        self.assertEqual(serialized, '{"bytes": {"__b64__": "AQIDBAU="}}')
         self.assertEqual(data.deserialize(serialized), testdict)
 
+    def test_large_byte_serialize(self) -> None:
+        data = BaseData(Mock(), None)
+
+        testdict = {
+            "compressible": b"\x00" * 4096,
+            "random": os.urandom(4096),
+        }
+
+        serialized = data.serialize(testdict)
+        self.assertIn('"compressible": {"__zlib__": ', serialized)
+        self.assertIn('"random": {"__b64__": ', serialized)
+        self.assertLess(len(serialized), 4096 * 2)
+        self.assertEqual(data.deserialize(serialized), testdict)
+
+    def test_legacy_byte_deserialize(self) -> None:
+        data = BaseData(Mock(), None)
+
+        self.assertEqual(
+            data.deserialize(
+                '{"bytes": ["__bytes__", 1, 2, 3, 4, 5], "list": [["__bytes__"], 1]}'
+            ),
+            {"bytes": b"\x01\x02\x03\x04\x05", "list": [b"", 1]},
+        )
+
     def test_deep_byte_serialize(self) -> None:
         data = BaseData(Mock(), None)
 
@@ -46,3 +72,39 @@ class TestBaseData(unittest.TestCase):
         }
 
         self.assertEqual(data.deserialize(data.serialize(testdict)), testdict)
+
+    def test_reencode_table(self) -> None:
+        data = BaseData(Mock(), None)
+        rows = [
+            {"refid": "A", "data": '{"bytes": ["__bytes__", 1, 2]}'},
+            {"refid": "B", "data": '{"name": "__bytes__"}'},
+            {"refid": "C", "data": '{"bytes": ["__bytes__", 3]}'},
+        ]
+        data.execute = Mock(  # type: ignore
+            side_effect=[
+                Mock(rowcount=3, fetchall=Mock(return_value=rows)),
+                Mock(rowcount=1),
+                Mock(rowcount=0),
+                Mock(rowcount=0),
+            ]
+        )
+
+        self.assertEqual(data.reencode_table(profile), 1)
+        calls = data.execute.call_args_list
+        self.assertIn("ORDER BY `refid`", calls[0][0][0])
+        self.assertIn("data = CAST(:old AS JSON)", calls[1][0][0])
+        self.assertEqual(
+            calls[1][0][1],
+            {
+                "data": '{"bytes": {"__b64__": "AQI="}}',
+                "old": '{"bytes": ["__bytes__", 1, 2]}',
+                "refid": "A",
+            },
+        )
+
+        # Row C was saved by a game between reading and rewriting it, so it is left
+        # alone rather than overwritten with the stale data.
+        self.assertEqual(calls[2][0][1]["refid"], "C")
+
+        # The row that only looks like it holds bytes isn't fetched again.
+        self.assertEqual(calls[3][0][1]["offset"], 1)
@@ -0,0 +1,30 @@
+# vim: set fileencoding=utf-8
+import unittest
+
+from sqlalchemy import create_engine  # type: ignore
+
+from bemani.data import Config, Data
+from bemani.data.data import _MeteredQueuePool
+
+
+class TestData(unittest.TestCase):
+    def test_shared(self) -> None:
+        engine = create_engine(
+            "sqlite://", poolclass=_MeteredQueuePool, pool_size=1, max_overflow=0
+        )
+        config = Config({"database": {"engine": engine}})
+
+        data = Data.shared(config)
+        self.assertIs(Data.shared(config.overlay(client={})), data)
+
+        # Closing hands the connection back, but the data object stays usable.
+        data.local.user.execute("SELECT 1")
+        data.close()
+        stats = Data.pool_stats(engine)
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["checkouts"], 1)
+        self.assertEqual(stats["waits"], 0)
+
+        data.local.user.execute("SELECT 1")
+        data.close()
+        self.assertEqual(Data.pool_stats(engine)["checkouts"], 2)
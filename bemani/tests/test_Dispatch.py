@@ -0,0 +1,113 @@
+# vim: set fileencoding=utf-8
+import unittest
+from typing import List, Optional, Type
+from unittest.mock import Mock, patch
+
+from bemani.backend import Base, Dispatch, DispatchTable
+from bemani.backend.base import Factory
+from bemani.common import GameConstants, Model, ValidatedDict
+from bemani.data import Config, Data
+from bemani.protocol import Node
+
+
+class DummyGame(Base):
+    game = GameConstants.IIDX
+    version = 1
+    name = "Test Game"
+
+    def handle_test_echo_request(self, request: Node) -> Node:
+        root = Node.void("test")
+        root.add_child(Node.u8("paseli", 1 if self.config.paseli.enabled else 0))
+        return root
+
+    def handle_generic_requests(self, request: Node) -> Node:
+        return Node.void("generic")
+
+
+class DummyFactory(Factory):
+    MANAGED_CLASSES: List[Type[Base]] = [DummyGame]
+    created = 0
+
+    @classmethod
+    def register_all(cls) -> None:
+        Base.register("TST", DummyFactory)
+
+    @classmethod
+    def create(
+        cls,
+        data: Data,
+        config: Config,
+        model: Model,
+        parentmodel: Optional[Model] = None,
+    ) -> Optional[Base]:
+        cls.created += 1
+        return DummyGame(data, config, model)
+
+
+class TestDispatch(unittest.TestCase):
+    def setUp(self) -> None:
+        # Registering the dummy game must not leak into other tests, so give Base empty
+        # registries for the duration of each test and rebuild the dispatch table after.
+        # Cleanups run last to first, so the table is rebuilt once the registries are back.
+        self.addCleanup(DispatchTable.precompute)
+        for registry in ["_Base__registered_games", "_Base__registered_handlers"]:
+            patcher = patch.object(Base, registry, type(getattr(Base, registry))())
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def __request(self, service: str, method: str) -> Node:
+        root = Node.void("call")
+        root.set_attribute("model", "TST:J:A:A:2020010100")
+        root.set_attribute("srcid", "0101020304050607086F")
+        request = Node.void(service)
+        request.set_attribute("method", method)
+        root.add_child(request)
+        return root
+
+    def test_dispatch(self) -> None:
+        DummyFactory.register_all()
+        DispatchTable.precompute()
+        DummyFactory.created = 0
+
+        data = Mock()
+        data.local.machine.get_machine.return_value = Mock(
+            arcade=5, game=None, version=None
+        )
+        data.local.machine.get_arcade.return_value = Mock(
+            data=ValidatedDict(
+                {
+                    "paseli_enabled": True,
+                    "paseli_infinite": False,
+                    "mask_services_url": False,
+                }
+            )
+        )
+        config = Config(
+            {
+                "server": {"enforce_pcbid": False},
+                "paseli": {"enabled": False, "infinite": False},
+            }
+        )
+        dispatch = Dispatch(config, data, False)
+
+        response = dispatch.handle(self.__request("test", "echo"))
+        self.assertEqual(response.child_value("test/paseli"), 1)
+        response = dispatch.handle(self.__request("generic", "anything"))
+        self.assertIsNotNone(response.child("generic"))
+        self.assertIsNone(dispatch.handle(self.__request("test", "missing")))
+
+        # The factory is only consulted the first time a model is seen.
+        self.assertEqual(DummyFactory.created, 1)
+
+        # Arcade overrides apply to the request, not the shared config.
+        self.assertFalse(config.paseli.enabled)
+
+    def test_overlay(self) -> None:
+        config = Config({"server": {"uri": "http://localhost"}, "client": {}})
+        overlay = config.overlay(client={"address": "1.2.3.4"})
+        overlay["server"] = {**overlay["server"], "uri": None}
+
+        self.assertEqual(overlay.client.address, "1.2.3.4")
+        self.assertIsNone(overlay.server.uri)
+        self.assertEqual(config.server.uri, "http://localhost")
+        self.assertEqual(config["client"], {})
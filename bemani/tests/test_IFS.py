@@ -0,0 +1,166 @@
+# vim: set fileencoding=utf-8
+import hashlib
+import os
+import struct
+import tempfile
+import unittest
+from typing import Dict, List, Tuple
+from unittest.mock import Mock
+
+from bemani.format import IFS
+from bemani.protocol.binary import BinaryEncoding
+from bemani.protocol.lz77 import Lz77
+from bemani.protocol.node import Node
+
+
+def build_ifs(
+    files: Dict[str, bytes],
+    supers: List[str] = [],
+    references: Dict[str, int] = {},
+) -> bytes:
+    # Lay out a minimal version 3 IFS. Files are given as directory/name pairs separated
+    # by a slash, and referenced files point at an index in the list of super-files.
+    header = Node.void("imgfs")
+    for name in supers:
+        super_node = Node.string("_super_", name)
+        super_node.add_child(Node.binary("md5", b"\0" * 16))
+        header.add_child(super_node)
+
+    body = b""
+    directories: Dict[str, Node] = {}
+    for path, data in files.items():
+        directory, name = path.split("/")
+        if directory not in directories:
+            directories[directory] = Node.void(directory)
+            header.add_child(directories[directory])
+        node = Node(
+            name=name.replace(".", "_E"),
+            type=Node.NODE_TYPE_3S32,
+            value=[len(body), len(data), 0],
+        )
+        if path in references:
+            node.add_child(Node.s32("i", references[path]))
+        else:
+            body += data
+        directories[directory].add_child(node)
+
+    headerdata = BinaryEncoding().encode(header, "ascii")
+    data_index = 36 + len(headerdata)
+    return (
+        struct.pack(
+            ">IHHIII", 0x6CAD8F89, 3, 3 ^ 0xFFFF, 0, len(headerdata), data_index
+        )
+        + (b"\0" * 16)
+        + headerdata
+        + body
+    )
+
+
+def compressed_texture() -> Tuple[str, bytes, Dict[str, bytes]]:
+    # A texture list that marks its textures as compressed, plus the texture itself
+    # stored under its hashed name.
+    texture = b"texture data " * 20
+    texlist = Node.void("texturelist")
+    texlist.set_attribute("compress", "avslz")
+    texnode = Node.void("texture")
+    texnode.set_attribute("format", "argb8888rev")
+    image = Node.void("image")
+    image.set_attribute("name", "sprite")
+    texnode.add_child(image)
+    texlist.add_child(texnode)
+
+    compressed = Lz77().compress(texture)
+    md5sum = hashlib.md5(b"sprite").hexdigest()
+    return (
+        os.path.join("tex", "sprite"),
+        texture,
+        {
+            "tex/texturelist.xml": BinaryEncoding().encode(texlist, "ascii"),
+            f"tex/{md5sum}": struct.pack(">II", len(texture), len(compressed))
+            + compressed,
+        },
+    )
+
+
+class TestIFS(unittest.TestCase):
+    def test_open(self) -> None:
+        data = build_ifs({"data/hello.txt": b"Hello, world!", "data/empty.bin": b""})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.ifs")
+            with open(path, "wb") as fp:
+                fp.write(data)
+
+            for ifs in [IFS(data), IFS.open(path)]:
+                with ifs:
+                    self.assertEqual(
+                        sorted(ifs.filenames),
+                        [
+                            os.path.join("data", "empty.bin"),
+                            os.path.join("data", "hello.txt"),
+                        ],
+                    )
+                    hello = os.path.join("data", "hello.txt")
+                    self.assertEqual(ifs.read_file(hello), b"Hello, world!")
+                    self.assertEqual(
+                        ifs.read_file(os.path.join("data", "empty.bin")), b""
+                    )
+
+                    view = ifs.read_view(hello)
+                    self.assertIsInstance(view, memoryview)
+                    self.assertEqual(view, b"Hello, world!")
+                    del view
+
+            with open(path, "wb") as fp:
+                fp.write(b"not an ifs file")
+            with self.assertRaises(Exception):
+                IFS.open(path)
+
+    def test_decoded_cache(self) -> None:
+        name, texture, files = compressed_texture()
+        ifs = IFS(build_ifs(files))
+
+        self.assertIn(name, ifs.filenames)
+        first = ifs.read_file(name)
+        self.assertEqual(first, texture)
+        self.assertEqual(ifs.read_view(name), texture)
+
+        # Reading the same file again doesn't decompress it again.
+        self.assertIs(ifs.read_file(name), first)
+
+    def test_super_references(self) -> None:
+        base = IFS(
+            build_ifs({"data/shared.bin": b"shared data", "data/other.bin": b"other"}),
+            keep_hex_names=True,
+        )
+        loader = Mock(return_value=base)
+        ifs = IFS(
+            build_ifs(
+                {"data/own.bin": b"own data", "data/shared.bin": b""},
+                supers=["base.ifs"],
+                references={"data/shared.bin": 1},
+            ),
+            reference_loader=loader,
+        )
+
+        # References are only loaded once something is read out of them.
+        loader.assert_not_called()
+        self.assertEqual(ifs.read_file(os.path.join("data", "own.bin")), b"own data")
+        loader.assert_not_called()
+        self.assertEqual(
+            ifs.read_file(os.path.join("data", "shared.bin")), b"shared data"
+        )
+        self.assertEqual(
+            ifs.read_file(os.path.join("data", "shared.bin")), b"shared data"
+        )
+        loader.assert_called_once_with("base.ifs")
+
+        missing = IFS(
+            build_ifs(
+                {"data/shared.bin": b""},
+                supers=["base.ifs"],
+                references={"data/shared.bin": 1},
+            ),
+            reference_loader=Mock(return_value=None),
+        )
+        with self.assertRaises(Exception):
+            missing.read_file(os.path.join("data", "shared.bin"))
@@ -0,0 +1,111 @@
+# vim: set fileencoding=utf-8
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+from typing import List, Tuple
+
+from sqlalchemy import create_engine  # type: ignore
+from sqlalchemy.sql import text  # type: ignore
+
+from bemani.common import GameConstants, VersionConstants
+from bemani.data import Config
+from bemani.data.mysql.base import metadata
+from bemani.data.mysql.game import catalog
+from bemani.data.mysql.music import music
+from bemani.utils.read import ImportBase
+
+
+class TestImportBase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            f"sqlite:///{os.path.join(self.directory.name, 'test.db')}",
+            connect_args={"check_same_thread": False},
+        )
+        metadata.create_all(self.engine, tables=[music, catalog])
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO music (id, songid, chart, game, version, data) VALUES "
+                    + "(5, 1, 0, 'pnm', 1, '{}'), (7, 9, 0, 'iidx', 1, '{}')"
+                )
+            )
+
+    def tearDown(self) -> None:
+        self.engine.dispose()
+        self.directory.cleanup()
+
+    def import_songs(self, dry_run: bool) -> str:
+        config = Config({"database": {"engine": self.engine}})
+        output = StringIO()
+        with redirect_stdout(output):
+            importer = ImportBase(
+                config,
+                GameConstants.POPN_MUSIC,
+                VersionConstants.POPN_MUSIC_FANTASIA,
+                False,
+                False,
+                dry_run,
+            )
+            for songid in [1, 2]:
+                importer.start_batch()
+                for chart in [0, 1]:
+                    old_id = importer.get_music_id_for_song(songid, chart)
+                    next_id = (
+                        old_id if old_id is not None else importer.get_next_music_id()
+                    )
+                    importer.insert_music_id_for_song(next_id, songid, chart, "Title")
+                importer.finish_batch()
+            importer.start_batch()
+            importer.insert_catalog_entry("item", 1, {"name": "Item"})
+            importer.insert_catalog_entry("item", 1, {"name": "Item"})
+            importer.finish_batch()
+            importer.close()
+        return output.getvalue()
+
+    def music(self) -> List[Tuple[int, int, int, int]]:
+        with self.engine.connect() as conn:
+            return [
+                (row["id"], row["songid"], row["chart"], row["version"])
+                for row in conn.execute(
+                    text(
+                        "SELECT id, songid, chart, version FROM music WHERE game = 'pnm' "
+                        + "ORDER BY songid, chart, version"
+                    )
+                )
+            ]
+
+    def test_import(self) -> None:
+        fantasia = VersionConstants.POPN_MUSIC_FANTASIA
+        output = self.import_songs(False)
+        self.assertIn("Wrote 4 music and 1 catalog entries", output)
+
+        # Existing songs keep their music ID, and new ones are numbered after the
+        # largest ID for any game.
+        self.assertEqual(
+            self.music(),
+            [
+                (5, 1, 0, 1),
+                (5, 1, 0, fantasia),
+                (8, 1, 1, fantasia),
+                (9, 2, 0, fantasia),
+                (10, 2, 1, fantasia),
+            ],
+        )
+
+        # Running the import again doesn't create anything new.
+        output = self.import_songs(False)
+        self.assertIn("Wrote 0 music and 0 catalog entries", output)
+        self.assertEqual(len(self.music()), 5)
+
+    def test_dry_run(self) -> None:
+        output = self.import_songs(True)
+        self.assertIn("Would have written 4 music and 1 catalog entries", output)
+        self.assertIn("total", output)
+        self.assertEqual(self.music(), [(5, 1, 0, 1)])
+        with self.engine.connect() as conn:
+            self.assertEqual(
+                list(conn.execute(text("SELECT COUNT(*) FROM catalog")))[0][0], 0
+            )
@@ -0,0 +1,122 @@
+# vim: set fileencoding=utf-8
+import unittest
+from unittest.mock import Mock
+
+from bemani.common import TTLCache
+from bemani.data import Config
+from bemani.data.mysql.machine import MachineData
+from bemani.data.types import ArcadeID
+from bemani.tests.helpers import FakeCursor
+
+
+MACHINE_ROW = {
+    "name": "なし",
+    "description": "",
+    "arcadeid": 1,
+    "id": 5,
+    "port": 10000,
+    "game": None,
+    "version": None,
+    "data": '{"pref": 51}',
+}
+ARCADE_ROW = {
+    "name": "Test Arcade",
+    "description": "",
+    "pin": "00000000",
+    "pref": 51,
+    "area": None,
+    "data": '{"paseli_enabled": true}',
+}
+
+
+class TestMachineData(unittest.TestCase):
+    def setUp(self) -> None:
+        MachineData.MACHINE_CACHE.clear()
+        MachineData.ARCADE_CACHE.clear()
+        MachineData.MACHINE_CACHE.reset_stats()
+        MachineData.ARCADE_CACHE.reset_stats()
+
+    def test_ttl_cache(self) -> None:
+        cache = TTLCache(maxsize=2)
+        self.assertEqual(cache.get("a"), (False, None))
+        cache.put("a", None, 60.0)
+        self.assertEqual(cache.get("a"), (True, None))
+
+        # Expired and disabled entries are never returned.
+        cache.put("b", 1, -1.0)
+        self.assertEqual(cache.get("b"), (False, None))
+
+        # Values loaded across an invalidation are not cached.
+        generation = cache.generation
+        cache.invalidate("c")
+        cache.put("c", 3, 60.0, generation)
+        self.assertEqual(cache.get("c"), (False, None))
+
+        # The least recently used entry is evicted.
+        cache.put("b", 2, 60.0)
+        cache.put("c", 3, 60.0)
+        self.assertEqual(cache.get("a"), (False, None))
+        self.assertEqual(cache.get("c"), (True, 3))
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 4)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_get_machine_cached(self) -> None:
+        machine = MachineData(Config({"database": {"machine_cache_ttl": 60}}), None)
+        machine.execute = Mock(return_value=FakeCursor([MACHINE_ROW]))  # type: ignore
+
+        first = machine.get_machine("0101020304050607086F")
+        second = machine.get_machine("0101020304050607086F")
+        self.assertEqual(machine.execute.call_count, 1)
+        self.assertEqual(second.data.get_int("pref"), 51)
+
+        # Each caller gets its own object to modify.
+        first.data.replace_int("pref", 1)
+        self.assertIsNot(first, second)
+        self.assertEqual(second.data.get_int("pref"), 51)
+
+        # Writes invalidate the cached row.
+        machine.put_machine(first)
+        machine.get_machine("0101020304050607086F")
+        self.assertEqual(machine.execute.call_count, 3)
+
+        # Misses are cached too, until the machine is created.
+        machine.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+        self.assertIsNone(machine.get_machine("0101020304050607FFFF"))
+        self.assertIsNone(machine.get_machine("0101020304050607FFFF"))
+        self.assertEqual(machine.execute.call_count, 1)
+        machine.destroy_machine("0101020304050607FFFF")
+        self.assertIsNone(machine.get_machine("0101020304050607FFFF"))
+        self.assertEqual(machine.execute.call_count, 3)
+
+        stats = MachineData.cache_stats()["machine"]
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 4)
+
+    def test_get_arcade_cached(self) -> None:
+        machine = MachineData(Config({"database": {"machine_cache_ttl": 60}}), None)
+        machine.execute = Mock(  # type: ignore
+            side_effect=lambda sql, params=None: FakeCursor(
+                [{"userid": 7}] if "arcade_owner" in sql else [ARCADE_ROW]
+            )
+        )
+
+        arcade = machine.get_arcade(ArcadeID(1))
+        self.assertEqual(arcade.owners, [7])
+        self.assertTrue(arcade.data.get_bool("paseli_enabled"))
+        machine.get_arcade(ArcadeID(1))
+        self.assertEqual(machine.execute.call_count, 2)
+
+        machine.put_arcade(arcade)
+        machine.get_arcade(ArcadeID(1))
+        self.assertEqual(machine.execute.call_count, 7)
+
+    def test_cache_disabled(self) -> None:
+        machine = MachineData(Config(), None)
+        machine.execute = Mock(return_value=FakeCursor([MACHINE_ROW]))  # type: ignore
+
+        machine.get_machine("0101020304050607086F")
+        machine.get_machine("0101020304050607086F")
+        self.assertEqual(machine.execute.call_count, 2)
@@ -0,0 +1,144 @@
+# vim: set fileencoding=utf-8
+import unittest
+from unittest.mock import Mock
+
+from bemani.common import GameConstants
+from bemani.data import Attempt, Config, UserID
+from bemani.data.mysql.music import MusicData
+from bemani.tests.helpers import FakeCursor
+
+
+class TestMusicData(unittest.TestCase):
+    def setUp(self) -> None:
+        MusicData.invalidate_musicids()
+
+    def test_get_musicids(self) -> None:
+        music = MusicData(Config(), None)
+        music.execute = Mock(  # type: ignore
+            return_value=FakeCursor(
+                [
+                    {"songid": 1000, "chart": 0, "id": 1},
+                    {"songid": 1000, "chart": 1, "id": 2},
+                    {"songid": 1001, "chart": 0, "id": 3},
+                ]
+            )
+        )
+
+        self.assertEqual(
+            music.get_musicids(GameConstants.IIDX, 25, [(1000, 1), (1001, 0)]),
+            {(1000, 1): 2, (1001, 0): 3},
+        )
+        self.assertEqual(
+            music.get_musicids(GameConstants.IIDX, 25, [(1000, 0)]),
+            {(1000, 0): 1},
+        )
+        self.assertEqual(music.execute.call_count, 1)
+
+        # Songs missing from the index are looked up individually, in case they were
+        # imported after the index was loaded.
+        music.execute = Mock(return_value=FakeCursor([{"id": 4}]))  # type: ignore
+        self.assertEqual(
+            music.get_musicids(GameConstants.IIDX, 25, [(1000, 0), (1002, 0)]),
+            {(1000, 0): 1, (1002, 0): 4},
+        )
+        music.get_musicids(GameConstants.IIDX, 25, [(1002, 0)])
+        self.assertEqual(music.execute.call_count, 1)
+
+        # Other versions have their own index, and songs that don't exist are left out.
+        music.execute = Mock(return_value=FakeCursor([]))  # type: ignore
+        self.assertEqual(
+            music.get_musicids(GameConstants.IIDX, 26, [(1000, 0)]),
+            {},
+        )
+        self.assertIsNone(
+            music.get_score(GameConstants.IIDX, 26, UserID(1337), 1000, 0),
+        )
+        with self.assertRaises(Exception):
+            music.put_score(
+                GameConstants.IIDX, 26, UserID(1337), 1000, 0, 1, 100, {}, True
+            )
+
+    def test_invalidate_musicids(self) -> None:
+        music = MusicData(Config(), None)
+        music.execute = Mock(  # type: ignore
+            return_value=FakeCursor([{"songid": 1000, "chart": 0, "id": 1}])
+        )
+
+        music.get_musicids(GameConstants.IIDX, 25, [(1000, 0)])
+        MusicData.invalidate_musicids(GameConstants.IIDX, 25)
+        music.get_musicids(GameConstants.IIDX, 25, [(1000, 0)])
+        self.assertEqual(music.execute.call_count, 2)
+
+    def test_get_musicids_uncached(self) -> None:
+        music = MusicData(Config({"database": {"music_cache_ttl": 0}}), None)
+        music.execute = Mock(return_value=FakeCursor([{"id": 2}]))  # type: ignore
+
+        # With caching disabled, songs are looked up one at a time rather than loading
+        # the whole game/version.
+        self.assertEqual(
+            music.get_musicids(GameConstants.IIDX, 25, [(1000, 1)]),
+            {(1000, 1): 2},
+        )
+        music.get_musicids(GameConstants.IIDX, 25, [(1000, 1)])
+        self.assertEqual(music.execute.call_count, 2)
+        sql = music.execute.call_args[0][0]
+        self.assertIn("songid = :songid", sql)
+
+    def test_put_scores(self) -> None:
+        music = MusicData(Config(), None)
+        music.execute = Mock(  # type: ignore
+            return_value=FakeCursor(
+                [
+                    {"songid": 1000, "chart": 0, "id": 1},
+                    {"songid": 1000, "chart": 1, "id": 2},
+                ]
+            )
+        )
+        music.get_musicids(GameConstants.JUBEAT, 13, [])
+        music.execute = Mock()  # type: ignore
+
+        music.put_scores(
+            GameConstants.JUBEAT,
+            13,
+            UserID(1337),
+            [
+                Attempt(0, 1000, 0, 500000, 1234, 5, True, {}),
+                Attempt(0, 1000, 1, 600000, 1235, 5, True, {}),
+                Attempt(0, 1000, 0, 400000, 1236, 5, False, {}),
+            ],
+        )
+
+        # Consecutive new records are written together, the rest keep their order.
+        self.assertEqual(music.execute.call_count, 3)
+        sql, params = music.execute.call_args_list[0][0]
+        self.assertIn("lid = VALUES(lid)", sql)
+        self.assertEqual([params["musicid0"], params["musicid1"]], [1, 2])
+        sql, params = music.execute.call_args_list[1][0]
+        self.assertNotIn("lid = VALUES(lid)", sql)
+        self.assertEqual(params["points0"], 400000)
+
+        # Then every song is checked for a new record in one go.
+        sql, params = music.execute.call_args_list[2][0]
+        self.assertIn("INTO `record`", sql)
+        self.assertEqual(sorted(params["musicids"]), [1, 2])
+
+        music.put_attempts(
+            GameConstants.JUBEAT,
+            13,
+            UserID(1337),
+            [
+                Attempt(0, 1000, 0, 500000, 1234, 5, True, {}),
+                Attempt(0, 1000, 1, 600000, 1235, 5, True, {}),
+            ],
+        )
+        # One statement for the attempts, then one each for the play count tables.
+        self.assertEqual(music.execute.call_count, 6)
+        sql, params = music.execute.call_args_list[3][0]
+        self.assertIn("score_history", sql)
+        self.assertEqual(params["timestamp1"], 1235)
+        sql, params = music.execute.call_args_list[4][0]
+        self.assertIn("score_play_count", sql)
+        self.assertEqual(params["plays0"], 1)
+        self.assertEqual(params["plays1"], 1)
+        sql, params = music.execute.call_args_list[5][0]
+        self.assertIn("music_play_count", sql)
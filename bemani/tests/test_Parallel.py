@@ -1,5 +1,7 @@
 # vim: set fileencoding=utf-8
 from abc import ABC
+import concurrent.futures
+import threading
 import unittest
 
 from bemani.common import Parallel
@@ -101,3 +103,61 @@ class TestParallel(unittest.TestCase):
     def test_flatten(self) -> None:
         results = Parallel.flatten([[1, 2, 3], [4, 5, 6], [7, 8, 9], []])
         self.assertEqual(results, [1, 2, 3, 4, 5, 6, 7, 8, 9])
+
+    def test_nested(self) -> None:
+        # Even with a single worker, nested calls can't deadlock waiting on each other.
+        Parallel.configure(max_workers=1)
+        try:
+            results = Parallel.map(
+                lambda x: Parallel.call(
+                    [lambda y: Parallel.map(lambda z: z * y, [1, 2, 3])] * 2, x
+                ),
+                [1, 2, 3],
+            )
+            self.assertEqual(
+                results,
+                [
+                    [[1, 2, 3], [1, 2, 3]],
+                    [[2, 4, 6], [2, 4, 6]],
+                    [[3, 6, 9], [3, 6, 9]],
+                ],
+            )
+            self.assertGreater(Parallel.stats()["nested_calls"], 0)
+        finally:
+            Parallel.configure()
+
+    def test_exception(self) -> None:
+        def fun(x: int) -> int:
+            if x == 3:
+                raise ValueError("bad value")
+            return x
+
+        with self.assertRaises(ValueError):
+            Parallel.map(fun, [1, 2, 3, 4, 5])
+
+    def test_timeout(self) -> None:
+        Parallel.configure(max_workers=1)
+        Parallel.reset_stats()
+        release = threading.Event()
+        ran = []
+
+        def fun(x: int) -> int:
+            ran.append(x)
+            release.wait(5)
+            return x
+
+        try:
+            with self.assertRaises(concurrent.futures.TimeoutError):
+                Parallel.map(fun, [1, 2, 3, 4], timeout=0.1)
+            release.set()
+
+            # The one worker got stuck on the first task, and the rest were cancelled
+            # instead of being run later.
+            stats = Parallel.stats()
+            self.assertEqual(stats["timeouts"], 1)
+            self.assertEqual(stats["cancelled"], 3)
+            self.assertEqual(Parallel.map(lambda x: x, [1, 2]), [1, 2])
+            self.assertEqual(ran, [1])
+        finally:
+            release.set()
+            Parallel.configure()
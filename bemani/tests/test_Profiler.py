@@ -0,0 +1,145 @@
+# vim: set fileencoding=utf-8
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stderr
+from typing import List
+
+from bemani.common import Histogram, Profiler, RequestProfile
+from bemani.protocol import EAmuseProtocol, Node
+
+
+class TestProfiler(unittest.TestCase):
+    def test_histogram(self) -> None:
+        histogram = Histogram()
+        self.assertEqual(histogram.percentile(50), None)
+
+        for value in [0.05, 0.3, 0.3, 3.0, 20000.0]:
+            histogram.add(value)
+
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.min, 0.05)
+        self.assertEqual(histogram.max, 20000.0)
+        self.assertEqual(histogram.percentile(50), 0.5)
+        self.assertEqual(histogram.percentile(100), 20000.0)
+        self.assertEqual(histogram.to_dict()["buckets"][">10000.0"], 1)
+
+    def test_no_current_request(self) -> None:
+        # Outside of a profiled request, instrumentation points are no-ops.
+        self.assertIsNone(RequestProfile.current())
+        with RequestProfile.phase("handler"):
+            pass
+        RequestProfile.tag(model="LDJ:J:B:A:2020092900")
+
+    def test_request_phases(self) -> None:
+        profiler = Profiler()
+        with profiler.request() as profile:
+            self.assertIs(RequestProfile.current(), profile)
+            RequestProfile.tag(
+                model="LDJ:J:B:A:2020092900", handler="handle_pcbtracker_alive_request"
+            )
+            with RequestProfile.phase("handler"):
+                pass
+            with RequestProfile.phase("handler"):
+                pass
+
+            proto = EAmuseProtocol(timer=profile.add)
+            root = Node.void("call")
+            root.add_child(Node.s32("value", 1))
+            data = proto.encode(
+                "lz77",
+                "1-abcdef-0123",
+                root,
+                text_encoding=EAmuseProtocol.SHIFT_JIS,
+                packet_encoding=EAmuseProtocol.BINARY,
+            )
+            proto.decode("lz77", "1-abcdef-0123", data)
+        self.assertIsNone(RequestProfile.current())
+
+        stats = profiler.stats()
+        self.assertEqual(stats["requests"], 1)
+        for phase in [
+            "total",
+            "handler",
+            "decrypt",
+            "decompress",
+            "decode",
+            "encode",
+            "compress",
+            "encrypt",
+        ]:
+            self.assertEqual(stats["all"][phase]["count"], 1)
+        self.assertEqual(
+            stats["model"]["LDJ:J:B:A:2020092900"]["total"]["count"],
+            1,
+        )
+        self.assertEqual(
+            stats["handler"]["handle_pcbtracker_alive_request"]["handler"]["count"],
+            1,
+        )
+
+    def test_slow_capture_and_dump(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            profiler = Profiler(
+                slow_threshold=0.0,
+                sample_rate=1.0,
+                profile_dir=os.path.join(tmpdir, "captures"),
+                dump_file=os.path.join(tmpdir, "stats-{pid}.json"),
+                dump_interval=0.0,
+            )
+            with profiler.request():
+                RequestProfile.tag(handler="handle_test_request")
+
+            captures = os.listdir(os.path.join(tmpdir, "captures"))
+            self.assertEqual(len(captures), 1)
+            self.assertTrue(captures[0].startswith("handle_test_request-"))
+
+            with open(os.path.join(tmpdir, f"stats-{os.getpid()}.json")) as fp:
+                stats = json.load(fp)
+            self.assertEqual(stats["requests"], 1)
+            self.assertEqual(stats["slow_requests"], 1)
+
+            # Resetting clears everything, including the capture count.
+            profiler.reset()
+            self.assertEqual(profiler.stats()["captures"], 0)
+
+    def test_concurrent_dumps(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            profiler = Profiler(
+                dump_file=os.path.join(tmpdir, "stats.json"),
+                dump_interval=0.0,
+            )
+            errors: List[Exception] = []
+
+            def work() -> None:
+                try:
+                    for _ in range(50):
+                        with profiler.request():
+                            pass
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=work) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            self.assertEqual(os.listdir(tmpdir), ["stats.json"])
+
+    def test_dump_failure(self) -> None:
+        # A dump file that can't be written doesn't fail the request being profiled.
+        with tempfile.TemporaryDirectory() as tmpdir:
+            profiler = Profiler(
+                dump_file=os.path.join(tmpdir, "missing", "stats.json"),
+                dump_interval=0.0,
+            )
+            with redirect_stderr(io.StringIO()) as stderr:
+                with profiler.request():
+                    pass
+            self.assertIn("Failed to dump profiling stats", stderr.getvalue())
+            self.assertEqual(profiler.stats()["requests"], 1)
@@ -2,7 +2,9 @@
 import random
 import unittest
 
+from bemani.protocol import rc4
 from bemani.protocol.protocol import EAmuseProtocol
+from bemani.protocol.rc4 import RC4
 
 
 class TestRC4Cipher(unittest.TestCase):
@@ -39,3 +41,15 @@ class TestRC4Cipher(unittest.TestCase):
 
         plaintext = proto._rc4_crypt(cyphertext, key)
         self.assertEqual(data, plaintext)
+
+    def test_native_matches_python(self) -> None:
+        if rc4.clib is None:
+            self.skipTest("C++ RC4 implementation is not built")
+
+        data = bytes([random.randint(0, 255) for _ in range(10 * 1024)])
+        key = bytes([random.randint(0, 255) for _ in range(16)])
+
+        self.assertEqual(
+            RC4(key, native=False).crypt(data),
+            RC4(key, native=True).crypt(data),
+        )
@@ -0,0 +1,117 @@
+# vim: set fileencoding=utf-8
+import unittest
+from unittest.mock import Mock
+
+from bemani.common import GameConstants
+from bemani.data import Config
+from bemani.data.mysql.user import UserData
+from bemani.data.types import UserID
+from bemani.tests.helpers import FakeCursor
+
+
+class TestUserData(unittest.TestCase):
+    def test_get_profiles(self) -> None:
+        user = UserData(Config({}), None)
+        user.execute = Mock(  # type: ignore
+            return_value=FakeCursor(
+                [
+                    {"userid": 2, "refid": "2", "extid": 22, "data": '{"name": "B"}'},
+                ]
+            )
+        )
+
+        profiles = user.get_profiles(
+            GameConstants.REFLEC_BEAT, 3, [UserID(1), UserID(2)]
+        )
+        self.assertEqual(user.execute.call_count, 1)
+        self.assertEqual([uid for (uid, _) in profiles], [1, 2])
+        self.assertIsNone(profiles[0][1])
+        found = profiles[1][1]
+        if found is None:
+            raise Exception("Expected a profile for user 2!")
+        self.assertEqual(found.extid, 22)
+        self.assertEqual(found.get_str("name"), "B")
+
+        # Nothing to look up means nothing to query.
+        self.assertEqual(user.get_profiles(GameConstants.REFLEC_BEAT, 3, []), [])
+        self.assertEqual(user.execute.call_count, 1)
+
+    def test_get_any_profiles(self) -> None:
+        user = UserData(Config({}), None)
+        user.execute = Mock(  # type: ignore
+            return_value=FakeCursor(
+                [
+                    {
+                        "userid": 1,
+                        "version": 2,
+                        "refid": "1",
+                        "extid": 11,
+                        "data": '{"name": "A"}',
+                    },
+                ]
+            )
+        )
+
+        profiles = user.get_any_profiles(
+            GameConstants.REFLEC_BEAT, 3, [UserID(1), UserID(2)]
+        )
+        self.assertEqual(user.execute.call_count, 1)
+        sql, params = user.execute.call_args[0]
+        self.assertEqual(params["userids"], [1, 2])
+        self.assertEqual(params["version"], 3)
+
+        # The profile keeps the version it was found under.
+        found = profiles[0][1]
+        if found is None:
+            raise Exception("Expected a profile for user 1!")
+        self.assertEqual(found.version, 2)
+        self.assertEqual(found.get_str("name"), "A")
+        self.assertIsNone(profiles[1][1])
+
+        profile = user.get_any_profile(GameConstants.REFLEC_BEAT, 3, UserID(1))
+        self.assertEqual(user.execute.call_count, 2)
+        if profile is None:
+            raise Exception("Expected a profile for user 1!")
+        self.assertEqual(profile.extid, 11)
+
+    def test_get_userids_for_cards(self) -> None:
+        UserData.CARD_CACHE.clear()
+        user = UserData(Config({"database": {"card_cache_ttl": 60}}), None)
+        user.execute = Mock(  # type: ignore
+            return_value=FakeCursor([{"id": "e004000000000001", "userid": 1}])
+        )
+
+        self.assertEqual(
+            user.get_userids_for_cards(["E004000000000001", "E004000000000002"]),
+            {"E004000000000001": 1},
+        )
+        self.assertEqual(user.execute.call_count, 1)
+        self.assertEqual(
+            sorted(user.execute.call_args.args[1]["cardids"]),
+            ["E004000000000001", "E004000000000002"],
+        )
+
+        # Both local and unknown cards are remembered.
+        self.assertEqual(
+            user.get_userids_for_cards(["e004000000000001", "E004000000000002"]),
+            {"E004000000000001": 1},
+        )
+        self.assertEqual(user.execute.call_count, 1)
+
+        # Adding a card to an account makes it get looked up again.
+        user.add_card(UserID(2), "E004000000000002")
+        user.execute = Mock(  # type: ignore
+            return_value=FakeCursor([{"id": "E004000000000002", "userid": 2}])
+        )
+        self.assertEqual(
+            user.get_userids_for_cards(["E004000000000001", "E004000000000002"]),
+            {"E004000000000001": 1, "E004000000000002": 2},
+        )
+        self.assertEqual(user.execute.call_count, 1)
+        self.assertEqual(
+            user.execute.call_args.args[1]["cardids"], ("E004000000000002",)
+        )
+
+        # Nothing to look up means nothing to query.
+        self.assertEqual(user.get_userids_for_cards([]), {})
+        self.assertEqual(user.execute.call_count, 1)
@@ -1,25 +1,27 @@
 # vim: set fileencoding=utf-8
 import unittest
 
-from bemani.protocol.xml import XmlDecoder
+from bemani.protocol.xml import XmlDecoder, XmlEncoding, XmlExpatDecoder
 
 
 class TestXmlDecoder(unittest.TestCase):
+    DECODER = XmlDecoder
+
     def test_detect_encoding(self) -> None:
-        xml = XmlDecoder(b'<?xml version="1.0" encoding="utf-8"?>', "ascii")
+        xml = self.DECODER(b'<?xml version="1.0" encoding="utf-8"?>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(xml.encoding, "utf-8")
         self.assertEqual(tree, None)
 
-        xml = XmlDecoder(b'<?xml\nversion = "1.0"\tencoding   =   "utf-8"?>', "ascii")
+        xml = self.DECODER(b'<?xml\nversion = "1.0"\tencoding   =   "utf-8"?>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(xml.encoding, "utf-8")
         self.assertEqual(tree, None)
 
     def test_decode_void(self) -> None:
-        xml = XmlDecoder(b"<node></node>", "ascii")
+        xml = self.DECODER(b"<node></node>", "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -28,7 +30,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.data_type, "void")
         self.assertEqual(tree.value, None)
 
-        xml = XmlDecoder(b"<node />", "ascii")
+        xml = self.DECODER(b"<node />", "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -38,7 +40,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.value, None)
 
     def test_decode_attributes(self) -> None:
-        xml = XmlDecoder(b'<node attr1="foo" attr2="bar"></node>', "ascii")
+        xml = self.DECODER(b'<node attr1="foo" attr2="bar"></node>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -47,7 +49,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.data_type, "void")
         self.assertEqual(tree.value, None)
 
-        xml = XmlDecoder(b'<node attr1="foo" attr2="bar" />', "ascii")
+        xml = self.DECODER(b'<node attr1="foo" attr2="bar" />', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -56,7 +58,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.data_type, "void")
         self.assertEqual(tree.value, None)
 
-        xml = XmlDecoder(b'<node\nattr1="foo"\tattr2="bar"/>', "ascii")
+        xml = self.DECODER(b'<node\nattr1="foo"\tattr2="bar"/>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -66,7 +68,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.value, None)
 
     def test_decode_bin(self) -> None:
-        xml = XmlDecoder(b'<node __type="bin">DEADBEEF</node>', "ascii")
+        xml = self.DECODER(b'<node __type="bin">DEADBEEF</node>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -75,7 +77,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.data_type, "bin")
         self.assertEqual(tree.value, b"\xDE\xAD\xBE\xEF")
 
-        xml = XmlDecoder(b'<node __type="bin">\nDEADBEEF\n</node>', "ascii")
+        xml = self.DECODER(b'<node __type="bin">\nDEADBEEF\n</node>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -84,7 +86,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.data_type, "bin")
         self.assertEqual(tree.value, b"\xDE\xAD\xBE\xEF")
 
-        xml = XmlDecoder(b'<node __type="bin"> D E A D B E E F </node>', "ascii")
+        xml = self.DECODER(b'<node __type="bin"> D E A D B E E F </node>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -94,7 +96,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.value, b"\xDE\xAD\xBE\xEF")
 
     def test_decode_array(self) -> None:
-        xml = XmlDecoder(b'<node __type="u32" __count="4">1 2 3 4</node>', "ascii")
+        xml = self.DECODER(b'<node __type="u32" __count="4">1 2 3 4</node>', "ascii")
         tree = xml.get_tree()
 
         self.assertEqual(tree.children, [])
@@ -103,7 +105,7 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.data_type, "u32")
         self.assertEqual(tree.value, [1, 2, 3, 4])
 
-        xml = XmlDecoder(
+        xml = self.DECODER(
             b'<node __type="u32" __count="4">\n1\n2\n3\n4\n</node>', "ascii"
         )
         tree = xml.get_tree()
@@ -113,3 +115,25 @@ class TestXmlDecoder(unittest.TestCase):
         self.assertEqual(tree.attributes, {})
         self.assertEqual(tree.data_type, "u32")
         self.assertEqual(tree.value, [1, 2, 3, 4])
+
+
+class TestXmlExpatDecoder(TestXmlDecoder):
+    DECODER = XmlExpatDecoder
+
+    def test_spec_differences(self) -> None:
+        # Expat follows the XML spec where the hand-rolled decoder doesn't, which is why
+        # it is not the default.
+        xml = self.DECODER(b'<node __type="str">&#x41;b</node>', "ascii")
+        self.assertEqual(xml.get_tree().value, "Ab")
+
+        xml = self.DECODER(b'<node attr="1\t2\n3"/>', "ascii")
+        self.assertEqual(xml.get_tree().attribute("attr"), "1 2 3")
+
+        xml = self.DECODER(b"<node><!-- comment --></node>", "ascii")
+        self.assertEqual(xml.get_tree().name, "node")
+
+    def test_default_backend(self) -> None:
+        encoding = XmlEncoding()
+        self.assertEqual(encoding.backend, XmlEncoding.BACKEND_PYTHON)
+        tree = encoding.decode(b'<node __type="str">&#x41;b</node>')
+        self.assertEqual(tree.value, "&#x41;b")
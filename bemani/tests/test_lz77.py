@@ -3,7 +3,7 @@ import os
 import random
 import unittest
 
-from bemani.protocol.lz77 import Lz77, Lz77Decompress
+from bemani.protocol.lz77 import Lz77, Lz77ChainCompress, Lz77Decompress, LzException
 from bemani.tests.helpers import get_fixture
 
 
@@ -26,6 +26,38 @@ class TestLZ77Decompressor(unittest.TestCase):
             # Verify integrity of ringbuffer
             self.assertEqual(len(dec.ring), Lz77Decompress.RING_LENGTH)
 
+    def test_decompress_into(self) -> None:
+        lz77 = Lz77()
+        data = get_fixture("declaration.txt")
+        compresseddata = lz77.compress(data)
+
+        # Streaming and in-place decompression should agree.
+        dec = Lz77Decompress(compresseddata)
+        self.assertEqual(data, b"".join(dec.decompress_bytes()))
+
+        # Growing an empty buffer.
+        outbuf = bytearray()
+        dec = Lz77Decompress(compresseddata)
+        self.assertEqual(len(data), dec.decompress_into(outbuf))
+        self.assertEqual(data, outbuf)
+
+        # Preallocated buffers, both exact and oversized.
+        for size in [len(data), len(data) * 2]:
+            outbuf = bytearray(size)
+            self.assertEqual(len(data), lz77.decompress_into(compresseddata, outbuf))
+            self.assertEqual(data, outbuf)
+
+    def test_backref_before_start(self) -> None:
+        # A backref reaching before the start of the stream reads zeros from the ring.
+        compresseddata = b"\x01a\x00\x30\x00\x00"
+        dec = Lz77Decompress(compresseddata)
+        self.assertEqual(b"a\x00\x00a", b"".join(dec.decompress_bytes()))
+
+        outbuf = bytearray()
+        dec = Lz77Decompress(compresseddata)
+        dec.decompress_into(outbuf)
+        self.assertEqual(b"a\x00\x00a", outbuf)
+
 
 class TestLz77RealCompressor(unittest.TestCase):
     def test_small_data_random(self) -> None:
@@ -103,3 +135,29 @@ class TestLz77RealCompressor(unittest.TestCase):
 
         decompresseddata = lz77.decompress(compresseddata)
         self.assertEqual(data, decompresseddata)
+
+    def test_compression_levels(self) -> None:
+        data = get_fixture("declaration.txt")
+        for level in range(Lz77.LEVEL_STORE, Lz77.LEVEL_BEST + 1):
+            lz77 = Lz77(level=level)
+            compresseddata = lz77.compress(data)
+            if level != Lz77.LEVEL_STORE:
+                self.assertTrue(len(compresseddata) < len(data))
+
+            decompresseddata = lz77.decompress(compresseddata)
+            self.assertEqual(data, decompresseddata)
+
+        with self.assertRaises(LzException):
+            Lz77(level=10)
+
+    def test_chain_compressor(self) -> None:
+        # Exercise odd lengths, overlaps and the end of stream marker landing
+        # exactly on a flag byte boundary.
+        for data in [b"", b"a", b"abcabcabcabc", b"\x00" * 100, os.urandom(64) * 4]:
+            for level in [1, 4, 8]:
+                max_chain, lazy = Lz77.CHAIN_LEVELS[level]
+                lz = Lz77ChainCompress(data, max_chain=max_chain, lazy=lazy)
+                compresseddata = b"".join(lz.compress_bytes())
+
+                dec = Lz77Decompress(compresseddata)
+                self.assertEqual(data, b"".join(dec.decompress_bytes()))
@@ -1,7 +1,10 @@
 # vim: set fileencoding=utf-8
+import array
 import unittest
 
 from bemani.protocol import EAmuseProtocol, Node
+from bemani.protocol.binary import BinaryEncoding, NodeNameCodec
+from bemani.protocol.xml import XmlEncoding
 
 
 class TestProtocol(unittest.TestCase):
@@ -10,6 +13,21 @@ class TestProtocol(unittest.TestCase):
     def assertLoopback(self, root: Node) -> None:
         proto = EAmuseProtocol()
 
+        # Both XML backends must agree on the documents we generate ourselves.
+        reference = XmlEncoding(XmlEncoding.BACKEND_PYTHON)
+        fast = XmlEncoding(XmlEncoding.BACKEND_EXPAT)
+        xml = reference.encode(root, encoding=EAmuseProtocol.SHIFT_JIS)
+        self.assertEqual(
+            fast.encode(root, encoding=EAmuseProtocol.SHIFT_JIS),
+            xml,
+            "Expat XML backend encoding doesn't match!",
+        )
+        self.assertEqual(
+            fast.decode(xml),
+            reference.decode(xml),
+            "Expat XML backend decoding doesn't match!",
+        )
+
         for encoding in [
             EAmuseProtocol.BINARY,
             EAmuseProtocol.BINARY_DECOMPRESSED,
@@ -38,6 +56,13 @@ class TestProtocol(unittest.TestCase):
                 f"Round trip with {loop_name} and no encryption/compression doesn't match!",
             )
 
+            newroot = proto.decode(None, None, binary, lazy=True)
+            self.assertEqual(
+                newroot,
+                root,
+                f"Round trip with {loop_name} and lazy decoding doesn't match!",
+            )
+
             binary = proto.encode(
                 None,
                 "1-abcdef-0123",
@@ -80,6 +105,85 @@ class TestProtocol(unittest.TestCase):
                 f"Round trip with {loop_name}, no encryption and lz77 compression doesn't match!",
             )
 
+    def test_iterparse(self) -> None:
+        root = Node.void("call")
+        root.set_attribute("model", "LDJ:A:A:A:2015060700")
+        music = Node.void("music")
+        music.set_attribute("method", "reg")
+        root.add_child(music)
+        music.add_child(Node.s32("mid", 1000))
+        music.add_child(Node.u8_array("ghost", [1, 2, 3, 4]))
+
+        binary = BinaryEncoding().encode(root, encoding=EAmuseProtocol.SHIFT_JIS)
+        events = [
+            (event, node.name) for event, node in BinaryEncoding().iterparse(binary)
+        ]
+        self.assertEqual(
+            events,
+            [
+                ("start", "call"),
+                ("start", "music"),
+                ("start", "mid"),
+                ("value", "mid"),
+                ("end", "mid"),
+                ("start", "ghost"),
+                ("value", "ghost"),
+                ("end", "ghost"),
+                ("end", "music"),
+                ("end", "call"),
+            ],
+        )
+
+        for event, node in BinaryEncoding().iterparse(binary):
+            if event == "start" and node.name == "music":
+                self.assertEqual(node.attribute("method"), "reg")
+            if event == "value" and node.name == "mid":
+                self.assertEqual(node.value, 1000)
+            if event == "value" and node.name == "ghost":
+                self.assertEqual(node.value, [1, 2, 3, 4])
+
+    def test_node_name_codec(self) -> None:
+        # Known packings taken from real game packets.
+        self.assertEqual(NodeNameCodec.pack("call"), b"\xa2\x6c\x71")
+        self.assertEqual(NodeNameCodec.unpack(4, b"\xa2\x6c\x71"), "call")
+
+        for name in ["a", "_", "info", "music_id", "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "0:9"]:
+            packed = NodeNameCodec.pack(name)
+            self.assertEqual(len(packed), (len(name) * 6 + 7) // 8)
+            self.assertEqual(NodeNameCodec.unpack(len(name), packed), name)
+
+        # Zero-length names pack to nothing and must still decode.
+        root = Node.void("root")
+        root.add_child(Node.s32("", 5))
+        decoded = BinaryEncoding().decode(BinaryEncoding().encode(root, "shift-jis"))
+        self.assertEqual(decoded.children[0].name, "")
+        self.assertEqual(decoded.children[0].value, 5)
+
+        NodeNameCodec.warm(["warmed", "not a valid name"])
+        info = NodeNameCodec.cache_info()
+        self.assertGreater(info["pack"]["currsize"], 0)
+        self.assertGreater(info["unpack"]["currsize"], 0)
+
+    def test_compact_node(self) -> None:
+        node = Node.s32_array("data", [-1, 0, 2147483647])
+        self.assertEqual(node.value, [-1, 0, 2147483647])
+        self.assertEqual(node.children, [])
+        self.assertEqual(node.attributes, {})
+        self.assertIsNone(node.child("missing"))
+
+        # Typed arrays as decoded from a packet compare equal to user-built lists.
+        other = Node.void("data")
+        other.set_type(Node.NODE_TYPE_S32, array=True)
+        other.set_value((-1, 0, 2147483647))
+        self.assertEqual(node, other)
+
+        node.set_value(array.array("i", [5, 6]))
+        self.assertEqual(node.value, [5, 6])
+        self.assertNotEqual(node, other)
+
+        with self.assertRaises(AttributeError):
+            setattr(node, "extra", 1)
+
     def test_game_packet1(self) -> None:
         root = Node.void("call")
         root.set_attribute("model", "M39:J:B:A:2014061900")
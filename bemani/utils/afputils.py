@@ -23,6 +23,7 @@ from bemani.format.afp import (
     Color,
     Matrix,
 )
+from bemani.format.afp.blend import COMPOSITE_BACKENDS, DEFAULT_COMPOSITE_BACKEND
 from bemani.format import IFS
 
 
@@ -439,15 +440,24 @@ def load_containers(
     # This is a complicated one, as we need to be able to specify multiple
     # directories of files as well as support IFS files and TXP2 files.
     for container in containers:
-        with open(container, "rb") as bfp:
-            data = bfp.read()
-
-        afpfile = None
+        # IFS files are memory-mapped and only read as needed, so try those first before
+        # reading in the whole file to see if it is a TXP2 container.
+        ifsfile = None
         try:
-            afpfile = TXP2File(data, verbose=verbose)
+            ifsfile = IFS.open(container, decode_textures=True)
         except Exception:
             pass
 
+        afpfile = None
+        if ifsfile is None:
+            with open(container, "rb") as bfp:
+                data = bfp.read()
+
+            try:
+                afpfile = TXP2File(data, verbose=verbose)
+            except Exception:
+                pass
+
         if afpfile is not None:
             if verbose:
                 print(
@@ -516,12 +526,6 @@ def load_containers(
 
             continue
 
-        ifsfile = None
-        try:
-            ifsfile = IFS(data, decode_textures=True)
-        except Exception:
-            pass
-
         if ifsfile is not None:
             if verbose:
                 print(
@@ -579,6 +583,9 @@ def load_containers(
                                 f"Added {afpname} to animation library.",
                                 file=sys.stderr,
                             )
+
+            # Everything we need was copied out above, so we can unmap the file.
+            ifsfile.close()
             continue
 
 
@@ -659,6 +666,7 @@ def render_path(
     *,
     disable_threads: bool = False,
     enable_anti_aliasing: bool = False,
+    composite_backend: Optional[str] = None,
     background_color: Optional[str] = None,
     background_image: Optional[str] = None,
     background_loop_start: Optional[int] = None,
@@ -680,7 +688,9 @@ def render_path(
         print("Loading textures, shapes and animation instructions...")
 
     renderer = AFPRenderer(
-        single_threaded=disable_threads, enable_aa=enable_anti_aliasing
+        single_threaded=disable_threads,
+        enable_aa=enable_anti_aliasing,
+        composite_backend=composite_backend,
     )
     load_containers(renderer, containers, need_extras=True, verbose=verbose)
 
@@ -868,60 +878,14 @@ def render_path(
     else:
         requested_frames = None
 
-    if fmt in ["GIF", "WEBP"]:
-        # Write all the frames out in one file.
-        duration = renderer.compute_path_frame_duration(path)
-        frames = renderer.compute_path_frames(path)
-        images: List[Image.Image] = []
-        for i, img in enumerate(
-            renderer.render_path(
-                path,
-                verbose=verbose,
-                background_color=color,
-                background_image=background,
-                only_depths=requested_depths,
-                only_frames=requested_frames,
-                movie_transform=transform,
-                overridden_width=override_width,
-                overridden_height=override_height,
-            )
-        ):
-            if show_progress:
-                frameno = (
-                    requested_frames[i] if requested_frames is not None else (i + 1)
-                )
-                print(f"Rendered animation frame {frameno}/{frames}.")
-            images.append(img)
-
-        if len(images) > 0:
-            try:
-                dirof = os.path.dirname(os.path.abspath(output))
-                os.makedirs(dirof, exist_ok=True)
-            except FileNotFoundError:
-                # Apparently on OSX this is possible?
-                pass
-
-            with open(output, "wb") as bfp:
-                images[0].save(
-                    bfp,
-                    format=fmt,
-                    save_all=True,
-                    append_images=images[1:],
-                    duration=duration,
-                    optimize=True,
-                )
-
-            print(f"Wrote animation to {output}")
-    else:
-        # Write all the frames out in individual_files.
-        filename = output[:-4]
-        ext = output[-4:]
-
-        # Figure out padding for the images.
-        frames = renderer.compute_path_frames(path)
-        if frames > 0:
-            digits = f"0{int(math.log10(frames)) + 1}"
-
+    # Compositing may have started worker processes and shared memory, make sure they're
+    # released even if rendering fails part of the way through.
+    try:
+        if fmt in ["GIF", "WEBP"]:
+            # Write all the frames out in one file.
+            duration = renderer.compute_path_frame_duration(path)
+            frames = renderer.compute_path_frames(path)
+            images: List[Image.Image] = []
             for i, img in enumerate(
                 renderer.render_path(
                     path,
@@ -931,24 +895,75 @@ def render_path(
                     only_depths=requested_depths,
                     only_frames=requested_frames,
                     movie_transform=transform,
+                    overridden_width=override_width,
+                    overridden_height=override_height,
                 )
             ):
-                frameno = (
-                    requested_frames[i] if requested_frames is not None else (i + 1)
-                )
-                fullname = f"{filename}-{frameno:{digits}}{ext}"
+                if show_progress:
+                    frameno = (
+                        requested_frames[i] if requested_frames is not None else (i + 1)
+                    )
+                    print(f"Rendered animation frame {frameno}/{frames}.")
+                images.append(img)
 
+            if len(images) > 0:
                 try:
-                    dirof = os.path.dirname(os.path.abspath(fullname))
+                    dirof = os.path.dirname(os.path.abspath(output))
                     os.makedirs(dirof, exist_ok=True)
                 except FileNotFoundError:
                     # Apparently on OSX this is possible?
                     pass
 
-                with open(fullname, "wb") as bfp:
-                    img.save(bfp, format=fmt)
+                with open(output, "wb") as bfp:
+                    images[0].save(
+                        bfp,
+                        format=fmt,
+                        save_all=True,
+                        append_images=images[1:],
+                        duration=duration,
+                        optimize=True,
+                    )
 
-                print(f"Wrote animation frame to {fullname}")
+                print(f"Wrote animation to {output}")
+        else:
+            # Write all the frames out in individual_files.
+            filename = output[:-4]
+            ext = output[-4:]
+
+            # Figure out padding for the images.
+            frames = renderer.compute_path_frames(path)
+            if frames > 0:
+                digits = f"0{int(math.log10(frames)) + 1}"
+
+                for i, img in enumerate(
+                    renderer.render_path(
+                        path,
+                        verbose=verbose,
+                        background_color=color,
+                        background_image=background,
+                        only_depths=requested_depths,
+                        only_frames=requested_frames,
+                        movie_transform=transform,
+                    )
+                ):
+                    frameno = (
+                        requested_frames[i] if requested_frames is not None else (i + 1)
+                    )
+                    fullname = f"{filename}-{frameno:{digits}}{ext}"
+
+                    try:
+                        dirof = os.path.dirname(os.path.abspath(fullname))
+                        os.makedirs(dirof, exist_ok=True)
+                    except FileNotFoundError:
+                        # Apparently on OSX this is possible?
+                        pass
+
+                    with open(fullname, "wb") as bfp:
+                        img.save(bfp, format=fmt)
+
+                    print(f"Wrote animation frame to {fullname}")
+    finally:
+        renderer.close()
 
     return 0
 
@@ -1334,6 +1349,16 @@ def main() -> int:
         action="store_true",
         help="Enable anti-aliased rendering, using bilinear interpolation and super-sampling where appropriate to produce the best resulting animation.",
     )
+    render_parser.add_argument(
+        "--composite-backend",
+        type=str,
+        choices=list(COMPOSITE_BACKENDS),
+        default=DEFAULT_COMPOSITE_BACKEND,
+        help=(
+            "Compositing implementation to render with. Defaults to the fastest one available, which is the compiled "
+            "C++ extension, then the numpy implementation if numpy is installed, then pure python."
+        ),
+    )
 
     list_parser = subparsers.add_parser(
         "list",
@@ -1411,6 +1436,7 @@ def main() -> int:
             args.output,
             disable_threads=args.disable_threads,
             enable_anti_aliasing=args.enable_anti_aliasing,
+            composite_backend=args.composite_backend,
             background_color=args.background_color,
             background_image=args.background_image,
             background_loop_start=args.background_loop_start,
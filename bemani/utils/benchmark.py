@@ -0,0 +1,630 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.sql import text  # type: ignore
+
+from bemani import package_root
+from bemani.common import GameConstants
+from bemani.data import Config, Data, DBCreateException, UserID
+from bemani.data.mysql.base import BaseData
+from bemani.protocol import EAmuseProtocol, EAmuseException, Node, rc4
+from bemani.protocol.binary import (
+    BinaryEncoding,
+    NodeNameCodec,
+    _pack_name,
+    _unpack_name,
+)
+from bemani.protocol.lz77 import Lz77
+from bemani.protocol.xml import XmlEncoding
+from bemani.protocol.rc4 import RC4
+from bemani.utils.config import load_config
+
+
+def time_call(func: Callable[[], Any], iterations: int) -> float:
+    """
+    Call a function the given number of times and return the average wall-clock
+    time per call in seconds.
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def print_timing(name: str, size: int, seconds: float) -> None:
+    """
+    Print a single benchmark result line, including throughput.
+    """
+    throughput = (size / seconds) / (1024 * 1024) if seconds > 0 else 0.0
+    print(
+        f"{name:<24} {size:>10} bytes {seconds * 1000000:>12.1f} us {throughput:>10.2f} MiB/s"
+    )
+
+
+def benchmark_rc4(sizes: List[int], iterations: int) -> int:
+    backends = [("python", False)]
+    if rc4.clib is not None:
+        backends.append(("native", True))
+    else:
+        print("C++ RC4 implementation is not built, only benchmarking python!")
+
+    key = os.urandom(16)
+    for size in sizes:
+        data = os.urandom(size)
+        for name, native in backends:
+            # Uncached schedule, as would happen for the first packet of a session.
+            def uncached() -> None:
+                rc4._schedule.cache_clear()
+                RC4(key, native=native).crypt(data)
+
+            # Cached schedule, as happens for a response to an already-seen key.
+            def cached() -> None:
+                RC4(key, native=native).crypt(data)
+
+            print_timing(f"rc4 {name}", size, time_call(uncached, iterations))
+            print_timing(f"rc4 {name} (cached)", size, time_call(cached, iterations))
+
+    return 0
+
+
+def load_packets(filenames: List[str]) -> List[Tuple[str, bytes]]:
+    """
+    Load packets to benchmark with. Packets as logged by services, proxy or trafficgen
+    are decoded and re-encoded to the binary form that is compressed on the wire. Anything
+    that cannot be decoded is used as-is. If no files are given, the test fixtures are used.
+    """
+    if not filenames:
+        filenames = [
+            os.path.join(package_root, "tests", name)
+            for name in ["declaration.txt", "lorem.txt", "rawdata"]
+        ]
+
+    packets: List[Tuple[str, bytes]] = []
+    for filename in filenames:
+        with open(filename, "rb") as fp:
+            data = fp.read()
+
+        try:
+            proto = EAmuseProtocol()
+            tree = proto.decode(None, None, data)
+            data = proto.encode(
+                None,
+                None,
+                tree,
+                packet_encoding=EAmuseProtocol.BINARY,
+            )
+        except EAmuseException:
+            pass
+
+        packets.append((os.path.basename(filename), data))
+    return packets
+
+
+def benchmark_lz77(filenames: List[str], levels: List[int], iterations: int) -> int:
+    for name, data in load_packets(filenames):
+        for level in levels:
+            lz = Lz77(level=level)
+            compressed = lz.compress(data)
+            if lz.decompress(compressed) != data:
+                raise Exception(f"Level {level} failed to round-trip {name}!")
+
+            seconds = time_call(lambda: lz.compress(data), iterations)
+            ratio = len(compressed) / len(data) if data else 1.0
+            print_timing(f"{name} level {level}", len(data), seconds)
+            print(f"{'':<24} {len(compressed):>10} bytes {ratio * 100:>12.1f} %")
+
+    return 0
+
+
+def generate_response(entries: int) -> Node:
+    """
+    Generate a response tree shaped like a typical game profile load, with a mix
+    of scalar values, strings, attributes and arrays, and a list of score entries.
+    """
+    root = Node.void("response")
+    game = Node.void("game")
+    root.add_child(game)
+    game.set_attribute("status", "0")
+
+    profile = Node.void("profile")
+    game.add_child(profile)
+    profile.add_child(Node.string("name", "PLAYER"))
+    profile.add_child(Node.s32("user_id", 12345678))
+    profile.add_child(Node.u8_array("settings", [0] * 64))
+    profile.add_child(Node.s32_array("achievements", list(range(32))))
+
+    music = Node.void("music")
+    game.add_child(music)
+    for i in range(entries):
+        info = Node.void("info")
+        music.add_child(info)
+        info.set_attribute("mid", str(i))
+        info.add_child(Node.s32("music_id", i))
+        info.add_child(Node.u8("chart", i % 4))
+        info.add_child(Node.u32("score", i * 1000))
+        info.add_child(Node.u16_array("clear", [i & 0xFFFF, 0, 0, 0]))
+
+    return root
+
+
+def benchmark_binary(sizes: List[int], iterations: int) -> int:
+    for size in sizes:
+        tree = generate_response(size)
+        data = BinaryEncoding().encode(tree, encoding=EAmuseProtocol.SHIFT_JIS)
+
+        def encode() -> None:
+            BinaryEncoding().encode(tree, encoding=EAmuseProtocol.SHIFT_JIS)
+
+        def decode() -> None:
+            BinaryEncoding().decode(data)
+
+        def encode_uncached() -> None:
+            _pack_name.cache_clear()
+            encode()
+
+        def decode_uncached() -> None:
+            _unpack_name.cache_clear()
+            decode()
+
+        print_timing(
+            f"encode {size} (cold)", len(data), time_call(encode_uncached, iterations)
+        )
+        print_timing(
+            f"encode {size} (cached)", len(data), time_call(encode, iterations)
+        )
+        print_timing(
+            f"decode {size} (cold)", len(data), time_call(decode_uncached, iterations)
+        )
+        print_timing(
+            f"decode {size} (cached)", len(data), time_call(decode, iterations)
+        )
+
+    print(NodeNameCodec.cache_info())
+    return 0
+
+
+def measure_memory(func: Callable[[], Any]) -> int:
+    """
+    Call a function and return the number of bytes still allocated by the object it
+    returns, as measured by tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = func()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def benchmark_node(sizes: List[int], iterations: int) -> int:
+    for size in sizes:
+        tree = generate_response(size)
+        data = BinaryEncoding().encode(tree, encoding=EAmuseProtocol.SHIFT_JIS)
+
+        def build() -> Node:
+            return generate_response(size)
+
+        def decode() -> Optional[Node]:
+            return BinaryEncoding().decode(data)
+
+        music = tree.child("game/music")
+        if music is None:
+            raise Exception("Logic error, generated response has no music node!")
+
+        def values() -> None:
+            for child in music.children:
+                child.child_value("music_id")
+                child.child_value("clear")
+
+        print_timing(f"build {size}", len(data), time_call(build, iterations))
+        print_timing(f"decode {size}", len(data), time_call(decode, iterations))
+        print_timing(f"values {size}", len(data), time_call(values, iterations))
+        print(f"{'':<24} {measure_memory(build):>10} bytes built tree")
+        print(f"{'':<24} {measure_memory(decode):>10} bytes decoded tree")
+
+    return 0
+
+
+def benchmark_xml(sizes: List[int], iterations: int) -> int:
+    for size in sizes:
+        tree = generate_response(size)
+        reference = XmlEncoding(XmlEncoding.BACKEND_PYTHON).encode(
+            tree, encoding=EAmuseProtocol.SHIFT_JIS
+        )
+
+        for backend in XmlEncoding.BACKENDS:
+            xml = XmlEncoding(backend)
+            data = xml.encode(tree, encoding=EAmuseProtocol.SHIFT_JIS)
+            if data != reference:
+                raise Exception(f"Backend {backend} encoded {size} differently!")
+            if xml.decode(data) != tree:
+                raise Exception(f"Backend {backend} failed to round-trip {size}!")
+
+            def encode() -> None:
+                xml.encode(tree, encoding=EAmuseProtocol.SHIFT_JIS)
+
+            def decode() -> None:
+                xml.decode(data)
+
+            print_timing(
+                f"encode {size} ({backend})", len(data), time_call(encode, iterations)
+            )
+            print_timing(
+                f"decode {size} ({backend})", len(data), time_call(decode, iterations)
+            )
+
+    return 0
+
+
+def generate_blob(ghosts: int) -> Dict[str, Any]:
+    """
+    Generate a data blob shaped like a profile or score for a game that stores
+    ghost data, with a mix of scalars, lists, nested dictionaries and bytes.
+    """
+    rng = random.Random(ghosts)
+    return {
+        "name": "PLAYER",
+        "settings": {"hispeed": 25, "options": [0] * 16},
+        "achievements": list(range(256)),
+        "last_ghost": bytes(rng.randrange(4) for _ in range(64)),
+        "ghosts": [
+            {
+                "music_id": i,
+                "points": rng.randrange(3000),
+                "ghost": bytes(rng.randrange(8) for _ in range(800)),
+            }
+            for i in range(ghosts)
+        ],
+    }
+
+
+def benchmark_blobs(sizes: List[int], iterations: int) -> int:
+    class LegacyEncoder(json.JSONEncoder):
+        def default(self, obj: Any) -> Any:
+            if isinstance(obj, bytes):
+                return ["__bytes__"] + [b for b in obj]
+            return json.JSONEncoder.default(self, obj)
+
+    base = BaseData(Config(), None)
+    for size in sizes:
+        blob = generate_blob(size)
+        legacy = json.dumps(blob, cls=LegacyEncoder)
+        current = base.serialize(blob)
+        if base.deserialize(legacy) != blob or base.deserialize(current) != blob:
+            raise Exception(f"Failed to round-trip blob with {size} ghosts!")
+
+        def encode_legacy() -> None:
+            json.dumps(blob, cls=LegacyEncoder)
+
+        def encode() -> None:
+            base.serialize(blob)
+
+        def decode_legacy() -> None:
+            base.deserialize(legacy)
+
+        def decode() -> None:
+            base.deserialize(current)
+
+        print_timing(
+            f"encode {size} (legacy)", len(legacy), time_call(encode_legacy, iterations)
+        )
+        print_timing(f"encode {size}", len(current), time_call(encode, iterations))
+        print_timing(
+            f"decode {size} (legacy)", len(legacy), time_call(decode_legacy, iterations)
+        )
+        print_timing(f"decode {size}", len(current), time_call(decode, iterations))
+
+    return 0
+
+
+def seed_scores(config: Config, users: int, songs: int, plays: int) -> None:
+    """
+    Fill an empty database with a synthetic IIDX catalog spread over two versions, a high
+    score for a random selection of charts per user and the given number of attempts.
+    """
+    charts = 5
+    engine = config.database.engine
+    with engine.begin() as conn:
+
+        def insert(sql: str, rows: List[Dict[str, Any]]) -> None:
+            for offset in range(0, len(rows), 10000):
+                conn.execute(text(sql), rows[offset : offset + 10000])
+
+        music: List[Dict[str, Any]] = []
+        for version in [1, 2]:
+            for songid in range(songs):
+                for chart in range(charts):
+                    music.append(
+                        {
+                            "id": songid * charts + chart + 1,
+                            "songid": 1000 + songid,
+                            "chart": chart,
+                            "version": version,
+                        }
+                    )
+        insert(
+            "INSERT INTO music (id, songid, chart, game, version, name, artist, genre, data) "
+            + "VALUES (:id, :songid, :chart, 'iidx', :version, '', '', '', '{}')",
+            music,
+        )
+
+        musicids = list(range(1, songs * charts + 1))
+        history: List[Dict[str, Any]] = []
+        for play in range(plays):
+            history.append(
+                {
+                    "userid": random.randint(1, users),
+                    "musicid": random.choice(musicids),
+                    "timestamp": play,
+                    "points": random.randint(0, 3000),
+                }
+            )
+        insert(
+            "INSERT INTO score_history (userid, musicid, timestamp, lid, new_record, points, data) "
+            + "VALUES (:userid, :musicid, :timestamp, 1, 0, :points, '{}')",
+            history,
+        )
+
+        best: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        for row in history:
+            key = (row["userid"], row["musicid"])
+            if key not in best or row["points"] >= best[key]["points"]:
+                best[key] = row
+        insert(
+            "INSERT INTO score (userid, musicid, points, timestamp, `update`, lid, data) "
+            + "VALUES (:userid, :musicid, :points, :timestamp, :timestamp, 1, '{}')",
+            list(best.values()),
+        )
+
+        conn.execute(
+            text(
+                "INSERT INTO score_play_count (userid, musicid, plays) "
+                + "SELECT userid, musicid, COUNT(timestamp) FROM score_history GROUP BY userid, musicid"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO music_play_count (musicid, plays) "
+                + "SELECT musicid, COUNT(timestamp) FROM score_history GROUP BY musicid"
+            )
+        )
+
+
+def benchmark_scores(
+    configfile: str, users: int, songs: int, plays: int, iterations: int
+) -> int:
+    config = Config()
+    load_config(configfile, config)
+    data = Data(config)
+    try:
+        data.create()
+    except DBCreateException:
+        print(
+            "Database already exists, reusing its contents! Point the config at an "
+            + "empty scratch database to seed synthetic data."
+        )
+    else:
+        print(
+            f"Seeding {users} users, {songs} songs and {plays} plays, this may take a while..."
+        )
+        seed_scores(config, users, songs, plays)
+        # Seeding writes the score tables directly, so records need to be brought up to
+        # date the same way "dbutils rebuild-records" does.
+        data.local.music.rebuild_records()
+
+    music = data.local.music
+    userlist = [UserID(userid) for userid in range(1, 11)]
+    queries: List[Tuple[str, Callable[[], List[Any]]]] = [
+        ("get_scores", lambda: music.get_scores(GameConstants.IIDX, 2, UserID(1))),
+        ("get_all_scores", lambda: music.get_all_scores(GameConstants.IIDX, 2)),
+        (
+            "get_all_scores (user)",
+            lambda: music.get_all_scores(GameConstants.IIDX, 2, userid=UserID(1)),
+        ),
+        (
+            "get_all_scores (any ver)",
+            lambda: music.get_all_scores(GameConstants.IIDX, songid=1000),
+        ),
+        ("get_all_records", lambda: music.get_all_records(GameConstants.IIDX, 2)),
+        (
+            "get_all_records (users)",
+            lambda: music.get_all_records(GameConstants.IIDX, 2, userlist=userlist),
+        ),
+        (
+            "get_all_records (any ver)",
+            lambda: music.get_all_records(GameConstants.IIDX),
+        ),
+    ]
+    for name, query in queries:
+        rows = len(query())
+        seconds = time_call(query, iterations)
+        print(f"{name:<26} {rows:>10} rows {seconds * 1000:>12.2f} ms")
+
+    data.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="A utility for measuring the performance of hot code paths."
+    )
+    parser.add_argument(
+        "-n",
+        "--iterations",
+        help="Number of iterations to average over for each measurement.",
+        type=int,
+        default=100,
+    )
+    subparsers = parser.add_subparsers(help="Benchmark to run", dest="action")
+
+    rc4_parser = subparsers.add_parser(
+        "rc4",
+        help="Benchmark RC4 packet encryption",
+        description="Compare python and C++ RC4 implementations across packet sizes.",
+    )
+    rc4_parser.add_argument(
+        "-s",
+        "--size",
+        help="Packet size in bytes to benchmark. Can be specified multiple times.",
+        type=int,
+        action="append",
+        default=[],
+    )
+
+    lz77_parser = subparsers.add_parser(
+        "lz77",
+        help="Benchmark Lz77 packet compression",
+        description="Compare compression ratio and throughput of each Lz77 compression level.",
+    )
+    lz77_parser.add_argument(
+        "-f",
+        "--file",
+        help=(
+            "Captured packet to compress, as logged by services, proxy or trafficgen. Can be "
+            "specified multiple times. Defaults to the unit test fixtures."
+        ),
+        type=str,
+        action="append",
+        default=[],
+    )
+    lz77_parser.add_argument(
+        "-l",
+        "--level",
+        help="Compression level to benchmark. Can be specified multiple times. Defaults to all levels.",
+        type=int,
+        action="append",
+        default=[],
+    )
+
+    binary_parser = subparsers.add_parser(
+        "binary",
+        help="Benchmark binary packet encoding and decoding",
+        description="Measure binary encode/decode throughput for generated response trees.",
+    )
+    binary_parser.add_argument(
+        "-e",
+        "--entries",
+        help="Number of score entries in the generated response. Can be specified multiple times.",
+        type=int,
+        action="append",
+        default=[],
+    )
+
+    node_parser = subparsers.add_parser(
+        "node",
+        help="Benchmark node tree memory usage and access",
+        description="Measure construction time, value access time and memory usage of generated response trees.",
+    )
+    node_parser.add_argument(
+        "-e",
+        "--entries",
+        help="Number of score entries in the generated response. Can be specified multiple times.",
+        type=int,
+        action="append",
+        default=[],
+    )
+
+    xml_parser = subparsers.add_parser(
+        "xml",
+        help="Benchmark XML packet encoding and decoding",
+        description="Compare XML backends on generated response trees, verifying that their output matches.",
+    )
+    xml_parser.add_argument(
+        "-e",
+        "--entries",
+        help="Number of score entries in the generated response. Can be specified multiple times.",
+        type=int,
+        action="append",
+        default=[],
+    )
+
+    blobs_parser = subparsers.add_parser(
+        "blobs",
+        help="Benchmark data blob serialization",
+        description="Compare size and speed of the legacy and current JSON data blob encodings.",
+    )
+    blobs_parser.add_argument(
+        "-g",
+        "--ghosts",
+        help="Number of ghosts in the generated blob. Can be specified multiple times.",
+        type=int,
+        action="append",
+        default=[],
+    )
+
+    scores_parser = subparsers.add_parser(
+        "scores",
+        help="Benchmark score and record lookups against a database",
+        description=(
+            "Time score and record lookups. If the configured database is empty, it is "
+            "first created and seeded with synthetic data, so point this at a scratch "
+            "database and not a production one."
+        ),
+    )
+    scores_parser.add_argument(
+        "-c",
+        "--config",
+        help="Core configuration for the database to use. Defaults to server.yaml",
+        type=str,
+        default="server.yaml",
+    )
+    scores_parser.add_argument(
+        "-u",
+        "--users",
+        help="Number of users to seed. Defaults to 1000.",
+        type=int,
+        default=1000,
+    )
+    scores_parser.add_argument(
+        "-s",
+        "--songs",
+        help="Number of songs to seed, each with five charts. Defaults to 1000.",
+        type=int,
+        default=1000,
+    )
+    scores_parser.add_argument(
+        "-p",
+        "--plays",
+        help="Number of score history entries to seed. Defaults to 1000000.",
+        type=int,
+        default=1000000,
+    )
+
+    args = parser.parse_args()
+
+    if args.action == "rc4":
+        return benchmark_rc4(
+            args.size or [64, 1024, 16 * 1024, 128 * 1024], args.iterations
+        )
+    elif args.action == "lz77":
+        return benchmark_lz77(
+            args.file,
+            args.level or list(range(Lz77.LEVEL_STORE, Lz77.LEVEL_BEST + 1)),
+            args.iterations,
+        )
+    elif args.action == "binary":
+        return benchmark_binary(args.entries or [10, 100, 500], args.iterations)
+    elif args.action == "node":
+        return benchmark_node(args.entries or [10, 100, 500], args.iterations)
+    elif args.action == "xml":
+        return benchmark_xml(args.entries or [10, 100, 500], args.iterations)
+    elif args.action == "blobs":
+        return benchmark_blobs(args.ghosts or [0, 10, 100], args.iterations)
+    elif args.action == "scores":
+        return benchmark_scores(
+            args.config, args.users, args.songs, args.plays, args.iterations
+        )
+    else:
+        raise Exception(f"Invalid action {args.action}!")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 import yaml
-from typing import Set
+from typing import Optional, Set
 
 from bemani.backend.iidx import IIDXFactory
 from bemani.backend.popn import PopnMusicFactory
@@ -10,14 +10,48 @@ from bemani.backend.sdvx import SoundVoltexFactory
 from bemani.backend.reflec import ReflecBeatFactory
 from bemani.backend.museca import MusecaFactory
 from bemani.backend.mga import MetalGearArcadeFactory
-from bemani.common import GameConstants
+from bemani.common import GameConstants, Parallel
 from bemani.data import Config, Data
+from bemani.data.api.cache import (
+    FilesystemResponseCache,
+    MemoryResponseCache,
+    ResponseCache,
+)
+from bemani.data.api.client import APIClient
 
 
 def load_config(filename: str, config: Config) -> None:
     config.update(yaml.safe_load(open(filename)))
     config["database"]["engine"] = Data.create_engine(config)
     config["filename"] = filename
+    Parallel.configure(
+        max_workers=config.parallel.max_workers,
+        timeout=config.parallel.timeout,
+    )
+    APIClient.configure(
+        connect_timeout=config.federation.connect_timeout,
+        timeout=config.federation.timeout,
+        max_connections=config.federation.max_connections,
+        failure_threshold=config.federation.failure_threshold,
+        retry_interval=config.federation.retry_interval,
+    )
+    cache: Optional[ResponseCache] = None
+    if config.federation.cache_backend == "memory":
+        cache = MemoryResponseCache(config.federation.cache_max_entries)
+    elif config.federation.cache_backend == "filesystem":
+        cache = FilesystemResponseCache(
+            config.federation.cache_directory,
+            config.federation.cache_max_entries,
+        )
+    elif config.federation.cache_backend != "none":
+        raise Exception(
+            f"Unknown federation cache backend '{config.federation.cache_backend}'!"
+        )
+    APIClient.configure_cache(
+        cache,
+        config.federation.cache_ttls,
+        config.federation.cache_stale,
+    )
 
     supported_series: Set[GameConstants] = set()
     for series in GameConstants:
@@ -27,6 +27,22 @@ def upgrade(config: Config) -> None:
     data.close()
 
 
+def rebuild_records(config: Config) -> None:
+    data = Data(config)
+    data.local.music.rebuild_records()
+    data.close()
+    print("Records rebuilt.")
+
+
+def reencode_blobs(config: Config, batch_size: int) -> None:
+    data = Data(config)
+    for table, count in data.reencode_blobs(batch_size).items():
+        if count > 0:
+            print(f"Rewrote {count} rows in {table}.")
+    data.close()
+    print("Data blobs reencoded.")
+
+
 def change_password(config: Config, username: Optional[str]) -> None:
     if username is None:
         raise Exception("Please provide a username!")
@@ -74,7 +90,7 @@ def main() -> None:
     )
     parser.add_argument(
         "operation",
-        help="Operation to perform, options include 'create', 'generate', 'upgrade', 'change-password', 'add-admin' and 'remove-admin'.",
+        help="Operation to perform, options include 'create', 'generate', 'upgrade', 'change-password', 'add-admin', 'remove-admin', 'rebuild-records' and 'reencode-blobs'.",
         type=str,
     )
     parser.add_argument(
@@ -95,6 +111,13 @@ def main() -> None:
         help="Allow empty migration script to be generated. Useful for data-only migrations.",
         action="store_true",
     )
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        help="Number of rows to rewrite at once when reencoding data blobs.",
+        type=int,
+        default=1000,
+    )
     parser.add_argument(
         "-c",
         "--config",
@@ -120,6 +143,10 @@ def main() -> None:
             remove_admin(config, args.username)
         elif args.operation == "change-password":
             change_password(config, args.username)
+        elif args.operation == "rebuild-records":
+            rebuild_records(config)
+        elif args.operation == "reencode-blobs":
+            reencode_blobs(config, args.batch_size)
         else:
             raise Exception(f"Unknown operation '{args.operation}'")
     except DBCreateException as e:
@@ -41,12 +41,8 @@ def main() -> None:
     def load_ifs(fname: str, root: bool = False) -> Optional[IFS]:
         fname = os.path.join(fileroot, fname)
         if os.path.isfile(fname):
-            fp = open(fname, "rb")
-            data = fp.read()
-            fp.close()
-
-            return IFS(
-                data,
+            return IFS.open(
+                fname,
                 decode_binxml=root and args.convert_xml_files,
                 decode_textures=root and args.convert_texture_files,
                 keep_hex_names=not root,
@@ -59,13 +55,14 @@ def main() -> None:
     if ifs is None:
         raise Exception(f"Couldn't locate file {args.file}!")
 
-    for fn in ifs.filenames:
-        print(f"Extracting {fn} to disk...")
-        realfn = os.path.join(root, fn)
-        dirof = os.path.dirname(realfn)
-        os.makedirs(dirof, exist_ok=True)
-        with open(realfn, "wb") as fp:
-            fp.write(ifs.read_file(fn))
+    with ifs:
+        for fn in ifs.filenames:
+            print(f"Extracting {fn} to disk...")
+            realfn = os.path.join(root, fn)
+            dirof = os.path.dirname(realfn)
+            os.makedirs(dirof, exist_ok=True)
+            with open(realfn, "wb") as fp:
+                fp.write(ifs.read_view(fn))
 
 
 if __name__ == "__main__":
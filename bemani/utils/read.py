@@ -8,12 +8,17 @@ import jaconv  # type: ignore
 import json
 import os
 import struct
+import threading
+import time
 import xml.etree.ElementTree as ET
-from sqlalchemy.engine import CursorResult  # type: ignore
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from sqlalchemy.engine import Connection, CursorResult  # type: ignore
 from sqlalchemy.orm import sessionmaker  # type: ignore
 from sqlalchemy.sql import text  # type: ignore
 from sqlalchemy.exc import IntegrityError  # type: ignore
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from typing_extensions import Final
 
 from bemani.common import GameConstants, VersionConstants, DBConstants, PEFile, Time
 from bemani.format import ARC, IFS, IIDXChart, IIDXMusicDB
@@ -45,6 +50,13 @@ class ReadAPI(APIProviderInterface):
 
 
 class ImportBase:
+    # Number of rows written by a single multi-row INSERT statement.
+    INSERT_CHUNK_SIZE: Final[int] = 500
+
+    # Number of rows written before committing, so that a whole import doesn't need to
+    # be one enormous transaction but also doesn't commit once per song.
+    COMMIT_INTERVAL: Final[int] = 5000
+
     def __init__(
         self,
         config: Config,
@@ -52,24 +64,170 @@ class ImportBase:
         version: Optional[int],
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         self.game = game
         self.version = version
         self.update = update
         self.no_combine = no_combine
+        self.dry_run = dry_run
         self.__config = config
         self.__engine = self.__config.database.engine
         self.__sessionmanager = sessionmaker(self.__engine)
         self.__conn = self.__engine.connect()
         self.__session = self.__sessionmanager(bind=self.__conn)
+        self.__remote_conn: Optional[Connection] = None
         self.__batch = False
 
+        # Every statement runs on a single writer thread that owns the above session, so
+        # that writing to the DB overlaps with parsing game data on the calling thread.
+        self.__writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="import-writer"
+        )
+        self.__writes: List["Future[Any]"] = []
+        self.__lock = threading.Lock()
+        self.__timings: Dict[str, float] = {}
+        self.__counts: Dict[str, int] = {}
+        self.__started = time.monotonic()
+
+        # Index of every music entry for this game, keyed by song ID and chart and then
+        # by version, along with the catalog keys for this version. These are loaded in
+        # the background while game data is parsed, and kept up to date as entries are
+        # queued, so that looking up or allocating a music ID never needs a query.
+        self.__music: Dict[Tuple[int, int], Dict[int, int]] = {}
+        self.__max_music_id = 0
+        self.__catalog: Set[Tuple[str, int]] = set()
+        self.__pending_music: List[Dict[str, Any]] = []
+        self.__pending_catalog: List[Dict[str, Any]] = []
+        self.__uncommitted = 0
+        self.__loaded = self.__writer.submit(self.__load)
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[None]:
+        """
+        Add the time spent inside this context to the named stage of the summary that
+        is printed once the import is closed.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.__lock:
+                self.__timings[stage] = (
+                    self.__timings.get(stage, 0.0) + time.monotonic() - start
+                )
+
+    def __count(self, name: str, amount: int = 1) -> None:
+        with self.__lock:
+            self.__counts[name] = self.__counts.get(name, 0) + amount
+
+    def __load(self) -> None:
+        with self.timed("load"):
+            cursor = self.__session.execute(
+                text(
+                    "SELECT id, songid, chart, version FROM `music` WHERE game = :game"
+                ),
+                {"game": self.game.value},
+            )
+            for result in cursor:
+                self.__music.setdefault((result["songid"], result["chart"]), {})[
+                    result["version"]
+                ] = result["id"]
+
+            # Music IDs are shared between every game, so this is across the whole table.
+            cursor = self.__session.execute(
+                text("SELECT MAX(id) AS max_id FROM `music`")
+            )
+            self.__max_music_id = cursor.fetchone()["max_id"] or 0
+
+            if self.version is not None:
+                cursor = self.__session.execute(
+                    text(
+                        "SELECT type, id FROM `catalog` WHERE game = :game AND version = :version"
+                    ),
+                    {"game": self.game.value, "version": self.version},
+                )
+                self.__catalog = {(result["type"], result["id"]) for result in cursor}
+
+    def __wait_loaded(self) -> None:
+        if not self.__loaded.done():
+            with self.timed("wait"):
+                self.__loaded.result()
+        self.__loaded.result()
+
+    def __sync(self) -> None:
+        # Wait for every write handed to the writer so far, surfacing any failures.
+        writes, self.__writes = self.__writes, []
+        with self.timed("wait"):
+            for write in writes:
+                write.result()
+
+    def __insert(self, table: str, rows: List[Dict[str, Any]]) -> None:
+        columns = list(rows[0].keys())
+        values = []
+        params: Dict[str, Any] = {}
+        for i, row in enumerate(rows):
+            values.append("(" + ", ".join(f":{col}_{i}" for col in columns) + ")")
+            for col in columns:
+                params[f"{col}_{i}"] = row[col]
+        sql = f"INSERT INTO `{table}` ({', '.join(columns)}) VALUES {', '.join(values)}"
+
+        with self.timed("db"):
+            try:
+                self.__session.execute(text(sql), params)
+            except IntegrityError:
+                raise Exception(
+                    f"The {table} table was changed by something else during this import, please run it again!"
+                )
+        self.__count("statements")
+
+    def __flush(self) -> None:
+        # Hand anything queued to the writer, a chunk at a time.
+        for table, pending in [
+            ("music", self.__pending_music),
+            ("catalog", self.__pending_catalog),
+        ]:
+            for start in range(0, len(pending), self.INSERT_CHUNK_SIZE):
+                self.__writes.append(
+                    self.__writer.submit(
+                        self.__insert,
+                        table,
+                        pending[start : (start + self.INSERT_CHUNK_SIZE)],
+                    )
+                )
+            pending.clear()
+
+    def __queue(self, pending: List[Dict[str, Any]], row: Dict[str, Any]) -> None:
+        if self.__config.database.read_only:
+            raise Exception("Read-only mode is active!")
+        pending.append(row)
+        self.__uncommitted += 1
+        if len(pending) >= self.INSERT_CHUNK_SIZE:
+            self.__flush()
+
+    def __commit(self) -> None:
+        self.__flush()
+
+        def commit() -> None:
+            with self.timed("db"):
+                if self.dry_run:
+                    # Nothing is committed until the very end, where it is rolled back.
+                    return
+                self.__session.commit()
+            self.__count("commits")
+
+        self.__writes.append(self.__writer.submit(commit))
+        self.__sync()
+        self.__uncommitted = 0
+        MusicData.invalidate_musicids(self.game, self.version)
+
     def start_batch(self) -> None:
         self.__batch = True
 
     def finish_batch(self) -> None:
-        self.__session.commit()
         self.__batch = False
+        if self.__uncommitted >= self.COMMIT_INTERVAL:
+            self.__commit()
 
     def execute(
         self, sql: str, params: Optional[Dict[str, Any]] = None
@@ -86,12 +244,35 @@ class ImportBase:
             ]:
                 if write_statement in sql.lower():
                     raise Exception("Read-only mode is active!")
-        return self.__session.execute(text(sql), params if params is not None else {})
+
+        def execute() -> CursorResult:
+            with self.timed("db"):
+                return self.__session.execute(
+                    text(sql), params if params is not None else {}
+                )
+
+        # Anything queued has to be written first, since this might depend on it.
+        self.__flush()
+        result = self.__writer.submit(execute)
+        self.__writes.append(result)
+        self.__sync()
+        self.__count("statements")
+        if any(
+            statement in sql.lower()
+            for statement in ["insert into ", "update ", "delete from "]
+        ):
+            self.__uncommitted += 1
+        return result.result()
 
     def remote_music(self, server: str, token: str) -> GlobalMusicData:
+        # Remote lookups happen while the writer may be busy, so they get their own
+        # connection to look up local data with.
+        if self.__remote_conn is None:
+            self.__remote_conn = self.__engine.connect()
+        session = self.__sessionmanager(bind=self.__remote_conn)
         api = ReadAPI(server, token)
-        user = UserData(self.__config, self.__session)
-        music = MusicData(self.__config, self.__session)
+        user = UserData(self.__config, session)
+        music = MusicData(self.__config, session)
         return GlobalMusicData(api, user, music)
 
     def remote_game(self, server: str, token: str) -> GlobalGameData:
@@ -99,13 +280,11 @@ class ImportBase:
         return GlobalGameData(api)
 
     def get_next_music_id(self) -> int:
-        cursor = self.execute("SELECT MAX(id) AS next_id FROM `music`")
-        result = cursor.fetchone()
-        try:
-            return result["next_id"] + 1
-        except TypeError:
-            # Nothing in DB
-            return 1
+        # IDs are handed out locally, based on the largest one in the DB when the import
+        # started. Like looking up the largest ID every time, asking again without
+        # inserting anything returns the same ID.
+        self.__wait_loaded()
+        return self.__max_music_id + 1
 
     def get_music_id_for_song(
         self, songid: int, chart: int, version: Optional[int] = None
@@ -116,26 +295,23 @@ class ImportBase:
                 raise Exception(
                     "Cannot get music ID for song when operating on all versions!"
                 )
-            version = self.version
-            sql = "SELECT id FROM `music` WHERE songid = :songid AND chart = :chart AND game = :game AND version != :version"
+            candidates = [
+                v for v in self.__music_versions(songid, chart) if v != self.version
+            ]
         else:
             # Specific version lookup
-            sql = "SELECT id FROM `music` WHERE songid = :songid AND chart = :chart AND game = :game AND version = :version"
+            candidates = [
+                v for v in self.__music_versions(songid, chart) if v == version
+            ]
 
-        cursor = self.execute(
-            sql,
-            {
-                "songid": songid,
-                "chart": chart,
-                "game": self.game.value,
-                "version": version,
-            },
-        )
-        if cursor.rowcount != 0:
-            result = cursor.fetchone()
-            return result["id"]
-        else:
+        if len(candidates) == 0:
             return None
+        # Prefer the oldest version, which is what the DB's index order would give us.
+        return self.__music_versions(songid, chart)[min(candidates)]
+
+    def __music_versions(self, songid: int, chart: int) -> Dict[int, int]:
+        self.__wait_loaded()
+        return self.__music.get((songid, chart), {})
 
     def get_music_id_for_song_data(
         self,
@@ -195,6 +371,8 @@ class ImportBase:
         data: Optional[Dict[str, Any]] = None,
         version: Optional[int] = None,
     ) -> None:
+        if not self.__batch:
+            raise Exception("Logic error, cannot execute outside of a batch!")
         version = version if version is not None else self.version
         if version is None:
             raise Exception(
@@ -204,26 +382,8 @@ class ImportBase:
             jsondata = "{}"
         else:
             jsondata = json.dumps(data)
-        try:
-            sql = (
-                "INSERT INTO `music` (id, songid, chart, game, version, name, artist, genre, data) "
-                + "VALUES (:id, :songid, :chart, :game, :version, :name, :artist, :genre, :data)"
-            )
-            self.execute(
-                sql,
-                {
-                    "id": musicid,
-                    "songid": songid,
-                    "chart": chart,
-                    "game": self.game.value,
-                    "version": version,
-                    "name": name,
-                    "artist": artist,
-                    "genre": genre,
-                    "data": jsondata,
-                },
-            )
-        except IntegrityError:
+
+        if version in self.__music_versions(songid, chart):
             if self.update:
                 print("Entry already existed, so updating information!")
                 self.update_metadata_for_song(
@@ -231,6 +391,25 @@ class ImportBase:
                 )
             else:
                 print("Entry already existed, so skip creating a second one!")
+            return
+
+        self.__queue(
+            self.__pending_music,
+            {
+                "id": musicid,
+                "songid": songid,
+                "chart": chart,
+                "game": self.game.value,
+                "version": version,
+                "name": name,
+                "artist": artist,
+                "genre": genre,
+                "data": jsondata,
+            },
+        )
+        self.__music.setdefault((songid, chart), {})[version] = musicid
+        self.__max_music_id = max(self.__max_music_id, musicid)
+        self.__count("music")
 
     def update_metadata_for_song(
         self,
@@ -324,26 +503,15 @@ class ImportBase:
         catid: int,
         data: Optional[Dict[str, Any]] = None,
     ) -> None:
+        if not self.__batch:
+            raise Exception("Logic error, cannot execute outside of a batch!")
         if data is None:
             jsondata = "{}"
         else:
             jsondata = json.dumps(data)
-        try:
-            sql = (
-                "INSERT INTO `catalog` (game, version, type, id, data) "
-                + "VALUES (:game, :version, :type, :id, :data)"
-            )
-            self.execute(
-                sql,
-                {
-                    "id": catid,
-                    "type": cattype,
-                    "game": self.game.value,
-                    "version": self.version,
-                    "data": jsondata,
-                },
-            )
-        except IntegrityError:
+
+        self.__wait_loaded()
+        if (cattype, catid) in self.__catalog:
             if self.update:
                 print("Entry already existed, so updating information!")
                 sql = (
@@ -362,23 +530,69 @@ class ImportBase:
                 )
             else:
                 print("Entry already existed, so skip creating a second one!")
+            return
+
+        self.__queue(
+            self.__pending_catalog,
+            {
+                "game": self.game.value,
+                "version": self.version,
+                "type": cattype,
+                "id": catid,
+                "data": jsondata,
+            },
+        )
+        self.__catalog.add((cattype, catid))
+        self.__count("catalog")
 
     def close(self) -> None:
         """
-        Close any open data connection.
+        Write anything still queued, close any open data connection and print a summary
+        of where the time went. On a dry run, everything is rolled back instead.
         """
         # Make sure we don't leak connections after finising insertion.
         if self.__batch:
             raise Exception("Logic error, opened a batch without closing!")
+        self.__wait_loaded()
+        self.__commit()
+        if self.dry_run:
+            self.__writer.submit(self.__session.rollback).result()
+        self.__writer.shutdown()
+        self.__print_summary()
+
         if self.__session is not None:
             self.__session.close()
         if self.__conn is not None:
             self.__conn.close()
             self.__conn = None
+        if self.__remote_conn is not None:
+            self.__remote_conn.close()
+            self.__remote_conn = None
         if self.__engine is not None:
             self.__engine.dispose()
             self.__engine = None
 
+    def __print_summary(self) -> None:
+        with self.__lock:
+            timings = dict(self.__timings)
+            counts = dict(self.__counts)
+        action = "Would have written" if self.dry_run else "Wrote"
+        print(
+            f"{action} {counts.get('music', 0)} music and {counts.get('catalog', 0)} "
+            + f"catalog entries using {counts.get('statements', 0)} statements and "
+            + f"{counts.get('commits', 0)} commits."
+        )
+        for stage, description in [
+            ("parse", "parsing game data"),
+            ("import", "importing parsed data"),
+            ("load", "loading existing entries, in the background"),
+            ("db", "running statements on the DB, in the background"),
+            ("wait", "waiting on the DB"),
+        ]:
+            if stage in timings:
+                print(f"  {timings[stage]:9.3f}s {description}")
+        print(f"  {time.monotonic() - self.__started:9.3f}s total")
+
 
 class ImportPopn(ImportBase):
     def __init__(
@@ -387,6 +601,7 @@ class ImportPopn(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         actual_version = {
             "19": VersionConstants.POPN_MUSIC_TUNE_STREET,
@@ -413,7 +628,12 @@ class ImportPopn(ImportBase):
             )
 
         super().__init__(
-            config, GameConstants.POPN_MUSIC, actual_version, no_combine, update
+            config,
+            GameConstants.POPN_MUSIC,
+            actual_version,
+            no_combine,
+            update,
+            dry_run,
         )
 
     def scrape(self, infile: str) -> List[Dict[str, Any]]:
@@ -1409,6 +1629,7 @@ class ImportJubeat(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         if version in ["saucer", "saucer-fulfill", "prop", "qubell", "clan", "festo"]:
             actual_version = {
@@ -1456,7 +1677,7 @@ class ImportJubeat(ImportBase):
             )
 
         super().__init__(
-            config, GameConstants.JUBEAT, actual_version, no_combine, update
+            config, GameConstants.JUBEAT, actual_version, no_combine, update, dry_run
         )
 
     def scrape(self, xmlfile: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
@@ -1793,6 +2014,7 @@ class ImportIIDX(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         if version in ["20", "21", "22", "23", "24", "25", "26"]:
             actual_version = {
@@ -1832,7 +2054,9 @@ class ImportIIDX(ImportBase):
                 "Unsupported IIDX version, expected one of the following: 20, 21, 22, 23, 24, 25, 26, omni-20, omni-21, omni-22, omni-23, omni-24, omni-25, omni-26!"
             )
 
-        super().__init__(config, GameConstants.IIDX, actual_version, no_combine, update)
+        super().__init__(
+            config, GameConstants.IIDX, actual_version, no_combine, update, dry_run
+        )
 
     def __gather_sound_files(self, directory: str) -> Dict[int, str]:
         files = {}
@@ -2016,14 +2240,11 @@ class ImportIIDX(ImportBase):
                             data = fp.read()
                             fp.close()
                         else:
-                            fp = open(filename, "rb")
-                            ifsdata = fp.read()
-                            fp.close()
-                            ifs = IFS(ifsdata)
-                            for fn in ifs.filenames:
-                                _, extension = os.path.splitext(fn)
-                                if extension == ".1":
-                                    data = ifs.read_file(fn)
+                            with IFS.open(filename) as ifs:
+                                for fn in ifs.filenames:
+                                    _, extension = os.path.splitext(fn)
+                                    if extension == ".1":
+                                        data = ifs.read_file(fn)
 
                         if data is not None:
                             iidxchart = IIDXChart(data)
@@ -2409,6 +2630,7 @@ class ImportDDR(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         if version in ["12", "13", "14", "15", "16"]:
             actual_version = {
@@ -2424,7 +2646,9 @@ class ImportDDR(ImportBase):
                 "Unsupported DDR version, expected one of the following: 12, 13, 14, 15, 16"
             )
 
-        super().__init__(config, GameConstants.DDR, actual_version, no_combine, update)
+        super().__init__(
+            config, GameConstants.DDR, actual_version, no_combine, update, dry_run
+        )
 
     def scrape(self, infile: str) -> List[Dict[str, Any]]:
         with open(infile, mode="rb") as myfile:
@@ -3110,6 +3334,7 @@ class ImportSDVX(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         actual_version = {
             "1": VersionConstants.SDVX_BOOTH,
@@ -3131,7 +3356,9 @@ class ImportSDVX(ImportBase):
                 "Unsupported SDVX version, expected one of the following: 1, 2, 3, 4!"
             )
 
-        super().__init__(config, GameConstants.SDVX, actual_version, no_combine, update)
+        super().__init__(
+            config, GameConstants.SDVX, actual_version, no_combine, update, dry_run
+        )
 
     def scrape(self, infile: str) -> List[Dict[str, Any]]:
         with open(infile, mode="rb") as myfile:
@@ -3475,6 +3702,7 @@ class ImportMuseca(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         if version in ["1", "1+1/2", "plus"]:
             actual_version = {
@@ -3495,7 +3723,7 @@ class ImportMuseca(ImportBase):
             )
 
         super().__init__(
-            config, GameConstants.MUSECA, actual_version, no_combine, update
+            config, GameConstants.MUSECA, actual_version, no_combine, update, dry_run
         )
 
     def import_music_db(self, xmlfile: str) -> None:
@@ -3617,6 +3845,7 @@ class ImportReflecBeat(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         # We always have 4 charts, even if we're importing from Colette and below,
         # so that we guarantee a stable song ID. We'll be in trouble if Reflec
@@ -3637,7 +3866,12 @@ class ImportReflecBeat(ImportBase):
             )
 
         super().__init__(
-            config, GameConstants.REFLEC_BEAT, actual_version, no_combine, update
+            config,
+            GameConstants.REFLEC_BEAT,
+            actual_version,
+            no_combine,
+            update,
+            dry_run,
         )
 
     def scrape(self, infile: str) -> List[Dict[str, Any]]:
@@ -3902,6 +4136,7 @@ class ImportDanceEvolution(ImportBase):
         version: str,
         no_combine: bool,
         update: bool,
+        dry_run: bool = False,
     ) -> None:
         if version in ["1"]:
             actual_version = 1
@@ -3911,7 +4146,12 @@ class ImportDanceEvolution(ImportBase):
             )
 
         super().__init__(
-            config, GameConstants.DANCE_EVOLUTION, actual_version, no_combine, update
+            config,
+            GameConstants.DANCE_EVOLUTION,
+            actual_version,
+            no_combine,
+            update,
+            dry_run,
         )
 
     def scrape(self, infile: str) -> List[Dict[str, Any]]:
@@ -4089,6 +4329,14 @@ if __name__ == "__main__":
         default=False,
         help="Overwrite data with updated values when it already exists.",
     )
+    parser.add_argument(
+        "--dry-run",
+        dest="dry_run",
+        action="store_true",
+        default=False,
+        help="Go through the whole import but roll back instead of saving anything, "
+        + "printing how long each stage took.",
+    )
     parser.add_argument(
         "--config",
         type=str,
@@ -4128,88 +4376,109 @@ if __name__ == "__main__":
         pass
 
     if series == GameConstants.POPN_MUSIC:
-        popn = ImportPopn(config, args.version, args.no_combine, args.update)
-        if args.bin:
-            songs = popn.scrape(args.bin)
-        elif args.server and args.token:
-            songs = popn.lookup(args.server, args.token)
-        else:
-            raise Exception(
-                "No game DLL provided and no remote server specified! Please "
-                + "provide either a --bin or a --server and --token option!"
-            )
-        popn.import_music_db(songs)
+        popn = ImportPopn(
+            config, args.version, args.no_combine, args.update, args.dry_run
+        )
+        with popn.timed("parse"):
+            if args.bin:
+                songs = popn.scrape(args.bin)
+            elif args.server and args.token:
+                songs = popn.lookup(args.server, args.token)
+            else:
+                raise Exception(
+                    "No game DLL provided and no remote server specified! Please "
+                    + "provide either a --bin or a --server and --token option!"
+                )
+        with popn.timed("import"):
+            popn.import_music_db(songs)
         popn.close()
 
     elif series == GameConstants.JUBEAT:
-        jubeat = ImportJubeat(config, args.version, args.no_combine, args.update)
+        jubeat = ImportJubeat(
+            config, args.version, args.no_combine, args.update, args.dry_run
+        )
         if args.tsv is not None:
             # Special case for Jubeat, grab the title/artist metadata that was
             # hand-populated since its not in the music DB.
-            jubeat.import_metadata(args.tsv)
+            with jubeat.timed("import"):
+                jubeat.import_metadata(args.tsv)
         else:
             # Normal case, doing a music DB or emblem import.
-            if args.xml is not None:
-                songs, emblems = jubeat.scrape(args.xml)
-            elif args.server and args.token:
-                songs, emblems = jubeat.lookup(args.server, args.token)
-            else:
-                raise Exception(
-                    "No music_info.xml or TSV provided and no remote server specified! Please "
-                    + "provide either a --xml, --tsv or a --server and --token option!"
-                )
-            jubeat.import_music_db(songs)
-            jubeat.import_emblems(emblems)
+            with jubeat.timed("parse"):
+                if args.xml is not None:
+                    songs, emblems = jubeat.scrape(args.xml)
+                elif args.server and args.token:
+                    songs, emblems = jubeat.lookup(args.server, args.token)
+                else:
+                    raise Exception(
+                        "No music_info.xml or TSV provided and no remote server specified! Please "
+                        + "provide either a --xml, --tsv or a --server and --token option!"
+                    )
+            with jubeat.timed("import"):
+                jubeat.import_music_db(songs)
+                jubeat.import_emblems(emblems)
         jubeat.close()
 
     elif series == GameConstants.IIDX:
-        iidx = ImportIIDX(config, args.version, args.no_combine, args.update)
+        iidx = ImportIIDX(
+            config, args.version, args.no_combine, args.update, args.dry_run
+        )
         if args.tsv is not None:
             # Special case for IIDX, grab the title/artist metadata that was
             # wrong in the music DB, and correct it.
-            iidx.import_metadata(args.tsv)
+            with iidx.timed("import"):
+                iidx.import_metadata(args.tsv)
         else:
             # Normal case, doing a music DB import.
-            if args.bin is not None:
-                songs, qpros = iidx.scrape(args.bin, args.assets)
-            elif args.server and args.token:
-                songs, qpros = iidx.lookup(args.server, args.token)
-            else:
-                raise Exception(
-                    "No music_data.bin or TSV provided and no remote server specified! Please "
-                    + "provide either a --bin, --tsv or a --server and --token option!"
-                )
-            iidx.import_music_db(songs)
-            iidx.import_qpros(qpros)
+            with iidx.timed("parse"):
+                if args.bin is not None:
+                    songs, qpros = iidx.scrape(args.bin, args.assets)
+                elif args.server and args.token:
+                    songs, qpros = iidx.lookup(args.server, args.token)
+                else:
+                    raise Exception(
+                        "No music_data.bin or TSV provided and no remote server specified! Please "
+                        + "provide either a --bin, --tsv or a --server and --token option!"
+                    )
+            with iidx.timed("import"):
+                iidx.import_music_db(songs)
+                iidx.import_qpros(qpros)
         iidx.close()
 
     elif series == GameConstants.DDR:
-        ddr = ImportDDR(config, args.version, args.no_combine, args.update)
-        if args.server and args.token:
-            songs = ddr.lookup(args.server, args.token)
-        else:
-            if args.version == "16":
-                if args.bin is None:
-                    raise Exception("No startup.arc provided!")
-                # DDR Ace has a different format altogether
-                songs = ddr.parse_xml(args.bin)
+        ddr = ImportDDR(
+            config, args.version, args.no_combine, args.update, args.dry_run
+        )
+        with ddr.timed("parse"):
+            if args.server and args.token:
+                songs = ddr.lookup(args.server, args.token)
             else:
-                if args.bin is None:
-                    raise Exception("No game DLL provided!")
-                if args.xml is None:
-                    raise Exception("No game music XML provided!")
-                # DDR splits the music DB between the DLL and external XML
-                # (Why??), so we must first scrape then hydrate with extra
-                # data to get the full DB.
-                songs = ddr.scrape(args.bin)
-                songs = ddr.hydrate(songs, args.xml)
-        ddr.import_music_db(songs)
+                if args.version == "16":
+                    if args.bin is None:
+                        raise Exception("No startup.arc provided!")
+                    # DDR Ace has a different format altogether
+                    songs = ddr.parse_xml(args.bin)
+                else:
+                    if args.bin is None:
+                        raise Exception("No game DLL provided!")
+                    if args.xml is None:
+                        raise Exception("No game music XML provided!")
+                    # DDR splits the music DB between the DLL and external XML
+                    # (Why??), so we must first scrape then hydrate with extra
+                    # data to get the full DB.
+                    songs = ddr.scrape(args.bin)
+                    songs = ddr.hydrate(songs, args.xml)
+        with ddr.timed("import"):
+            ddr.import_music_db(songs)
         ddr.close()
 
     elif series == GameConstants.SDVX:
-        sdvx = ImportSDVX(config, args.version, args.no_combine, args.update)
+        sdvx = ImportSDVX(
+            config, args.version, args.no_combine, args.update, args.dry_run
+        )
         if args.server and args.token:
-            sdvx.import_from_server(args.server, args.token)
+            with sdvx.timed("import"):
+                sdvx.import_from_server(args.server, args.token)
         else:
             if args.xml is None and args.bin is None and args.csv is None:
                 raise Exception(
@@ -4217,56 +4486,66 @@ if __name__ == "__main__":
                     + "no remote server specified! Please provide either a --xml, "
                     + "--bin, --csv or a --server and --token option!"
                 )
-            if args.xml is not None:
-                sdvx.import_music_db_or_appeal_cards(args.xml)
-            if args.bin is not None:
-                sdvx.import_catalog(args.bin)
-            if args.csv is not None:
-                sdvx.import_appeal_cards(args.csv)
+            with sdvx.timed("import"):
+                if args.xml is not None:
+                    sdvx.import_music_db_or_appeal_cards(args.xml)
+                if args.bin is not None:
+                    sdvx.import_catalog(args.bin)
+                if args.csv is not None:
+                    sdvx.import_appeal_cards(args.csv)
         sdvx.close()
 
     elif series == GameConstants.MUSECA:
-        museca = ImportMuseca(config, args.version, args.no_combine, args.update)
-        if args.server and args.token:
-            museca.import_from_server(args.server, args.token)
-        elif args.xml is not None:
-            museca.import_music_db(args.xml)
-        else:
-            raise Exception(
-                "No music-info.xml provided and no remote server specified! "
-                + "Please provide either a --xml or a --server and --token option!"
-            )
+        museca = ImportMuseca(
+            config, args.version, args.no_combine, args.update, args.dry_run
+        )
+        with museca.timed("import"):
+            if args.server and args.token:
+                museca.import_from_server(args.server, args.token)
+            elif args.xml is not None:
+                museca.import_music_db(args.xml)
+            else:
+                raise Exception(
+                    "No music-info.xml provided and no remote server specified! "
+                    + "Please provide either a --xml or a --server and --token option!"
+                )
         museca.close()
 
     elif series == GameConstants.REFLEC_BEAT:
-        reflec = ImportReflecBeat(config, args.version, args.no_combine, args.update)
-        if args.bin is not None:
-            songs = reflec.scrape(args.bin)
-        elif args.server and args.token:
-            songs = reflec.lookup(args.server, args.token)
-        else:
-            raise Exception(
-                "No game DLL provided and no remote server specified! "
-                + "Please provide either a --bin or a --server and --token option!"
-            )
-        reflec.import_music_db(songs)
+        reflec = ImportReflecBeat(
+            config, args.version, args.no_combine, args.update, args.dry_run
+        )
+        with reflec.timed("parse"):
+            if args.bin is not None:
+                songs = reflec.scrape(args.bin)
+            elif args.server and args.token:
+                songs = reflec.lookup(args.server, args.token)
+            else:
+                raise Exception(
+                    "No game DLL provided and no remote server specified! "
+                    + "Please provide either a --bin or a --server and --token option!"
+                )
+        with reflec.timed("import"):
+            reflec.import_music_db(songs)
         reflec.close()
 
     elif series == GameConstants.DANCE_EVOLUTION:
         danevo = ImportDanceEvolution(
-            config, args.version, args.no_combine, args.update
+            config, args.version, args.no_combine, args.update, args.dry_run
         )
-        if args.server and args.token:
-            songs = danevo.lookup(args.server, args.token)
-        elif args.bin is not None:
-            songs = danevo.scrape(args.bin)
-        else:
-            raise Exception(
-                "No resource_lists.arc provided and no remote server "
-                + "specified! Please provide either a --bin or a "
-                + "--server and --token option!",
-            )
-        danevo.import_music_db(songs)
+        with danevo.timed("parse"):
+            if args.server and args.token:
+                songs = danevo.lookup(args.server, args.token)
+            elif args.bin is not None:
+                songs = danevo.scrape(args.bin)
+            else:
+                raise Exception(
+                    "No resource_lists.arc provided and no remote server "
+                    + "specified! Please provide either a --bin or a "
+                    + "--server and --token option!",
+                )
+        with danevo.timed("import"):
+            danevo.import_music_db(songs)
         danevo.close()
 
     else:
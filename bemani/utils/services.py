@@ -1,10 +1,13 @@
 import argparse
 import traceback
-from flask import Flask, request, redirect, Response, make_response
+from typing import Callable, Optional
+from flask import Flask, request, redirect, Response, make_response, jsonify
 
+from bemani.common import Parallel, Profiler
 from bemani.protocol import EAmuseProtocol
-from bemani.backend import Dispatch, UnrecognizedPCBIDException
+from bemani.backend import Dispatch, DispatchTable, UnrecognizedPCBIDException
 from bemani.data import Config, Data
+from bemani.data.api.client import APIClient
 from bemani.utils.config import (
     load_config as base_load_config,
     register_games as base_register_games,
@@ -13,6 +16,22 @@ from bemani.utils.config import (
 
 app = Flask(__name__)
 config = Config()
+profiler: Optional[Profiler] = None
+
+
+@app.route("/profiling/stats", methods=["GET"])
+def receive_profiling_stats() -> Response:
+    # Only answer requests made directly to this process, not ones forwarded by a proxy.
+    local = request.remote_addr in {"127.0.0.1", "::1"}
+    if not local or "x-remote-address" in request.headers:
+        return Response("Not found", 404)
+    stats = profiler.stats() if profiler is not None else {}
+    stats["caches"] = Data.cache_stats()
+    stats["caches"]["federation"] = APIClient.cache_stats()
+    stats["pool"] = Data.pool_stats(config.database.engine)
+    stats["parallel"] = Parallel.stats()
+    stats["federation"] = APIClient.stats()
+    return jsonify(stats)
 
 
 @app.route("/", defaults={"path": ""}, methods=["GET"])
@@ -31,7 +50,15 @@ def receive_healthcheck(path: str) -> Response:
 @app.route("/", defaults={"path": ""}, methods=["POST"])
 @app.route("/<path:path>", methods=["POST"])
 def receive_request(path: str) -> Response:
-    proto = EAmuseProtocol()
+    if profiler is None:
+        return handle_request(None)
+    with profiler.request() as profile:
+        return handle_request(profile.add)
+
+
+def handle_request(timer: Optional[Callable[[str, float], None]]) -> Response:
+    global config
+    proto = EAmuseProtocol(xml_backend=config.server.xml_backend, timer=timer)
     remote_address = request.headers.get("x-remote-address", None)
     compression = request.headers.get("x-compress", None)
     encryption = request.headers.get("x-eamuse-info", None)
@@ -39,6 +66,7 @@ def receive_request(path: str) -> Response:
         compression,
         encryption,
         request.data,
+        lazy=True,
     )
 
     if req is None:
@@ -50,13 +78,13 @@ def receive_request(path: str) -> Response:
         return Response("Unrecognized packet!", 500)
 
     # Create and format config
-    global config
-    requestconfig = config.clone()
-    requestconfig["client"] = {
-        "address": remote_address or request.remote_addr,
-    }
+    requestconfig = config.overlay(
+        client={
+            "address": remote_address or request.remote_addr,
+        }
+    )
 
-    dataprovider = Data(requestconfig)
+    dataprovider = Data.shared(config)
     try:
         dispatch = Dispatch(requestconfig, dataprovider, config["verbose"])
         resp = dispatch.handle(req)
@@ -75,6 +103,7 @@ def receive_request(path: str) -> Response:
             compression,
             encryption,
             resp,
+            compression_level=config.server.compression_level,
         )
 
         response = make_response(data)
@@ -118,12 +147,24 @@ def receive_request(path: str) -> Response:
 def register_games() -> None:
     global config
     base_register_games(config)
+    DispatchTable.precompute()
 
 
 def load_config(filename: str) -> None:
     global config
+    global profiler
     base_load_config(filename, config)
 
+    if config.profiling.enabled:
+        profiler = Profiler(
+            slow_threshold=config.profiling.slow_threshold,
+            sample_rate=config.profiling.sample_rate,
+            profile_dir=config.profiling.profile_dir,
+            dump_file=config.profiling.dump_file,
+            dump_interval=config.profiling.dump_interval,
+        )
+        profiler.instrument_engine(config.database.engine)
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(